@@ -39,6 +39,7 @@ try:
     from src.utils.comprehensive_logger import ComprehensiveLogger, comprehensive_logger
     from src.utils.startup_logger import StartupLogger
     from src.utils.database_audit import create_audit_trail
+    from src.utils.blueprint_registry import blueprint_registry
 
 except ImportError as e:
     print(f"❌ Missing required dependencies: {e}")
@@ -437,7 +438,7 @@ def register_blueprints(app):
                 logger.info(f"ℹ️ Skipping blueprint {blueprint_name} (not available)")
                 continue
 
-            app.register_blueprint(blueprint)
+            blueprint_registry.register(app, blueprint)
             registered_count += 1
 
             # Log successful blueprint registration
@@ -461,6 +462,9 @@ def register_blueprints(app):
         failed=len(blueprints_to_register) - registered_count,
     )
 
+    # WARMUP_ROUTE_GROUPS=all|excel,pdf,... preloads heavy route dependencies
+    blueprint_registry.warmup_from_env()
+
 
 def register_error_handlers(app):
     """Register error handlers"""
@@ -71,7 +71,12 @@ class ProductionConfig:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
 
     # إعدادات الجلسة
-    SESSION_TYPE = "filesystem"
+    # Shared store so any node can serve any session (no sticky sessions)
+    SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "redis")
+    SESSION_REDIS_URL = os.environ.get("SESSION_REDIS_URL") or os.environ.get(
+        "REDIS_URL", "redis://localhost:5606/0"
+    )
+    SESSION_TYPE = "filesystem"  # only used with SESSION_BACKEND=filesystem
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
     SESSION_KEY_PREFIX = "inventory_"
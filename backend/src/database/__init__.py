@@ -9,8 +9,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from datetime import datetime
 
+from .sqlite_engine import RoutingSession, SQLiteEngineProfile
+
 # إنشاء كائن قاعدة البيانات
-db = SQLAlchemy()
+# RoutingSession يوجّه القراءات إلى مجمع القراءة عند تفعيل ملف SQLite
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
 logger = logging.getLogger(__name__)
@@ -38,6 +41,7 @@ def configure_database(app):
     # Check for DATABASE_URL from environment (Docker/Production)
     # This allows Docker Compose to use PostgreSQL while development uses SQLite
     database_url = os.environ.get("DATABASE_URL")
+    sqlite_profile = None
 
     if database_url:
         app.config["SQLALCHEMY_DATABASE_URI"] = database_url
@@ -65,11 +69,9 @@ def configure_database(app):
                     if parent_dir:
                         os.makedirs(parent_dir, exist_ok=True)
 
-            # SQLite-specific engine options
-            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-                "pool_pre_ping": True,
-                "pool_recycle": 300,
-            }
+            # SQLite-specific engine options (pooled, read/write split)
+            sqlite_profile = SQLiteEngineProfile()
+            sqlite_profile.configure(app)
         else:
             # Use PostgreSQL (Docker/Production)
             logger.info("✅ Using PostgreSQL from DATABASE_URL environment variable")
@@ -82,7 +84,7 @@ def configure_database(app):
             }
     else:
         # Fallback to SQLite for development
-        basedir = os.path.abspath(os.path.dirname(__file__))
+        basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         instance_dir = os.path.join(os.path.dirname(basedir), "instance")
 
         # إنشاء مجلد instance إذا لم يكن موجوداً
@@ -93,11 +95,9 @@ def configure_database(app):
         database_path = os.path.join(instance_dir, "inventory.db")
         app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{database_path}"
         logger.info(f"✅ Using SQLite for development: {database_path}")
-        # SQLite-specific engine options
-        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-            "pool_pre_ping": True,
-            "pool_recycle": 300,
-        }
+        # SQLite-specific engine options (pooled, read/write split)
+        sqlite_profile = SQLiteEngineProfile()
+        sqlite_profile.configure(app)
 
     # Common configuration for both database types
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
@@ -105,6 +105,8 @@ def configure_database(app):
     # تهيئة قاعدة البيانات مع التطبيق
     db.init_app(app)
     migrate.init_app(app, db)
+    if sqlite_profile is not None:
+        sqlite_profile.init_app(app, db)
 
     return db
 
@@ -439,7 +441,7 @@ def backup_database():
         import shutil
         from datetime import datetime
 
-        basedir = os.path.abspath(os.path.dirname(__file__))
+        basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         instance_dir = os.path.join(os.path.dirname(basedir), "instance")
 
         source_db = os.path.join(instance_dir, "inventory.db")
@@ -62,13 +62,26 @@ class ConnectionPoolConfig:
         "echo_pool": False,
     }
 
+    # SQLite file databases (branch deployments); see database.sqlite_engine
+    SQLITE = {
+        "poolclass": QueuePool,
+        "pool_size": 8,
+        "max_overflow": 4,
+        "pool_timeout": 30,
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+        "echo_pool": False,
+        "connect_args": {"check_same_thread": False, "timeout": 30},
+    }
+
     @classmethod
     def get_config(cls, environment: str = "development") -> Dict[str, Any]:
         """
         Get configuration for environment.
 
         Args:
-            environment: Environment name (development, production, testing, high_traffic)
+            environment: Environment name (development, production, testing,
+                high_traffic, sqlite)
 
         Returns:
             Pool configuration dictionary
@@ -78,6 +91,7 @@ class ConnectionPoolConfig:
             "production": cls.PRODUCTION,
             "testing": cls.TESTING,
             "high_traffic": cls.HIGH_TRAFFIC,
+            "sqlite": cls.SQLITE,
         }
 
         return configs.get(environment.lower(), cls.DEVELOPMENT)
@@ -152,6 +166,18 @@ class ConnectionPoolMonitor:
         """
         pool = self.engine.pool
 
+        # NullPool/StaticPool keep no counters
+        if not hasattr(pool, "size"):
+            return {
+                "size": 0,
+                "checked_in": 0,
+                "checked_out": 0,
+                "overflow": 0,
+                "total_connections": 0,
+                "utilization_percent": 0,
+                "pool_class": type(pool).__name__,
+            }
+
         return {
             "size": pool.size(),
             "checked_in": pool.checkedin(),
@@ -161,6 +187,7 @@ class ConnectionPoolMonitor:
             "utilization_percent": (
                 (pool.checkedout() / pool.size() * 100) if pool.size() > 0 else 0
             ),
+            "pool_class": type(pool).__name__,
         }
 
     def get_statistics(self) -> Dict[str, Any]:
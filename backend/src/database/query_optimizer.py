@@ -16,11 +16,16 @@ Features:
 
 import hashlib
 import pickle
+import re
+from collections import Counter
 from typing import Any, Optional, List, Callable, Dict
-from functools import wraps
+from functools import lru_cache, wraps
 from datetime import datetime, timedelta
 import logging
-from flask import g
+import time
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Query, joinedload, selectinload
 from database import db
 
@@ -334,33 +339,80 @@ def count_efficiently(query: Query) -> int:
 
 # Context manager for query tracking
 
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),  # string literals
+    (re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+"), "?"),  # driver placeholders
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),  # numeric literals
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),  # IN (...) / VALUES lists
+    (re.compile(r"\s+"), " "),
+]
+
+
+@lru_cache(maxsize=4096)
+def statement_fingerprint(statement: str) -> str:
+    """
+    Normalize a SQL statement so repeats differing only in values compare equal.
+
+    ``SELECT * FROM t WHERE id = 3`` and ``... id = ?`` both become
+    ``SELECT * FROM t WHERE id = ?``; IN lists of any length collapse to ``(?)``.
+    """
+    for pattern, replacement in _FINGERPRINT_RULES:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
 
 class QueryTracker:
-    """Track queries executed in a context."""
+    """Track queries executed in a context (nested trackers all see them)."""
 
     def __init__(self):
         self.queries: List[Dict[str, Any]] = []
+        self._outer: Optional["QueryTracker"] = None
 
     def __enter__(self):
         """Start tracking."""
+        self._outer = g.get("query_tracker")
         g.query_tracker = self
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Stop tracking."""
-        if hasattr(g, "query_tracker"):
+        """Stop tracking (the enclosing tracker, if any, becomes active again)."""
+        if self._outer is not None:
+            g.query_tracker = self._outer
+        elif hasattr(g, "query_tracker"):
             delattr(g, "query_tracker")
 
     def record_query(self, query: str, duration: float):
         """Record query execution."""
         self.queries.append(
-            {"query": query, "duration": duration, "timestamp": datetime.utcnow()}
+            {
+                "query": query,
+                "fingerprint": statement_fingerprint(query),
+                "duration": duration,
+                "timestamp": datetime.utcnow(),
+            }
         )
+        if self._outer is not None:
+            self._outer.record_query(query, duration)
+
+    def get_duplicates(self, min_count: int = 2) -> List[Dict[str, Any]]:
+        """
+        Statements repeated at least ``min_count`` times with different values,
+        the usual shape of an N+1 (one query per row of a parent list).
+        """
+        counts = Counter(q["fingerprint"] for q in self.queries)
+        times: Dict[str, float] = {}
+        for q in self.queries:
+            times[q["fingerprint"]] = times.get(q["fingerprint"], 0.0) + q["duration"]
+        return [
+            {"fingerprint": fp, "count": n, "total_time": times[fp]}
+            for fp, n in counts.most_common()
+            if n >= min_count
+        ]
 
     def get_summary(self) -> Dict[str, Any]:
         """Get query summary."""
         if not self.queries:
-            return {"count": 0, "total_time": 0.0, "avg_time": 0.0}
+            return {"count": 0, "total_time": 0.0, "avg_time": 0.0, "duplicates": []}
 
         total_time = sum(q["duration"] for q in self.queries)
 
@@ -369,4 +421,22 @@ class QueryTracker:
             "total_time": total_time,
             "avg_time": total_time / len(self.queries),
             "queries": self.queries,
+            "duplicates": self.get_duplicates(),
         }
+
+
+# Feed the active QueryTracker (if any) from every engine
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _track_query_start(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and hasattr(g, "query_tracker"):
+        # per execution: a statement that fails leaves nothing behind
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _track_query_end(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is not None and has_app_context() and hasattr(g, "query_tracker"):
+        g.query_tracker.record_query(statement, time.perf_counter() - start)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite Engine Profile
+=====================
+
+Pooled SQLite setup for branch deployments.
+
+Features:
+- Real connection pools instead of NullPool (pragmas run once per connection)
+- Per-connection pragmas: WAL, cache_size, mmap_size, temp_store, autocheckpoint
+- One serialized writer connection (BEGIN IMMEDIATE) + pool of read-only readers
+  (reads of GET/HEAD requests only; read-modify-write flows stay on the writer)
+- Retry with backoff when BEGIN hits SQLITE_BUSY
+- Pool statistics through ConnectionPoolMonitor
+"""
+
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import TextClause
+
+from .connection_pool import ConnectionPoolConfig, ConnectionPoolMonitor
+
+logger = logging.getLogger(__name__)
+
+# Requests whose reads may go to the read-only pool. Reads of other requests
+# (and of code outside requests) usually feed a write, so they stay on the
+# writer: its BEGIN IMMEDIATE transaction keeps read-modify-write atomic.
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Pragmas applied to every new physical connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms
+    "cache_size": -64000,  # negative = KiB -> 64 MB page cache per connection
+    "mmap_size": 268435456,  # 256 MB memory mapped I/O
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 1000,  # pages
+}
+
+_busy_stats = {"retries": 0, "failures": 0}
+_busy_lock = threading.Lock()
+
+# Whether the current thread holds an open BEGIN IMMEDIATE transaction
+_writer_state = threading.local()
+_IMMEDIATE_KEY = "_sqlite_begin_immediate"
+_NESTED_KEY = "_sqlite_nested_writer"
+
+
+def is_file_database(database_url: str) -> bool:
+    """Read/write splitting only makes sense for on-disk databases."""
+    return (
+        database_url.startswith("sqlite")
+        and bool(make_url(database_url).database)
+        and ":memory:" not in database_url
+        and "mode=memory" not in database_url
+    )
+
+
+def _is_busy_error(exc: BaseException) -> bool:
+    message = str(exc).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def begin_immediate(dbapi_connection, retries: int = 5, base_delay: float = 0.05):
+    """
+    Start a write transaction, retrying on SQLITE_BUSY.
+
+    Retrying is safe here because nothing has been executed in the
+    transaction yet; the writer lock is taken up-front so the transaction can
+    never fail half-way with a lock upgrade error.
+    """
+    for attempt in range(retries + 1):
+        try:
+            dbapi_connection.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not _is_busy_error(e) or attempt == retries:
+                with _busy_lock:
+                    _busy_stats["failures"] += 1
+                raise
+            with _busy_lock:
+                _busy_stats["retries"] += 1
+            # Exponential backoff with jitter
+            time.sleep(base_delay * (2**attempt) * (0.5 + random.random()))
+
+
+def _apply_pragmas(dbapi_connection, pragmas: Dict[str, Any], read_only: bool):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _install_listeners(
+    engine: Engine, pragmas: Dict[str, Any], read_only: bool, busy_retries: int
+):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):  # noqa: ARG001
+        # Take over transaction control from pysqlite so BEGIN can be IMMEDIATE
+        dbapi_connection.isolation_level = None
+        _apply_pragmas(dbapi_connection, pragmas, read_only)
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        if read_only:
+            conn.exec_driver_sql("BEGIN")
+            return
+        if getattr(_writer_state, "active", False):
+            # Nested writer connection: this thread already holds the write
+            # lock, so a write here would wait busy_timeout on itself. Take a
+            # read-only snapshot so reads work and writes fail immediately.
+            conn.exec_driver_sql("PRAGMA query_only=ON")
+            conn.info[_NESTED_KEY] = True
+            conn.exec_driver_sql("BEGIN")
+            return
+        begin_immediate(conn.connection.driver_connection, retries=busy_retries)
+        conn.info[_IMMEDIATE_KEY] = True
+        _writer_state.active = True
+
+    if read_only:
+        return
+
+    def _release(info, dbapi_connection):
+        if info.pop(_NESTED_KEY, False):
+            dbapi_connection.execute("PRAGMA query_only=OFF")
+        if info.pop(_IMMEDIATE_KEY, False):
+            _writer_state.active = False
+
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn):
+        _release(conn.info, conn.connection.driver_connection)
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn):
+        _release(conn.info, conn.connection.driver_connection)
+
+    @event.listens_for(engine, "reset")
+    def _on_reset(dbapi_connection, connection_record, reset_state):  # noqa: ARG001
+        # Connection returned to the pool without an explicit commit/rollback
+        _release(connection_record.info, dbapi_connection)
+
+
+def sqlite_engine_options(
+    read_only: bool = False, pool_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Engine options for the writer or the read-only pool.
+
+    Args:
+        read_only: Build options for the reader pool
+        pool_size: Override reader pool size (writer keeps a single connection)
+
+    Returns:
+        Options dictionary for create_engine / SQLALCHEMY_ENGINE_OPTIONS
+    """
+    options = dict(ConnectionPoolConfig.SQLITE)
+    options["connect_args"] = dict(options["connect_args"])
+    if read_only:
+        options["pool_size"] = pool_size or options["pool_size"]
+    else:
+        # One persistent writer connection; the small overflow only exists so
+        # code that opens db.engine inside a session transaction cannot
+        # deadlock on the pool. Write transactions still serialize on
+        # BEGIN IMMEDIATE.
+        options["pool_size"] = 1
+        options["max_overflow"] = 2
+    return options
+
+
+class SQLiteEngineProfile:
+    """Configure a Flask app for pooled SQLite with a read/write split."""
+
+    def __init__(
+        self,
+        read_pool_size: Optional[int] = None,
+        pragmas: Optional[Dict[str, Any]] = None,
+        busy_retries: int = 5,
+        split_reads: bool = True,
+    ):
+        self.read_pool_size = read_pool_size
+        self.pragmas = {**SQLITE_PRAGMAS, **(pragmas or {})}
+        self.busy_retries = busy_retries
+        self.split_reads = split_reads
+        self.monitors: Dict[str, ConnectionPoolMonitor] = {}
+        self.reader: Optional[Engine] = None
+
+    def configure(self, app):
+        """Set engine options; call before db.init_app(app)."""
+        if is_file_database(app.config["SQLALCHEMY_DATABASE_URI"]):
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = sqlite_engine_options()
+        # In-memory databases are per-connection: Flask-SQLAlchemy already keeps
+        # them on one static connection, which rejects pool sizing options
+
+    def init_app(self, app, db):
+        """Install pragma/BEGIN listeners and pool monitors; call after db.init_app."""
+        with app.app_context():
+            writer = db.engines[None]
+        _install_listeners(writer, self.pragmas, False, self.busy_retries)
+        self.monitors["writer"] = ConnectionPoolMonitor(writer)
+
+        if self.split_reads and is_file_database(app.config["SQLALCHEMY_DATABASE_URI"]):
+            # A private engine rather than a SQLALCHEMY_BINDS entry: binds add
+            # metadata to the shared db object and break create_all elsewhere.
+            self.reader = create_engine(
+                writer.url, **sqlite_engine_options(True, self.read_pool_size)
+            )
+            _install_listeners(self.reader, self.pragmas, True, self.busy_retries)
+            self.monitors["reader"] = ConnectionPoolMonitor(self.reader)
+
+        app.extensions["sqlite_profile"] = self
+        logger.info(
+            "SQLite profile installed (read pool: %s)",
+            "on" if "reader" in self.monitors else "off",
+        )
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Pool statistics for the writer and reader engines."""
+        stats = {name: mon.get_statistics() for name, mon in self.monitors.items()}
+        stats["busy"] = get_busy_stats()
+        return stats
+
+
+def get_busy_stats() -> Dict[str, int]:
+    with _busy_lock:
+        return dict(_busy_stats)
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends plain reads to the read-only pool.
+
+    Only reads of GET/HEAD/OPTIONS requests are split off: anywhere else a
+    SELECT is typically the first half of a read-modify-write (stock,
+    balances) and must run in the writer's transaction to avoid lost updates.
+    Flushes, DML, ``FOR UPDATE`` selects and non-SELECT text go to the writer;
+    once a transaction has written, the session sticks to the writer until it
+    ends so it always reads its own uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return engine
+
+        profile = current_app.extensions.get("sqlite_profile")
+        reader = profile.reader if profile is not None else None
+        if reader is None or engine is not self._db.engines.get(None):
+            return engine
+
+        if self._flushing or self.info.get("_wrote") or not _is_plain_read(clause):
+            self.info["_wrote"] = True
+            return engine
+        if not (has_request_context() and request.method in READ_ONLY_METHODS):
+            return engine
+        return reader
+
+
+def _is_plain_read(clause) -> bool:
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None
+    if isinstance(clause, TextClause):
+        words = clause.text.split(None, 1)
+        return bool(words) and words[0].upper() == "SELECT"
+    return False
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_write_affinity(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("_wrote", None)
@@ -575,6 +575,7 @@ class FileEncryption:
                     "file_size": file_path.stat().st_size,
                     "upload_time": datetime.now().isoformat(),
                     "file_hash": file_hash,
+                    "encryption_format": "sef1",
                 }
 
                 info_file = encrypted_file_path.with_suffix(".info")
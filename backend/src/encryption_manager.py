@@ -21,6 +21,11 @@ from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPubl
 # من cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 import bcrypt
 
+try:
+    from src.utils.stream_encryption import StreamCipher, StreamDecryptionError
+except ImportError:
+    from utils.stream_encryption import StreamCipher, StreamDecryptionError
+
 
 class EncryptionManager:
     """مدير التشفير الشامل"""
@@ -33,6 +38,8 @@ class EncryptionManager:
         # تحميل أو إنشاء المفاتيح
         self.master_key = self.load_or_generate_master_key()
         self.fernet = Fernet(self.master_key)
+        # تشفير الملفات على دفعات (AES-256-GCM) بذاكرة ثابتة
+        self.stream_cipher = StreamCipher(self.master_key)
         (self.rsa_private_key, self.rsa_public_key) = self.load_or_generate_rsa_keys()
 
     def load_or_generate_master_key(self):
@@ -222,7 +229,7 @@ class EncryptionManager:
             return None
 
     def encrypt_file(self, file_path, output_path=None):
-        """تشفير ملف"""
+        """تشفير ملف (بصيغة SEF1 المتدفقة - لا يُقرأ الملف كاملاً في الذاكرة)"""
         file_path = Path(file_path)
 
         if not file_path.exists():
@@ -235,13 +242,7 @@ class EncryptionManager:
             output_path = Path(output_path)
 
         try:
-            with open(file_path, "rb") as f:
-                file_data = f.read()
-
-            encrypted_data = self.fernet.encrypt(file_data)
-
-            with open(output_path, "wb") as f:
-                f.write(encrypted_data)
+            self.stream_cipher.encrypt_file(file_path, output_path)
 
             print(f"✅ تم تشفير الملف: {file_path} -> {output_path}")
             return True
@@ -251,7 +252,7 @@ class EncryptionManager:
             return False
 
     def decrypt_file(self, encrypted_file_path, output_path=None):
-        """فك تشفير ملف"""
+        """فك تشفير ملف (SEF1 أو ملفات Fernet القديمة)"""
         encrypted_file_path = Path(encrypted_file_path)
 
         if not encrypted_file_path.exists():
@@ -266,18 +267,12 @@ class EncryptionManager:
             output_path = Path(output_path)
 
         try:
-            with open(encrypted_file_path, "rb") as f:
-                encrypted_data = f.read()
-
-            decrypted_data = self.fernet.decrypt(encrypted_data)
-
-            with open(output_path, "wb") as f:
-                f.write(decrypted_data)
+            self.stream_cipher.decrypt_file(encrypted_file_path, output_path)
 
             print(f"✅ تم فك تشفير الملف: {encrypted_file_path} -> {output_path}")
             return True
 
-        except (ValueError, TypeError, OSError, InvalidToken) as e:
+        except (ValueError, TypeError, OSError, InvalidToken, StreamDecryptionError) as e:
             print(f"❌ خطأ في فك تشفير الملف: {e}")
             return False
 
@@ -345,6 +340,7 @@ class EncryptionManager:
         """الحصول على معلومات التشفير"""
         return {
             "symmetric_algorithm": "Fernet (AES 128)",
+            "file_encryption": "SEF1 chunked AES-256-GCM (streaming)",
             "asymmetric_algorithm": "RSA 2048",
             "password_hashing": "bcrypt (rounds=12)",
             "key_derivation": "PBKDF2-HMAC-SHA256",
@@ -16,6 +16,11 @@ from pathlib import Path
 from functools import wraps
 import traceback
 
+try:
+    from src.utils.log_pipeline import log_pipeline
+except ImportError:
+    from utils.log_pipeline import log_pipeline
+
 
 class AdvancedLogger:
     def __init__(self, log_dir="../../logs"):
@@ -72,10 +77,10 @@ class AdvancedLogger:
             "%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
         )
 
-        # File handler
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        # File handler - الكتابة تتم في خيط خلفي عبر log_pipeline
+        file_handler = logging.FileHandler(log_file, encoding="utf-8", delay=True)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        log_pipeline.attach(logger, file_handler)
 
         return logger
 
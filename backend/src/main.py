@@ -11,11 +11,14 @@
 All linting disabled due to complex imports and optional dependencies.
 """
 
+import logging
 import os
 import sys
 import time
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
 # DON'T CHANGE THIS !!! - Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
@@ -134,6 +137,8 @@ blueprints_to_import = [
     ("routes.comprehensive_reports", "comprehensive_reports_bp"),
 ]
 blueprints_to_import.append(("routes.rag", "rag_bp"))
+blueprints_to_import.append(("routes.images", "images_bp"))
+blueprints_to_import.append(("routes.metrics", "metrics_bp"))
 blueprints_to_import.append(("routes.external_integration", "ext_bp"))
 
 # OpenAPI documentation blueprints
@@ -151,18 +156,16 @@ blueprints_to_import.append(("routes.users_smorest", "users_smorest_bp"))
 blueprints_to_import.append(("routes.partners_smorest", "partners_smorest_bp"))
 
 
-imported_blueprints = {}
-for module_name, bp_name in blueprints_to_import:
-    try:
-        module = __import__(module_name, fromlist=[bp_name])
-        imported_blueprints[bp_name] = getattr(module, bp_name)
-        print(f"✅ Imported {bp_name} from {module_name}")
-    except ImportError as e:
-        print(f"⚠️ Warning: {module_name} not available - {e}")
-        imported_blueprints[bp_name] = None
-    except AttributeError as e:
-        print(f"⚠️ Warning: {bp_name} not found in {module_name} - {e}")
-        imported_blueprints[bp_name] = None
+# Heavy route dependencies (pandas, openpyxl, reportlab, ...) are imported
+# lazily; the registry warms them per route group on first use.
+from src.utils.blueprint_registry import blueprint_registry  # noqa: E402
+
+imported_blueprints = blueprint_registry.import_all(blueprints_to_import)
+for bp_name, blueprint in imported_blueprints.items():
+    if blueprint is None:
+        logger.warning(
+            "Blueprint %s not available - %s", bp_name, blueprint_registry.failed.get(bp_name)
+        )
 
 # Extract core blueprints
 user_bp = imported_blueprints.get("user_bp")
@@ -218,6 +221,8 @@ ext_bp = imported_blueprints.get("ext_bp")
 
 products_advanced_bp = imported_blueprints.get("products_advanced_bp")
 rag_bp = imported_blueprints.get("rag_bp")
+images_bp = imported_blueprints.get("images_bp")
+metrics_bp = imported_blueprints.get("metrics_bp")
 
 # Extract newly created blueprints
 accounting_bp = imported_blueprints.get("accounting_bp")
@@ -660,12 +665,6 @@ try:
 except Exception as _e:  # pragma: no cover
     print("⚠️ Could not register OpenAPI blueprints:", _e)
 
-# إعداد Flask-Session إذا كان متاحاً
-if SESSION_AVAILABLE and Session is not None:
-    Session(app)
-    print("✅ Flask-Session initialized successfully")
-else:
-    print("⚠️ Using Flask default session management")
 # Initialize Flask-Login (some modules use flask_login.login_required)
 try:
     from flask_login import LoginManager
@@ -700,6 +699,15 @@ if CSP_NONCE_AVAILABLE and init_csp_nonce:
 else:
     print("⚠️ CSP nonce middleware not available")
 
+# P1.33: Scan uploads while they are received (imports, logos, images)
+try:
+    from src.utils.file_scanner import init_file_scanner
+
+    init_file_scanner(app)
+    print("✅ P1.33: Streaming upload scanner initialized")
+except Exception as _e:  # noqa: BLE001
+    print(f"⚠️ Upload scanner failed to initialize: {_e}")
+
 # تسجيل blueprints الأساسية
 print("📋 تسجيل blueprints...")
 
@@ -715,13 +723,13 @@ core_blueprints = [
 for blueprint, prefix, name in core_blueprints:
     if blueprint is not None:
         try:
-            app.register_blueprint(blueprint, url_prefix=prefix)
+            blueprint_registry.register(app, blueprint, url_prefix=prefix)
             registered_count += 1
-            print(f"✅ Registered {name} blueprint")
+            logger.debug("Registered %s blueprint", name)
         except Exception as e:
-            print(f"❌ Error registering {name}: {e}")
+            logger.error("Error registering %s: %s", name, e)
     else:
-        print(f"⚠️ Core blueprint {name} not available")
+        logger.warning("Core blueprint %s not available", name)
 
 # Optional blueprints (with error handling)
 blueprints_to_register = [
@@ -759,20 +767,25 @@ blueprints_to_register = [
     (payment_management_bp, "/api", "payment_management"),
     (products_advanced_bp, "/api", "products_advanced"),
     (rag_bp, "/api", "rag"),
+    (images_bp, "", "images"),
+    (metrics_bp, "", "metrics"),
 ]
 
 for blueprint, prefix, name in blueprints_to_register:
     try:
         if blueprint is not None:
-            app.register_blueprint(blueprint, url_prefix=prefix)
+            blueprint_registry.register(app, blueprint, url_prefix=prefix)
             registered_count += 1
-            print(f"✅ Registered optional {name} blueprint")
+            logger.debug("Registered optional %s blueprint", name)
         else:
-            print(f"⚠️ Optional blueprint {name} not available")
+            logger.debug("Optional blueprint %s not available", name)
     except Exception as e:
-        print(f"❌ Error registering {name}: {e}")
+        logger.error("Error registering %s: %s", name, e)
 
-print(f"✅ تم تسجيل {registered_count} blueprint")
+logger.info("تم تسجيل %d blueprint", registered_count)
+
+# WARMUP_ROUTE_GROUPS=all|excel,pdf,... preloads heavy route dependencies
+blueprint_registry.warmup_from_env()
 
 # إعداد قاعدة البيانات
 # Use instance folder for database to match existing setup
@@ -781,33 +794,14 @@ os.makedirs(instance_path, exist_ok=True)
 db_path = os.path.join(instance_path, "inventory.db")
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-# SQLite locking and performance tuning for SQLAlchemy engine
+# SQLite locking and performance tuning: pooled connections with per-connection
+# pragmas, one serialized writer plus a read-only pool (see database/sqlite_engine.py)
+sqlite_profile = None
 try:
-    import sqlite3
-    from sqlalchemy import event
-    from sqlalchemy.engine import Engine
-    from sqlalchemy.pool import NullPool
-
-    # Use NullPool to avoid long-held pooled connections on SQLite
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "poolclass": NullPool,
-        "connect_args": {
-            "check_same_thread": False,  # allow access across threads used by Flask dev server
-            "timeout": 30,  # avoid immediate lock errors
-        },
-    }
-
-    @event.listens_for(Engine, "connect")
-    def _set_sqlite_pragma(dbapi_connection, connection_record):  # noqa: ARG001
-        if isinstance(dbapi_connection, sqlite3.Connection):
-            cursor = dbapi_connection.cursor()
-            try:
-                cursor.execute("PRAGMA journal_mode=WAL")
-                cursor.execute("PRAGMA synchronous=NORMAL")
-                cursor.execute("PRAGMA busy_timeout=5000")
-            finally:
-                cursor.close()
+    from src.database.sqlite_engine import SQLiteEngineProfile
 
+    sqlite_profile = SQLiteEngineProfile()
+    sqlite_profile.configure(app)
 except Exception as e:  # noqa: BLE001
     print(f"⚠️ SQLite tuning not applied: {e}")
 
@@ -816,6 +810,8 @@ except Exception as e:  # noqa: BLE001
 if db is not None:
     try:
         db.init_app(app)
+        if sqlite_profile is not None:
+            sqlite_profile.init_app(app, db)
         print(f"✅ Database initialized: {db_path}")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
@@ -894,6 +890,52 @@ with app.app_context():
     else:
         print("⚠️ Database not available - skipping table creation")
 
+# Server-side sessions in SQL or Redis (SESSION_BACKEND=sql|redis|filesystem)
+try:
+    from src.middleware.session_store import init_session_store
+
+    init_session_store(app)
+    print(f"✅ Session store initialized: {type(app.session_interface).__name__}")
+except Exception as e:  # noqa: BLE001
+    print(f"⚠️ Using Flask default session management: {e}")
+
+# Per-request SQL profiling: Server-Timing, N+1 warnings, query budgets
+try:
+    from src.middleware.query_profiler import init_query_profiler
+
+    if init_query_profiler(app) is not None:
+        print("✅ Query profiler initialized")
+except Exception as e:  # noqa: BLE001
+    print(f"⚠️ Query profiler not initialized: {e}")
+
+# Per-route latency histograms (p50/p95/p99) and Prometheus gauges;
+# PROMETHEUS_MULTIPROC_DIR aggregates all gunicorn workers
+try:
+    from src.services.metrics import init_metrics
+
+    init_metrics(app)
+    print("✅ Metrics initialized: /metrics")
+except Exception as e:  # noqa: BLE001
+    print(f"⚠️ Metrics not initialized: {e}")
+
+# Semantic index of ERP records for RAG (RAG_RECORD_INDEX_ENABLED=1)
+try:
+    from src.services.record_index import init_record_index
+
+    if init_record_index(app) is not None:
+        print("✅ Record index enabled")
+except Exception as e:  # noqa: BLE001
+    print(f"⚠️ Record index not enabled: {e}")
+
+# Barcode / QR rendering (cached, ETag) and batch label sheets
+try:
+    from src.utils.barcode_generator import init_barcode_routes
+
+    init_barcode_routes(app)
+    print("✅ Barcode routes registered")
+except Exception as e:  # noqa: BLE001
+    print(f"⚠️ Barcode routes not registered: {e}")
+
 
 # Health check endpoint
 @app.route("/api/health", methods=["GET"])
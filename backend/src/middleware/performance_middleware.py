@@ -6,11 +6,14 @@ Adds caching, compression, and performance monitoring
 from flask import request, make_response, g
 from functools import wraps
 import time
+import threading
 import gzip
 import io
 import hashlib
 from typing import Any, Callable
 
+from src.services.metrics import LatencySketch
+
 # Simple in-memory cache (use Redis in production)
 _cache = {}
 _cache_ttl = {}
@@ -218,17 +221,36 @@ class PerformanceMonitor:
     """Monitor application performance"""
 
     def __init__(self):
-        self.metrics = {"requests": 0, "total_time": 0, "slow_requests": []}
+        self.metrics = {
+            "requests": 0,
+            "total_time": 0,
+            "total_queries": 0,
+            "total_db_time": 0,
+            "slow_requests": [],
+        }
+        # fixed-memory latency distribution (p50/p95/p99 within 1%)
+        self.latency = LatencySketch()
+        self._latency_lock = threading.Lock()  # the sketch is not thread-safe
 
-    def record_request(self, path, duration):
-        """Record request metrics"""
+    def record_request(self, path, duration, queries=None, db_time=None):
+        """Record request metrics (SQL count/time when the query profiler is on)"""
         self.metrics["requests"] += 1
         self.metrics["total_time"] += duration
+        self.metrics["total_queries"] += queries or 0
+        self.metrics["total_db_time"] += db_time or 0
+        with self._latency_lock:
+            self.latency.add(duration)
 
         # Track slow requests (> 1 second)
         if duration > 1.0:
             self.metrics["slow_requests"].append(
-                {"path": path, "duration": duration, "timestamp": time.time()}
+                {
+                    "path": path,
+                    "duration": duration,
+                    "queries": queries,
+                    "db_time": db_time,
+                    "timestamp": time.time(),
+                }
             )
 
             # Keep only last 100 slow requests
@@ -240,9 +262,16 @@ class PerformanceMonitor:
         if self.metrics["requests"] == 0:
             return {"average_time": 0, "total_requests": 0}
 
+        with self._latency_lock:
+            p50, p95, p99 = (self.latency.quantile(q) for q in (0.5, 0.95, 0.99))
         return {
             "total_requests": self.metrics["requests"],
             "average_time": self.metrics["total_time"] / self.metrics["requests"],
+            "average_queries": self.metrics["total_queries"] / self.metrics["requests"],
+            "average_db_time": self.metrics["total_db_time"] / self.metrics["requests"],
+            "p50_time": p50,
+            "p95_time": p95,
+            "p99_time": p99,
             "slow_requests_count": len(self.metrics["slow_requests"]),
             "recent_slow_requests": self.metrics["slow_requests"][-10:],
         }
@@ -0,0 +1,269 @@
+"""
+مراقبة استعلامات قاعدة البيانات لكل طلب
+Request-level SQL profiler, N+1 detector and query budgets
+
+Every request gets a ``RequestProfile`` (a ``QueryTracker`` fed by the
+engine-wide ``before/after_cursor_execute`` listeners in
+``database/query_optimizer.py``):
+
+- ``Server-Timing: db;dur=..;desc="N queries", app;dur=..`` on responses,
+  so browser dev tools show SQL time next to the request (debug and testing
+  apps only, unless ``QUERY_PROFILER_SERVER_TIMING`` is set).
+- Statements repeated ``QUERY_PROFILER_N_PLUS_ONE`` times or more with
+  different values (same fingerprint) are logged as a probable N+1.
+- Slow requests (``QUERY_PROFILER_SLOW_MS``) are logged with their statement
+  list, sampled at ``QUERY_PROFILER_SLOW_SAMPLE_RATE``.
+- Endpoints declare a budget with ``@query_budget(max_queries, max_duplicates)``
+  (or ``QUERY_BUDGETS = {"endpoint": n}``); overruns are logged here and fail
+  tests through the ``tests/query_budget.py`` pytest plugin.
+
+Request totals go to ``performance_monitor`` and per-statement timings to a
+process-wide ``QueryStats``.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app, g, request
+
+from src.database.performance_analyzer import QueryStats
+from src.database.query_optimizer import QueryTracker
+from src.middleware.performance_middleware import performance_monitor
+
+logger = logging.getLogger(__name__)
+
+_TRUTHY = ("1", "true", "yes", "on")
+SLOW_LOG_MAX_STATEMENTS = 50
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """
+    Most queries a request may issue, and how many times beyond the first
+    one statement may be repeated (``max_duplicates=0``: every statement once).
+    """
+
+    max_queries: Optional[int] = None
+    max_duplicates: Optional[int] = None
+
+    def check(self, profile: "RequestProfile") -> List[str]:
+        """Violation messages for ``profile`` (empty when within budget)."""
+        problems = []
+        where = f"{profile.method} {profile.path} ({profile.endpoint})"
+        if self.max_queries is not None and profile.count > self.max_queries:
+            problems.append(
+                f"{where}: {profile.count} queries > budget {self.max_queries}"
+            )
+        if self.max_duplicates is not None:
+            for dup in profile.get_duplicates(self.max_duplicates + 2):
+                problems.append(
+                    f"{where}: statement run {dup['count']}x "
+                    f"(max duplicates {self.max_duplicates}): {dup['fingerprint'][:200]}"
+                )
+        return problems
+
+
+def query_budget(max_queries: Optional[int] = None, max_duplicates: Optional[int] = None):
+    """
+    Declare the query budget of a view.
+
+    Usage:
+        @products_bp.route("/api/products")
+        @query_budget(4, max_duplicates=1)
+        def get_products(): ...
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func._query_budget = QueryBudget(max_queries, max_duplicates)
+        return func
+
+    return decorator
+
+
+class RequestProfile(QueryTracker):
+    """Queries of one request plus its timing and declared budget."""
+
+    def __init__(self, method: str, path: str, endpoint: Optional[str] = None):
+        super().__init__()
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.budget: Optional[QueryBudget] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def db_time(self) -> float:
+        return sum(q["duration"] for q in self.queries)
+
+    def violations(self) -> List[str]:
+        return self.budget.check(self) if self.budget else []
+
+    def server_timing(self) -> str:
+        total = (self.duration or 0.0) * 1000
+        db_ms = self.db_time * 1000
+        return (
+            f'db;dur={db_ms:.2f};desc="{self.count} queries", '
+            f"app;dur={max(total - db_ms, 0.0):.2f}"
+        )
+
+    def to_dict(self, statements: bool = False) -> Dict[str, Any]:
+        data = {
+            "method": self.method,
+            "path": self.path,
+            "endpoint": self.endpoint,
+            "status": self.status_code,
+            "duration_ms": round((self.duration or 0.0) * 1000, 2),
+            "queries": self.count,
+            "db_time_ms": round(self.db_time * 1000, 2),
+            "duplicates": self.get_duplicates(),
+        }
+        if statements:
+            data["statements"] = [
+                {"sql": q["query"][:500], "ms": round(q["duration"] * 1000, 2)}
+                for q in self.queries[:SLOW_LOG_MAX_STATEMENTS]
+            ]
+        return data
+
+
+class QueryProfiler:
+    """Flask extension wiring ``RequestProfile`` into the request cycle."""
+
+    def __init__(self, app=None):
+        self.stats = QueryStats()
+        self._subscribers: List[Callable[[RequestProfile], None]] = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        env = os.environ.get
+        config = app.config
+        config.setdefault(
+            "QUERY_PROFILER_ENABLED", env("QUERY_PROFILER_ENABLED", "1").lower() in _TRUTHY
+        )
+        # timings are for developers: not sent by production apps by default
+        server_timing = "1" if app.debug or app.testing else "0"
+        config.setdefault(
+            "QUERY_PROFILER_SERVER_TIMING",
+            env("QUERY_PROFILER_SERVER_TIMING", server_timing).lower() in _TRUTHY,
+        )
+        config.setdefault("QUERY_PROFILER_SLOW_MS", float(env("QUERY_PROFILER_SLOW_MS", 500)))
+        config.setdefault(
+            "QUERY_PROFILER_SLOW_SAMPLE_RATE",
+            float(env("QUERY_PROFILER_SLOW_SAMPLE_RATE", 0.1)),
+        )
+        config.setdefault("QUERY_PROFILER_N_PLUS_ONE", int(env("QUERY_PROFILER_N_PLUS_ONE", 5)))
+        config.setdefault("QUERY_BUDGETS", {})
+        if not config["QUERY_PROFILER_ENABLED"]:
+            return None
+
+        # first, so queries made by the other before_request hooks are counted
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.extensions["query_profiler"] = self
+        return self
+
+    def subscribe(self, callback: Callable[[RequestProfile], None]) -> Callable[[], None]:
+        """Call ``callback`` with every finished profile; returns an unsubscribe."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def budget_for(self, endpoint: Optional[str]) -> Optional[QueryBudget]:
+        if endpoint is None:
+            return None
+        view = current_app.view_functions.get(endpoint)
+        budget = getattr(view, "_query_budget", None)
+        if budget is None and endpoint in current_app.config["QUERY_BUDGETS"]:
+            declared = current_app.config["QUERY_BUDGETS"][endpoint]
+            budget = declared if isinstance(declared, QueryBudget) else QueryBudget(declared)
+        return budget
+
+    def _start(self):
+        profile = RequestProfile(request.method, request.path, request.endpoint)
+        g._request_profile = profile.__enter__()
+
+    def _finish(self, response):
+        profile = g.pop("_request_profile", None)
+        if profile is None:
+            return response
+        profile.__exit__(None, None, None)
+        profile.duration = time.perf_counter() - profile.started
+        profile.status_code = response.status_code
+        profile.budget = self.budget_for(profile.endpoint)
+        config = current_app.config
+
+        if config["QUERY_PROFILER_SERVER_TIMING"]:
+            timing = profile.server_timing()
+            existing = response.headers.get("Server-Timing")
+            response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+
+        performance_monitor.record_request(
+            profile.path, profile.duration, queries=profile.count, db_time=profile.db_time
+        )
+        with self._lock:
+            for q in profile.queries:
+                self.stats.record_query(q["fingerprint"], q["duration"])
+
+        repeated = profile.get_duplicates(config["QUERY_PROFILER_N_PLUS_ONE"])
+        if repeated:
+            logger.warning(
+                "Probable N+1 on %s %s: %s",
+                profile.method,
+                profile.path,
+                "; ".join(f"{d['count']}x {d['fingerprint'][:200]}" for d in repeated[:3]),
+            )
+        for problem in profile.violations():
+            logger.warning("Query budget exceeded: %s", problem)
+        if (
+            profile.duration * 1000 >= config["QUERY_PROFILER_SLOW_MS"]
+            and random.random() < config["QUERY_PROFILER_SLOW_SAMPLE_RATE"]
+        ):
+            logger.warning("Slow request: %s", profile.to_dict(statements=True))
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(profile)
+        return response
+
+    def _teardown(self, exc):
+        profile = g.pop("_request_profile", None)
+        if profile is not None:
+            profile.__exit__(None, None, None)
+
+
+query_profiler = QueryProfiler()
+
+
+def init_query_profiler(app):
+    """Install the request profiler on ``app`` (no-op when disabled)."""
+    return query_profiler.init_app(app)
+
+
+__all__ = [
+    "QueryBudget",
+    "QueryProfiler",
+    "RequestProfile",
+    "init_query_profiler",
+    "query_budget",
+    "query_profiler",
+]
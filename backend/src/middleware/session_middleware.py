@@ -11,7 +11,8 @@ from datetime import datetime, timedelta
 from functools import wraps
 from typing import Optional, Dict, Any
 
-from flask import Flask, request, session, g, jsonify, make_response
+import jwt
+from flask import Flask, request, session, g, jsonify, make_response, current_app
 
 
 class SessionConfig:
@@ -47,6 +48,13 @@ class SessionConfig:
     # Security settings
     SESSION_USE_SIGNER = True
     SESSION_KEY_PREFIX = "store_"
+    STRICT_FINGERPRINT = (
+        os.environ.get("STRICT_SESSION_FINGERPRINT", "false").lower() == "true"
+    )
+
+    # last_activity is rewritten at most this often (seconds), so reads do
+    # not dirty the session and force a store write on every request
+    SESSION_ACTIVITY_INTERVAL = int(os.environ.get("SESSION_ACTIVITY_INTERVAL", 60))
 
 
 class SessionMiddleware:
@@ -98,8 +106,10 @@ class SessionMiddleware:
 
     def _before_request(self):
         """Pre-request processing"""
-        # Skip for static files
-        if request.path.startswith("/static"):
+        # Skip for static files and JWT-authenticated API calls, which never
+        # need the stored session (it is then not even loaded). A session
+        # cookie sent with an invalid token is still checked.
+        if request.path.startswith("/static") or _is_bearer_request():
             return
 
         # Initialize session data
@@ -128,8 +138,17 @@ class SessionMiddleware:
     def _after_request(self, response):
         """Post-request processing"""
         # Update session activity timestamp
-        if "created_at" in session:
-            session["last_activity"] = datetime.utcnow().isoformat()
+        if not _is_bearer_request() and "created_at" in session:
+            now = datetime.utcnow()
+            last = session.get("last_activity")
+            try:
+                stale = now - datetime.fromisoformat(last) >= timedelta(
+                    seconds=SessionConfig.SESSION_ACTIVITY_INTERVAL
+                )
+            except (TypeError, ValueError):
+                stale = True
+            if stale:
+                session["last_activity"] = now.isoformat()
 
         # Add security headers for session
         response.headers["X-Content-Type-Options"] = "nosniff"
@@ -139,13 +158,11 @@ class SessionMiddleware:
         return response
 
     def _generate_fingerprint(self) -> str:
-        """Generate a session fingerprint based on client info"""
-        client_ip = request.remote_addr or ""
-        user_agent = request.user_agent.string or ""
-
-        # Create fingerprint hash
-        fingerprint_data = f"{client_ip}:{user_agent}"
-        return hashlib.sha256(fingerprint_data.encode()).hexdigest()[:32]
+        """Generate a session fingerprint based on client info (once per request)"""
+        fingerprint = g.get("_session_fingerprint")
+        if fingerprint is None:
+            fingerprint = g._session_fingerprint = _fingerprint()
+        return fingerprint
 
     def _validate_fingerprint(self) -> bool:
         """Validate that the session fingerprint matches"""
@@ -153,12 +170,10 @@ class SessionMiddleware:
         if not stored_fingerprint:
             return True  # No fingerprint stored yet
 
-        current_fingerprint = self._generate_fingerprint()
-
         # Allow some flexibility for fingerprint validation
         # (e.g., mobile users might have changing IPs)
-        if os.environ.get("STRICT_SESSION_FINGERPRINT", "false").lower() == "true":
-            return stored_fingerprint == current_fingerprint
+        if SessionConfig.STRICT_FINGERPRINT:
+            return stored_fingerprint == self._generate_fingerprint()
 
         # Less strict: only validate user agent part
         return True
@@ -191,6 +206,43 @@ class SessionMiddleware:
         )
 
 
+def _is_bearer_request() -> bool:
+    """
+    JWT API call that may skip the session checks: a Bearer token and either
+    no session cookie or a valid access token (decided once per request).
+    """
+    skip = g.get("_session_bearer")
+    if skip is None:
+        skip = g._session_bearer = _bearer_skips_session()
+    return skip
+
+
+def _bearer_skips_session() -> bool:
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return False
+    if current_app.config.get("SESSION_COOKIE_NAME", "session") not in request.cookies:
+        return True
+    try:
+        payload = jwt.decode(
+            header[len("Bearer "):].strip(),
+            current_app.config.get("JWT_SECRET_KEY", current_app.config["SECRET_KEY"]),
+            algorithms=["HS256"],
+        )
+    except jwt.InvalidTokenError:
+        return False
+    return payload.get("type") == "access"
+
+
+def _fingerprint() -> str:
+    client_ip = request.remote_addr or ""
+    user_agent = request.user_agent.string or ""
+
+    # Create fingerprint hash
+    fingerprint_data = f"{client_ip}:{user_agent}"
+    return hashlib.sha256(fingerprint_data.encode()).hexdigest()[:32]
+
+
 def create_session(
     user_id: int, user_role: str, additional_data: Dict[str, Any] = None
 ):
@@ -214,9 +266,7 @@ def create_session(
     session["user_id"] = user_id
     session["user_role"] = user_role
     session["created_at"] = datetime.utcnow().isoformat()
-    session["fingerprint"] = hashlib.sha256(
-        f"{request.remote_addr}:{request.user_agent.string}".encode()
-    ).hexdigest()[:32]
+    session["fingerprint"] = _fingerprint()
 
     # Add any additional data
     if additional_data:
@@ -0,0 +1,443 @@
+"""
+مخزن الجلسات على الخادم
+Server-side session store
+
+Sessions live in Redis or in a SQL table instead of one pickled file per
+session, so any node can serve any user and no sticky sessions are needed.
+
+- The cookie carries only a signed session id.
+- The stored session is read lazily, on first access: requests that never
+  touch ``session`` (JWT-authenticated API calls) cost no store round trip.
+- Data is written only when the session was modified. Unmodified permanent
+  sessions have their expiry extended at most once per
+  ``SESSION_TOUCH_INTERVAL`` instead of being rewritten on every request.
+- The SQL table has an index on ``expires_at``; expired rows are purged in
+  batches (Redis expires keys itself).
+
+Configuration (app.config or environment):
+    SESSION_BACKEND      sql (default) | redis | filesystem (Flask-Session)
+    SESSION_REDIS_URL    falls back to REDIS_URL
+    SESSION_SQL_URI      defaults to the app database; for SQLite a
+                         ``sessions.db`` next to it
+"""
+
+import logging
+import os
+import secrets
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional, Tuple
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import (
+    Column,
+    Float,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+SESSION_TOUCH_INTERVAL = int(os.environ.get("SESSION_TOUCH_INTERVAL", 300))
+SESSION_PURGE_INTERVAL = int(os.environ.get("SESSION_PURGE_INTERVAL", 600))
+SESSION_PURGE_BATCH = int(os.environ.get("SESSION_PURGE_BATCH", 1000))
+
+
+def _generate_sid() -> str:
+    return secrets.token_urlsafe(32)
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+
+
+class SessionBackend(ABC):
+    """Storage for serialized sessions keyed by session id."""
+
+    @abstractmethod
+    def load(self, sid: str) -> Optional[Tuple[str, float]]:
+        """Return ``(data, expires_at)`` of a live session, or None."""
+
+    @abstractmethod
+    def save(self, sid: str, data: str, expires_at: float) -> None:
+        """Store ``data`` under ``sid`` until ``expires_at``."""
+
+    @abstractmethod
+    def touch(self, sid: str, expires_at: float) -> None:
+        """Extend the expiry without rewriting the data."""
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        """Remove a session (no error if it does not exist)."""
+
+    def purge_expired(self, batch_size: int = SESSION_PURGE_BATCH) -> int:
+        """Remove expired sessions; returns how many were removed."""
+        return 0
+
+
+class RedisSessionBackend(SessionBackend):
+    """Sessions as Redis strings with a TTL (Redis drops expired keys)."""
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = "session:"):
+        if client is None:
+            import redis
+
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, sid: str) -> str:
+        return f"{self.prefix}{sid}"
+
+    def load(self, sid):
+        pipe = self.client.pipeline()
+        pipe.get(self._key(sid))
+        pipe.pttl(self._key(sid))
+        data, ttl_ms = pipe.execute()
+        if data is None:
+            return None
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return data, time.time() + max(ttl_ms, 0) / 1000
+
+    def save(self, sid, data, expires_at):
+        ttl_ms = max(int((expires_at - time.time()) * 1000), 1)
+        self.client.set(self._key(sid), data, px=ttl_ms)
+
+    def touch(self, sid, expires_at):
+        self.client.pexpireat(self._key(sid), int(expires_at * 1000))
+
+    def delete(self, sid):
+        self.client.delete(self._key(sid))
+
+
+class SQLSessionBackend(SessionBackend):
+    """Sessions in a SQL table indexed by expiry; works with any SQLAlchemy URL."""
+
+    def __init__(self, engine_or_uri, table_name: str = "http_sessions"):
+        self._engine: Optional[Engine] = (
+            engine_or_uri if isinstance(engine_or_uri, Engine) else None
+        )
+        self._uri = None if self._engine is not None else str(engine_or_uri)
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("sid", String(64), primary_key=True),
+            Column("data", Text, nullable=False),
+            Column("expires_at", Float, nullable=False, index=True),
+        )
+        self._ready = False
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            url = make_url(self._uri)
+            kwargs = {"pool_pre_ping": True}
+            if url.get_backend_name() == "sqlite":
+                kwargs["connect_args"] = {"check_same_thread": False, "timeout": 30}
+                if not url.database or url.database == ":memory:":
+                    kwargs["poolclass"] = StaticPool
+            self._engine = create_engine(url, **kwargs)
+        if not self._ready:
+            self.table.metadata.create_all(self._engine, checkfirst=True)
+            self._ready = True
+        return self._engine
+
+    def load(self, sid):
+        t = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(t.c.data, t.c.expires_at).where(
+                    t.c.sid == sid, t.c.expires_at > time.time()
+                )
+            ).first()
+        return (row.data, row.expires_at) if row else None
+
+    def save(self, sid, data, expires_at):
+        t = self.table
+        values = {"data": data, "expires_at": expires_at}
+        with self.engine.begin() as conn:
+            if conn.execute(update(t).where(t.c.sid == sid).values(**values)).rowcount:
+                return
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(t).values(sid=sid, **values))
+            except IntegrityError:  # inserted concurrently
+                conn.execute(update(t).where(t.c.sid == sid).values(**values))
+
+    def touch(self, sid, expires_at):
+        t = self.table
+        with self.engine.begin() as conn:
+            conn.execute(update(t).where(t.c.sid == sid).values(expires_at=expires_at))
+
+    def delete(self, sid):
+        t = self.table
+        with self.engine.begin() as conn:
+            conn.execute(delete(t).where(t.c.sid == sid))
+
+    def purge_expired(self, batch_size=SESSION_PURGE_BATCH):
+        t = self.table
+        now = time.time()
+        removed = 0
+        while True:
+            # small batches keep each write transaction (and its locks) short
+            with self.engine.begin() as conn:
+                sids = conn.execute(
+                    select(t.c.sid).where(t.c.expires_at <= now).limit(batch_size)
+                ).scalars().all()
+                if sids:
+                    conn.execute(delete(t).where(t.c.sid.in_(sids)))
+            removed += len(sids)
+            if len(sids) < batch_size:
+                return removed
+
+
+# =============================================================================
+# Session interface
+# =============================================================================
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    """
+    Session dict loaded from the backend on first access.
+
+    ``loaded`` stays False for requests that never touch the session, and
+    ``modified`` is only set by writes, so such requests cause no I/O.
+    """
+
+    def __init__(
+        self,
+        sid: str,
+        loader: Optional[Callable[[], Optional[Tuple[dict, float]]]] = None,
+    ):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(None, on_update)
+        self.sid = sid
+        self.new = loader is None
+        self.modified = False
+        self.accessed = False
+        self.expires_at: Optional[float] = None
+        self._loader = loader
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def _ensure_loaded(self):
+        self.accessed = True
+        if self._loader is None:
+            return
+        loader, self._loader = self._loader, None
+        stored = loader()
+        if stored is None:
+            # unknown or expired id: start over under a fresh one
+            self.sid = _generate_sid()
+            self.new = True
+            return
+        data, self.expires_at = stored
+        dict.update(self, data)
+
+
+def _loading(name):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._ensure_loaded()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__getitem__",
+    "__setitem__",
+    "__delitem__",
+    "__contains__",
+    "__iter__",
+    "__len__",
+    "__eq__",
+    "__repr__",
+    "get",
+    "keys",
+    "values",
+    "items",
+    "copy",
+    "setdefault",
+    "pop",
+    "popitem",
+    "update",
+    "clear",
+):
+    setattr(StoredSession, _name, _loading(_name))
+StoredSession.__hash__ = None
+
+
+class StoreSessionInterface(SessionInterface):
+    """Flask session interface over a SessionBackend."""
+
+    serializer = TaggedJSONSerializer()
+    salt = "server-session"
+
+    def __init__(
+        self,
+        backend: SessionBackend,
+        touch_interval: int = SESSION_TOUCH_INTERVAL,
+        purge_interval: int = SESSION_PURGE_INTERVAL,
+    ):
+        self.backend = backend
+        self.touch_interval = touch_interval
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+
+    def _signer(self, app) -> Optional[Signer]:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return StoredSession(_generate_sid())
+        try:
+            sid = signer.unsign(cookie).decode("ascii")
+        except BadSignature:
+            return StoredSession(_generate_sid())
+        return StoredSession(sid, loader=lambda: self._load(sid))
+
+    def _load(self, sid):
+        stored = self.backend.load(sid)
+        if stored is None:
+            return None
+        data, expires_at = stored
+        return self.serializer.loads(data), expires_at
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+        if not session.loaded:
+            return
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        expires_at = now + app.permanent_session_lifetime.total_seconds()
+        if session.modified or session.new:
+            self.backend.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+        elif (
+            session.permanent
+            and session.expires_at is not None
+            and expires_at - session.expires_at >= self.touch_interval
+        ):
+            self.backend.touch(session.sid, expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode("ascii"),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        self._maybe_purge(now)
+
+    def _maybe_purge(self, now: float):
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        try:
+            removed = self.backend.purge_expired()
+            if removed:
+                logger.info("Purged %d expired sessions", removed)
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"Session purge failed: {e}")
+
+
+def _default_sql_uri(app) -> str:
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI") or "sqlite://"
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        # a separate file keeps session writes off the main database's write lock
+        sessions_db = os.path.join(os.path.dirname(url.database), "sessions.db")
+        return url.set(database=sessions_db).render_as_string(hide_password=False)
+    return uri
+
+
+def init_session_store(app, backend: Optional[SessionBackend] = None):
+    """
+    Install the server-side session interface on ``app``.
+
+    Returns the backend, or None when SESSION_BACKEND=filesystem hands
+    sessions to Flask-Session as before.
+    """
+    if backend is None:
+        kind = (
+            app.config.get("SESSION_BACKEND")
+            or os.environ.get("SESSION_BACKEND", "sql")
+        ).lower()
+        if kind == "filesystem":
+            from flask_session import Session
+
+            Session(app)
+            return None
+        if kind == "redis":
+            url = (
+                app.config.get("SESSION_REDIS_URL")
+                or os.environ.get("SESSION_REDIS_URL")
+                or os.environ.get("REDIS_URL", "redis://localhost:5606/0")
+            )
+            backend = RedisSessionBackend(url=url)
+        elif kind == "sql":
+            backend = SQLSessionBackend(
+                app.config.get("SESSION_SQL_URI")
+                or os.environ.get("SESSION_SQL_URI")
+                or _default_sql_uri(app)
+            )
+        else:
+            raise ValueError(f"Unknown SESSION_BACKEND: {kind}")
+
+    app.session_interface = StoreSessionInterface(backend)
+    app.extensions["session_store"] = backend
+    return backend
+
+
+__all__ = [
+    "SessionBackend",
+    "RedisSessionBackend",
+    "SQLSessionBackend",
+    "StoredSession",
+    "StoreSessionInterface",
+    "init_session_store",
+]
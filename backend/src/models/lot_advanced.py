@@ -7,10 +7,11 @@ from datetime import datetime, date
 import enum
 from sqlalchemy import event
 
+# Same db as the sale / product models (SaleItem.batch points here)
 try:
-    from database import db
+    from src.database import db
 except ImportError:
-    from ..database import db
+    from database import db
 
 
 class LotStatusEnum(enum.Enum):
@@ -19,7 +19,7 @@ class Sale(db.Model):
     
     # معلومات الوردية والفرع
     shift_id = Column(Integer, ForeignKey('shifts.id'), nullable=True)
-    branch_id = Column(Integer, ForeignKey('branches.id'), nullable=True)
+    branch_id = Column(Integer, nullable=True)  # لا يوجد جدول فروع بعد (no branches table yet)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     
     # المبالغ
@@ -78,9 +78,11 @@ class Setting(db.Model):
 
     @classmethod
     def get(cls, key: str, default: Any = None) -> Any:
-        """Get a setting value by key."""
-        setting = cls.query.filter_by(key=key).first()
-        return setting.get_value() if setting else default
+        """Get a setting value by key (from the per-process reference cache)."""
+        from src.services.reference_data import reference_data
+
+        setting = reference_data.get("settings").lookup("key", key)
+        return setting.typed_value if setting else default
 
     @classmethod
     def set(
@@ -112,8 +114,20 @@ class Setting(db.Model):
             db.session.add(setting)
 
         db.session.commit()
+        invalidate_settings_cache()
         return setting
 
+    @classmethod
+    def delete(cls, key: str) -> bool:
+        """Delete a setting; returns False if it does not exist."""
+        setting = cls.query.filter_by(key=key).first()
+        if not setting:
+            return False
+        db.session.delete(setting)
+        db.session.commit()
+        invalidate_settings_cache()
+        return True
+
     @classmethod
     def get_by_category(cls, category: str) -> list:
         """Get all settings in a category."""
@@ -127,13 +141,21 @@ class Setting(db.Model):
     @classmethod
     def get_all_as_dict(cls) -> dict:
         """Get all settings as a dictionary."""
-        settings = cls.query.all()
-        return {s.key: s.get_value() for s in settings}
+        from src.services.reference_data import reference_data
+
+        return {s.key: s.typed_value for s in reference_data.get("settings")}
 
     def __repr__(self):
         return f"<Setting {self.key}={self.value}>"
 
 
+def invalidate_settings_cache():
+    """Drop the cached settings snapshot, including the current request's copy."""
+    from src.services.reference_data import reference_data
+
+    reference_data.invalidate("settings")
+
+
 # =============================================================================
 # Default Settings
 # =============================================================================
@@ -310,6 +332,12 @@ def initialize_default_settings():
             db.session.add(setting)
 
     db.session.commit()
+    invalidate_settings_cache()
 
 
-__all__ = ["Setting", "DEFAULT_SETTINGS", "initialize_default_settings"]
+__all__ = [
+    "Setting",
+    "DEFAULT_SETTINGS",
+    "initialize_default_settings",
+    "invalidate_settings_cache",
+]
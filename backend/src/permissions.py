@@ -462,7 +462,7 @@ def get_current_user_role() -> str:
     user_id = getattr(request, "current_user_id", None)
     if user_id:
         try:
-            from src.models.user import User, Role
+            from src.models.user import User
 
             user = User.query.get(user_id)
             if user:
@@ -471,7 +471,9 @@ def get_current_user_role() -> str:
                     return user.role_obj.name
                 # Fallback to role_id
                 if hasattr(user, "role_id") and user.role_id:
-                    role = Role.query.get(user.role_id)
+                    from src.services.reference_data import reference_data
+
+                    role = reference_data.find("roles", id=user.role_id)
                     if role:
                         return role.name
                 # Fallback to role string
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline RAG evaluation runner.
+
+Runs a golden query set through one or more retrieval + rerank
+configurations and reports retrieval quality (rag_evaluation metrics,
+computed over the whole run at once) next to latency percentiles.
+
+- Queries are sharded over a process pool (CPU only)
+- Retrieval results are cached in SQLite keyed by (retrieval config hash,
+  corpus fingerprint, query), so rerank/top-k variants of one retrieval
+  setup and repeated runs only pay for reranking; cache hits report the
+  retrieval time measured when the entry was stored
+- Retrievers: "bm25" and "dense" build an in-process index over the
+  Markdown corpus chunked with the configuration's ``chunk_tokens`` (to
+  compare chunking settings); "chroma" queries the live RAG collection
+
+Golden set (JSONL or JSON list):
+    {"query": "...", "relevant": ["docs/guide.md", ...]}
+Relevant ids are matched against the source path of retrieved chunks.
+
+Usage:
+    python -m src.rag_eval_runner --golden golden.jsonl \\
+        --configs configs.json --workers 4 --out report.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.rag_evaluation import batch_retrieval_metrics
+
+logger = logging.getLogger(__name__)
+
+EVAL_CACHE_PATH = Path(
+    os.environ.get(
+        "RAG_EVAL_CACHE",
+        str(Path(__file__).resolve().parents[1] / "instance" / "rag_eval_cache.sqlite"),
+    )
+)
+EVAL_SHARD_SIZE = int(os.environ.get("RAG_EVAL_SHARD_SIZE", 64))
+
+
+# =============================================================================
+# Inputs
+# =============================================================================
+
+
+@dataclass
+class GoldenQuery:
+    """One query of the golden set."""
+
+    query: str
+    relevant: Set[str]
+
+
+def load_golden_set(path: Path) -> List[GoldenQuery]:
+    """Load a JSONL or JSON-list golden set."""
+    text = Path(path).read_text(encoding="utf-8")
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [
+        GoldenQuery(r["query"], set(r.get("relevant") or r.get("relevant_doc_ids") or []))
+        for r in records
+    ]
+
+
+@dataclass
+class EvalConfig:
+    """A retrieval + rerank configuration to evaluate."""
+
+    name: str
+    retriever: str = "bm25"  # bm25 | dense | chroma
+    fetch_k: int = 20  # candidates retrieved before reranking
+    chunk_tokens: int = 200
+    rerank: Optional[str] = None  # None | hybrid | bm25 | cross_encoder
+    top_k: int = 10
+    use_diversity: bool = False
+    diversity_lambda: float = 0.5
+    cross_encoder: bool = False
+    normalization: str = ""
+    k_values: Tuple[int, ...] = (1, 3, 5, 10)
+
+    def retrieval_key(self) -> Dict[str, Any]:
+        """Settings that change retrieval results (and the cache key)."""
+        key: Dict[str, Any] = {"retriever": self.retriever, "fetch_k": self.fetch_k}
+        if self.retriever != "chroma":
+            from src.rag_ingest import CHUNK_OVERLAP
+
+            key["chunk_tokens"] = self.chunk_tokens
+            key["chunk_overlap"] = CHUNK_OVERLAP
+        return key
+
+    def retrieval_hash(self, corpus: str = "") -> str:
+        """Hash of the retrieval settings; ``corpus`` is a corpus_fingerprint()."""
+        key = self.retrieval_key()
+        if corpus and self.retriever != "chroma":
+            key["corpus"] = corpus
+        payload = json.dumps(key, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def config_hash(self) -> str:
+        data = asdict(self)
+        data.pop("name")
+        payload = json.dumps(data, sort_keys=True, default=list)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def corpus_fingerprint(sources: Iterable[Tuple[str, str]]) -> str:
+    """Hash of the (key, text) sources the in-process indexes are built from."""
+    digest = hashlib.sha256()
+    for key, text in sorted(sources):
+        digest.update(key.encode("utf-8") + b"\0" + text.encode("utf-8") + b"\0")
+    return digest.hexdigest()[:16]
+
+
+# =============================================================================
+# Retrieval cache
+# =============================================================================
+
+
+class RetrievalCache:
+    """(retrieval hash, query) -> retrieved candidates and retrieval_ms, in SQLite."""
+
+    def __init__(self, path: Path = EVAL_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS retrieval ("
+            " config TEXT NOT NULL, query TEXT NOT NULL, result TEXT NOT NULL,"
+            " PRIMARY KEY (config, query))"
+        )
+
+    def get_many(self, config: str, queries: Sequence[str]) -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
+        for start in range(0, len(queries), 500):
+            batch = list(queries[start : start + 500])
+            rows = self._conn.execute(
+                f"SELECT query, result FROM retrieval WHERE config = ? "
+                f"AND query IN ({','.join('?' * len(batch))})",
+                [config, *batch],
+            )
+            found.update((query, json.loads(result)) for query, result in rows)
+        return found
+
+    def put_many(self, config: str, results: Dict[str, Any]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO retrieval (config, query, result) VALUES (?, ?, ?)",
+                [(config, q, json.dumps(r, ensure_ascii=False)) for q, r in results.items()],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# =============================================================================
+# Retrievers (run inside pool workers)
+# =============================================================================
+
+_SOURCES: List[Tuple[str, str]] = []
+_INDEXES: Dict[str, Any] = {}
+
+
+def _init_worker(sources: List[Tuple[str, str]]) -> None:
+    global _SOURCES
+    _SOURCES = sources
+    _INDEXES.clear()
+
+
+def _corpus(chunk_tokens: int):
+    from src.rag_ingest import build_chunks
+
+    chunks = []
+    for key, text in _SOURCES:
+        chunks.extend(build_chunks(key, text, chunk_tokens))
+    return chunks
+
+
+def _candidate(chunk, score: float) -> Dict[str, Any]:
+    return {
+        "id": chunk.id,
+        "text": chunk.text,
+        "distance": 1.0 - score,
+        "meta": {"path": chunk.meta["path"]},
+    }
+
+
+def _retrieve(config: EvalConfig, query: str) -> List[Dict[str, Any]]:
+    key = config.retrieval_hash()
+    if config.retriever == "bm25":
+        if key not in _INDEXES:
+            from src.rag_reranker import BM25Scorer
+
+            chunks = _corpus(config.chunk_tokens)
+            _INDEXES[key] = (chunks, BM25Scorer().fit([c.text for c in chunks]))
+        chunks, bm25 = _INDEXES[key]
+        scores = bm25.score_all(query)
+        top = scores.max() if len(scores) else 0
+        scores = scores / top if top > 0 else scores
+    elif config.retriever == "dense":
+        from src.rag_ingest import encode_texts
+
+        if key not in _INDEXES:
+            chunks = _corpus(config.chunk_tokens)
+            vectors = np.asarray(encode_texts([c.text for c in chunks]), dtype=np.float32)
+            _INDEXES[key] = (chunks, vectors)
+        chunks, vectors = _INDEXES[key]
+        scores = vectors @ np.asarray(encode_texts([query])[0], dtype=np.float32)
+    elif config.retriever == "chroma":
+        from src.rag_service import _get_collection, embed_texts
+
+        results = _get_collection().query(
+            query_embeddings=embed_texts([query]),
+            n_results=config.fetch_k,
+            include=["metadatas", "documents", "distances"],
+        )
+        return [
+            {
+                "id": results["ids"][0][i],
+                "text": results["documents"][0][i],
+                "distance": float(results["distances"][0][i] or 0.0),
+                "meta": results["metadatas"][0][i] or {},
+            }
+            for i in range(len(results["ids"][0]))
+        ]
+    else:
+        raise ValueError(f"Unknown retriever: {config.retriever}")
+
+    order = np.argsort(-scores, kind="stable")[: config.fetch_k]
+    return [_candidate(chunks[i], float(scores[i])) for i in order]
+
+
+def _embeddings(query: str, candidates: List[Dict[str, Any]]):
+    """Query and candidate vectors for MMR, in candidate order."""
+    from src.rag_ingest import encode_texts
+
+    vectors = encode_texts([query] + [c.get("text", "") for c in candidates])
+    return vectors[0], vectors[1:]
+
+
+def _rerank(config: EvalConfig, query: str, candidates: List[Dict[str, Any]]):
+    from src.rag_reranker import MMRDiversifier
+
+    if not config.rerank:
+        if not config.use_diversity or not candidates:
+            return candidates[: config.top_k]
+        query_vector, doc_vectors = _embeddings(query, candidates)
+        return MMRDiversifier(lambda_param=config.diversity_lambda).diversify(
+            query_vector, candidates, doc_vectors, config.top_k
+        )
+    from src.rag_reranker import RAGReranker, HybridReranker
+
+    # with diversity, rerank every candidate so MMR picks from all of them
+    # (greedy MMR picks in order, so its first top_k are the top_k picks)
+    reranker = RAGReranker(
+        strategy=config.rerank,
+        top_k=len(candidates) if config.use_diversity else config.top_k,
+        use_diversity=config.use_diversity,
+    )
+    if config.rerank == "hybrid":
+        reranker.reranker = HybridReranker(
+            use_cross_encoder=config.cross_encoder, normalization=config.normalization
+        )
+    vectors: Tuple[Any, Any] = (None, None)
+    if config.use_diversity and candidates:
+        reranker.diversifier = MMRDiversifier(lambda_param=config.diversity_lambda)
+        vectors = _embeddings(query, candidates)
+    # rerankers may annotate the dicts; keep cached candidates untouched
+    return reranker.rerank(query, [dict(c) for c in candidates], *vectors)[: config.top_k]
+
+
+def _run_shard(config: EvalConfig, items: List[Tuple[str, Optional[Dict[str, Any]]]]):
+    """Retrieve (unless cached) and rerank one shard of queries."""
+    out = []
+    for query, cached in items:
+        if cached is not None:
+            candidates, retrieval_ms = cached["candidates"], cached["retrieval_ms"]
+        else:
+            started = time.perf_counter()
+            candidates = _retrieve(config, query)
+            retrieval_ms = (time.perf_counter() - started) * 1000
+        reranked_at = time.perf_counter()
+        ranked = _rerank(config, query, candidates)
+        finished = time.perf_counter()
+        out.append(
+            {
+                "query": query,
+                "candidates": None if cached is not None else candidates,
+                "ranked": [d.get("meta", {}).get("path", d.get("id")) for d in ranked],
+                "retrieval_ms": retrieval_ms,
+                "rerank_ms": (finished - reranked_at) * 1000,
+            }
+        )
+    return out
+
+
+# =============================================================================
+# Evaluation
+# =============================================================================
+
+
+def _dedupe(ids: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(ids))
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    if not len(values):
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(np.mean(values)), 3),
+    }
+
+
+@dataclass
+class ConfigReport:
+    """Quality and latency of one configuration."""
+
+    name: str
+    config_hash: str
+    queries: int
+    cache_hits: int
+    metrics: Dict[str, float]
+    latency_ms: Dict[str, Dict[str, float]]
+    seconds: float
+    per_query: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("per_query")
+        return data
+
+
+def evaluate_configs(
+    golden: Sequence[GoldenQuery],
+    configs: Sequence[EvalConfig],
+    sources: Sequence[Tuple[str, str]] = (),
+    cache: Optional[RetrievalCache] = None,
+    workers: int = os.cpu_count() or 1,
+    shard_size: int = EVAL_SHARD_SIZE,
+) -> List[ConfigReport]:
+    """Run every configuration over the golden set."""
+    queries = _dedupe(g.query for g in golden)
+    sources = list(sources)
+    corpus = corpus_fingerprint(sources)
+    plan = []
+    for config in configs:
+        cached = cache.get_many(config.retrieval_hash(corpus), queries) if cache else {}
+        items = [(q, cached.get(q)) for q in queries]
+        shards = [items[i : i + shard_size] for i in range(0, len(items), shard_size)]
+        plan.append((config, len(cached), shards))
+
+    results: Dict[str, List[Dict[str, Any]]] = {c.name: [] for c in configs}
+    elapsed: Dict[str, float] = {}
+    if workers <= 1:
+        _init_worker(sources)
+        for config, _, shards in plan:
+            started = time.perf_counter()
+            for shard in shards:
+                results[config.name].extend(_run_shard(config, shard))
+            elapsed[config.name] = time.perf_counter() - started
+    else:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(sources,)
+        ) as pool:
+            futures = [
+                (config.name, pool.submit(_run_shard, config, shard))
+                for config, _, shards in plan
+                for shard in shards
+            ]
+            for name, future in futures:
+                results[name].extend(future.result())
+                elapsed[name] = time.perf_counter() - started
+
+    reports = []
+    for config, cache_hits, _ in plan:
+        rows = results[config.name]
+        if cache:
+            fresh = {
+                r["query"]: {"candidates": r["candidates"], "retrieval_ms": r["retrieval_ms"]}
+                for r in rows
+                if r["candidates"] is not None
+            }
+            if fresh:
+                cache.put_many(config.retrieval_hash(corpus), fresh)
+        by_query = {r["query"]: r for r in rows}
+        ranked = [_dedupe(by_query[g.query]["ranked"]) for g in golden]
+        per_query = batch_retrieval_metrics(
+            ranked, [g.relevant for g in golden], config.k_values
+        )
+        retrieval_ms = np.array([by_query[g.query]["retrieval_ms"] for g in golden])
+        rerank_ms = np.array([by_query[g.query]["rerank_ms"] for g in golden])
+        reports.append(
+            ConfigReport(
+                name=config.name,
+                config_hash=config.config_hash(),
+                queries=len(golden),
+                cache_hits=cache_hits,
+                metrics={k: round(float(v.mean()), 4) for k, v in per_query.items()},
+                latency_ms={
+                    "retrieval": percentiles(retrieval_ms),
+                    "rerank": percentiles(rerank_ms),
+                    "total": percentiles(retrieval_ms + rerank_ms),
+                },
+                seconds=round(elapsed.get(config.name, 0.0), 3),
+                per_query=[
+                    {"query": g.query, "ranked": r, **{k: float(v[i]) for k, v in per_query.items()}}
+                    for i, (g, r) in enumerate(zip(golden, ranked))
+                ],
+            )
+        )
+    return reports
+
+
+def load_configs(path: Path) -> List[EvalConfig]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    configs = []
+    for item in data if isinstance(data, list) else [data]:
+        if "k_values" in item:
+            item = {**item, "k_values": tuple(item["k_values"])}
+        configs.append(EvalConfig(**item))
+    return configs
+
+
+def main(argv: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    from src.rag_ingest import iter_file_sources
+
+    parser = argparse.ArgumentParser(description="Offline RAG evaluation")
+    parser.add_argument("--golden", required=True, type=Path)
+    parser.add_argument("--configs", type=Path, help="JSON list of EvalConfig fields")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache", type=Path, default=EVAL_CACHE_PATH)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    golden = load_golden_set(args.golden)
+    configs = load_configs(args.configs) if args.configs else [EvalConfig("default")]
+    needs_corpus = any(c.retriever != "chroma" for c in configs)
+    sources = [s for s in iter_file_sources() if s[1].strip()] if needs_corpus else []
+    cache = None if args.no_cache else RetrievalCache(args.cache)
+    try:
+        reports = evaluate_configs(golden, configs, sources, cache, args.workers)
+    finally:
+        if cache:
+            cache.close()
+
+    summary = [r.to_dict() for r in reports]
+    for report in reports:
+        print(
+            f"{report.name}: mrr={report.metrics['mrr']:.3f} "
+            f"map={report.metrics['map']:.3f} "
+            f"p95={report.latency_ms['total']['p95']:.1f}ms "
+            f"cache_hits={report.cache_hits}/{report.queries} in {report.seconds}s"
+        )
+    if args.out:
+        args.out.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -8,14 +8,19 @@ Provides comprehensive evaluation metrics for RAG systems:
 - Generation metrics (BLEU, ROUGE, BERTScore)
 - Faithfulness metrics
 - Answer relevance metrics
+
+Retrieval metrics over a whole run are computed at once on a
+(queries x ranks) relevance matrix; ROUGE-L uses a bit-parallel LCS.
 """
 
 import math
 import logging
-from typing import List, Dict, Any, Optional, Tuple, Set
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple, Set
 from dataclasses import dataclass, field
 from collections import Counter
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,6 +62,65 @@ class RetrievalExample:
 # =============================================================================
 
 
+def relevance_matrix(
+    retrieved: Sequence[Sequence[str]], relevant: Sequence[Set[str]], width: int = 0
+) -> np.ndarray:
+    """Boolean (queries x ranks) matrix: is the doc at each rank relevant."""
+    width = max(width, max((len(r) for r in retrieved), default=0))
+    matrix = np.zeros((len(retrieved), width), dtype=bool)
+    for row, (docs, rel) in enumerate(zip(retrieved, relevant)):
+        if rel:
+            matrix[row, : len(docs)] = [doc in rel for doc in docs]
+    return matrix
+
+
+def batch_retrieval_metrics(
+    retrieved: Sequence[Sequence[str]],
+    relevant: Sequence[Set[str]],
+    k_values: Iterable[int] = (1, 3, 5, 10),
+) -> Dict[str, np.ndarray]:
+    """
+    Per-query retrieval metrics for a whole run.
+
+    Same definitions as the ``RetrievalMetrics`` static methods (binary
+    relevance), returned as arrays of length ``len(retrieved)``.
+    """
+    k_values = list(k_values)
+    hits = relevance_matrix(retrieved, relevant, max(k_values, default=0))
+    n_queries, width = hits.shape
+    n_relevant = np.array([len(r) for r in relevant], dtype=np.float64)
+    has_relevant = n_relevant > 0
+    safe_relevant = np.where(has_relevant, n_relevant, 1.0)
+
+    ranks = np.arange(1, width + 1, dtype=np.float64)
+    discounts = 1.0 / np.log2(ranks + 1)
+    cumulative = np.cumsum(hits, axis=1)
+
+    any_hit = hits.any(axis=1)
+    first_hit = hits.argmax(axis=1)
+    metrics: Dict[str, np.ndarray] = {
+        "mrr": np.where(any_hit, 1.0 / (first_hit + 1), 0.0),
+        "map": np.where(
+            has_relevant, (cumulative / ranks * hits).sum(axis=1) / safe_relevant, 0.0
+        ),
+    }
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])
+    for k in k_values:
+        if k <= 0:
+            zeros = np.zeros(n_queries)
+            for name in ("precision", "recall", "ndcg", "hit_rate"):
+                metrics[f"{name}@{k}"] = zeros
+            continue
+        found = cumulative[:, k - 1] if width else np.zeros(n_queries)
+        metrics[f"precision@{k}"] = found / k
+        metrics[f"recall@{k}"] = np.where(has_relevant, found / safe_relevant, 0.0)
+        dcg = (hits[:, :k] * discounts[:k]).sum(axis=1)
+        idcg = ideal[np.minimum(n_relevant, k).astype(int)]
+        metrics[f"ndcg@{k}"] = np.divide(dcg, idcg, out=np.zeros(n_queries), where=idcg > 0)
+        metrics[f"hit_rate@{k}"] = (found > 0).astype(np.float64)
+    return metrics
+
+
 class RetrievalMetrics:
     """
     P1.41: Retrieval evaluation metrics.
@@ -227,49 +291,20 @@ class RetrievalMetrics:
         Returns:
             Dictionary of metric scores
         """
-        metrics = {}
-
-        # Initialize accumulators
-        mrr_scores = []
-        ap_scores = []
-
-        for k in k_values:
-            metrics[f"precision@{k}"] = []
-            metrics[f"recall@{k}"] = []
-            metrics[f"ndcg@{k}"] = []
-            metrics[f"hit_rate@{k}"] = []
-
-        # Calculate metrics for each example
-        for ex in examples:
-            mrr_scores.append(self.mrr(ex.retrieved_docs, ex.relevant_docs))
-            ap_scores.append(
-                self.average_precision(ex.retrieved_docs, ex.relevant_docs)
-            )
-
+        if not examples:
+            result = {"mrr": 0, "map": 0}
             for k in k_values:
-                metrics[f"precision@{k}"].append(
-                    self.precision_at_k(ex.retrieved_docs, ex.relevant_docs, k)
-                )
-                metrics[f"recall@{k}"].append(
-                    self.recall_at_k(ex.retrieved_docs, ex.relevant_docs, k)
-                )
-                metrics[f"ndcg@{k}"].append(
-                    self.ndcg_at_k(ex.retrieved_docs, ex.relevant_docs, k)
-                )
-                metrics[f"hit_rate@{k}"].append(
-                    self.hit_rate(ex.retrieved_docs, ex.relevant_docs, k)
-                )
-
+                for name in ("precision", "recall", "ndcg", "hit_rate"):
+                    result[f"{name}@{k}"] = 0
+            return result
+
+        per_query = batch_retrieval_metrics(
+            [ex.retrieved_docs for ex in examples],
+            [set(ex.relevant_docs) for ex in examples],
+            k_values,
+        )
         # Calculate averages
-        result = {
-            "mrr": sum(mrr_scores) / len(mrr_scores) if mrr_scores else 0,
-            "map": sum(ap_scores) / len(ap_scores) if ap_scores else 0,
-        }
-
-        for key, values in metrics.items():
-            result[key] = sum(values) / len(values) if values else 0
-
-        return result
+        return {key: float(values.mean()) for key, values in per_query.items()}
 
 
 # =============================================================================
@@ -277,6 +312,25 @@ class RetrievalMetrics:
 # =============================================================================
 
 
+def lcs_length_bitparallel(a: Sequence[str], b: Sequence[str]) -> int:
+    """
+    Longest common subsequence length (Hyyro's bit-vector algorithm).
+
+    One big-int row update per token of ``b`` instead of an m x n table.
+    """
+    if not a or not b:
+        return 0
+    masks: Dict[str, int] = {}
+    for i, token in enumerate(a):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for token in b:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count("1")
+
+
 class GenerationMetrics:
     """
     P1.41: Text generation evaluation metrics.
@@ -373,18 +427,7 @@ class GenerationMetrics:
         if not candidate_tokens or not reference_tokens:
             return {"precision": 0.0, "recall": 0.0, "f1": 0.0}
 
-        # Find LCS length
-        m, n = len(candidate_tokens), len(reference_tokens)
-        dp = [[0] * (n + 1) for _ in range(m + 1)]
-
-        for i in range(1, m + 1):
-            for j in range(1, n + 1):
-                if candidate_tokens[i - 1] == reference_tokens[j - 1]:
-                    dp[i][j] = dp[i - 1][j - 1] + 1
-                else:
-                    dp[i][j] = max(dp[i - 1][j], dp[i][j - 1])
-
-        lcs_length = dp[m][n]
+        lcs_length = lcs_length_bitparallel(candidate_tokens, reference_tokens)
 
         precision = lcs_length / len(candidate_tokens)
         recall = lcs_length / len(reference_tokens)
@@ -663,4 +706,7 @@ __all__ = [
     "RAGEvaluator",
     "EvaluationResult",
     "RetrievalExample",
+    "batch_retrieval_metrics",
+    "relevance_matrix",
+    "lcs_length_bitparallel",
 ]
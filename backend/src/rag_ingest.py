@@ -1,18 +1,64 @@
 """
 Ingest Markdown files into Chroma collection for RAG.
 Usage:
-  python complete_inventory_system/backend/src/rag_ingest.py --rebuild
+  python complete_inventory_system/backend/src/rag_ingest.py [--rebuild]
+
+Ingestion is incremental. A manifest next to the Chroma store maps every
+source path to its content hash and chunk ids, so a run only:
+- re-chunks files whose hash changed,
+- embeds chunks whose text is new (chunk ids are content-addressed),
+- deletes chunks of removed files and chunks dropped from edited files.
+
+Markdown is chunked on headings and paragraphs with a token budget, and
+embeddings are computed in bounded batches (optionally across a process
+pool) and upserted as they arrive.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
+import logging
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Dict, Union, Sequence, Mapping, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+
+try:
+    import chromadb
+
+    CHROMADB_AVAILABLE = True
+except ImportError:
+    chromadb = None
+    CHROMADB_AVAILABLE = False
+
+try:
+    from sentence_transformers import SentenceTransformer
+
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SentenceTransformer = None
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
 
-import chromadb
-from sentence_transformers import SentenceTransformer
+logger = logging.getLogger(__name__)
 
 # Paths
 SRC_DIR = Path(__file__).resolve().parent
@@ -33,6 +79,19 @@ PERSIST_DIR = Path(
 )
 COLLECTION_NAME = os.environ.get("RAG_COLLECTION", "docs")
 MODEL_NAME = os.environ.get("RAG_MODEL", "all-MiniLM-L6-v2")
+MANIFEST_PATH = Path(
+    os.environ.get(
+        "RAG_INGEST_MANIFEST", str(PERSIST_DIR / f"{COLLECTION_NAME}_manifest.json")
+    )
+)
+
+# Chunking / embedding
+CHUNK_TOKENS = int(os.environ.get("RAG_CHUNK_TOKENS", 200))
+CHUNK_OVERLAP = int(os.environ.get("RAG_CHUNK_OVERLAP", 20))
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", 64))
+INGEST_WORKERS = int(os.environ.get("RAG_INGEST_WORKERS", 1))
+
+MANIFEST_VERSION = 1
 
 MetadataValue = Union[str, int, float, bool, None]
 MetadataDict = Dict[str, MetadataValue]
@@ -66,6 +125,25 @@ def read_text(path: Path) -> str:
         return ""
 
 
+def source_key(path: Path) -> str:
+    """Stable id base / metadata path of a file (relative to the repo root)."""
+    try:
+        rel = path.relative_to(ROOT) if path.is_absolute() else path
+    except ValueError:
+        rel = path
+    return str(rel).replace("\\", "/")
+
+
+# =============================================================================
+# Chunking
+# =============================================================================
+
+
+def count_tokens(text: str) -> int:
+    """Whitespace token count used for the chunk budget."""
+    return len(text.split())
+
+
 def chunk_text(
     text: str,
     chunk_size: int = 800,
@@ -84,9 +162,348 @@ def chunk_text(
     return chunks
 
 
-def main(rebuild: bool = False) -> None:
-    """Ingest markdown into a Chroma collection."""
-    # pylint: disable=too-many-locals
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def split_sections(text: str) -> List[Tuple[str, List[str]]]:
+    """
+    Split Markdown into (heading path, paragraphs) sections.
+
+    Headings inside fenced code blocks are ignored, and a fenced block is
+    kept in one paragraph.
+    """
+    sections: List[Tuple[str, List[str]]] = []
+    headings: List[Tuple[int, str]] = []
+    paragraphs: List[str] = []
+    current: List[str] = []
+    in_fence = False
+
+    def end_paragraph():
+        if current:
+            paragraph = "\n".join(current).strip()
+            if paragraph:
+                paragraphs.append(paragraph)
+            current.clear()
+
+    def end_section():
+        end_paragraph()
+        if paragraphs:
+            sections.append((" > ".join(h for _, h in headings), list(paragraphs)))
+            paragraphs.clear()
+
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            current.append(line)
+            continue
+        if not in_fence:
+            heading = _HEADING.match(line)
+            if heading:
+                end_section()
+                level = len(heading.group(1))
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, heading.group(2)))
+                continue
+            if not line.strip():
+                end_paragraph()
+                continue
+        current.append(line)
+    end_section()
+    return sections
+
+
+def chunk_markdown(
+    text: str,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap: int = CHUNK_OVERLAP,
+) -> List[Tuple[str, str]]:
+    """
+    Structure-aware chunking: (section, chunk) pairs.
+
+    Paragraphs of one section are packed up to ``max_tokens``; a paragraph
+    larger than the budget is split with overlapping word windows. Each
+    chunk starts with its heading path so it keeps its context.
+    """
+    chunks: List[Tuple[str, str]] = []
+    for section, paragraphs in split_sections(text):
+        bodies: List[str] = []
+        packed: List[str] = []
+        size = 0
+        for paragraph in paragraphs:
+            tokens = count_tokens(paragraph)
+            if packed and size + tokens > max_tokens:
+                bodies.append("\n\n".join(packed))
+                packed, size = [], 0
+            if tokens > max_tokens:
+                bodies.extend(chunk_text(paragraph, max_tokens, overlap))
+                continue
+            packed.append(paragraph)
+            size += tokens
+        if packed:
+            bodies.append("\n\n".join(packed))
+        for body in bodies:
+            chunks.append((section, f"{section}\n\n{body}" if section else body))
+    return chunks
+
+
+def chunk_id(key: str, text: str) -> str:
+    """Content-addressed chunk id: unchanged chunks keep their id (and vector)."""
+    return f"{key}#{hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()}"
+
+
+@dataclass
+class Chunk:
+    """One chunk of a source, ready to embed."""
+
+    id: str
+    text: str
+    meta: MetadataDict
+
+
+def build_chunks(
+    key: str, text: str, max_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP
+) -> List[Chunk]:
+    """Chunk one source; duplicate chunk texts get distinct ids."""
+    chunks: List[Chunk] = []
+    seen: Dict[str, int] = {}
+    for idx, (section, chunk) in enumerate(chunk_markdown(text, max_tokens, overlap)):
+        cid = chunk_id(key, chunk)
+        if cid in seen:
+            seen[cid] += 1
+            cid = f"{cid}.{seen[cid]}"
+        else:
+            seen[cid] = 0
+        chunks.append(
+            Chunk(cid, chunk, {"path": key, "chunk": idx, "section": section})
+        )
+    return chunks
+
+
+# =============================================================================
+# Manifest
+# =============================================================================
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(path: Path, settings: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Load the manifest; a missing/corrupt one, or one written with other
+    model/chunking settings, yields an empty manifest (full re-ingest).
+    """
+    empty = {"version": MANIFEST_VERSION, "settings": dict(settings), "files": {}}
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return empty
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("settings") != dict(settings)
+        or not isinstance(manifest.get("files"), dict)
+    ):
+        return empty
+    return manifest
+
+
+def save_manifest(path: Path, manifest: Mapping[str, Any]) -> None:
+    """Write the manifest atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# Embedding
+# =============================================================================
+
+
+@lru_cache(maxsize=1)
+def _get_model():
+    """Embedding model, loaded once per process (pool workers included)."""
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise RuntimeError("sentence-transformers is not installed")
+    return SentenceTransformer(MODEL_NAME)
+
+
+def encode_texts(texts: Sequence[str]):
+    """Normalized embeddings (np.ndarray) for a batch of texts."""
+    return _get_model().encode(
+        list(texts),
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )  # type: ignore
+
+
+def iter_embeddings(
+    texts: Sequence[str],
+    encode: Callable[[Sequence[str]], Any] = encode_texts,
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = INGEST_WORKERS,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (start, vectors) per batch, in order.
+
+    With ``workers > 1`` batches are encoded in a process pool with at most
+    ``2 * workers`` batches in flight, so memory stays bounded by the batch
+    size rather than the corpus size.
+    """
+    starts = range(0, len(texts), batch_size)
+    if workers <= 1 or len(starts) <= 1:
+        for start in starts:
+            yield start, encode(texts[start : start + batch_size])
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for start in starts:
+            pending.append(
+                (start, pool.submit(encode, list(texts[start : start + batch_size])))
+            )
+            if len(pending) >= 2 * workers:
+                first, future = pending.pop(0)
+                yield first, future.result()
+        for start, future in pending:
+            yield start, future.result()
+
+
+# =============================================================================
+# Incremental ingestion
+# =============================================================================
+
+
+@dataclass
+class IngestStats:
+    """Counters of one ingestion run."""
+
+    sources: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    chunks_deleted: int = 0
+    seconds: float = 0.0
+    changed_keys: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if k != "changed_keys"}
+
+
+def ingest(
+    collection,
+    sources: Iterable[Tuple[str, str]],
+    manifest_path: Path = MANIFEST_PATH,
+    encode: Callable[[Sequence[str]], Any] = encode_texts,
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = INGEST_WORKERS,
+    max_tokens: int = CHUNK_TOKENS,
+    prune: bool = True,
+    overlap: int = CHUNK_OVERLAP,
+) -> IngestStats:
+    """
+    Bring ``collection`` in line with ``sources`` ((key, text) pairs).
+
+    Args:
+        collection: Chroma collection (upsert/update/delete)
+        sources: (key, text) of every current source
+        manifest_path: Manifest of the previous run
+        encode: texts -> normalized vectors (must be picklable for workers > 1)
+        prune: Delete chunks of manifest entries missing from ``sources``
+    """
+    started = time.perf_counter()
+    settings = {"model": MODEL_NAME, "max_tokens": max_tokens, "overlap": overlap}
+    manifest = load_manifest(manifest_path, settings)
+    previous: Dict[str, Dict[str, Any]] = manifest["files"]
+    files: Dict[str, Dict[str, Any]] = {}
+    stats = IngestStats()
+
+    to_embed: List[Chunk] = []
+    to_relabel: List[Chunk] = []
+    stale_ids: List[str] = []
+    legacy_keys: List[str] = []
+
+    for key, text in sources:
+        if not text.strip():
+            continue
+        stats.sources += 1
+        digest = content_hash(text)
+        entry = previous.get(key)
+        if entry and entry.get("sha256") == digest:
+            files[key] = entry
+            stats.unchanged += 1
+            continue
+
+        stats.changed += 1
+        stats.changed_keys.append(key)
+        chunks = build_chunks(key, text, max_tokens, overlap)
+        old_ids = set(entry["chunk_ids"]) if entry else set()
+        if entry is None:
+            # not tracked yet: clear whatever an earlier full ingest stored
+            legacy_keys.append(key)
+            old_ids = set()
+        for chunk in chunks:
+            (to_relabel if chunk.id in old_ids else to_embed).append(chunk)
+        new_ids = {chunk.id for chunk in chunks}
+        stale_ids.extend(sorted(old_ids - new_ids))
+        files[key] = {"sha256": digest, "chunk_ids": [c.id for c in chunks]}
+
+    if prune:
+        for key, entry in previous.items():
+            if key not in files:
+                stats.removed += 1
+                stale_ids.extend(entry.get("chunk_ids", []))
+    else:
+        for key, entry in previous.items():
+            files.setdefault(key, entry)
+
+    for key in legacy_keys:
+        collection.delete(where={"path": key})
+
+    texts = [chunk.text for chunk in to_embed]
+    for start, vectors in iter_embeddings(texts, encode, batch_size, workers):
+        batch = to_embed[start : start + len(vectors)]
+        collection.upsert(
+            ids=[c.id for c in batch],
+            documents=[c.text for c in batch],
+            metadatas=cast(Sequence[Mapping[str, MetadataValue]], [c.meta for c in batch]),
+            embeddings=vectors,
+        )
+        stats.chunks_embedded += len(batch)
+        logger.info("Upserted %d/%d", stats.chunks_embedded, len(texts))
+
+    if to_relabel:
+        # same text, same vector: only the position metadata may have moved
+        collection.update(
+            ids=[c.id for c in to_relabel],
+            metadatas=cast(Sequence[Mapping[str, MetadataValue]], [c.meta for c in to_relabel]),
+        )
+        stats.chunks_reused = len(to_relabel)
+
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        stats.chunks_deleted = len(stale_ids)
+
+    manifest["files"] = files
+    save_manifest(manifest_path, manifest)
+    stats.seconds = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def iter_file_sources(paths: Optional[Iterable[Path]] = None) -> Iterator[Tuple[str, str]]:
+    """(key, text) for the configured Markdown files."""
+    for path in paths if paths is not None else iter_markdown_files():
+        yield source_key(path), read_text(path)
+
+
+def get_collection(rebuild: bool = False):
+    """Open (or recreate with ``rebuild``) the Chroma collection."""
+    if not CHROMADB_AVAILABLE:
+        raise RuntimeError("chromadb is not installed")
     PERSIST_DIR.mkdir(parents=True, exist_ok=True)
 
     client = chromadb.PersistentClient(path=str(PERSIST_DIR))
@@ -97,58 +514,41 @@ def main(rebuild: bool = False) -> None:
             except (ValueError, RuntimeError):
                 # Collection may not exist yet
                 pass
-        col = client.get_or_create_collection(
+        return client.get_or_create_collection(
             name=COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
         )
     except (ValueError, RuntimeError, TypeError):
-        col = client.create_collection(
+        return client.create_collection(
             name=COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
         )
 
-    model = SentenceTransformer(MODEL_NAME)
 
-    all_texts: List[str] = []
-    all_ids: List[str] = []
-    all_meta: List[MetadataDict] = []
+def main(
+    rebuild: bool = False,
+    workers: int = INGEST_WORKERS,
+    batch_size: int = EMBED_BATCH_SIZE,
+) -> None:
+    """Ingest markdown into a Chroma collection."""
+    if rebuild and MANIFEST_PATH.exists():
+        MANIFEST_PATH.unlink()
+    col = get_collection(rebuild=rebuild)
 
-    for path in iter_markdown_files():
-        text = read_text(path)
-        if not text.strip():
-            continue
-        chunks = chunk_text(text)
-        for idx, ch in enumerate(chunks):
-            meta_path = str(path.relative_to(ROOT)) if path.is_absolute() else str(path)
-            id_base = meta_path.replace("\\", "/")
-            all_texts.append(ch)
-            all_ids.append(f"{id_base}:{idx}")
-            all_meta.append({"path": id_base, "chunk": idx})
-
-    if not all_texts:
+    stats = ingest(
+        col,
+        iter_file_sources(),
+        MANIFEST_PATH,
+        batch_size=batch_size,
+        workers=workers,
+    )
+    if not stats.sources:
         print("No markdown files found to ingest.")
         return
 
-    embeddings = model.encode(
-        all_texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True,
-    )  # type: ignore
-
-    # Upsert in batches to avoid large payloads
-    batch_size = 256
-    for i in range(0, len(all_texts), batch_size):
-        j = i + batch_size
-        metadata_batch = cast(Sequence[Mapping[str, MetadataValue]], all_meta[i:j])
-        col.upsert(
-            ids=all_ids[i:j],
-            documents=all_texts[i:j],
-            metadatas=metadata_batch,
-            embeddings=embeddings[i:j],
-        )
-        print(f"Upserted {min(j, len(all_texts))}/{len(all_texts)}")
-
     print(
         f"Ingestion complete. Collection={COLLECTION_NAME}, "
-        f"items={len(all_texts)} at {PERSIST_DIR}"
+        f"changed={stats.changed} unchanged={stats.unchanged} removed={stats.removed} "
+        f"embedded={stats.chunks_embedded} reused={stats.chunks_reused} "
+        f"deleted={stats.chunks_deleted} in {stats.seconds}s at {PERSIST_DIR}"
     )
 
 
@@ -157,5 +557,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--rebuild", action="store_true", help="Drop and rebuild the collection"
     )
+    parser.add_argument(
+        "--workers", type=int, default=INGEST_WORKERS, help="Embedding processes"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding batch"
+    )
     args = parser.parse_args()
-    main(rebuild=args.rebuild)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main(rebuild=args.rebuild, workers=args.workers, batch_size=args.batch_size)
@@ -9,16 +9,23 @@ Implements multiple reranking strategies:
 - BM25 scoring
 - Hybrid scoring (semantic + keyword)
 - Diversity-aware reranking
+
+Scores and embeddings are handled as NumPy arrays: document embeddings are
+one float32 matrix (query relevance is a single matrix-vector product), MMR
+keeps an incremental max-similarity vector, and score normalization/fusion
+is vectorized.
 """
 
 import os
 import re
 import math
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from dataclasses import dataclass
 from collections import Counter
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -32,6 +39,63 @@ RERANKER_TOP_K = int(os.environ.get("RAG_RERANKER_TOP_K", 10))
 BM25_K1 = float(os.environ.get("BM25_K1", 1.5))
 BM25_B = float(os.environ.get("BM25_B", 0.75))
 DIVERSITY_LAMBDA = float(os.environ.get("DIVERSITY_LAMBDA", 0.5))
+# "" keeps per-signal defaults (BM25: max, cross-encoder: min-max)
+SCORE_NORMALIZATION = os.environ.get("RAG_SCORE_NORMALIZATION", "")
+
+
+# =============================================================================
+# Vector helpers
+# =============================================================================
+
+
+def as_unit_matrix(vectors: Sequence[Sequence[float]], dim: Optional[int] = None) -> np.ndarray:
+    """
+    Stack vectors into a float32 matrix with L2-normalized rows.
+
+    Zero vectors and vectors whose length differs from ``dim`` become zero
+    rows, i.e. cosine similarity 0 with everything.
+    """
+    try:
+        matrix = np.asarray(vectors, dtype=np.float32)
+    except ValueError:  # ragged input
+        matrix = None
+    if matrix is None or matrix.ndim != 2 or (dim is not None and matrix.shape[1] != dim):
+        if dim is None:
+            dim = Counter(len(v) for v in vectors).most_common(1)[0][0] if len(vectors) else 0
+        matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+        for i, vec in enumerate(vectors):
+            if vec is not None and len(vec) == dim:
+                matrix[i] = vec
+    else:
+        matrix = matrix.copy()
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def normalize_scores(scores, method: str = "minmax") -> np.ndarray:
+    """
+    Normalize a score vector.
+
+    Methods:
+        max:    s / max(s) (0 when max <= 0)
+        minmax: (s - min) / (max - min) (unchanged when all equal)
+        zscore: (s - mean) / std (0 when std == 0)
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return scores
+    if method == "max":
+        top = scores.max()
+        return scores / top if top > 0 else np.zeros_like(scores)
+    if method == "minmax":
+        low, high = scores.min(), scores.max()
+        return (scores - low) / (high - low) if high > low else scores
+    if method == "zscore":
+        std = scores.std()
+        return (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+    raise ValueError(f"Unknown normalization method: {method}")
 
 
 # =============================================================================
@@ -71,6 +135,7 @@ class BM25Scorer:
         self.avgdl = 0
         self.doc_freqs: Dict[str, int] = {}
         self.doc_lengths: List[int] = []
+        self.doc_term_freqs: List[Counter] = []
         self.corpus_size = 0
 
     def _tokenize(self, text: str) -> List[str]:
@@ -89,6 +154,7 @@ class BM25Scorer:
         """
         self.corpus_size = len(documents)
         self.doc_lengths = []
+        self.doc_term_freqs = []
         self.doc_freqs = Counter()
 
         total_length = 0
@@ -97,14 +163,42 @@ class BM25Scorer:
             self.doc_lengths.append(len(tokens))
             total_length += len(tokens)
 
-            # Count document frequencies (unique terms per doc)
-            unique_tokens = set(tokens)
-            for token in unique_tokens:
-                self.doc_freqs[token] += 1
+            # Term frequencies; their keys are the unique terms of the doc
+            term_freqs = Counter(tokens)
+            self.doc_term_freqs.append(term_freqs)
+            self.doc_freqs.update(term_freqs.keys())
 
         self.avgdl = total_length / self.corpus_size if self.corpus_size > 0 else 0
         return self
 
+    def score_all(self, query: str) -> np.ndarray:
+        """
+        BM25 scores of the query against every fitted document.
+
+        Same values as ``score(query, doc, i)`` for each i, computed on a
+        (documents x query terms) term-frequency matrix.
+        """
+        query_tokens = self._tokenize(query)
+        if not self.corpus_size or not query_tokens:
+            return np.zeros(self.corpus_size)
+
+        tf = np.array(
+            [[freqs.get(term, 0) for term in query_tokens] for freqs in self.doc_term_freqs],
+            dtype=np.float64,
+        )
+        df = np.array([self.doc_freqs.get(term, 0) for term in query_tokens], dtype=np.float64)
+        idf = np.log((self.corpus_size - df + 0.5) / (df + 0.5) + 1)
+
+        doc_len = np.asarray(self.doc_lengths, dtype=np.float64)[:, None]
+        length_norm = self.k1 * (1 - self.b + self.b * doc_len / (self.avgdl or 1))
+        tf_component = np.divide(
+            tf * (self.k1 + 1),
+            tf + length_norm,
+            out=np.zeros_like(tf),
+            where=tf > 0,
+        )
+        return tf_component @ idf
+
     def score(self, query: str, doc_text: str, doc_idx: int = 0) -> float:
         """
         Calculate BM25 score for a query-document pair.
@@ -206,27 +300,35 @@ class CrossEncoderReranker:
             # Fallback: return documents with original scores
             return documents[:top_k]
 
-        # Prepare pairs for cross-encoder
-        pairs = [(query, doc.get("text", "")) for doc in documents]
+        scores = self.score(query, documents)
+        if scores is None:
+            return documents[:top_k]
 
-        try:
-            # Get cross-encoder scores
-            scores = self.model.predict(pairs)
+        # Combine with original documents
+        for doc, score in zip(documents, scores.tolist()):
+            doc["rerank_score"] = score
 
-            # Combine with original documents
-            for i, doc in enumerate(documents):
-                doc["rerank_score"] = float(scores[i])
+        # Sort by rerank score
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [documents[i] for i in order]
 
-            # Sort by rerank score
-            reranked = sorted(
-                documents, key=lambda x: x.get("rerank_score", 0), reverse=True
-            )
+    def score(self, query: str, documents: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Cross-encoder scores aligned with ``documents``.
 
-            return reranked[:top_k]
+        Returns:
+            Score vector, or None when the model is unavailable or fails
+        """
+        if self.model is None or not documents:
+            return None
 
+        # Prepare pairs for cross-encoder
+        pairs = [(query, doc.get("text", "")) for doc in documents]
+        try:
+            return np.asarray(self.model.predict(pairs), dtype=np.float64).reshape(-1)
         except Exception as e:
             logger.error(f"P1.40: Cross-encoder reranking failed: {e}")
-            return documents[:top_k]
+            return None
 
 
 # =============================================================================
@@ -250,11 +352,14 @@ class HybridReranker:
         bm25_weight: float = 0.3,
         cross_encoder_weight: float = 0.2,
         use_cross_encoder: bool = True,
+        normalization: str = SCORE_NORMALIZATION,
     ):
         self.semantic_weight = semantic_weight
         self.bm25_weight = bm25_weight
         self.cross_encoder_weight = cross_encoder_weight
         self.use_cross_encoder = use_cross_encoder
+        # "max", "minmax" or "zscore" for the BM25 and cross-encoder signals
+        self.normalization = normalization
 
         self.bm25 = BM25Scorer()
         self.cross_encoder = CrossEncoderReranker() if use_cross_encoder else None
@@ -282,69 +387,49 @@ class HybridReranker:
         texts = [doc.get("text", "") for doc in documents]
         self.bm25.fit(texts)
 
-        # Calculate BM25 scores
-        bm25_scores = []
-        for i, doc in enumerate(documents):
-            score = self.bm25.score(query, doc.get("text", ""), i)
-            bm25_scores.append(score)
-
-        # Normalize BM25 scores
-        max_bm25 = max(bm25_scores) if bm25_scores else 1
-        bm25_scores = [s / max_bm25 if max_bm25 > 0 else 0 for s in bm25_scores]
+        # Calculate and normalize BM25 scores
+        bm25_scores = normalize_scores(
+            self.bm25.score_all(query), self.normalization or "max"
+        )
 
         # Get cross-encoder scores if available
-        ce_scores = [0.0] * len(documents)
-        if self.use_cross_encoder and self.cross_encoder and self.cross_encoder.model:
-            reranked = self.cross_encoder.rerank(
-                query, documents.copy(), len(documents)
-            )
-            for i, doc in enumerate(documents):
-                for j, reranked_doc in enumerate(reranked):
-                    if doc.get("id") == reranked_doc.get("id"):
-                        ce_scores[i] = reranked_doc.get("rerank_score", 0)
-                        break
-
-            # Normalize cross-encoder scores
-            max_ce = max(ce_scores) if ce_scores else 1
-            min_ce = min(ce_scores) if ce_scores else 0
-            if max_ce > min_ce:
-                ce_scores = [(s - min_ce) / (max_ce - min_ce) for s in ce_scores]
-
-        # Calculate final hybrid scores
-        results = []
-        for i, doc in enumerate(documents):
-            # Convert distance to similarity (1 - distance for cosine)
-            semantic_score = 1 - doc.get("distance", 0)
-
-            # Weighted combination
-            final_score = (
-                self.semantic_weight * semantic_score
-                + self.bm25_weight * bm25_scores[i]
-                + self.cross_encoder_weight * ce_scores[i]
-            )
+        ce_scores = np.zeros(len(documents))
+        if self.use_cross_encoder and self.cross_encoder:
+            scores = self.cross_encoder.score(query, documents)
+            if scores is not None:
+                ce_scores = normalize_scores(scores, self.normalization or "minmax")
+
+        # Convert distance to similarity (1 - distance for cosine)
+        semantic_scores = 1 - np.array(
+            [doc.get("distance", 0) for doc in documents], dtype=np.float64
+        )
+
+        # Weighted combination
+        final_scores = (
+            self.semantic_weight * semantic_scores
+            + self.bm25_weight * bm25_scores
+            + self.cross_encoder_weight * ce_scores
+        )
+        reranked_scores = ce_scores if self.use_cross_encoder else bm25_scores
+
+        # Sort by final score (stable: ties keep retrieval order)
+        order = np.argsort(-final_scores, kind="stable")[:top_k]
 
+        results = []
+        for rank, i in enumerate(order.tolist(), start=1):
+            doc = documents[i]
             results.append(
                 RankedDocument(
                     id=doc.get("id", ""),
                     text=doc.get("text", ""),
                     metadata=doc.get("meta", {}),
-                    original_score=semantic_score,
-                    reranked_score=(
-                        ce_scores[i] if self.use_cross_encoder else bm25_scores[i]
-                    ),
-                    final_score=final_score,
-                    rank=0,  # Will be set after sorting
+                    original_score=float(semantic_scores[i]),
+                    reranked_score=float(reranked_scores[i]),
+                    final_score=float(final_scores[i]),
+                    rank=rank,
                 )
             )
-
-        # Sort by final score
-        results.sort(key=lambda x: x.final_score, reverse=True)
-
-        # Set ranks
-        for i, doc in enumerate(results):
-            doc.rank = i + 1
-
-        return results[:top_k]
+        return results
 
 
 # =============================================================================
@@ -362,25 +447,11 @@ class MMRDiversifier:
     def __init__(self, lambda_param: float = DIVERSITY_LAMBDA):
         self.lambda_param = lambda_param
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        if not vec1 or not vec2 or len(vec1) != len(vec2):
-            return 0.0
-
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = math.sqrt(sum(a * a for a in vec1))
-        norm2 = math.sqrt(sum(b * b for b in vec2))
-
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-
-        return dot_product / (norm1 * norm2)
-
     def diversify(
         self,
-        query_embedding: List[float],
+        query_embedding: Sequence[float],
         documents: List[Dict[str, Any]],
-        embeddings: List[List[float]],
+        embeddings: Sequence[Sequence[float]],
         top_k: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
@@ -389,52 +460,38 @@ class MMRDiversifier:
         Args:
             query_embedding: Query vector
             documents: List of documents
-            embeddings: Document embeddings
+            embeddings: Document embeddings (lists or an ndarray), in
+                the same order as ``documents``
             top_k: Number of documents to return
 
         Returns:
             Diversified document list
         """
-        if not documents or not embeddings:
+        if not documents or embeddings is None or len(embeddings) == 0:
             return documents
 
-        top_k = top_k or min(RERANKER_TOP_K, len(documents))
-
-        # Calculate relevance scores (similarity to query)
-        relevance_scores = [
-            self._cosine_similarity(query_embedding, emb) for emb in embeddings
-        ]
-
-        selected_indices = []
-        remaining_indices = list(range(len(documents)))
-
-        while len(selected_indices) < top_k and remaining_indices:
-            best_idx = None
-            best_mmr = float("-inf")
-
-            for idx in remaining_indices:
-                # Relevance to query
-                relevance = relevance_scores[idx]
-
-                # Maximum similarity to already selected documents
-                max_sim = 0.0
-                if selected_indices:
-                    for sel_idx in selected_indices:
-                        sim = self._cosine_similarity(
-                            embeddings[idx], embeddings[sel_idx]
-                        )
-                        max_sim = max(max_sim, sim)
-
-                # MMR score
-                mmr = self.lambda_param * relevance - (1 - self.lambda_param) * max_sim
-
-                if mmr > best_mmr:
-                    best_mmr = mmr
-                    best_idx = idx
-
-            if best_idx is not None:
-                selected_indices.append(best_idx)
-                remaining_indices.remove(best_idx)
+        # Only documents that have an embedding can be selected
+        n = min(len(documents), len(embeddings))
+        top_k = min(top_k or min(RERANKER_TOP_K, n), n)
+
+        # Document embeddings as one unit-row matrix; relevance is one matvec
+        doc_matrix = as_unit_matrix(embeddings[:n])
+        query = as_unit_matrix([query_embedding], dim=doc_matrix.shape[1])[0]
+        relevance = doc_matrix @ query
+
+        # Max similarity of each candidate to the selected set, updated with
+        # one matvec per pick (similarities below 0 count as 0)
+        max_sim = np.zeros(n, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        selected_indices: List[int] = []
+
+        for _ in range(top_k):
+            mmr = self.lambda_param * relevance - (1 - self.lambda_param) * max_sim
+            mmr[~available] = -np.inf
+            best_idx = int(np.argmax(mmr))
+            selected_indices.append(best_idx)
+            available[best_idx] = False
+            np.maximum(max_sim, doc_matrix @ doc_matrix[best_idx], out=max_sim)
 
         # Return diversified documents
         return [documents[i] for i in selected_indices]
@@ -516,18 +573,27 @@ class RAGReranker:
         else:  # bm25
             # Simple BM25 scoring
             texts = [doc.get("text", "") for doc in documents]
-            self.reranker.fit(texts)
-            scores = [
-                self.reranker.score(query, doc.get("text", ""), i)
-                for i, doc in enumerate(documents)
-            ]
+            scores = self.reranker.fit(texts).score_all(query)
             # Sort by score
-            doc_scores = list(zip(documents, scores))
-            doc_scores.sort(key=lambda x: x[1], reverse=True)
-            reranked = [d for d, s in doc_scores[: self.top_k]]
+            order = np.argsort(-scores, kind="stable")[: self.top_k]
+            reranked = [documents[i] for i in order]
 
         # Apply diversity if enabled
-        if self.use_diversity and query_embedding and doc_embeddings:
+        if (
+            self.use_diversity
+            and query_embedding is not None
+            and doc_embeddings is not None
+            and len(query_embedding)
+            and len(doc_embeddings)
+        ):
+            # doc_embeddings follow the input order; align them with the
+            # reranked list when ids allow it
+            position = {doc.get("id"): i for i, doc in enumerate(documents)}
+            rows = [position.get(doc.get("id")) for doc in reranked]
+            if len(position) == len(documents) and all(
+                row is not None and row < len(doc_embeddings) for row in rows
+            ):
+                doc_embeddings = [doc_embeddings[row] for row in rows]
             reranked = self.diversifier.diversify(
                 query_embedding, reranked, doc_embeddings, self.top_k
             )
@@ -542,4 +608,6 @@ __all__ = [
     "MMRDiversifier",
     "RAGReranker",
     "RankedDocument",
+    "as_unit_matrix",
+    "normalize_scores",
 ]
@@ -8,6 +8,19 @@ from .circuit_breaker import (
     get_circuit_breaker,
 )
 from .http_client import http_request, http_get, http_post, http_put, http_delete
+from .session_pool import (
+    configure_service_pool,
+    get_session,
+    close_sessions,
+    pool_stats,
+)
+from .async_http_client import (
+    async_http_request,
+    async_http_get,
+    async_http_post,
+    async_http_put,
+    async_http_delete,
+)
 
 # Optional: pybreaker + tenacity adapter
 try:  # pragma: no cover - optional dependency may be absent in some environments
@@ -37,6 +50,17 @@ __all__ = [
     "http_post",
     "http_put",
     "http_delete",
+    # pooled keep-alive sessions
+    "configure_service_pool",
+    "get_session",
+    "close_sessions",
+    "pool_stats",
+    # asyncio variants (httpx)
+    "async_http_request",
+    "async_http_get",
+    "async_http_post",
+    "async_http_put",
+    "async_http_delete",
 ]
 
 if _PB_AVAILABLE:
@@ -0,0 +1,200 @@
+"""
+Asyncio HTTP client with the same retries, backoff + jitter, hedging and
+Circuit Breaker semantics as http_client.
+
+Backed by httpx (optional dependency). One pooled ``httpx.AsyncClient`` per
+service and event loop; pool sizes come from session_pool so sync and async
+callers of a service share one configuration. Backoff uses ``asyncio.sleep``
+so retries never block the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import Any, Dict, Optional
+
+from .circuit_breaker import CircuitOpenError
+from .http_client import (
+    IDEMPOTENT_METHODS,
+    _backoff_delay,
+    _get_breaker,
+    _is_server_error,
+    _resolve_config,
+)
+from .session_pool import service_pool_config
+
+try:
+    import httpx
+
+    HTTPX_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None  # type: ignore
+    HTTPX_AVAILABLE = False
+
+_RETRYABLE_EXC: tuple = (asyncio.TimeoutError, ConnectionError)
+if HTTPX_AVAILABLE:
+    _RETRYABLE_EXC += (httpx.TimeoutException, httpx.TransportError)
+
+# event loop -> {service_name: AsyncClient}; clients are bound to their loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client(service_name: str):
+    """Return the pooled ``httpx.AsyncClient`` of ``service_name`` for this loop."""
+    if not HTTPX_AVAILABLE:
+        raise RuntimeError("httpx is required for the async HTTP client")
+    loop = asyncio.get_running_loop()
+    per_loop = _clients.setdefault(loop, {})
+    client = per_loop.get(service_name)
+    if client is None or client.is_closed:
+        cfg = service_pool_config(service_name)
+        client = per_loop[service_name] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=cfg["pool_maxsize"] * cfg["pool_connections"],
+                max_keepalive_connections=cfg["pool_maxsize"],
+            )
+        )
+    return client
+
+
+async def close_async_clients() -> None:
+    """Close the pooled clients of the running loop."""
+    per_loop = _clients.pop(asyncio.get_running_loop(), {})
+    for client in per_loop.values():
+        await client.aclose()
+
+
+async def _hedged_send(send, hedge_after: float, max_hedges: int):
+    """Async counterpart of http_client._hedged_send; losing copies are cancelled."""
+    pending = {asyncio.ensure_future(send())}
+    launched = 1
+    last_resp = None
+    last_exc: Optional[BaseException] = None
+    try:
+        while pending:
+            can_hedge = launched <= max_hedges
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=hedge_after if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                pending.add(asyncio.ensure_future(send()))
+                launched += 1
+                continue
+            for task in done:
+                exc = task.exception()
+                if exc is not None:
+                    last_exc = exc
+                    continue
+                resp = task.result()
+                if not _is_server_error(resp):
+                    return resp
+                last_resp = resp
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if last_resp is not None:
+        return last_resp
+    assert last_exc is not None
+    raise last_exc
+
+
+async def async_http_request(
+    service_name: str,
+    method: str,
+    url: str,
+    *,
+    client: Any = None,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff_base: Optional[float] = None,
+    backoff_factor: Optional[float] = None,
+    jitter: Optional[float] = None,
+    breaker_kwargs: Optional[dict] = None,
+    hedge_after: Optional[float] = None,
+    max_hedges: Optional[int] = None,
+    **kwargs,
+):
+    """
+    Perform an HTTP request with circuit-breaker and retries (asyncio).
+
+    Arguments mirror http_client.http_request; ``client`` replaces ``session``
+    and defaults to the pooled AsyncClient of the service.
+    """
+    cfg = _resolve_config(
+        breaker_kwargs,
+        timeout_seconds=timeout,
+        retries=retries,
+        backoff_base=backoff_base,
+        backoff_factor=backoff_factor,
+        jitter=jitter,
+        max_hedges=max_hedges,
+    )
+    breaker = _get_breaker(service_name, cfg)
+    client = client or get_async_client(service_name)
+    method = method.upper()
+    timeout = cfg["timeout_seconds"]
+
+    async def send():
+        return await client.request(method, url, timeout=timeout, **kwargs)
+
+    hedged = hedge_after is not None and method in IDEMPOTENT_METHODS
+
+    token = breaker.before_call()
+    last_exc: Optional[BaseException] = None
+    total_attempts = max(0, int(cfg["retries"])) + 1
+
+    for attempt in range(total_attempts):
+        try:
+            if hedged:
+                resp = await _hedged_send(send, hedge_after, int(cfg["max_hedges"]))
+            else:
+                resp = await send()
+            if _is_server_error(resp):
+                if attempt < total_attempts - 1:
+                    await asyncio.sleep(_backoff_delay(attempt, cfg))
+                    continue
+                # final failure: HTTPError is recorded once by the handler below
+                resp.raise_for_status()
+            else:
+                breaker.after_call(token, success=True)
+            return resp
+        except asyncio.CancelledError:
+            # Caller gave up: free the probe slot, record no outcome
+            breaker.release(token)
+            raise
+        except Exception as exc:  # network errors / timeout / last 5xx raise
+            last_exc = exc
+            if isinstance(exc, _RETRYABLE_EXC) and attempt < total_attempts - 1:
+                await asyncio.sleep(_backoff_delay(attempt, cfg))
+                continue
+            breaker.after_call(token, success=False)
+            raise
+
+    if last_exc:
+        raise last_exc
+    raise CircuitOpenError(f"Circuit '{service_name}' failed without exception")
+
+
+# Convenience wrappers -------------------------------------------------------
+
+
+async def async_http_get(service_name: str, url: str, **kwargs):
+    return await async_http_request(service_name, "GET", url, **kwargs)
+
+
+async def async_http_post(service_name: str, url: str, **kwargs):
+    return await async_http_request(service_name, "POST", url, **kwargs)
+
+
+async def async_http_put(service_name: str, url: str, **kwargs):
+    return await async_http_request(service_name, "PUT", url, **kwargs)
+
+
+async def async_http_delete(service_name: str, url: str, **kwargs):
+    return await async_http_request(service_name, "DELETE", url, **kwargs)
@@ -171,6 +171,14 @@ class CircuitBreaker:
             if self._state == "CLOSED":
                 self._maybe_trip_from_closed(now)
 
+    def release(self, token: _Token) -> None:
+        """Give back a token without recording an outcome (e.g. caller cancelled)."""
+        if not token.is_probe:
+            return
+        with self._lock:
+            if self._state == "HALF_OPEN" and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
 
 # ---------------------- registry ----------------------
 _registry_lock = threading.Lock()
@@ -1,17 +1,25 @@
 """
 HTTP client wrapper with retries, backoff + jitter, and the Circuit Breaker.
 Dependency-free except for 'requests'.
+
+Calls reuse a pooled keep-alive session per service (see session_pool) and
+idempotent requests can be hedged: if the first attempt has not answered
+within ``hedge_after`` seconds a backup copy is sent and the first good
+response wins.
 """
 
 from __future__ import annotations
 
+import os
 import random
 import time
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
 
 import requests
 
-from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from .session_pool import get_session
 
 
 DEFAULTS = {
@@ -26,8 +34,15 @@ DEFAULTS = {
     "backoff_base": 0.25,
     "backoff_factor": 2.0,
     "jitter": 0.2,
+    "max_hedges": 1,
 }
 
+# Only these may be sent twice by hedging
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_pid: Optional[int] = None
+
 
 def _is_server_error(resp: requests.Response) -> bool:
     try:
@@ -47,6 +62,86 @@ def _is_retryable_exc(exc: Exception) -> bool:
     )
 
 
+def _resolve_config(breaker_kwargs: Optional[dict], **overrides) -> dict:
+    cfg = DEFAULTS.copy()
+    if breaker_kwargs:
+        cfg.update({k: v for k, v in breaker_kwargs.items() if k in cfg})
+    cfg.update({k: v for k, v in overrides.items() if v is not None})
+    return cfg
+
+
+def _get_breaker(service_name: str, cfg: dict) -> CircuitBreaker:
+    return get_circuit_breaker(
+        service_name,
+        failure_threshold=cfg["failure_threshold"],
+        rolling_window_seconds=cfg["rolling_window_seconds"],
+        min_throughput=cfg["min_throughput"],
+        open_state_seconds=cfg["open_state_seconds"],
+        half_open_max_in_flight=cfg["half_open_max_in_flight"],
+        success_quorum_percent=cfg["success_quorum_percent"],
+    )
+
+
+def _backoff_delay(attempt: int, cfg: dict) -> float:
+    wait_s = cfg["backoff_base"] * (cfg["backoff_factor"] ** attempt)
+    wait_s *= 1 + (random.random() - 0.5) * 2 * cfg["jitter"]
+    return max(0.0, wait_s)
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor, _hedge_pid
+    if _hedge_executor is None or _hedge_pid != os.getpid():
+        # Worker threads do not survive a fork; build a fresh pool per process
+        _hedge_executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("HTTP_HEDGE_WORKERS", "16")),
+            thread_name_prefix="http-hedge",
+        )
+        _hedge_pid = os.getpid()
+    return _hedge_executor
+
+
+def _hedged_send(
+    send: Callable[[], requests.Response], hedge_after: float, max_hedges: int
+) -> requests.Response:
+    """
+    Run ``send`` and fire up to ``max_hedges`` backup copies, each after
+    ``hedge_after`` seconds without an answer. The first non-5xx response
+    wins; slower copies finish in the background and release their
+    connections to the pool.
+    """
+    executor = _get_hedge_executor()
+    pending = {executor.submit(send)}
+    launched = 1
+    last_resp: Optional[requests.Response] = None
+    last_exc: Optional[Exception] = None
+
+    while pending:
+        can_hedge = launched <= max_hedges
+        done, pending = wait(
+            pending,
+            timeout=hedge_after if can_hedge else None,
+            return_when=FIRST_COMPLETED,
+        )
+        if not done:
+            pending.add(executor.submit(send))
+            launched += 1
+            continue
+        for fut in done:
+            try:
+                resp = fut.result()
+            except Exception as exc:  # noqa: BLE001 - another copy may still win
+                last_exc = exc
+                continue
+            if not _is_server_error(resp):
+                return resp
+            last_resp = resp
+
+    if last_resp is not None:
+        return last_resp
+    assert last_exc is not None
+    raise last_exc
+
+
 def http_request(
     service_name: str,
     method: str,
@@ -59,6 +154,8 @@ def http_request(
     backoff_factor: Optional[float] = None,
     jitter: Optional[float] = None,
     breaker_kwargs: Optional[dict] = None,
+    hedge_after: Optional[float] = None,
+    max_hedges: Optional[int] = None,
     **kwargs,
 ) -> requests.Response:
     """
@@ -68,57 +165,55 @@ def http_request(
     - method: GET/POST/PUT/DELETE/...
     - timeout: per-attempt seconds; defaults to DEFAULTS['timeout_seconds']
     - retries: number of retries after the initial attempt; defaults to DEFAULTS['retries']
+    - session: explicit session; defaults to the pooled keep-alive session of the service
+    - hedge_after: GET/HEAD/OPTIONS only - seconds to wait before sending a backup copy
+    - max_hedges: backup copies per attempt; defaults to DEFAULTS['max_hedges']
     """
-    cfg = DEFAULTS.copy()
-    if breaker_kwargs:
-        cfg.update({k: v for k, v in breaker_kwargs.items() if k in cfg})
-
-    timeout = cfg["timeout_seconds"] if timeout is None else timeout
-    retries = cfg["retries"] if retries is None else retries
-    backoff_base = cfg["backoff_base"] if backoff_base is None else backoff_base
-    backoff_factor = cfg["backoff_factor"] if backoff_factor is None else backoff_factor
-    jitter = cfg["jitter"] if jitter is None else jitter
-
-    breaker = get_circuit_breaker(
-        service_name,
-        failure_threshold=cfg["failure_threshold"],
-        rolling_window_seconds=cfg["rolling_window_seconds"],
-        min_throughput=cfg["min_throughput"],
-        open_state_seconds=cfg["open_state_seconds"],
-        half_open_max_in_flight=cfg["half_open_max_in_flight"],
-        success_quorum_percent=cfg["success_quorum_percent"],
+    cfg = _resolve_config(
+        breaker_kwargs,
+        timeout_seconds=timeout,
+        retries=retries,
+        backoff_base=backoff_base,
+        backoff_factor=backoff_factor,
+        jitter=jitter,
+        max_hedges=max_hedges,
     )
+    breaker = _get_breaker(service_name, cfg)
+    sess = session or get_session(service_name)
+    method = method.upper()
+    timeout = cfg["timeout_seconds"]
 
-    sess = session or requests.Session()
+    def send() -> requests.Response:
+        return sess.request(method, url, timeout=timeout, **kwargs)
+
+    hedged = hedge_after is not None and method in IDEMPOTENT_METHODS
 
     token = breaker.before_call()
     last_exc: Optional[Exception] = None
     # attempts = initial + retries
-    total_attempts = max(0, int(retries)) + 1
+    total_attempts = max(0, int(cfg["retries"])) + 1
 
     for attempt in range(total_attempts):
         try:
-            resp = sess.request(method.upper(), url, timeout=timeout, **kwargs)
+            if hedged:
+                resp = _hedged_send(send, hedge_after, int(cfg["max_hedges"]))
+            else:
+                resp = send()
             # Consider 5xx as failure; 4xx are caller responsibility but not breaker failures
             if _is_server_error(resp):
                 if attempt < total_attempts - 1:
                     # backoff and retry
-                    wait = backoff_base * (backoff_factor**attempt)
-                    wait *= 1 + (random.random() - 0.5) * 2 * jitter
-                    time.sleep(max(0.0, wait))
+                    time.sleep(_backoff_delay(attempt, cfg))
                     continue
-                # final failure
-                breaker.after_call(token, success=False)
-                resp.raise_for_status()  # raises HTTPError
+                # final failure: HTTPError is recorded once by the handler below
+                resp.raise_for_status()
             else:
                 breaker.after_call(token, success=True)
             return resp
         except Exception as exc:  # network errors / timeout / last 5xx raise
             last_exc = exc
             if _is_retryable_exc(exc) and attempt < total_attempts - 1:
-                wait = backoff_base * (backoff_factor**attempt)
-                wait *= 1 + (random.random() - 0.5) * 2 * jitter
-                time.sleep(max(0.0, wait))
+                time.sleep(_backoff_delay(attempt, cfg))
                 continue
             # final failure
             breaker.after_call(token, success=False)
@@ -18,6 +18,7 @@ from tenacity import (
 from pybreaker import CircuitBreaker as PyCircuitBreaker, CircuitBreakerError
 
 from .circuit_breaker import CircuitOpenError
+from .session_pool import get_session
 
 
 DEFAULTS = {
@@ -90,7 +91,7 @@ def http_request(
     br = _get_pybreaker(
         service_name, fail_max=cfg["fail_max"], reset_timeout=cfg["reset_timeout"]
     )
-    sess = session or requests.Session()
+    sess = session or get_session(service_name)
 
     @retry(
         retry=(
@@ -0,0 +1,114 @@
+"""
+Per-service pooled HTTP sessions.
+
+One keep-alive ``requests.Session`` per logical service, so repeated calls to
+the same integration reuse TCP connections and TLS sessions instead of paying
+a handshake per call. Pool sizes are configurable per service; sessions are
+recreated after a fork (gunicorn preload) so workers never share sockets.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+POOL_DEFAULTS = {
+    # number of distinct hosts kept per session
+    "pool_connections": int(os.environ.get("HTTP_POOL_CONNECTIONS", "4")),
+    # keep-alive connections kept per host
+    "pool_maxsize": int(os.environ.get("HTTP_POOL_MAXSIZE", "10")),
+    # block instead of opening throwaway connections when the pool is exhausted
+    "pool_block": False,
+}
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_service_config: Dict[str, dict] = {}
+_pid = os.getpid()
+
+
+def configure_service_pool(
+    service_name: str,
+    *,
+    pool_connections: Optional[int] = None,
+    pool_maxsize: Optional[int] = None,
+    pool_block: Optional[bool] = None,
+) -> None:
+    """Set pool sizes for ``service_name``; an existing session is rebuilt."""
+    overrides = {
+        "pool_connections": pool_connections,
+        "pool_maxsize": pool_maxsize,
+        "pool_block": pool_block,
+    }
+    with _lock:
+        cfg = _service_config.setdefault(service_name, {})
+        cfg.update({k: v for k, v in overrides.items() if v is not None})
+        old = _sessions.pop(service_name, None)
+    if old is not None:
+        old.close()
+
+
+def service_pool_config(service_name: str) -> dict:
+    """Effective pool settings for ``service_name`` (shared with the async client)."""
+    return {**POOL_DEFAULTS, **_service_config.get(service_name, {})}
+
+
+def _build_session(service_name: str) -> requests.Session:
+    cfg = service_pool_config(service_name)
+    # Retries are handled by the resilient client, not by urllib3
+    adapter = HTTPAdapter(
+        pool_connections=cfg["pool_connections"],
+        pool_maxsize=cfg["pool_maxsize"],
+        pool_block=cfg["pool_block"],
+        max_retries=0,
+    )
+    sess = requests.Session()
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    return sess
+
+
+def _reset_after_fork() -> None:
+    global _pid
+    if os.getpid() != _pid:
+        # Sockets inherited from the parent must not be reused by the child
+        _sessions.clear()
+        _pid = os.getpid()
+
+
+def get_session(service_name: str) -> requests.Session:
+    """Return the shared keep-alive session for ``service_name``."""
+    with _lock:
+        _reset_after_fork()
+        sess = _sessions.get(service_name)
+        if sess is None:
+            sess = _sessions[service_name] = _build_session(service_name)
+        return sess
+
+
+def close_sessions() -> None:
+    """Close every pooled session (tests, graceful shutdown)."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for sess in sessions:
+        sess.close()
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Configured pool sizes and live connection pools per service."""
+    with _lock:
+        stats = {}
+        for name, sess in _sessions.items():
+            adapter = sess.get_adapter("https://")
+            stats[name] = {
+                "pool_connections": adapter._pool_connections,
+                "pool_maxsize": adapter._pool_maxsize,
+                "host_pools": len(adapter.poolmanager.pools),
+            }
+        return stats
@@ -15,12 +15,14 @@ from src.middleware.error_envelope_middleware import (
     error_response,
     ErrorCodes,
 )
+from src.middleware.query_profiler import query_budget
 
 # إنشاء Blueprint
 customers_bp = Blueprint("customers", __name__)
 
 
 @customers_bp.route("/api/customers", methods=["GET"])
+@query_budget(4, max_duplicates=2)
 def get_customers():
     """الحصول على قائمة العملاء"""
     try:
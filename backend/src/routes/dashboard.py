@@ -9,10 +9,11 @@ API endpoints for dashboard statistics and widgets.
 import logging
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from src.database import db
 from src.routes.auth_unified import token_required
 from src.permissions import require_permission, Permissions
+from src.services.time_series import inclusive_range, period_total, sales_series
 
 logger = logging.getLogger(__name__)
 
@@ -81,7 +82,7 @@ def get_summary():
 
     Returns key metrics for the dashboard overview.
     """
-    from src.models.invoice import Invoice
+    from src.models.invoice_unified import Invoice, InvoiceStatus, InvoiceType
     from src.models.product import Product
     from src.models.partners import Customer, Supplier
 
@@ -93,51 +94,17 @@ def get_summary():
     prev_end = start_date - timedelta(days=1)
     prev_start = prev_end - timedelta(days=period_days - 1)
 
-    # Current period metrics
-    current_sales = (
-        db.session.query(func.coalesce(func.sum(Invoice.total), 0))
-        .filter(
-            Invoice.type == "sale",
-            func.date(Invoice.created_at) >= start_date,
-            func.date(Invoice.created_at) <= end_date,
-        )
-        .scalar()
-        or 0
-    )
+    # Half-open ranges on the indexed invoice_date column
+    current_range = inclusive_range(start_date, end_date)
+    prev_range = inclusive_range(prev_start, prev_end)
 
-    current_purchases = (
-        db.session.query(func.coalesce(func.sum(Invoice.total), 0))
-        .filter(
-            Invoice.type == "purchase",
-            func.date(Invoice.created_at) >= start_date,
-            func.date(Invoice.created_at) <= end_date,
-        )
-        .scalar()
-        or 0
-    )
+    # Current period metrics
+    current_sales = period_total(db.session, *current_range, InvoiceType.SALES)
+    current_purchases = period_total(db.session, *current_range, InvoiceType.PURCHASE)
 
     # Previous period metrics
-    prev_sales = (
-        db.session.query(func.coalesce(func.sum(Invoice.total), 0))
-        .filter(
-            Invoice.type == "sale",
-            func.date(Invoice.created_at) >= prev_start,
-            func.date(Invoice.created_at) <= prev_end,
-        )
-        .scalar()
-        or 0
-    )
-
-    prev_purchases = (
-        db.session.query(func.coalesce(func.sum(Invoice.total), 0))
-        .filter(
-            Invoice.type == "purchase",
-            func.date(Invoice.created_at) >= prev_start,
-            func.date(Invoice.created_at) <= prev_end,
-        )
-        .scalar()
-        or 0
-    )
+    prev_sales = period_total(db.session, *prev_range, InvoiceType.SALES)
+    prev_purchases = period_total(db.session, *prev_range, InvoiceType.PURCHASE)
 
     # Counts
     total_products = Product.query.count()
@@ -150,7 +117,7 @@ def get_summary():
     ).count()
 
     # Pending invoices
-    pending_invoices = Invoice.query.filter(Invoice.status == "pending").count()
+    pending_invoices = Invoice.query.filter(Invoice.status == InvoiceStatus.DRAFT).count()
 
     return jsonify(
         {
@@ -192,97 +159,18 @@ def get_sales_chart():
         period: week, month, year
         type: daily, weekly, monthly
     """
-    from src.models.invoice import Invoice
-
     period = request.args.get("period", "month")
     chart_type = request.args.get("type", "daily")
+    granularity = {"daily": "day", "weekly": "week", "monthly": "month"}.get(
+        chart_type, "month"
+    )
 
     start_date, end_date = get_date_range(period)
 
-    # Build query based on grouping
-    if chart_type == "daily":
-        sales_data = (
-            db.session.query(
-                func.date(Invoice.created_at).label("date"),
-                func.coalesce(func.sum(Invoice.total), 0).label("total"),
-            )
-            .filter(
-                Invoice.type == "sale",
-                func.date(Invoice.created_at) >= start_date,
-                func.date(Invoice.created_at) <= end_date,
-            )
-            .group_by(func.date(Invoice.created_at))
-            .order_by("date")
-            .all()
-        )
-
-    elif chart_type == "weekly":
-        sales_data = (
-            db.session.query(
-                extract("week", Invoice.created_at).label("week"),
-                extract("year", Invoice.created_at).label("year"),
-                func.coalesce(func.sum(Invoice.total), 0).label("total"),
-            )
-            .filter(
-                Invoice.type == "sale",
-                func.date(Invoice.created_at) >= start_date,
-                func.date(Invoice.created_at) <= end_date,
-            )
-            .group_by("week", "year")
-            .order_by("year", "week")
-            .all()
-        )
-
-    else:  # monthly
-        sales_data = (
-            db.session.query(
-                extract("month", Invoice.created_at).label("month"),
-                extract("year", Invoice.created_at).label("year"),
-                func.coalesce(func.sum(Invoice.total), 0).label("total"),
-            )
-            .filter(
-                Invoice.type == "sale",
-                func.date(Invoice.created_at) >= start_date,
-                func.date(Invoice.created_at) <= end_date,
-            )
-            .group_by("month", "year")
-            .order_by("year", "month")
-            .all()
-        )
-
-    # Format response
-    if chart_type == "daily":
-        chart_data = [
-            {"label": row.date.strftime("%Y-%m-%d"), "value": float(row.total)}
-            for row in sales_data
-        ]
-    elif chart_type == "weekly":
-        chart_data = [
-            {"label": f"W{int(row.week)}/{int(row.year)}", "value": float(row.total)}
-            for row in sales_data
-        ]
-    else:
-        months = [
-            "Jan",
-            "Feb",
-            "Mar",
-            "Apr",
-            "May",
-            "Jun",
-            "Jul",
-            "Aug",
-            "Sep",
-            "Oct",
-            "Nov",
-            "Dec",
-        ]
-        chart_data = [
-            {
-                "label": f"{months[int(row.month) - 1]} {int(row.year)}",
-                "value": float(row.total),
-            }
-            for row in sales_data
-        ]
+    # One grouped query over [start, end + 1 day); empty buckets are zero-filled
+    chart_data = sales_series(
+        db.session, *inclusive_range(start_date, end_date), granularity
+    )
 
     return jsonify(
         {
@@ -291,8 +179,9 @@ def get_sales_chart():
                 "type": chart_type,
                 "period": period,
                 "labels": [d["label"] for d in chart_data],
-                "values": [d["value"] for d in chart_data],
-                "total": sum(d["value"] for d in chart_data),
+                "values": [d["total"] for d in chart_data],
+                "buckets": [d["bucket"] for d in chart_data],
+                "total": round(sum(d["total"] for d in chart_data), 2),
             },
         }
     )
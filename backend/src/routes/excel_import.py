@@ -71,13 +71,14 @@ except ImportError:
         files = {}
 
 
-try:
-    import openpyxl
-    import pandas as pd
-
-    EXCEL_AVAILABLE = True
-except ImportError:
-    EXCEL_AVAILABLE = False
+from src.utils.lazy_imports import lazy_module, module_available
+
+# تحميل كسول: تُستورد pandas/openpyxl عند أول استخدام وليس عند تشغيل العامل
+EXCEL_AVAILABLE = module_available("openpyxl") and module_available("pandas")
+if EXCEL_AVAILABLE:
+    openpyxl = lazy_module("openpyxl")
+    pd = lazy_module("pandas")
+else:
     openpyxl = None
 
     # Create comprehensive pandas mock
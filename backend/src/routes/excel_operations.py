@@ -24,8 +24,11 @@ from src.middleware.error_envelope_middleware import (
     ErrorCodes,
 )
 import logging
-import openpyxl  # Used in ExcelImporter
-import xlsxwriter
+from src.utils.lazy_imports import lazy_module
+
+# Loaded on first use to keep worker startup light
+openpyxl = lazy_module("openpyxl")  # Used in ExcelImporter
+xlsxwriter = lazy_module("xlsxwriter")
 from io import BytesIO
 import os
 from datetime import datetime, date
@@ -20,11 +20,12 @@ from src.middleware.error_envelope_middleware import (
     ErrorCodes,
 )
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+from src.utils.lazy_imports import lazy_module
+
+# Loaded on first export to keep worker startup light
+openpyxl = lazy_module("openpyxl")
 
 # Import database - handle different import paths
 try:
@@ -723,6 +724,9 @@ def export_monthly_sales_to_excel(current_user):
         results = db.session.execute(query, {"year": year, "month": month}).fetchall()
 
         # إنشاء ملف Excel
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from openpyxl.utils import get_column_letter
+
         wb = openpyxl.Workbook()
         ws = wb.active
         if ws is None:
@@ -959,16 +963,30 @@ def get_currency_transactions_report(current_user):
 def get_daily_sales_report():
     """تقرير المبيعات اليومية"""
     try:
-        # بيانات تجريبية
+        from src.database import db  # the app's ORM session (not database.db)
+        from src.services.time_series import sales_series
+
+        day = request.args.get("date")
+        day = date.fromisoformat(day) if day else date.today()
+        days = min(max(request.args.get("days", 1, type=int), 1), 366)
+
+        # سلسلة يومية مكتملة تنتهي بالتاريخ المطلوب (الأيام الفارغة = صفر)
+        series = sales_series(
+            db.session, day - timedelta(days=days - 1), day + timedelta(days=1), "day"
+        )
+        total_sales = round(sum(p["total"] for p in series), 2)
+        total_orders = int(sum(p["count"] for p in series))
         data = {
-            "date": "2025-10-04",
-            "total_sales": 15000,
-            "total_orders": 45,
-            "average_order": 333.33,
-            "top_products": [
-                {"name": "منتج أ", "quantity": 20, "revenue": 5000},
-                {"name": "منتج ب", "quantity": 15, "revenue": 3000},
-                {"name": "منتج ج", "quantity": 10, "revenue": 2000},
+            "date": day.isoformat(),
+            "days": days,
+            "total_sales": total_sales,
+            "total_orders": total_orders,
+            "average_order": (
+                round(total_sales / total_orders, 2) if total_orders else 0
+            ),
+            "series": [
+                {"date": p["bucket"], "sales": p["total"], "orders": int(p["count"])}
+                for p in series
             ],
         }
         return success_response(
@@ -981,22 +999,45 @@ def get_daily_sales_report():
         )
 
 
+WEEKDAY_NAMES_AR = (
+    "الاثنين",
+    "الثلاثاء",
+    "الأربعاء",
+    "الخميس",
+    "الجمعة",
+    "السبت",
+    "الأحد",
+)
+
+
 @financial_reports_bp.route("/api/reports/sales/weekly", methods=["GET"])
 def get_weekly_sales_report():
     """تقرير المبيعات الأسبوعية"""
     try:
+        from src.database import db  # the app's ORM session (not database.db)
+        from src.services.time_series import floor_bucket, sales_series
+
+        week = request.args.get("week")  # ISO: 2025-W40
+        if week:
+            year, number = week.upper().split("-W")
+            start = date.fromisocalendar(int(year), int(number), 1)
+        else:
+            start = floor_bucket(date.today(), "week")
+
+        series = sales_series(db.session, start, start + timedelta(days=7), "day")
+        iso_year, iso_week, _ = start.isocalendar()
         data = {
-            "week": "2025-W40",
-            "total_sales": 105000,
-            "total_orders": 315,
+            "week": f"{iso_year}-W{iso_week:02d}",
+            "total_sales": round(sum(p["total"] for p in series), 2),
+            "total_orders": int(sum(p["count"] for p in series)),
             "daily_breakdown": [
-                {"day": "الأحد", "sales": 15000, "orders": 45},
-                {"day": "الاثنين", "sales": 18000, "orders": 52},
-                {"day": "الثلاثاء", "sales": 16000, "orders": 48},
-                {"day": "الأربعاء", "sales": 14000, "orders": 42},
-                {"day": "الخميس", "sales": 17000, "orders": 51},
-                {"day": "الجمعة", "sales": 12000, "orders": 38},
-                {"day": "السبت", "sales": 13000, "orders": 39},
+                {
+                    "date": p["bucket"],
+                    "day": WEEKDAY_NAMES_AR[i],
+                    "sales": p["total"],
+                    "orders": int(p["count"]),
+                }
+                for i, p in enumerate(series)
             ],
         }
         return success_response(
@@ -42,12 +42,6 @@ import os
 from decimal import Decimal
 import io
 import csv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 
 financial_reports_advanced_bp = Blueprint("financial_reports_advanced", __name__)
 
@@ -354,7 +348,18 @@ def export_financial_report():
             )
 
         elif format_type == "pd":
-            # Generate PDF
+            # Generate PDF (reportlab is imported on demand)
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.platypus import (
+                SimpleDocTemplate,
+                Table,
+                TableStyle,
+                Paragraph,
+                Spacer,
+            )
+
             buffer = io.BytesIO()
             doc = SimpleDocTemplate(buffer, pagesize=A4)
             styles = getSampleStyleSheet()
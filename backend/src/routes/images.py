@@ -0,0 +1,57 @@
+# FILE: backend/src/routes/images.py | PURPOSE: Serve stored images and
+# thumbnails with conditional-GET caching | OWNER: Backend | RELATED:
+# utils/image_manager.py
+
+"""
+Stored images and thumbnails.
+
+Image names are content hashes, so a URL always points at the same bytes:
+responses carry a strong ETag (the file name) and a one-year immutable
+Cache-Control, and ``If-None-Match`` revalidations get a 304.
+"""
+
+from flask import Blueprint, abort, current_app, send_file
+
+images_bp = Blueprint("images", __name__)
+
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+
+def _manager():
+    manager = current_app.extensions.get("image_manager")
+    if manager is None:
+        from src.utils.image_manager import image_manager as manager
+
+        current_app.extensions["image_manager"] = manager
+    return manager
+
+
+def _send(path):
+    response = send_file(
+        path, etag=path.stem, conditional=True, max_age=IMAGE_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@images_bp.route("/uploads/<folder>/<filename>", methods=["GET"])
+def get_image(folder, filename):
+    """صورة مخزنة"""
+    path = _manager().image_path(folder, filename)
+    if path is None:
+        abort(404)
+    return _send(path)
+
+
+@images_bp.route("/uploads/thumbnails/<folder>/<thumb_name>", methods=["GET"])
+def get_thumbnail(folder, thumb_name):
+    """صورة مصغرة، تُنشأ عند أول طلب"""
+    stem, _, ext = thumb_name.rpartition(".")
+    name, _, size_name = stem.rpartition("_")
+    if not (name and ext):
+        abort(404)
+    path = _manager().thumbnail(folder, f"{name}.{ext}", size_name)
+    if path is None:
+        abort(404)
+    return _send(path)
@@ -24,13 +24,14 @@ from src.middleware.error_envelope_middleware import (
     ErrorCodes,
 )
 
-# Import pandas with fallback
-try:
-    import pandas as pd
-
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+# Import pandas with fallback (lazily: pandas is only needed by import routes)
+from src.services.reference_data import reference_data
+from src.utils.lazy_imports import lazy_module, module_available
+
+PANDAS_AVAILABLE = module_available("pandas")
+if PANDAS_AVAILABLE:
+    pd = lazy_module("pandas")
+else:
     # Create a mock pandas module for type checking
     # Create a mock pandas module for type checking
 
@@ -540,18 +541,20 @@ def import_categories(df):
 
     # استخراج التصنيفات الفريدة
     unique_categories = df[category_col].dropna().unique()
+    # التصنيفات الموجودة من الذاكرة المرجعية بدل استعلام لكل اسم
+    existing = reference_data.get("categories", db.session)
+    added = set()
 
     for cat_name in unique_categories:
         if cat_name and str(cat_name).strip():
+            name = str(cat_name).strip()
             # التحقق من عدم وجود التصنيف
-            existing_category = Category.query.filter_by(
-                name=str(cat_name).strip()
-            ).first()
-            if not existing_category:
+            if existing.by_name(name) is None and name.casefold() not in added:
                 category = Category()
-                category.name = str(cat_name).strip()
+                category.name = name
                 category.description = IMPORTED_FROM_EXCEL
                 db.session.add(category)
+                added.add(name.casefold())
                 imported_count += 1
 
     return imported_count
@@ -573,16 +576,17 @@ def import_warehouses(df):
 
     # استخراج المخازن الفريدة
     unique_warehouses = df[warehouse_col].dropna().unique()
+    existing = reference_data.get("warehouses", db.session)
+    added = set()
 
     for warehouse_name in unique_warehouses:
         if warehouse_name and str(warehouse_name).strip():
+            name = str(warehouse_name).strip()
             # التحقق من عدم وجود المخزن
-            existing_warehouse = Warehouse.query.filter_by(
-                name=str(warehouse_name).strip()
-            ).first()
-            if not existing_warehouse:
+            if existing.by_name(name) is None and name.casefold() not in added:
+                added.add(name.casefold())
                 warehouse = Warehouse()
-                warehouse.name = str(warehouse_name).strip()
+                warehouse.name = name
                 warehouse.location = IMPORTED_FROM_EXCEL
                 warehouse.is_active = True
                 db.session.add(warehouse)
@@ -697,6 +701,15 @@ def import_products(df, stats):
     if not product_name_col:
         return 0
 
+    # المخزن الافتراضي مرة واحدة (قد يكون أُضيف في هذا الاستيراد)
+    warehouses = reference_data.get("warehouses", db.session)
+    default_warehouse = warehouses.first(active_only=False)
+    default_warehouse_id = (
+        default_warehouse.id
+        if default_warehouse
+        else db.session.query(Warehouse.id).order_by(Warehouse.id).limit(1).scalar()
+    )
+
     # استيراد المنتجات
     for index, row in df.iterrows():
         try:
@@ -709,11 +722,6 @@ def import_products(df, stats):
             if existing_product:
                 continue
 
-            # الحصول على التصنيف (للاستخدام المستقبلي)
-            if category_col and row[category_col]:
-                category_name = str(row[category_col]).strip()
-                # Category lookup for future use
-                _ = Category.query.filter_by(name=category_name).first()
 
             # إنشاء المنتج
             product = Product()
@@ -743,11 +751,10 @@ def import_products(df, stats):
                     quantity = float(row[quantity_col])
                     if quantity > 0:
                         # إنشاء لوط افتراضي
-                        default_warehouse = Warehouse.query.first()
-                        if default_warehouse:
+                        if default_warehouse_id:
                             lot = Lot()
                             lot.product_id = product.id
-                            lot.warehouse_id = default_warehouse.id
+                            lot.warehouse_id = default_warehouse_id
                             lot.batch_number = (
                                 f'IMPORT_{datetime.now().strftime("%Y%m%d")}'
                                 f"_{product.id}"
@@ -37,22 +37,19 @@ except ImportError:
 
     current_user = DummyUser()
 
-# Import openpyxl components
+# pandas/openpyxl are heavy: resolve them on first use instead of at startup
 try:
-    from openpyxl.styles import Font, PatternFill, Alignment
+    from src.utils.lazy_imports import lazy_module, module_available
 except ImportError:
-    Font = None
-    PatternFill = None
-    Alignment = None
+    from utils.lazy_imports import lazy_module, module_available
 
-# Import pandas with fallback
-try:
-    import pandas as pd
+openpyxl_styles = (
+    lazy_module("openpyxl.styles") if module_available("openpyxl") else None
+)
 
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    pd = None
+# Import pandas with fallback
+PANDAS_AVAILABLE = module_available("pandas")
+pd = lazy_module("pandas") if PANDAS_AVAILABLE else None
 
 import json
 import os
@@ -389,15 +386,15 @@ def export_data():
                 worksheet = writer.sheets[data_type]
 
                 # Header styling
-                header_font = Font(bold=True, color="FFFFFF")
-                header_fill = PatternFill(
+                header_font = openpyxl_styles.Font(bold=True, color="FFFFFF")
+                header_fill = openpyxl_styles.PatternFill(
                     start_color="366092", end_color="366092", fill_type="solid"
                 )
 
                 for cell in worksheet[1]:
                     cell.font = header_font
                     cell.fill = header_fill
-                    cell.alignment = Alignment(horizontal="center")
+                    cell.alignment = openpyxl_styles.Alignment(horizontal="center")
 
                 # Auto-adjust column widths
                 for column in worksheet.columns:
@@ -532,18 +529,18 @@ def download_template(data_type):
             worksheet = writer.sheets["Template"]
 
             # Header styling
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(
+            header_font = openpyxl_styles.Font(bold=True, color="FFFFFF")
+            header_fill = openpyxl_styles.PatternFill(
                 start_color="366092", end_color="366092", fill_type="solid"
             )
 
             for cell in worksheet[1]:
                 cell.font = header_font
                 cell.fill = header_fill
-                cell.alignment = Alignment(horizontal="center")
+                cell.alignment = openpyxl_styles.Alignment(horizontal="center")
 
             # Example data styling
-            example_fill = PatternFill(
+            example_fill = openpyxl_styles.PatternFill(
                 start_color="E7F3FF", end_color="E7F3FF", fill_type="solid"
             )
             for cell in worksheet[2]:
@@ -581,8 +578,8 @@ def download_template(data_type):
 
             # Style instructions
             instructions_ws = writer.sheets["Instructions"]
-            instructions_ws["A1"].font = Font(bold=True, size=14)
-            instructions_ws["A1"].fill = PatternFill(
+            instructions_ws["A1"].font = openpyxl_styles.Font(bold=True, size=14)
+            instructions_ws["A1"].fill = openpyxl_styles.PatternFill(
                 start_color="FFE6CC", end_color="FFE6CC", fill_type="solid"
             )
 
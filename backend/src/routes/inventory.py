@@ -62,6 +62,7 @@ from src.models.product_unified import Product
 from src.models.warehouse_unified import Warehouse
 from src.models.supporting_models import StockMovement
 from src.database import db
+from src.services.reference_data import reference_data
 
 inventory_bp = Blueprint("inventory", __name__)
 
@@ -163,7 +164,7 @@ def create_product_group():
             )
 
         # التحقق من وجود التصنيف
-        category = Category.query.get(data["category_id"])
+        category = reference_data.find("categories", id=data["category_id"])
         if not category:
             return jsonify({"status": "error", "message": "التصنيف غير موجود"}), 404
 
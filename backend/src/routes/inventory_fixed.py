@@ -27,6 +27,7 @@ from ..schemas.inventory_schemas import CategorySchema, ProductGroupSchema, Rank
 from ..models.category import Category
 from ..models.inventory import ProductGroup, Rank  # Assuming these models exist
 from ..database import db
+from ..services.reference_data import reference_data
 
 # P0.5: Import unified error envelope
 from ..middleware.error_envelope_middleware import (
@@ -112,7 +113,7 @@ def create_product_group():
     try:
         validated_data = product_group_schema.load(request.get_json())
 
-        if not Category.query.get(validated_data["category_id"]):
+        if not reference_data.find("categories", id=validated_data["category_id"]):
             return error_response(
                 "Category not found.", ErrorCodes.VAL_INVALID_REFERENCE, 404
             )
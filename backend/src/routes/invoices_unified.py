@@ -24,7 +24,12 @@ from src.middleware.error_envelope_middleware import (
     error_response,
     ErrorCodes,
 )
-from sqlalchemy import func, or_
+from sqlalchemy import or_
+
+from src.schemas.list_serializers import invoice_list_serializer
+from src.services.stats_rollups import invoice_stats
+from src.services.tax_service import TaxService
+from src.utils.serializers import json_response
 
 # استيراد النماذج الموحدة | Import unified models
 try:
@@ -95,8 +100,57 @@ invoices_unified_bp = Blueprint("invoices_unified", __name__)
 # ==================== دوال مساعدة | Helper Functions ====================
 
 
-def calculate_invoice_totals(items_data):
+def calculate_line_taxes(items_data, default_tax_code=None):
+    """
+    حساب ضرائب الأسطر دفعة واحدة من سجل الضرائب في الذاكرة
+    Per-line taxes for items carrying 'tax_code' (no database queries)
+    """
+    if not default_tax_code and not any(item.get("tax_code") for item in items_data):
+        return None
+    return TaxService.calculate_batch(
+        [
+            {
+                "amount": item.get("price", 0),
+                "quantity": item.get("quantity", 0),
+                "discount": item.get("discount", 0),
+                "tax_code": item.get("tax_code") or default_tax_code,
+            }
+            for item in items_data
+        ],
+        default_tax_code=default_tax_code,
+    )
+
+
+def spread_invoice_discount(items_data, discount):
+    """
+    توزيع خصم الفاتورة على الأسطر بنسبة مبالغها
+    Spread an invoice-level discount over the lines pro rata, so per-line
+    taxes are charged on the discounted amounts
+    """
+    amounts = [
+        Decimal(str(item.get("quantity", 0))) * Decimal(str(item.get("price", 0)))
+        - Decimal(str(item.get("discount", 0)))
+        for item in items_data
+    ]
+    base = sum(amounts, Decimal("0.00"))
+    if base <= 0:
+        return items_data
+    discount = min(Decimal(str(discount)), base)
+    shares = [(discount * amount / base).quantize(Decimal("0.01")) for amount in amounts]
+    # فرق التقريب على أكبر سطر | Rounding remainder goes to the largest line
+    shares[amounts.index(max(amounts))] += discount - sum(shares)
+    return [
+        {**item, "discount": Decimal(str(item.get("discount", 0))) + share}
+        for item, share in zip(items_data, shares)
+    ]
+
+
+def calculate_invoice_totals(items_data, line_taxes=None):
     """حساب إجماليات الفاتورة"""
+    if line_taxes is not None:
+        # الأسعار الشاملة للضريبة: المجموع الفرعي صافٍ من الضريبة
+        return sum((line.subtotal for line in line_taxes.lines), Decimal("0.00"))
+
     subtotal = Decimal("0.00")
 
     for item in items_data:
@@ -253,89 +307,19 @@ def get_invoices():
         else:
             query = query.order_by(Invoice.invoice_date.desc())
 
-        # التقسيم إلى صفحات | Pagination
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-        # تحويل إلى قاموس | Convert to dict
-        invoices_data = []
-        for invoice in pagination.items:
-            invoice_dict = {
-                "id": invoice.id,
-                "invoice_number": invoice.invoice_number,
-                "invoice_type": (
-                    invoice.invoice_type.value
-                    if hasattr(invoice.invoice_type, "value")
-                    else invoice.invoice_type
-                ),
-                "invoice_date": (
-                    invoice.invoice_date.isoformat() if invoice.invoice_date else None
-                ),
-                "due_date": invoice.due_date.isoformat() if invoice.due_date else None,
-                "customer_id": invoice.customer_id,
-                "supplier_id": invoice.supplier_id,
-                "warehouse_id": invoice.warehouse_id,
-                "subtotal": float(invoice.subtotal) if invoice.subtotal else 0.00,
-                "tax_amount": float(invoice.tax_amount) if invoice.tax_amount else 0.00,
-                "discount_amount": (
-                    float(invoice.discount_amount) if invoice.discount_amount else 0.00
-                ),
-                "total_amount": (
-                    float(invoice.total_amount) if invoice.total_amount else 0.00
-                ),
-                "paid_amount": (
-                    float(invoice.paid_amount) if invoice.paid_amount else 0.00
-                ),
-                "remaining_amount": (
-                    float(invoice.remaining_amount)
-                    if invoice.remaining_amount
-                    else 0.00
-                ),
-                "status": (
-                    invoice.status.value
-                    if hasattr(invoice.status, "value")
-                    else invoice.status
-                ),
-                "payment_status": (
-                    invoice.payment_status.value
-                    if hasattr(invoice.payment_status, "value")
-                    else getattr(invoice, "payment_status", None)
-                ),
-                "notes": invoice.notes,
-                "created_at": (
-                    invoice.created_at.isoformat() if invoice.created_at else None
-                ),
-            }
-
-            # إضافة معلومات العميل | Add customer info
-            if invoice.customer_id and Customer:
-                customer = Customer.query.get(invoice.customer_id)
-                if customer:
-                    invoice_dict["customer_name"] = customer.name
-
-            # إضافة معلومات المورد | Add supplier info
-            if invoice.supplier_id and Supplier:
-                supplier = Supplier.query.get(invoice.supplier_id)
-                if supplier:
-                    invoice_dict["supplier_name"] = supplier.name
-
-            invoices_data.append(invoice_dict)
+        # التقسيم إلى صفحات وتحويل الأعمدة دفعة واحدة | Paginate and serialize columns in bulk
+        # include=items,payments يضيف البنود والدفعات باستعلام واحد لكل منها
+        include = [
+            name.strip()
+            for name in request.args.get("include", "").split(",")
+            if name.strip()
+        ]
+        invoices_data, pagination = invoice_list_serializer().paginate(
+            query, page, per_page, include=include
+        )
 
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "data": invoices_data,
-                    "pagination": {
-                        "page": page,
-                        "per_page": per_page,
-                        "total": pagination.total,
-                        "pages": pagination.pages,
-                        "has_next": pagination.has_next,
-                        "has_prev": pagination.has_prev,
-                    },
-                }
-            ),
-            200,
+        return json_response(
+            {"success": True, "data": invoices_data, "pagination": pagination}
         )
 
     except Exception as e:
@@ -481,7 +465,9 @@ def get_invoice(invoice_id):
 
         # إضافة معلومات المستودع | Add warehouse info
         if invoice.warehouse_id and Warehouse:
-            warehouse = Warehouse.query.get(invoice.warehouse_id)
+            from src.services.reference_data import reference_data
+
+            warehouse = reference_data.find("warehouses", id=invoice.warehouse_id)
             if warehouse:
                 invoice_dict["warehouse"] = {
                     "id": warehouse.id,
@@ -583,6 +569,7 @@ def create_invoice():
         warehouse_id (int): معرف المستودع
         items (list): قائمة العناصر
         tax_rate (float): نسبة الضريبة
+        tax_code (str): رمز الضريبة للأسطر (أو tax_code لكل عنصر)
         discount_type (str): نوع الخصم (fixed, percentage)
         discount_value (float): قيمة الخصم
         shipping_cost (float): تكلفة الشحن
@@ -613,6 +600,14 @@ def create_invoice():
                 status_code=400,
             )
 
+        if data.get("tax_rate") and data.get("tax_code"):
+            return error_response(
+                message="أرسل tax_rate أو tax_code وليس كليهما / "
+                "Send either tax_rate or tax_code, not both",
+                code=ErrorCodes.VAL_INVALID_FORMAT,
+                status_code=400,
+            )
+
         # التحقق من العميل أو المورد | Validate customer or supplier
         invoice_type = data["invoice_type"]
         if invoice_type in ["sales", "sales_return"]:
@@ -648,20 +643,37 @@ def create_invoice():
                     )
 
         # حساب الإجماليات | Calculate totals
-        subtotal = calculate_invoice_totals(data["items"])
+        line_taxes = calculate_line_taxes(data["items"], data.get("tax_code"))
+        subtotal = calculate_invoice_totals(data["items"], line_taxes)
 
         # حساب الخصم | Calculate discount
         discount_amount = Decimal("0.00")
         if data.get("discount_value"):
             discount_value = Decimal(str(data["discount_value"]))
+            # أساس الخصم قبل أي ضريبة شاملة | Discount base is the line prices
+            base = calculate_invoice_totals(data["items"])
             if data.get("discount_type") == "percentage":
-                discount_amount = (subtotal * discount_value) / Decimal("100")
+                discount_amount = (base * discount_value) / Decimal("100")
             else:
                 discount_amount = discount_value
+            if line_taxes is not None:
+                # الخصم قبل الضريبة: يوزع على الأسطر ثم تحسب ضرائبها
+                # Discount before tax: spread it over the lines, then tax them
+                line_taxes = calculate_line_taxes(
+                    spread_invoice_discount(data["items"], discount_amount),
+                    data.get("tax_code"),
+                )
+                discount_amount = subtotal - calculate_invoice_totals(
+                    data["items"], line_taxes
+                )
 
         # حساب الضريبة | Calculate tax
         tax_amount = Decimal("0.00")
-        if data.get("tax_rate"):
+        if line_taxes is not None:
+            tax_amount = sum(
+                (line.tax for line in line_taxes.lines), Decimal("0.00")
+            )
+        elif data.get("tax_rate"):
             tax_rate = Decimal(str(data["tax_rate"]))
             taxable_amount = subtotal - discount_amount
             tax_amount = (taxable_amount * tax_rate) / Decimal("100")
@@ -762,7 +774,7 @@ def create_invoice():
         db.session.flush()  # للحصول على معرف الفاتورة
 
         # إضافة العناصر | Add items
-        for item_data in data["items"]:
+        for index, item_data in enumerate(data["items"]):
             item = InvoiceItem()
             item.invoice_id = invoice.id
             item.product_id = item_data.get("product_id")
@@ -771,16 +783,23 @@ def create_invoice():
 
             if hasattr(item, "discount"):
                 item.discount = item_data.get("discount", 0)
-            if hasattr(item, "tax"):
-                item.tax = item_data.get("tax", 0)
+            if line_taxes is not None:
+                # ضريبة السطر من الحساب المجمع | Tax from the batch result
+                line = line_taxes.lines[index]
+                if hasattr(item, "tax"):
+                    item.tax = line.tax
+                item.total = line.total
+            else:
+                if hasattr(item, "tax"):
+                    item.tax = item_data.get("tax", 0)
 
-            # حساب الإجمالي للعنصر | Calculate item total
-            quantity = Decimal(str(item.quantity))
-            price = Decimal(str(item.price))
-            discount = Decimal(str(item_data.get("discount", 0)))
-            tax = Decimal(str(item_data.get("tax", 0)))
+                # حساب الإجمالي للعنصر | Calculate item total
+                quantity = Decimal(str(item.quantity))
+                price = Decimal(str(item.price))
+                discount = Decimal(str(item_data.get("discount", 0)))
+                tax = Decimal(str(item_data.get("tax", 0)))
 
-            item.total = (quantity * price) - discount + tax
+                item.total = (quantity * price) - discount + tax
 
             if hasattr(item, "notes"):
                 item.notes = item_data.get("notes", "")
@@ -991,95 +1010,11 @@ def get_invoices_stats():
                 status_code=501,
             )
 
-        # إحصائيات عامة | General statistics
-        total_invoices = Invoice.query.count()
-
-        # إحصائيات حسب النوع | Statistics by type
-        sales_count = Invoice.query.filter(
-            Invoice.invoice_type.in_(["sales", InvoiceType.SALES])
-            if InvoiceType
-            else Invoice.invoice_type == "sales"
-        ).count()
-
-        purchase_count = Invoice.query.filter(
-            Invoice.invoice_type.in_(["purchase", InvoiceType.PURCHASE])
-            if InvoiceType
-            else Invoice.invoice_type == "purchase"
-        ).count()
-
-        # إحصائيات حسب الحالة | Statistics by status
-        draft_count = Invoice.query.filter(
-            Invoice.status.in_(["draft", InvoiceStatus.DRAFT])
-            if InvoiceStatus
-            else Invoice.status == "draft"
-        ).count()
-
-        confirmed_count = Invoice.query.filter(
-            Invoice.status.in_(["confirmed", InvoiceStatus.CONFIRMED])
-            if InvoiceStatus
-            else Invoice.status == "confirmed"
-        ).count()
-
-        paid_count = Invoice.query.filter(
-            Invoice.status.in_(["paid", InvoiceStatus.PAID])
-            if InvoiceStatus
-            else Invoice.status == "paid"
-        ).count()
-
-        # إحصائيات المبالغ | Amount statistics
-        total_sales = (
-            db.session.query(func.sum(Invoice.total_amount))
-            .filter(
-                Invoice.invoice_type.in_(["sales", InvoiceType.SALES])
-                if InvoiceType
-                else Invoice.invoice_type == "sales"
-            )
-            .scalar()
-            or 0
-        )
-
-        total_purchases = (
-            db.session.query(func.sum(Invoice.total_amount))
-            .filter(
-                Invoice.invoice_type.in_(["purchase", InvoiceType.PURCHASE])
-                if InvoiceType
-                else Invoice.invoice_type == "purchase"
-            )
-            .scalar()
-            or 0
-        )
+        # تجميع واحد (GROUP BY النوع، الحالة) مع تخزين مؤقت يُبطل عند الكتابة
+        # One grouped scan, cached until the invoices table is written
+        stats, meta = invoice_stats(db.session, Invoice)
 
-        total_paid = db.session.query(func.sum(Invoice.paid_amount)).scalar() or 0
-        total_remaining = (
-            db.session.query(func.sum(Invoice.remaining_amount)).scalar() or 0
-        )
-
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "data": {
-                        "total_invoices": total_invoices,
-                        "by_type": {
-                            "sales": sales_count,
-                            "purchase": purchase_count,
-                        },
-                        "by_status": {
-                            "draft": draft_count,
-                            "confirmed": confirmed_count,
-                            "paid": paid_count,
-                        },
-                        "amounts": {
-                            "total_sales": float(total_sales),
-                            "total_purchases": float(total_purchases),
-                            "total_paid": float(total_paid),
-                            "total_remaining": float(total_remaining),
-                        },
-                    },
-                }
-            ),
-            200,
-        )
+        return json_response({"success": True, "data": stats, "meta": meta})
 
     except Exception as e:
         logger.error(f"خطأ في الحصول على إحصائيات الفواتير: {e}")
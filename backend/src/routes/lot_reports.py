@@ -41,12 +41,6 @@ except (ImportError, Exception):
     SalesInvoiceItem = None
 import io
 import csv
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 batch_reports_bp = Blueprint("batch_reports", __name__)
 
@@ -517,6 +511,11 @@ def get_batch_movements_report(batch_number):
 @batch_reports_bp.route("/reports/export/lot-tracking/<batch_number>", methods=["GET"])
 def export_batch_tracking_report(batch_number):
     """تصدير تقرير تتبع اللوط إلى PDF"""
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
     try:
         lot = Lot.query.filter_by(batch_number=batch_number).first()
         if not lot:
@@ -0,0 +1,61 @@
+"""
+مسارات المقاييس
+Metrics Blueprint
+- GET /metrics                        (Prometheus text exposition, all workers)
+- GET /api/metrics?format=prometheus  (same, for the "inventory-system" job)
+- GET /api/metrics                    (JSON: p50/p95/p99 per route for capacity planning)
+
+Set METRICS_AUTH_TOKEN to require ``Authorization: Bearer <token>``.
+"""
+
+import hmac
+import os
+
+from flask import Blueprint, Response, request
+
+from src.middleware.error_envelope_middleware import (
+    ErrorCodes,
+    error_response,
+    success_response,
+)
+from src.services.metrics import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _authorized() -> bool:
+    token = os.environ.get("METRICS_AUTH_TOKEN")
+    if not token:
+        return True
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return hmac.compare_digest(supplied, token)
+
+
+def _prometheus() -> Response:
+    return Response(metrics.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    if not _authorized():
+        return error_response(code=ErrorCodes.AUTH_UNAUTHORIZED, status_code=401)
+    return _prometheus()
+
+
+@metrics_bp.route("/api/metrics", methods=["GET"])
+def metrics_summary():
+    """زمن الاستجابة لكل مسار / Latency percentiles per route (seconds)"""
+    if not _authorized():
+        return error_response(code=ErrorCodes.AUTH_UNAUTHORIZED, status_code=401)
+    if request.args.get("format") == "prometheus":
+        return _prometheus()
+    return success_response(
+        data={
+            "routes": metrics.summary("http_request_duration_seconds"),
+            "db": metrics.summary("db_query_duration_seconds"),
+        },
+        message="تم جلب المقاييس / Metrics retrieved",
+    )
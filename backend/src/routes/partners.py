@@ -22,6 +22,9 @@ from src.middleware.error_envelope_middleware import (
 )
 import logging
 
+from src.schemas.list_serializers import stock_movement_list_serializer
+from src.utils.serializers import json_response
+
 try:
     from src.models.customer import Customer
     from src.models.supplier import Supplier
@@ -428,19 +431,19 @@ def get_stock_movements():
         if warehouse_id:
             query = query.filter_by(warehouse_id=warehouse_id)
 
-        movements = query.order_by(StockMovement.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        movements, pagination = stock_movement_list_serializer(StockMovement).paginate(
+            query.order_by(StockMovement.created_at.desc()), page, per_page
         )
 
-        return jsonify(
+        return json_response(
             {
                 "status": "success",
-                "data": [movement.to_dict() for movement in movements.items],
+                "data": movements,
                 "pagination": {
                     "page": page,
-                    "pages": movements.pages,
+                    "pages": pagination["pages"],
                     "per_page": per_page,
-                    "total": movements.total,
+                    "total": pagination["total"],
                 },
             }
         )
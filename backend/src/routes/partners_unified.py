@@ -9,7 +9,7 @@
 Unified Customers & Suppliers Routes
 """
 
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, g
 
 # P0.2.4: Import error envelope helpers
 from src.middleware.error_envelope_middleware import (
@@ -18,6 +18,11 @@ from src.middleware.error_envelope_middleware import (
     ErrorCodes,
 )
 from src.database import db
+from src.schemas.list_serializers import (
+    customer_list_serializer,
+    supplier_list_serializer,
+)
+from src.utils.serializers import json_response
 from datetime import datetime
 import logging
 
@@ -139,26 +144,15 @@ def get_customers():
                 )
             query = query.filter(search_filter)
 
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        customers, pagination = customer_list_serializer().paginate(
+            query, page, per_page
+        )
 
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "data": {
-                        "customers": [c.to_dict() for c in pagination.items],
-                        "pagination": {
-                            "page": page,
-                            "per_page": per_page,
-                            "total": pagination.total,
-                            "pages": pagination.pages,
-                            "has_next": pagination.has_next,
-                            "has_prev": pagination.has_prev,
-                        },
-                    },
-                }
-            ),
-            200,
+        return json_response(
+            {
+                "success": True,
+                "data": {"customers": customers, "pagination": pagination},
+            }
         )
     except Exception as e:
         logger.error(f"خطأ في الحصول على العملاء: {e}")
@@ -450,26 +444,15 @@ def get_suppliers():
                 )
             query = query.filter(search_filter)
 
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        suppliers, pagination = supplier_list_serializer().paginate(
+            query, page, per_page
+        )
 
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "data": {
-                        "suppliers": [s.to_dict() for s in pagination.items],
-                        "pagination": {
-                            "page": page,
-                            "per_page": per_page,
-                            "total": pagination.total,
-                            "pages": pagination.pages,
-                            "has_next": pagination.has_next,
-                            "has_prev": pagination.has_prev,
-                        },
-                    },
-                }
-            ),
-            200,
+        return json_response(
+            {
+                "success": True,
+                "data": {"suppliers": suppliers, "pagination": pagination},
+            }
         )
     except Exception as e:
         logger.error(f"خطأ في الحصول على الموردين: {e}")
@@ -9,6 +9,8 @@ from src.models.shift import Shift
 from src.models.sale import Sale, SaleItem
 from src.models.lot_advanced import LotAdvanced
 from src.models.product_advanced import ProductAdvanced
+from src.models.discount import Coupon, CouponUsage, Discount
+from src.services.pricing_engine import CartLine, price_cart
 
 pos_bp = Blueprint('pos', __name__, url_prefix='/api/pos')
 
@@ -164,6 +166,67 @@ def get_current_shift():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ==================== Pricing ====================
+
+def _cart_lines(items, products):
+    """بناء أسطر السلة لمحرك التسعير"""
+    return [
+        CartLine(
+            product_id=product.id,
+            quantity=item['quantity'],
+            unit_price=item.get('unit_price', product.sale_price or 0),
+            category_id=product.category_id,
+        )
+        for item, product in zip(items, products)
+    ]
+
+
+def _record_promotion_usage(pricing, customer_id):
+    """تحديث عدادات استخدام الخصومات والكوبونات المطبقة"""
+    discount_ids = [a.discount_id for a in pricing.applied]
+    if discount_ids:
+        Discount.query.filter(Discount.id.in_(discount_ids)).update(
+            {Discount.usage_count: db.func.coalesce(Discount.usage_count, 0) + 1},
+            synchronize_session=False,
+        )
+    codes = {a.coupon_code: a.amount for a in pricing.applied if a.coupon_code}
+    if codes:
+        for coupon in Coupon.query.filter(Coupon.code.in_(codes)).all():
+            coupon.usage_count = (coupon.usage_count or 0) + 1
+            db.session.add(CouponUsage(
+                coupon_id=coupon.id,
+                customer_id=customer_id,
+                discount_amount=float(codes[coupon.code]),
+            ))
+
+
+@pos_bp.route('/pricing/quote', methods=['POST'])
+def quote_cart():
+    """تسعير السلة مع العروض والكوبونات دون إنشاء فاتورة"""
+    try:
+        data = request.get_json()
+        items = data.get('items', [])
+        ids = {item['product_id'] for item in items}
+        products = {
+            p.id: p for p in ProductAdvanced.query.filter(ProductAdvanced.id.in_(ids)).all()
+        }
+        missing = ids - products.keys()
+        if missing:
+            return jsonify({
+                'success': False,
+                'error': f'المنتج {min(missing)} غير موجود'
+            }), 404
+
+        pricing = price_cart(
+            _cart_lines(items, [products[item['product_id']] for item in items]),
+            coupon_codes=data.get('coupon_codes', []),
+            customer_id=data.get('customer_id'),
+        )
+        return jsonify({'success': True, 'pricing': pricing.to_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ==================== Sales APIs ====================
 
 @pos_bp.route('/sales', methods=['POST'])
@@ -173,7 +236,7 @@ def create_sale():
         data = request.get_json()
         
         # إنشاء رقم الفاتورة
-        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
         
         # إنشاء عملية البيع
         sale = Sale(
@@ -183,7 +246,9 @@ def create_sale():
             shift_id=data.get('shift_id'),
             branch_id=data.get('branch_id'),
             user_id=data['user_id'],
+            discount_amount=0.0,
             discount_percentage=data.get('discount_percentage', 0.0),
+            tax_amount=0.0,
             tax_percentage=data.get('tax_percentage', 0.0),
             payment_method=data.get('payment_method', 'cash'),
             paid_amount=data.get('paid_amount', 0.0),
@@ -191,6 +256,7 @@ def create_sale():
         )
         
         # إضافة العناصر
+        promo_items = []
         for item_data in data.get('items', []):
             # الحصول على المنتج
             product = ProductAdvanced.query.get(item_data['product_id'])
@@ -210,7 +276,7 @@ def create_sale():
                     and_(
                         LotAdvanced.product_id == product.id,
                         LotAdvanced.status == 'active',
-                        LotAdvanced.current_quantity >= item_data['quantity']
+                        LotAdvanced.quantity >= item_data['quantity']
                     )
                 ).order_by(LotAdvanced.expiry_date).first()
             
@@ -219,22 +285,38 @@ def create_sale():
                 product_id=product.id,
                 batch_id=batch.id if batch else None,
                 product_name=product.name,
-                product_code=product.code,
+                product_code=product.sku,
                 quantity=item_data['quantity'],
-                unit_price=item_data.get('unit_price', product.selling_price),
+                unit_price=float(item_data.get('unit_price', product.sale_price or 0)),
+                discount_amount=0.0,
                 discount_percentage=item_data.get('discount_percentage', 0.0),
                 lot_number=batch.batch_number if batch else None,
                 expiry_date=batch.expiry_date if batch else None
             )
             
+            if not sale_item.discount_percentage:
+                promo_items.append((item_data, product, sale_item))
+
             sale_item.calculate_total()
             sale.items.append(sale_item)
             
-            # تحديث كمية اللوط
+            # تحديث كمية اللوط (المتاح = الكمية - المحجوز)
             if batch:
-                batch.current_quantity -= item_data['quantity']
-                batch.reserved_quantity += item_data['quantity']
-        
+                batch.quantity -= item_data['quantity']
+        
+        # تطبيق العروض والكوبونات على الأسطر بدون خصم يدوي
+        # (اختياري: apply_promotions=true، حتى لا تتغير أسعار العملاء الحاليين)
+        if promo_items and data.get('apply_promotions', False):
+            pricing = price_cart(
+                _cart_lines([i for i, _, _ in promo_items], [p for _, p, _ in promo_items]),
+                coupon_codes=data.get('coupon_codes', []),
+                customer_id=sale.customer_id,
+            )
+            for (_, _, sale_item), discount in zip(promo_items, pricing.line_discounts):
+                sale_item.discount_amount = float(discount)
+                sale_item.calculate_total()
+            _record_promotion_usage(pricing, sale.customer_id)
+
         # حساب الإجماليات
         sale.calculate_totals()
         
@@ -282,7 +364,7 @@ def refund_sale(sale_id):
         data = request.get_json()
         
         # إنشاء رقم فاتورة الإرجاع
-        refund_invoice_number = f"REF-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        refund_invoice_number = f"REF-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
         
         # إنشاء فاتورة الإرجاع
         refund_sale = Sale(
@@ -327,8 +409,7 @@ def refund_sale(sale_id):
             if original_item.batch_id:
                 batch = LotAdvanced.query.get(original_item.batch_id)
                 if batch:
-                    batch.current_quantity += abs(original_item.quantity)
-                    batch.reserved_quantity -= abs(original_item.quantity)
+                    batch.quantity += abs(original_item.quantity)
         
         # تحديث حالة الفاتورة الأصلية
         original_sale.status = 'refunded'
@@ -364,7 +445,7 @@ def search_products():
         products = ProductAdvanced.query.filter(
             or_(
                 ProductAdvanced.name.ilike(f'%{query_text}%'),
-                ProductAdvanced.code.ilike(f'%{query_text}%'),
+                ProductAdvanced.sku.ilike(f'%{query_text}%'),
                 ProductAdvanced.barcode == query_text
             )
         ).limit(20).all()
@@ -376,17 +457,17 @@ def search_products():
                 and_(
                     LotAdvanced.product_id == product.id,
                     LotAdvanced.status == 'active',
-                    LotAdvanced.current_quantity > 0
+                    LotAdvanced.quantity > 0
                 )
             ).order_by(LotAdvanced.expiry_date).all()
             
             results.append({
                 'id': product.id,
                 'name': product.name,
-                'code': product.code,
+                'code': product.sku,
                 'barcode': product.barcode,
-                'selling_price': product.selling_price,
-                'available_quantity': sum(b.current_quantity for b in batches),
+                'selling_price': float(product.sale_price or 0),
+                'available_quantity': sum(b.available_quantity for b in batches),
                 'batches': [b.to_dict() for b in batches]
             })
         
@@ -30,11 +30,14 @@ except ImportError:
         ErrorCodes,
     )
 
+from src.middleware.query_profiler import query_budget
+
 # إنشاء Blueprint
 products_bp = Blueprint("products", __name__)
 
 
 @products_bp.route("/api/products", methods=["GET"])
+@query_budget(4, max_duplicates=2)
 def get_products():
     """الحصول على قائمة المنتجات"""
     try:
@@ -71,18 +74,22 @@ def get_products():
                     )
                 )
 
-            # التصفح
-            products = query.paginate(page=page, per_page=per_page, error_out=False)
+            # التصفح مع تحويل الأعمدة دفعة واحدة
+            from src.schemas.list_serializers import product_list_serializer
+
+            products, pagination = product_list_serializer().paginate(
+                query, page, per_page
+            )
 
             # P0.2.4: Use unified success envelope
             return success_response(
                 data={
-                    "products": [product.to_dict() for product in products.items],
+                    "products": products,
                     "pagination": {
                         "page": page,
-                        "pages": products.pages,
+                        "pages": pagination["pages"],
                         "per_page": per_page,
-                        "total": products.total,
+                        "total": pagination["total"],
                     },
                 },
                 message="تم الحصول على المنتجات بنجاح / Products retrieved successfully",
@@ -25,8 +25,8 @@ from ..schemas.product_schema import ProductSchema
 
 # Import models and DB session
 from ..models.product_unified import Product
-from ..models.inventory import Category  # Assuming Category model exists
 from ..database import db
+from ..services.reference_data import reference_data
 
 # P0.5: Import unified error envelope
 from ..middleware.error_envelope_middleware import (
@@ -127,7 +127,7 @@ def create_product():
 
         # Optional: Check if category exists
         category_id = validated_data.get("category_id")
-        if category_id and not Category.query.get(category_id):
+        if category_id and not reference_data.find("categories", id=category_id):
             return error_response(
                 "Category not found.", ErrorCodes.VAL_INVALID_REFERENCE, 400
             )
@@ -182,7 +182,7 @@ def update_product(product_id):
 
         # Optional: Check if category exists
         category_id = validated_data.get("category_id")
-        if category_id and not Category.query.get(category_id):
+        if category_id and not reference_data.find("categories", id=category_id):
             return error_response(
                 "Category not found.", ErrorCodes.VAL_INVALID_REFERENCE, 400
             )
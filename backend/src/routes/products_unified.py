@@ -31,6 +31,9 @@ from datetime import datetime
 
 from flask import Blueprint, jsonify, request
 from src.database import db
+from src.schemas.list_serializers import product_list_serializer
+from src.services.stats_rollups import product_stats
+from src.utils.serializers import json_response
 
 # Validation and API metadata
 try:
@@ -340,27 +343,16 @@ def get_products():
         else:
             query = query.order_by(sort_column.asc())
 
-        # التصفح
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # التصفح مع تحويل الأعمدة دفعة واحدة
+        products, pagination = product_list_serializer().paginate(
+            query, page, per_page
+        )
 
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "data": {
-                        "products": [product.to_dict() for product in pagination.items],
-                        "pagination": {
-                            "page": page,
-                            "per_page": per_page,
-                            "total": pagination.total,
-                            "pages": pagination.pages,
-                            "has_next": pagination.has_next,
-                            "has_prev": pagination.has_prev,
-                        },
-                    },
-                }
-            ),
-            200,
+        return json_response(
+            {
+                "success": True,
+                "data": {"products": products, "pagination": pagination},
+            }
         )
 
     except Exception as e:
@@ -870,74 +862,17 @@ def get_products_stats():
                 status_code=501,
             )
 
-        # إحصائيات عامة
-        total_products = Product.query.count()
-        active_products = Product.query.filter_by(is_active=True).count()
-        inactive_products = total_products - active_products
-
-        stats = {
-            "total_products": total_products,
-            "active_products": active_products,
-            "inactive_products": inactive_products,
-        }
-
-        # إحصائيات المخزون (إذا كانت متاحة)
-        if hasattr(Product, "current_stock"):
-            total_stock = (
-                db.session.query(db.func.sum(Product.current_stock)).scalar() or 0
-            )
-            stats["total_stock"] = float(total_stock)
-
-            if hasattr(Product, "min_quantity"):
-                low_stock = Product.query.filter(
-                    Product.current_stock <= Product.min_quantity,
-                    Product.current_stock > 0,
-                ).count()
-                out_of_stock = Product.query.filter(Product.current_stock <= 0).count()
-
-                stats["low_stock_products"] = low_stock
-                stats["out_of_stock_products"] = out_of_stock
-
-        # إحصائيات القيمة (إذا كانت متاحة)
-        if hasattr(Product, "cost_price") and hasattr(Product, "current_stock"):
-            total_value = (
-                db.session.query(
-                    db.func.sum(Product.cost_price * Product.current_stock)
-                ).scalar()
-                or 0
-            )
-            stats["total_inventory_value"] = float(total_value)
-
-        # إحصائيات حسب النوع (للنماذل الموحدة)
-        if UNIFIED_MODELS and hasattr(Product, "product_type"):
-            try:
-                by_type = {}
-                for ptype in ProductType:
-                    count = Product.query.filter_by(product_type=ptype).count()
-                    by_type[ptype.value] = count
-                stats["by_type"] = by_type
-            except Exception as e:
-                logger.warning(f"Could not get stats by type: {e}")
-
-        # إحصائيات حسب الفئة
-        if hasattr(Product, "category_id") and Category:
-            try:
-                by_category = (
-                    db.session.query(
-                        Category.name, db.func.count(Product.id).label("count")
-                    )
-                    .join(Product)
-                    .group_by(Category.name)
-                    .all()
-                )
-
-                stats["by_category"] = [
-                    {"category": cat, "count": count} for cat, count in by_category
-                ]
-            except Exception as e:
-                logger.warning(f"Could not get stats by category: {e}")
+        # تجميع واحد لجدول المنتجات مع تخزين مؤقت يُبطل عند الكتابة
+        stats, meta = product_stats(
+            db.session,
+            Product,
+            ProductType if UNIFIED_MODELS else None,
+            Category,
+        )
 
-        return success_response(data=stats, message="Success", status_code=200)
+        return success_response(
+            data=stats, message="Success", status_code=200, meta=meta
+        )
 
     except Exception as e:
         import traceback
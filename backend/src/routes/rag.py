@@ -5,7 +5,7 @@
 # type: ignore
 # flake8: noqa
 # RAG endpoint backed by rag_service
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, current_app, request, jsonify, g
 from marshmallow import Schema, fields, validate, EXCLUDE
 
 # P0.2.4: Import error envelope helpers
@@ -38,6 +38,20 @@ class RAGQuerySchema(Schema):
     )
 
 
+class RecordSearchSchema(RAGQuerySchema):
+    """Semantic search over indexed ERP records, with metadata filters"""
+
+    entity = fields.Str(
+        required=False,
+        allow_none=True,
+        validate=validate.OneOf(["product", "customer", "supplier", "invoice"]),
+    )
+    warehouse_id = fields.Int(required=False, allow_none=True)
+    category_id = fields.Int(required=False, allow_none=True)
+    date_from = fields.Date(required=False, allow_none=True)
+    date_to = fields.Date(required=False, allow_none=True)
+
+
 # P0.20: Import validation decorator
 try:
     from src.utils.validation import validate_json, sanitize_string
@@ -53,6 +67,56 @@ except ImportError:
         return s if s else ""
 
 
+try:
+    from src.permissions import (
+        Permissions,
+        get_current_user_role,
+        get_user_permissions,
+        require_permission,
+    )
+    from src.routes.auth_unified import token_required
+except ImportError:
+    # Fallback if permissions not available
+    def require_permission(*args, **kwargs):
+        def decorator(f):
+            return f
+
+        return decorator
+
+    def token_required(f):
+        return f
+
+    class Permissions:
+        ADMIN_FULL = "admin_full"
+        INVENTORY_VIEW = "inventory_view"
+        CUSTOMER_VIEW = "customer_view"
+        SUPPLIER_VIEW = "supplier_view"
+        INVOICE_VIEW = "invoice_view"
+
+    def get_current_user_role():
+        return None
+
+    def get_user_permissions(role):
+        return [Permissions.ADMIN_FULL]
+
+
+# Permission needed to see each kind of indexed record
+RECORD_PERMISSIONS = {
+    "product": Permissions.INVENTORY_VIEW,
+    "customer": Permissions.CUSTOMER_VIEW,
+    "supplier": Permissions.SUPPLIER_VIEW,
+    "invoice": Permissions.INVOICE_VIEW,
+}
+
+
+def readable_entities():
+    """Record kinds the current user may read"""
+    permissions = get_user_permissions(get_current_user_role())
+    if Permissions.ADMIN_FULL in permissions:
+        return list(RECORD_PERMISSIONS)
+    return [e for e, perm in RECORD_PERMISSIONS.items() if perm in permissions]
+
+
 try:
     from rag_service import query as rag_query_service
 
@@ -116,3 +180,79 @@ def rag_query():
     result = rag_query_service(q.strip(), top_k=top_k)
     status = 200 if result.get("success") else 400
     return jsonify(result), status
+
+
+@rag_bp.route("/rag/records/search", methods=["POST"])
+@token_required
+@require_permission(*RECORD_PERMISSIONS.values(), any_of=True)
+@validate_json(RecordSearchSchema)
+def rag_records_search():
+    """
+    Semantic search over products, customers, suppliers and invoices
+
+    Accepts:
+        query: string (1-2000 chars)
+        top_k: int (1-50, optional, default 10)
+        entity: product | customer | supplier | invoice (optional)
+        warehouse_id, category_id: int (optional)
+        date_from, date_to: YYYY-MM-DD (optional)
+
+    Only record kinds the caller may read are searched.
+
+    Returns:
+        Ranked records with their metadata and the search time
+    """
+    indexer = current_app.extensions.get("record_index")
+    if indexer is None:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": "Record index is not enabled",
+                    "code": "SERVICE_UNAVAILABLE",
+                }
+            ),
+            503,
+        )
+
+    data = getattr(g, "validated_data", None) or request.get_json(silent=True) or {}
+    q = sanitize_string(data.get("query", ""))
+    if not q or not q.strip():
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": "Query cannot be empty",
+                    "code": "VALIDATION_ERROR",
+                }
+            ),
+            400,
+        )
+
+    allowed = readable_entities()
+    entity = data.get("entity")
+    if entity and entity not in allowed:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": "permission_denied",
+                    "message": "ليس لديك صلاحية للوصول إلى هذه الوظيفة",
+                    "code": "INSUFFICIENT_PERMISSIONS",
+                }
+            ),
+            403,
+        )
+    if not entity and len(allowed) < len(RECORD_PERMISSIONS):
+        entity = allowed
+
+    result = indexer.search(
+        q,
+        top_k=data.get("top_k") or 10,
+        entity=entity,
+        warehouse_id=data.get("warehouse_id"),
+        category_id=data.get("category_id"),
+        date_from=data.get("date_from"),
+        date_to=data.get("date_to"),
+    )
+    return jsonify({"success": True, "query": q.strip(), **result}), 200
@@ -26,13 +26,6 @@ from src.middleware.error_envelope_middleware import (
     ErrorCodes,
 )
 import logging
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 from sqlalchemy import func, or_
 from src.models.inventory import Category
 from src.models.product_unified import Product
@@ -213,14 +206,20 @@ def low_stock_report():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-# تسجيل خط عربي للـ PDF
-try:
-    # يمكن استخدام خط عربي مثل Arial Unicode MS أو Tahoma
-    font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.tt"
-    if os.path.exists(font_path):
-        pdfmetrics.registerFont(TTFont("Arabic", font_path))
-except BaseException:
-    pass
+def _register_arabic_font():
+    """تسجيل خط عربي للـ PDF (عند أول طباعة بدلاً من وقت الاستيراد)"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    try:
+        # يمكن استخدام خط عربي مثل Arial Unicode MS أو Tahoma
+        font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.tt"
+        if os.path.exists(font_path):
+            if "Arabic" not in pdfmetrics.getRegisteredFontNames():
+                pdfmetrics.registerFont(TTFont("Arabic", font_path))
+    except BaseException:
+        pass
+    return pdfmetrics
 
 
 @reports_bp.route("/inventory-report", methods=["GET"])
@@ -632,6 +631,19 @@ def purchases_report():
 @reports_bp.route("/print-inventory-report", methods=["POST"])
 def print_inventory_report():
     """طباعة تقرير المخزون كـ PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import (
+        Paragraph,
+        SimpleDocTemplate,
+        Spacer,
+        Table,
+        TableStyle,
+    )
+
+    pdfmetrics = _register_arabic_font()
     try:
         data = request.get_json()
         inventory_data = data.get("inventory", [])
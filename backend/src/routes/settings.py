@@ -10,7 +10,11 @@ import logging
 from flask import Blueprint, request, jsonify
 from src.routes.auth_unified import token_required
 from src.permissions import require_permission, Permissions
-from src.models.settings import Setting, initialize_default_settings
+from src.models.settings import (
+    Setting,
+    initialize_default_settings,
+    invalidate_settings_cache,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -172,6 +176,7 @@ def update_setting(key: str):
     from src.database import db
 
     db.session.commit()
+    invalidate_settings_cache()
 
     logger.info(f"P2.66: Updated setting {key}")
 
@@ -220,6 +225,7 @@ def update_settings_bulk():
         updated.append(key)
 
     db.session.commit()
+    invalidate_settings_cache()
 
     logger.info(f"P2.66: Bulk updated {len(updated)} settings")
 
@@ -259,6 +265,7 @@ def reset_setting(key: str):
         from src.database import db
 
         db.session.commit()
+        invalidate_settings_cache()
 
         return jsonify({"success": True, "data": setting.to_dict()})
 
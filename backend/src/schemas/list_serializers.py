@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# FILE: backend/src/schemas/list_serializers.py | PURPOSE: Column lists
+# and converters for list endpoints | OWNER: Backend | RELATED:
+# utils/serializers.py
+
+"""
+مُسلسِلات القوائم
+List serializers for the products, invoices, partners and stock-movement
+list endpoints. Each one is built on first use (models are imported lazily)
+and reused for every request.
+"""
+
+from functools import lru_cache
+
+from src.utils.serializers import Children, ListSerializer, Related, money
+
+
+@lru_cache(maxsize=None)
+def product_list_serializer() -> ListSerializer:
+    from src.models.product_unified import Product
+
+    return ListSerializer(
+        Product,
+        [
+            "id",
+            "name",
+            "name_en",
+            "sku",
+            "barcode",
+            "category_id",
+            "product_type",
+            "tracking_type",
+            "cost_price",
+            "sale_price",
+            "wholesale_price",
+            "unit_of_measure",
+            "min_quantity",
+            "reorder_point",
+            "is_active",
+            "is_saleable",
+            "is_purchasable",
+            "created_at",
+            "updated_at",
+        ],
+    )
+
+
+@lru_cache(maxsize=None)
+def invoice_item_serializer() -> ListSerializer:
+    from src.models.invoice_unified import InvoiceItem
+
+    return ListSerializer(
+        InvoiceItem,
+        [
+            "id",
+            "product_id",
+            "product_name",
+            "product_sku",
+            "quantity",
+            "price",
+            "discount",
+            "tax",
+            "total",
+        ],
+        converters={"discount": money, "tax": money},
+    )
+
+
+@lru_cache(maxsize=None)
+def invoice_payment_serializer() -> ListSerializer:
+    from src.models.invoice_unified import InvoicePayment
+
+    return ListSerializer(
+        InvoicePayment,
+        ["id", "amount", "payment_date", "payment_method", "reference", "notes"],
+    )
+
+
+@lru_cache(maxsize=None)
+def invoice_list_serializer() -> ListSerializer:
+    """Same keys as the hand-built dicts of invoices_unified.get_invoices."""
+    from src.models.customer import Customer
+    from src.models.invoice_unified import Invoice
+    from src.models.supplier import Supplier
+
+    amounts = (
+        "subtotal",
+        "tax_amount",
+        "discount_amount",
+        "total_amount",
+        "paid_amount",
+        "remaining_amount",
+    )
+    return ListSerializer(
+        Invoice,
+        [
+            "id",
+            "invoice_number",
+            "invoice_type",
+            "invoice_date",
+            "due_date",
+            "customer_id",
+            "supplier_id",
+            "warehouse_id",
+            *amounts,
+            "status",
+            "payment_status",
+            "notes",
+            "created_at",
+        ],
+        converters={name: money for name in amounts},
+        related={
+            "customer_name": Related("customer_id", Customer.name),
+            "supplier_name": Related("supplier_id", Supplier.name),
+        },
+        children={
+            "items": Children(invoice_item_serializer(), "invoice_id"),
+            "payments": Children(invoice_payment_serializer(), "invoice_id"),
+        },
+    )
+
+
+@lru_cache(maxsize=None)
+def customer_list_serializer() -> ListSerializer:
+    """Same keys as Customer.to_dict."""
+    from src.models.customer import Customer
+
+    return ListSerializer(
+        Customer,
+        [
+            "id",
+            "customer_code",
+            "name",
+            "email",
+            "phone",
+            "mobile",
+            "address",
+            "city",
+            "country",
+            "postal_code",
+            "company_name",
+            "tax_number",
+            "credit_limit",
+            "payment_terms",
+            "currency",
+            "discount_rate",
+            "category",
+            "is_active",
+            "notes",
+            "tags",
+            "sales_engineer_id",
+            "created_at",
+            "updated_at",
+        ],
+        converters={
+            "credit_limit": money,
+            "discount_rate": lambda value: float(value or 0),
+        },
+        constants={"created_by": None},  # column disabled on Customer
+    )
+
+
+@lru_cache(maxsize=None)
+def supplier_list_serializer() -> ListSerializer:
+    """Same keys as Supplier.to_dict."""
+    from src.models.supplier import Supplier
+
+    return ListSerializer(
+        Supplier,
+        [
+            "id",
+            "name",
+            "email",
+            "phone",
+            "mobile",
+            "website",
+            "address",
+            "city",
+            "country",
+            "postal_code",
+            "company_name",
+            "tax_number",
+            "supplier_type",
+            "payment_terms",
+            "preferred_payment_method",
+            "currency",
+            "bank_account",
+            "contact_person",
+            "contact_phone",
+            "contact_email",
+            "rating",
+            "quality_score",
+            "delivery_score",
+            "is_active",
+            "is_preferred",
+            "notes",
+            "tags",
+            "created_at",
+            "updated_at",
+            "created_by",
+        ],
+    )
+
+
+@lru_cache(maxsize=None)
+def stock_movement_list_serializer(model) -> ListSerializer:
+    """All columns of the stock-movement model bound by the route."""
+    return ListSerializer.from_model(model)
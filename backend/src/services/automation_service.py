@@ -239,12 +239,12 @@ class AutomationService:
 
             if schedule_type == "daily":
                 schedule.every().day.at(schedule_time).do(
-                    self._execute_task, task["id"]
+                    self._execute_task_once, task["id"]
                 )
             elif schedule_type == "weekly":
                 day = task.get("day_of_week", "monday")
                 schedule.every().week.at(schedule_time).do(
-                    self._execute_task, task["id"]
+                    self._execute_task_once, task["id"]
                 )
             elif schedule_type == "monthly":
                 # تنفيذ شهري في اليوم الأول من كل شهر
@@ -260,6 +260,21 @@ class AutomationService:
         except Exception as e:
             self.logger.error(f"خطأ في جدولة المهمة: {str(e)}")
 
+    def _execute_task_once(self, task_id: str):
+        """
+        تنفيذ المهمة مرة واحدة عبر جميع العمليات
+        Every worker runs this loop; the job lease lets one of them execute
+        each scheduled fire (see services/job_lease.py).
+        """
+        from src.services.job_lease import job_coordinator
+
+        result = job_coordinator.run(
+            f"automation:{task_id}", lambda: self._execute_task(task_id), window=60
+        )
+        if not result.executed:
+            self.logger.debug(f"تخطي المهمة {task_id}: {result.reason}")
+        return result
+
     def _execute_task(self, task_id: str):
         """تنفيذ مهمة محددة"""
         try:
@@ -674,7 +689,7 @@ class AutomationService:
         try:
             today = datetime.utcnow()
             if today.day == 1:  # اليوم الأول من الشهر
-                self._execute_task(task_id)
+                self._execute_task_once(task_id)
         except Exception as e:
             self.logger.error(f"خطأ في فحص المهمة الشهرية: {str(e)}")
 
@@ -8,15 +8,32 @@ Provides database backup and restore functionality.
 
 import os
 import json
-import gzip
 import shutil
 import logging
+import sqlite3
 import subprocess
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.services.logical_export import (
+    TransferProgress,
+    export_tables,
+    import_tables,
+)
+from src.services.sqlite_snapshots import (
+    CODEC_SUFFIXES,
+    BackupChain,
+    open_compressed_reader,
+    open_compressed_writer,
+    resolve_codec,
+    restore_snapshot,
+    snapshot_database,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,6 +44,17 @@ logger = logging.getLogger(__name__)
 BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups")
 MAX_BACKUPS = int(os.environ.get("MAX_BACKUPS", 10))
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
+# Encrypt backups with the streaming SEF1 format (utils/stream_encryption.py)
+BACKUP_ENCRYPTION = os.environ.get("BACKUP_ENCRYPTION", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Fernet-format key; defaults to the EncryptionManager master key
+BACKUP_ENCRYPTION_KEY = os.environ.get("BACKUP_ENCRYPTION_KEY", "")
+BACKUP_SUFFIXES = (".db", ".gz", ".zst", ".sql", ".enc")
+# Incremental chains live in <BACKUP_DIR>/chains/<name>/ (see sqlite_snapshots.py)
+BACKUP_CHAIN_DIR = "chains"
 
 
 @dataclass
@@ -40,6 +68,7 @@ class BackupInfo:
     backup_type: str  # 'full', 'incremental', 'schema'
     database: str
     compressed: bool
+    encrypted: bool = False
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -50,6 +79,7 @@ class BackupInfo:
             "backup_type": self.backup_type,
             "database": self.database,
             "compressed": self.compressed,
+            "encrypted": self.encrypted,
         }
 
     @staticmethod
@@ -66,23 +96,31 @@ class BackupService:
     P2.65: Database backup and restore service.
 
     Supports:
-    - SQLite database backup
+    - Online SQLite backup through the backup API (consistent under writes)
+    - Incremental SQLite backup chains with point-in-time restore
     - PostgreSQL database backup (pg_dump)
-    - Compressed backups
+    - Compressed backups (zstd when available, gzip otherwise)
+    - Encrypted backups (chunked AES-256-GCM, streamed through the compressor)
     - Automatic cleanup of old backups
     - Restore from backup
     """
 
-    def __init__(self, backup_dir: str = None):
+    def __init__(self, backup_dir: str = None, encryption_key: bytes = None):
         self.backup_dir = Path(backup_dir or BACKUP_DIR)
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self._encryption_key = encryption_key or BACKUP_ENCRYPTION_KEY or None
+        self._cipher = None
 
     # ==========================================================================
     # Backup Methods
     # ==========================================================================
 
     def create_backup(
-        self, backup_type: str = "full", compress: bool = True, description: str = None
+        self,
+        backup_type: str = "full",
+        compress: bool = True,
+        description: str = None,
+        encrypt: bool = None,
     ) -> BackupInfo:
         """
         Create a database backup.
@@ -91,55 +129,57 @@ class BackupService:
             backup_type: Type of backup ('full', 'schema', 'data')
             compress: Whether to compress the backup
             description: Optional description
+            encrypt: Whether to encrypt the backup (default: BACKUP_ENCRYPTION)
 
         Returns:
             BackupInfo with details about the created backup
         """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        encrypt = BACKUP_ENCRYPTION if encrypt is None else encrypt
 
         # Determine database type
         if "sqlite" in DATABASE_URL.lower() or DATABASE_URL.startswith("sqlite"):
-            return self._backup_sqlite(timestamp, backup_type, compress)
+            return self._backup_sqlite(timestamp, backup_type, compress, encrypt)
         elif "postgresql" in DATABASE_URL.lower() or DATABASE_URL.startswith(
             "postgres"
         ):
-            return self._backup_postgresql(timestamp, backup_type, compress)
+            return self._backup_postgresql(timestamp, backup_type, compress, encrypt)
         else:
             # Default to SQLite backup for the instance database
-            return self._backup_sqlite(timestamp, backup_type, compress)
+            return self._backup_sqlite(timestamp, backup_type, compress, encrypt)
 
     def _backup_sqlite(
-        self, timestamp: str, backup_type: str, compress: bool
+        self, timestamp: str, backup_type: str, compress: bool, encrypt: bool = False
     ) -> BackupInfo:
         """Backup SQLite database."""
-        from flask import current_app
-
-        # Get database path
-        db_path = current_app.config.get("SQLALCHEMY_DATABASE_URI", "")
-        if db_path.startswith("sqlite:///"):
-            db_path = db_path.replace("sqlite:///", "")
-        else:
-            db_path = "instance/store.db"  # Default path
-
-        if not os.path.exists(db_path):
-            raise FileNotFoundError(f"Database file not found: {db_path}")
+        db_path = self._sqlite_db_path()
 
         # Create backup filename
-        filename = f"backup_{timestamp}_{backup_type}"
+        codec = resolve_codec() if compress else None
+        filename = f"backup_{timestamp}_{backup_type}.db"
         if compress:
-            filename += ".db.gz"
-        else:
-            filename += ".db"
+            filename += CODEC_SUFFIXES[codec]
+        if encrypt:
+            filename += ".enc"
 
         filepath = self.backup_dir / filename
 
-        # Copy or compress the database
-        if compress:
-            with open(db_path, "rb") as f_in:
-                with gzip.open(filepath, "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+        # Consistent online snapshot (includes committed WAL frames), then
+        # stream it through the compressor/encryptor
+        if compress or encrypt:
+            snapshot = self.backup_dir / f".{filename}.snapshot"
+            try:
+                stats = snapshot_database(db_path, snapshot)
+                with open(snapshot, "rb") as f_in:
+                    with self._open_backup_writer(
+                        filepath, compress, encrypt, codec
+                    ) as f_out:
+                        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            finally:
+                if snapshot.exists():
+                    snapshot.unlink()
         else:
-            shutil.copy2(db_path, filepath)
+            stats = snapshot_database(db_path, filepath)
 
         # Get file size
         size = os.path.getsize(filepath)
@@ -152,11 +192,18 @@ class BackupService:
                 "database": "sqlite",
                 "original_path": db_path,
                 "compressed": compress,
+                "codec": codec,
+                "encrypted": encrypt,
+                "page_size": stats["page_size"],
+                "page_count": stats["pages"],
                 "created_at": datetime.now().isoformat(),
             },
         )
 
-        logger.info(f"P2.65: Created SQLite backup: {filename}")
+        logger.info(
+            f"P2.65: Created SQLite backup: {filename} "
+            f"({stats['pages']} pages in {stats['seconds']}s)"
+        )
 
         return BackupInfo(
             filename=filename,
@@ -166,10 +213,11 @@ class BackupService:
             backup_type=backup_type,
             database="sqlite",
             compressed=compress,
+            encrypted=encrypt,
         )
 
     def _backup_postgresql(
-        self, timestamp: str, backup_type: str, compress: bool
+        self, timestamp: str, backup_type: str, compress: bool, encrypt: bool = False
     ) -> BackupInfo:
         """Backup PostgreSQL database using pg_dump."""
         # Parse database URL
@@ -189,6 +237,8 @@ class BackupService:
             filename += ".sql.gz"
         else:
             filename += ".sql"
+        if encrypt:
+            filename += ".enc"
 
         filepath = self.backup_dir / filename
 
@@ -219,11 +269,11 @@ class BackupService:
 
         # Execute pg_dump
         try:
-            if compress:
-                with gzip.open(filepath, "wt") as f:
-                    result = subprocess.run(
-                        cmd, stdout=f, stderr=subprocess.PIPE, env=env, check=True
-                    )
+            if compress or encrypt:
+                # Stream pg_dump output through the compressor/encryptor; a
+                # gzip file object cannot be handed to the child as stdout
+                with self._open_backup_writer(filepath, compress, encrypt) as f:
+                    self._run_piped(cmd, env, stdout_to=f)
             else:
                 with open(filepath, "w") as f:
                     result = subprocess.run(
@@ -243,6 +293,7 @@ class BackupService:
                 "database": "postgresql",
                 "db_name": db_name,
                 "compressed": compress,
+                "encrypted": encrypt,
                 "created_at": datetime.now().isoformat(),
             },
         )
@@ -257,6 +308,7 @@ class BackupService:
             backup_type=backup_type,
             database="postgresql",
             compressed=compress,
+            encrypted=encrypt,
         )
 
     # ==========================================================================
@@ -281,7 +333,12 @@ class BackupService:
         # Load metadata
         metadata = self._load_metadata(filename)
         database = metadata.get("database", "sqlite")
-        compressed = metadata.get("compressed", filename.endswith(".gz"))
+        compressed = metadata.get(
+            "compressed", bool({".gz", ".zst"} & set(filepath.suffixes))
+        )
+        metadata.setdefault("encrypted", filepath.suffix == ".enc")
+        if compressed and not metadata.get("codec"):
+            metadata["codec"] = "zstd" if ".zst" in filepath.suffixes else "gzip"
 
         if database == "sqlite":
             return self._restore_sqlite(filepath, compressed, metadata)
@@ -298,19 +355,34 @@ class BackupService:
         db_path = metadata.get("original_path", "instance/store.db")
 
         # Create backup of current database before restore
+        backup_current = f"{db_path}.before_restore"
         if os.path.exists(db_path):
-            backup_current = f"{db_path}.before_restore"
-            shutil.copy2(db_path, backup_current)
+            try:
+                snapshot_database(db_path, backup_current)
+            except sqlite3.DatabaseError:
+                # Damaged database: keep the raw bytes
+                shutil.copy2(db_path, backup_current)
             logger.info(f"P2.65: Backed up current database to {backup_current}")
 
         # Restore
         try:
-            if compressed:
-                with gzip.open(filepath, "rb") as f_in:
-                    with open(db_path, "wb") as f_out:
-                        shutil.copyfileobj(f_in, f_out)
+            if compressed or metadata.get("encrypted"):
+                staged = Path(f"{db_path}.restoring")
+                try:
+                    with self._open_backup_reader(
+                        filepath,
+                        compressed,
+                        metadata.get("encrypted"),
+                        metadata.get("codec") or "gzip",
+                    ) as f_in:
+                        with open(staged, "wb") as f_out:
+                            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                    self._load_sqlite_snapshot(staged, db_path)
+                finally:
+                    if staged.exists():
+                        staged.unlink()
             else:
-                shutil.copy2(filepath, db_path)
+                self._load_sqlite_snapshot(filepath, db_path)
 
             logger.info(f"P2.65: Restored SQLite database from {filepath}")
             return True
@@ -318,10 +390,27 @@ class BackupService:
         except Exception as e:
             logger.error(f"P2.65: Restore failed: {e}")
             # Attempt to restore the backup
-            if os.path.exists(f"{db_path}.before_restore"):
-                shutil.copy2(f"{db_path}.before_restore", db_path)
+            if os.path.exists(backup_current):
+                shutil.copy2(backup_current, db_path)
             raise
 
+    @staticmethod
+    def _load_sqlite_snapshot(snapshot: Path, db_path: str):
+        """
+        Load a snapshot into the live database through the backup API.
+
+        Overwriting the file under open connections would leave a stale
+        -wal file to be replayed on top of it; a target that is not a
+        database at all is replaced outright.
+        """
+        try:
+            restore_snapshot(snapshot, db_path)
+        except sqlite3.DatabaseError:
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            shutil.copyfile(snapshot, db_path)
+
     def _restore_postgresql(
         self, filepath: Path, compressed: bool, metadata: dict
     ) -> bool:
@@ -354,11 +443,11 @@ class BackupService:
         ]
 
         try:
-            if compressed:
-                with gzip.open(filepath, "rt") as f:
-                    result = subprocess.run(
-                        cmd, stdin=f, stderr=subprocess.PIPE, env=env, check=True
-                    )
+            if compressed or metadata.get("encrypted"):
+                with self._open_backup_reader(
+                    filepath, compressed, metadata.get("encrypted")
+                ) as f:
+                    self._run_piped(cmd, env, stdin_from=f)
             else:
                 with open(filepath, "r") as f:
                     result = subprocess.run(
@@ -381,7 +470,7 @@ class BackupService:
         backups = []
 
         for filepath in self.backup_dir.glob("backup_*"):
-            if filepath.suffix in [".db", ".gz", ".sql"]:
+            if filepath.suffix in BACKUP_SUFFIXES:
                 stat = filepath.stat()
                 metadata = self._load_metadata(filepath.name)
 
@@ -393,7 +482,8 @@ class BackupService:
                         created_at=datetime.fromtimestamp(stat.st_mtime),
                         backup_type=metadata.get("backup_type", "full"),
                         database=metadata.get("database", "unknown"),
-                        compressed=filepath.name.endswith(".gz"),
+                        compressed=bool({".gz", ".zst"} & set(filepath.suffixes)),
+                        encrypted=filepath.suffix == ".enc",
                     )
                 )
 
@@ -430,6 +520,77 @@ class BackupService:
         logger.info(f"P2.65: Cleaned up {deleted} old backups")
         return deleted
 
+    # ==========================================================================
+    # Incremental Backups (SQLite)
+    # ==========================================================================
+
+    def get_chain(self, chain: str = "default", encrypt: bool = None) -> BackupChain:
+        """
+        Backup chain ``chain`` under ``<backup_dir>/chains/``.
+
+        ``encrypt`` only decides how new links are written; encrypted links
+        are always readable (the cipher is created when one is read).
+        """
+        encrypt = BACKUP_ENCRYPTION if encrypt is None else encrypt
+        return BackupChain(
+            self.backup_dir / BACKUP_CHAIN_DIR / chain,
+            cipher=self._get_cipher() if encrypt else None,
+            get_cipher=self._get_cipher,
+        )
+
+    def create_incremental_backup(
+        self, chain: str = "default", full: bool = False, encrypt: bool = None
+    ) -> Dict[str, Any]:
+        """
+        Add a backup to an incremental chain.
+
+        The first backup of a chain (or ``full=True``) stores the whole
+        database; later ones store only the pages changed since the previous
+        link.
+
+        Returns:
+            The manifest entry of the new link
+        """
+        return self.get_chain(chain, encrypt).backup(self._sqlite_db_path(), full=full)
+
+    def list_chain(self, chain: str = "default") -> List[Dict[str, Any]]:
+        """Manifest entries of ``chain``, oldest first."""
+        return BackupChain(self.backup_dir / BACKUP_CHAIN_DIR / chain).entries()
+
+    def restore_point_in_time(
+        self, chain: str = "default", upto=None, target_path: str = None
+    ) -> Dict[str, Any]:
+        """
+        Restore the database to the state of a chain link.
+
+        Args:
+            chain: Chain name
+            upto: Sequence number or datetime/ISO timestamp (default: latest)
+            target_path: Restore into this file instead of the live database
+
+        Returns:
+            The manifest entry that was restored
+        """
+        backup_chain = self.get_chain(chain)
+        if target_path:
+            return backup_chain.rebuild(target_path, upto)
+        return backup_chain.restore(self._sqlite_db_path(), upto)
+
+    @staticmethod
+    def _sqlite_db_path() -> str:
+        """Path of the SQLite database of the current app."""
+        from flask import current_app
+
+        db_path = current_app.config.get("SQLALCHEMY_DATABASE_URI", "")
+        if db_path.startswith("sqlite:///"):
+            db_path = db_path.replace("sqlite:///", "")
+        else:
+            db_path = "instance/store.db"  # Default path
+
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database file not found: {db_path}")
+        return db_path
+
     def get_backup_size(self) -> int:
         """Get total size of all backups."""
         total = 0
@@ -441,6 +602,94 @@ class BackupService:
     # Helper Methods
     # ==========================================================================
 
+    def _get_cipher(self):
+        """Streaming cipher for encrypted backups (created on first use)."""
+        if self._cipher is None:
+            from src.utils.stream_encryption import StreamCipher
+
+            key = self._encryption_key
+            if not key:
+                from src.encryption_manager import EncryptionManager
+
+                key = EncryptionManager().master_key
+            self._cipher = StreamCipher(key)
+        return self._cipher
+
+    @contextmanager
+    def _open_backup_writer(
+        self, filepath: Path, compress: bool, encrypt: bool, codec: str = "gzip"
+    ):
+        """
+        Writable stream for a backup file: data -> gzip/zstd -> encryption -> disk.
+
+        Everything is streamed in fixed-size blocks, so memory use does not
+        depend on the database size. A failed backup leaves no partial file.
+        """
+        try:
+            with open(filepath, "wb") as raw:
+                if encrypt:
+                    with self._get_cipher().writer(raw) as enc:
+                        if compress:
+                            with open_compressed_writer(enc, codec) as out:
+                                yield out
+                        else:
+                            yield enc
+                else:
+                    with open_compressed_writer(raw, codec) as out:
+                        yield out
+        except BaseException:
+            if filepath.exists():
+                filepath.unlink()
+            raise
+
+    @contextmanager
+    def _open_backup_reader(
+        self, filepath: Path, compressed: bool, encrypted: bool, codec: str = "gzip"
+    ):
+        """Readable stream of the original backup data (decrypt -> decompress)."""
+        with open(filepath, "rb") as raw:
+            src = self._get_cipher().reader(raw) if encrypted else raw
+            if compressed:
+                with open_compressed_reader(src, codec) as out:
+                    yield out
+            else:
+                yield src
+
+    @staticmethod
+    def _run_piped(cmd: list, env: dict, stdout_to=None, stdin_from=None):
+        """Run ``cmd`` streaming stdout into / stdin from a Python file object."""
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE if stdout_to is not None else None,
+            stdin=subprocess.PIPE if stdin_from is not None else None,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+        # Drain stderr concurrently: a tool that fills the stderr pipe while
+        # we wait on stdout/stdin would otherwise block forever.
+        stderr_chunks = []
+        drain = threading.Thread(
+            target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True
+        )
+        drain.start()
+        try:
+            if stdout_to is not None:
+                shutil.copyfileobj(proc.stdout, stdout_to, 1024 * 1024)
+                proc.stdout.close()
+            if stdin_from is not None:
+                try:
+                    shutil.copyfileobj(stdin_from, proc.stdin, 1024 * 1024)
+                finally:
+                    proc.stdin.close()
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            drain.join()
+        stderr = b"".join(stderr_chunks)
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+
     def _save_metadata(self, filename: str, metadata: dict):
         """Save backup metadata."""
         meta_path = self.backup_dir / f"{filename}.meta.json"
@@ -461,45 +710,28 @@ class BackupService:
 # =============================================================================
 
 
-def export_data_json(tables: List[str] = None) -> bytes:
-    """Export database tables to JSON format."""
-    from src.database import db
-    from sqlalchemy import inspect
-
-    inspector = inspect(db.engine)
-    table_names = tables or inspector.get_table_names()
-
-    data = {}
-
-    for table_name in table_names:
-        if table_name.startswith("alembic_"):
-            continue
-
-        result = db.session.execute(f"SELECT * FROM {table_name}")
-        columns = result.keys()
-        rows = [dict(zip(columns, row)) for row in result.fetchall()]
-        data[table_name] = rows
-
-    return json.dumps(data, indent=2, default=str).encode("utf-8")
-
-
-def import_data_json(data: bytes, clear_existing: bool = False):
-    """Import database tables from JSON format."""
-    from src.database import db
+def export_data_ndjson(output_dir: str, tables: List[str] = None, **kwargs) -> dict:
+    """
+    Export database tables to one NDJSON file per table.
 
-    tables_data = json.loads(data.decode("utf-8"))
+    Streams rows from a server-side cursor; see logical_export.export_tables.
+    """
+    return export_tables(output_dir, tables=tables, **kwargs)
 
-    for table_name, rows in tables_data.items():
-        if clear_existing:
-            db.session.execute(f"DELETE FROM {table_name}")
 
-        for row in rows:
-            columns = ", ".join(row.keys())
-            placeholders = ", ".join([":" + k for k in row.keys()])
-            sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-            db.session.execute(sql, row)
+def import_data_ndjson(input_dir: str, clear_existing: bool = False, **kwargs):
+    """
+    Import an NDJSON export in foreign-key order with batched inserts.
 
-    db.session.commit()
+    See logical_export.import_tables.
+    """
+    return import_tables(input_dir, clear_existing=clear_existing, **kwargs)
 
 
-__all__ = ["BackupService", "BackupInfo", "export_data_json", "import_data_json"]
+__all__ = [
+    "BackupService",
+    "BackupInfo",
+    "TransferProgress",
+    "export_data_ndjson",
+    "import_data_ndjson",
+]
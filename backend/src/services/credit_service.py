@@ -6,8 +6,10 @@ P2.91: Customer Credit Management
 Service for managing customer credit limits and transactions.
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Union
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import joinedload
 from src.database import db
 from enum import Enum
 import logging
@@ -121,7 +123,12 @@ class CustomerCredit(db.Model):
 
         return True, None
 
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, oldest_overdue_days: Optional[int] = None) -> Dict[str, Any]:
+        """``oldest_overdue_days`` may be precomputed by an aggregate query."""
+        if oldest_overdue_days is None:
+            is_overdue, oldest_overdue_days = self.is_overdue, self.oldest_overdue_days
+        else:
+            is_overdue = True
         return {
             "id": self.id,
             "customer_id": self.customer_id,
@@ -136,8 +143,8 @@ class CustomerCredit(db.Model):
             "is_blocked": self.is_blocked,
             "blocked_reason": self.blocked_reason,
             "risk_level": self.risk_level,
-            "is_overdue": self.is_overdue,
-            "oldest_overdue_days": self.oldest_overdue_days,
+            "is_overdue": is_overdue,
+            "oldest_overdue_days": oldest_overdue_days,
             "last_payment_date": (
                 self.last_payment_date.isoformat() if self.last_payment_date else None
             ),
@@ -346,28 +353,38 @@ class CreditService:
         return transaction
 
     @staticmethod
-    def _settle_transactions(credit_account_id: int, amount: float):
-        """Mark oldest transactions as settled up to the amount."""
+    def _settle_transactions(credit_account_id: int, amount: float) -> int:
+        """
+        Mark oldest transactions as settled up to the amount.
+
+        One UPDATE: a running SUM() OVER (ORDER BY due_date, id) of the
+        unsettled amounts selects the whole transactions the payment covers.
+        """
         unsettled = (
-            CreditTransaction.query.filter(
+            select(
+                CreditTransaction.id,
+                func.sum(CreditTransaction.amount)
+                .over(order_by=(CreditTransaction.due_date, CreditTransaction.id))
+                .label("running_total"),
+            )
+            .where(
                 CreditTransaction.credit_account_id == credit_account_id,
                 CreditTransaction.is_settled == False,
                 CreditTransaction.amount > 0,
             )
-            .order_by(CreditTransaction.due_date.asc())
-            .all()
+            .subquery()
         )
-
-        remaining = amount
-        for txn in unsettled:
-            if remaining <= 0:
-                break
-            if txn.amount <= remaining:
-                txn.is_settled = True
-                txn.settled_date = datetime.utcnow()
-                remaining -= txn.amount
-            else:
-                break
+        result = db.session.execute(
+            update(CreditTransaction)
+            .where(
+                CreditTransaction.id.in_(
+                    select(unsettled.c.id).where(unsettled.c.running_total <= amount)
+                )
+            )
+            .values(is_settled=True, settled_date=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
 
     @staticmethod
     def block_credit(
@@ -435,37 +452,66 @@ class CreditService:
     @staticmethod
     def get_overdue_customers(days_overdue: int = 0) -> List[Dict[str, Any]]:
         """Get list of customers with overdue credit."""
-        cutoff_date = datetime.utcnow() - timedelta(days=days_overdue)
-
-        overdue = (
-            db.session.query(CustomerCredit)
-            .join(
-                CreditTransaction,
-                CreditTransaction.credit_account_id == CustomerCredit.id,
+        now = datetime.utcnow()
+        cutoff_date = now - timedelta(days=days_overdue)
+        due = CreditTransaction.due_date
+
+        # one grouped query for the overdue amount and oldest due date
+        rows = db.session.execute(
+            select(
+                CreditTransaction.credit_account_id,
+                func.sum(case((due < cutoff_date, CreditTransaction.amount), else_=0)),
+                func.min(due),
             )
-            .filter(
-                CreditTransaction.due_date < cutoff_date,
+            .where(
+                due < now,
                 CreditTransaction.is_settled == False,
                 CreditTransaction.amount > 0,
             )
-            .distinct()
+            .group_by(CreditTransaction.credit_account_id)
+            .having(func.sum(case((due < cutoff_date, 1), else_=0)) > 0)
+        ).all()
+        if not rows:
+            return []
+
+        accounts = {
+            c.id: c
+            for c in CustomerCredit.query.options(joinedload(CustomerCredit.customer))
+            .filter(CustomerCredit.id.in_([row[0] for row in rows]))
             .all()
-        )
+        }
+        result = []
+        for account_id, overdue_amount, oldest_due in rows:
+            if isinstance(oldest_due, str):
+                oldest_due = datetime.fromisoformat(oldest_due)
+            result.append(
+                {
+                    **accounts[account_id].to_dict(
+                        oldest_overdue_days=(now - oldest_due).days
+                    ),
+                    "overdue_amount": overdue_amount,
+                }
+            )
+        return result
 
-        return [
-            {
-                **c.to_dict(),
-                "overdue_amount": sum(
-                    t.amount
-                    for t in c.transactions
-                    if not t.is_settled
-                    and t.due_date
-                    and t.due_date < cutoff_date
-                    and t.amount > 0
-                ),
-            }
-            for c in overdue
-        ]
+    @staticmethod
+    def get_aging_report(
+        as_of: Union[date, datetime, None] = None,
+        min_days_overdue: int = 0,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Receivables aging (current, 0-30, 31-60, 61-90, 90+) per customer.
+
+        Computed by one grouped query and cached per day until the credit
+        tables change (see services/receivables_aging.py).
+        """
+        from src.services.receivables_aging import aging_report, cached_aging_report
+
+        if not use_cache:
+            return aging_report(db.session, as_of, min_days_overdue)
+        data, meta = cached_aging_report(db.session, as_of, min_days_overdue)
+        return {**data, "meta": meta}
 
 
 __all__ = [
@@ -0,0 +1,615 @@
+"""
+تنفيذ المهام المجدولة مرة واحدة عبر العمليات
+Single-leader execution for scheduled jobs
+
+Every gunicorn worker starts its own ``TaskScheduler`` / ``AutomationService``,
+so every scheduled fire happens once per worker. ``JobCoordinator.run`` turns
+those N fires into one execution:
+
+1. A lease on ``(job_id, shard)`` is taken atomically (one UPDATE, or an
+   INSERT the first time) and kept alive by a heartbeat thread while the job
+   runs. A held lease means the job is already running: overlapping fires are
+   skipped. If the heartbeat finds the lease gone (expired and taken by
+   another worker), the job's next ORM commit raises ``LeaseLostError``;
+   jobs that write outside the session call ``check_lease()`` first.
+2. The run is recorded in ``job_runs`` under a run key (the fire time floored
+   to the job's window, e.g. the hour of an hourly job). The key is unique per
+   job and shard, so a worker that fires after another one finished sees the
+   run and skips it. Runs left ``running`` by a crashed worker are taken over.
+
+``run_sharded`` splits a large job into shards that are leased independently,
+so workers that fire together process different shards in parallel.
+
+Backends (``JOB_LEASE_BACKEND``): ``db`` (lease and history tables, works
+across hosts), ``file`` (``fcntl`` locks under ``JOB_LEASE_DIR``, single host)
+and ``none`` (always run; tests and single-process setups).
+"""
+
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import has_app_context
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database import db
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE_BACKEND = os.environ.get("JOB_LEASE_BACKEND", "db")
+JOB_LEASE_TTL = float(os.environ.get("JOB_LEASE_TTL", 60))
+JOB_LEASE_DIR = os.environ.get("JOB_LEASE_DIR", "instance/job_locks")
+JOB_HISTORY_LIMIT = 50
+
+# lost-lease event of the job running in this thread (set by its heartbeat)
+_running = threading.local()
+
+
+class LeaseLostError(RuntimeError):
+    """The job's lease expired and may now be held by another worker."""
+
+
+class JobLease(db.Model):
+    """عقد تنفيذ مهمة (قفل بمهلة يتجدد بنبضات)"""
+
+    __tablename__ = "job_leases"
+
+    job_id = db.Column(db.String(100), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, default=0)
+    owner = db.Column(db.String(150), nullable=False)
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class JobRun(db.Model):
+    """سجل تشغيل مهمة"""
+
+    __tablename__ = "job_runs"
+    __table_args__ = (
+        db.UniqueConstraint("job_id", "shard", "run_key", name="uq_job_run_key"),
+        db.Index("idx_job_runs_job_started", "job_id", "started_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), nullable=False)
+    shard = db.Column(db.Integer, nullable=False, default=0)
+    shard_count = db.Column(db.Integer, nullable=False, default=1)
+    run_key = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # running/success/failed
+    owner = db.Column(db.String(150), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=1)
+    started_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    error = db.Column(db.Text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "shard": self.shard,
+            "shard_count": self.shard_count,
+            "run_key": self.run_key,
+            "status": self.status,
+            "owner": self.owner,
+            "attempts": self.attempts,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+        }
+
+
+@dataclass
+class JobRunResult:
+    """نتيجة محاولة تشغيل: success / failed / skipped"""
+
+    job_id: str
+    shard: int
+    run_key: str
+    status: str
+    reason: str = ""
+    error: Optional[str] = None
+
+    @property
+    def executed(self) -> bool:
+        return self.status in ("success", "failed")
+
+
+def current_owner() -> str:
+    """``host:pid:thread`` of the caller (computed per call: safe after fork)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _timestamp(moment: datetime) -> float:
+    """POSIX time of ``moment``; naive datetimes are UTC (as ``utcnow()``)."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def run_key_for(now: datetime, window: float, origin: Optional[datetime] = None) -> str:
+    """
+    The fire time floored to ``window`` seconds, counted from ``origin``
+    (default: the epoch). Interval jobs pass the start of their schedule,
+    so every fire of one scheduled slot gets the same key.
+    """
+    window = max(int(window), 1)
+    start = int(_timestamp(origin)) if origin is not None else 0
+    floored = start + (int(_timestamp(now)) - start) // window * window
+    return datetime.utcfromtimestamp(floored).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def check_lease() -> None:
+    """Raise LeaseLostError if the job running in this thread lost its lease."""
+    lost = getattr(_running, "lost", None)
+    if lost is not None and lost.is_set():
+        raise LeaseLostError("job lease lost; another worker may run this job")
+
+
+@event.listens_for(Session, "before_commit")
+def _check_lease_before_commit(session):
+    check_lease()
+
+
+# ==================== Backends ====================
+
+
+class NullLeaseBackend:
+    """Runs everything: no coordination."""
+
+    name = "none"
+
+    def acquire(self, job_id, shard, owner, ttl):
+        return True
+
+    def heartbeat(self, job_id, shard, owner, ttl):
+        return True
+
+    def release(self, job_id, shard, owner):
+        pass
+
+    def begin_run(self, job_id, shard, shard_count, run_key, owner):
+        return True
+
+    def finish_run(self, job_id, shard, run_key, status, error, duration_ms):
+        pass
+
+    def history(self, job_id, limit):
+        return []
+
+
+class SqlLeaseBackend:
+    """
+    Lease and run-history tables. Every statement runs in its own short
+    transaction on the engine, independent of the job's ORM session.
+    """
+
+    name = "db"
+
+    def __init__(self, engine: Callable[[], Any] = None):
+        self._engine = engine or (lambda: db.engine)
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def engine(self):
+        engine = self._engine()
+        key = id(engine)
+        if key not in self._ready:
+            with self._lock:
+                if key not in self._ready:
+                    JobLease.__table__.create(engine, checkfirst=True)
+                    JobRun.__table__.create(engine, checkfirst=True)
+                    self._ready.add(key)
+        return engine
+
+    def acquire(self, job_id, shard, owner, ttl):
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=ttl)
+        leases = JobLease.__table__
+        with self.engine().begin() as conn:
+            taken = conn.execute(
+                update(leases)
+                .where(
+                    leases.c.job_id == job_id,
+                    leases.c.shard == shard,
+                    (leases.c.expires_at < now) | (leases.c.owner == owner),
+                )
+                .values(owner=owner, acquired_at=now, expires_at=expires)
+            ).rowcount
+        if taken:
+            return True
+        try:
+            with self.engine().begin() as conn:
+                conn.execute(
+                    leases.insert().values(
+                        job_id=job_id, shard=shard, owner=owner,
+                        acquired_at=now, expires_at=expires,
+                    )
+                )
+            return True
+        except IntegrityError:
+            return False  # held by another worker
+
+    def heartbeat(self, job_id, shard, owner, ttl):
+        now = datetime.utcnow()
+        leases = JobLease.__table__
+        with self.engine().begin() as conn:
+            alive = conn.execute(
+                update(leases)
+                .where(
+                    leases.c.job_id == job_id,
+                    leases.c.shard == shard,
+                    leases.c.owner == owner,
+                )
+                .values(expires_at=now + timedelta(seconds=ttl))
+            ).rowcount
+            conn.execute(
+                update(JobRun.__table__)
+                .where(
+                    JobRun.job_id == job_id,
+                    JobRun.shard == shard,
+                    JobRun.owner == owner,
+                    JobRun.status == "running",
+                )
+                .values(heartbeat_at=now)
+            )
+        return bool(alive)
+
+    def release(self, job_id, shard, owner):
+        leases = JobLease.__table__
+        with self.engine().begin() as conn:
+            conn.execute(
+                update(leases)
+                .where(
+                    leases.c.job_id == job_id,
+                    leases.c.shard == shard,
+                    leases.c.owner == owner,
+                )
+                .values(expires_at=datetime.utcnow())
+            )
+
+    def begin_run(self, job_id, shard, shard_count, run_key, owner):
+        """
+        Record the run; False when this run key already ran. Called with the
+        lease held, so a ``running`` row here was left by a crashed worker.
+        """
+        now = datetime.utcnow()
+        runs = JobRun.__table__
+        try:
+            with self.engine().begin() as conn:
+                conn.execute(
+                    runs.insert().values(
+                        job_id=job_id, shard=shard, shard_count=shard_count,
+                        run_key=run_key, status="running", owner=owner,
+                        attempts=1, started_at=now, heartbeat_at=now,
+                    )
+                )
+            return True
+        except IntegrityError:
+            pass
+        with self.engine().begin() as conn:
+            retaken = conn.execute(
+                update(runs)
+                .where(
+                    runs.c.job_id == job_id,
+                    runs.c.shard == shard,
+                    runs.c.run_key == run_key,
+                    runs.c.status == "running",
+                )
+                .values(
+                    owner=owner, started_at=now, heartbeat_at=now,
+                    attempts=runs.c.attempts + 1,
+                )
+            ).rowcount
+        return bool(retaken)
+
+    def finish_run(self, job_id, shard, run_key, status, error, duration_ms):
+        runs = JobRun.__table__
+        with self.engine().begin() as conn:
+            conn.execute(
+                update(runs)
+                .where(
+                    runs.c.job_id == job_id,
+                    runs.c.shard == shard,
+                    runs.c.run_key == run_key,
+                )
+                .values(
+                    status=status, error=error, duration_ms=duration_ms,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+
+    def history(self, job_id, limit):
+        runs = JobRun.__table__
+        with self.engine().connect() as conn:
+            rows = conn.execute(
+                select(runs)
+                .where(runs.c.job_id == job_id)
+                .order_by(runs.c.started_at.desc(), runs.c.shard)
+                .limit(limit)
+            ).mappings()
+            return [JobRun(**dict(row)).to_dict() for row in rows]
+
+
+class FileLeaseBackend:
+    """
+    Single-host backend: an exclusive ``flock`` per job shard. The kernel
+    drops the lock when the process dies, so no heartbeat is needed; the
+    last run keys and a short history live in a JSON file next to it.
+    """
+
+    name = "file"
+
+    def __init__(self, directory: str = JOB_LEASE_DIR):
+        if fcntl is None:
+            raise RuntimeError("file job leases need fcntl (POSIX)")
+        self.directory = directory
+        self._handles: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _safe(job_id: str) -> str:
+        return "".join(c if c.isalnum() or c in "-_" else "_" for c in job_id)
+
+    def _path(self, job_id, shard, suffix):
+        return os.path.join(self.directory, f"{self._safe(job_id)}.{shard}.{suffix}")
+
+    def _state(self, job_id, shard) -> Dict[str, Any]:
+        try:
+            with open(self._path(job_id, shard, "json"), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {"runs": []}
+
+    def _save(self, job_id, shard, state):
+        path = self._path(job_id, shard, "json")
+        state["runs"] = state["runs"][-JOB_HISTORY_LIMIT:]
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(path + ".tmp", path)
+
+    def acquire(self, job_id, shard, owner, ttl):
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(self._path(job_id, shard, "lock"), "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        with self._lock:
+            self._handles[(job_id, shard)] = handle
+        return True
+
+    def heartbeat(self, job_id, shard, owner, ttl):
+        return (job_id, shard) in self._handles
+
+    def release(self, job_id, shard, owner):
+        with self._lock:
+            handle = self._handles.pop((job_id, shard), None)
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def begin_run(self, job_id, shard, shard_count, run_key, owner):
+        state = self._state(job_id, shard)
+        previous = next((r for r in state["runs"] if r["run_key"] == run_key), None)
+        if previous is not None and previous["status"] != "running":
+            return False
+        now = datetime.utcnow().isoformat()
+        if previous is not None:
+            previous.update(owner=owner, started_at=now,
+                            attempts=previous["attempts"] + 1)
+        else:
+            state["runs"].append({
+                "job_id": job_id, "shard": shard, "shard_count": shard_count,
+                "run_key": run_key, "status": "running", "owner": owner,
+                "attempts": 1, "started_at": now, "finished_at": None,
+                "duration_ms": None, "error": None,
+            })
+        self._save(job_id, shard, state)
+        return True
+
+    def finish_run(self, job_id, shard, run_key, status, error, duration_ms):
+        state = self._state(job_id, shard)
+        for run in state["runs"]:
+            if run["run_key"] == run_key:
+                run.update(status=status, error=error, duration_ms=duration_ms,
+                           finished_at=datetime.utcnow().isoformat())
+        self._save(job_id, shard, state)
+
+    def history(self, job_id, limit):
+        runs = []
+        pattern = re.compile(rf"^{re.escape(self._safe(job_id))}\.(\d+)\.json$")
+        names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        for name in names:
+            match = pattern.match(name)
+            if match:
+                runs.extend(self._state(job_id, int(match.group(1)))["runs"])
+        runs.sort(key=lambda r: (r["started_at"], -r["shard"]), reverse=True)
+        return runs[:limit]
+
+
+def _make_backend(name: str = JOB_LEASE_BACKEND):
+    if name == "none":
+        return NullLeaseBackend()
+    if name == "file":
+        return FileLeaseBackend()
+    return SqlLeaseBackend()
+
+
+# ==================== Coordinator ====================
+
+
+class JobCoordinator:
+    """
+    منسق تنفيذ المهام: قائد واحد لكل تشغيل
+    Runs each scheduled fire of a job once across all workers.
+    """
+
+    def __init__(self, backend=None, ttl: float = JOB_LEASE_TTL):
+        self.backend = backend or _make_backend()
+        self.ttl = ttl
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def _context(self):
+        if self.app is not None and not has_app_context():
+            return self.app.app_context()
+        return nullcontext()
+
+    def _heartbeat(self, job_id, shard, owner, stop, lost, ttl):
+        while not stop.wait(ttl / 3):
+            try:
+                with self._context():
+                    if not self.backend.heartbeat(job_id, shard, owner, ttl):
+                        logger.warning(f"Job lease lost: {job_id}[{shard}]")
+                        lost.set()
+                        return
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Job heartbeat failed for {job_id}[{shard}]: {e}")
+
+    @staticmethod
+    def _call(func, sharded, shard, shard_count, result: JobRunResult):
+        try:
+            if sharded:
+                func(shard, shard_count)
+            else:
+                func()
+            check_lease()
+            result.status = "success"
+        except Exception as e:  # noqa: BLE001
+            result.status, result.error = "failed", str(e)
+            logger.error(f"Job {result.job_id}[{shard}] failed: {e}")
+
+    def run(
+        self,
+        job_id: str,
+        func: Callable[..., Any],
+        window: float = 60,
+        run_key: Optional[str] = None,
+        shard: int = 0,
+        shard_count: int = 1,
+        ttl: Optional[float] = None,
+        now: Optional[datetime] = None,
+        sharded: bool = False,
+    ) -> JobRunResult:
+        """
+        Run ``func`` unless another worker holds the job's lease or already
+        ran this window. Sharded runs call ``func(shard, shard_count)``.
+
+        A run whose lease is lost midway fails with reason "lease lost" and
+        is not recorded as finished: the run now belongs to whoever took the
+        lease over.
+
+        If the lease backend itself fails (no app context, database down)
+        the job runs uncoordinated, as it did before leases existed.
+        """
+        ttl = ttl or self.ttl
+        owner = current_owner()
+        run_key = run_key or run_key_for(now or datetime.utcnow(), window)
+        result = JobRunResult(job_id, shard, run_key, "skipped")
+
+        with self._context():
+            try:
+                acquired = self.backend.acquire(job_id, shard, owner, ttl)
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"Job lease backend unavailable, running {job_id}: {e}")
+                result.reason = "uncoordinated"
+                self._call(func, sharded, shard, shard_count, result)
+                return result
+            if not acquired:
+                result.reason = "running elsewhere"
+                return result
+            try:
+                if not self.backend.begin_run(job_id, shard, shard_count, run_key, owner):
+                    result.reason = "already ran"
+                    return result
+
+                stop, lost = threading.Event(), threading.Event()
+                beat = threading.Thread(
+                    target=self._heartbeat,
+                    args=(job_id, shard, owner, stop, lost, ttl),
+                    name=f"job-heartbeat-{job_id}",
+                    daemon=True,
+                )
+                beat.start()
+                started = time.perf_counter()
+                outer, _running.lost = getattr(_running, "lost", None), lost
+                try:
+                    self._call(func, sharded, shard, shard_count, result)
+                finally:
+                    _running.lost = outer
+                    stop.set()
+                    beat.join()
+                if lost.is_set() and result.status != "success":
+                    result.status, result.reason = "failed", "lease lost"
+                    return result
+                self.backend.finish_run(
+                    job_id, shard, run_key, result.status, result.error,
+                    int((time.perf_counter() - started) * 1000),
+                )
+                return result
+            finally:
+                self.backend.release(job_id, shard, owner)
+
+    def run_sharded(
+        self,
+        job_id: str,
+        func: Callable[[int, int], Any],
+        shards: int,
+        window: float = 60,
+        run_key: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ) -> List[JobRunResult]:
+        """
+        Try every shard, starting at a per-worker offset so workers firing
+        together claim different shards first.
+        """
+        run_key = run_key or run_key_for(datetime.utcnow(), window)
+        offset = os.getpid() % shards
+        return [
+            self.run(job_id, func, run_key=run_key, shard=(offset + i) % shards,
+                     shard_count=shards, ttl=ttl, sharded=True)
+            for i in range(shards)
+        ]
+
+    def history(self, job_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Latest runs of a job (newest first)."""
+        with self._context():
+            return self.backend.history(job_id, limit)
+
+
+job_coordinator = JobCoordinator()
+
+
+__all__ = [
+    "FileLeaseBackend",
+    "JobCoordinator",
+    "JobLease",
+    "JobRun",
+    "JobRunResult",
+    "LeaseLostError",
+    "NullLeaseBackend",
+    "SqlLeaseBackend",
+    "check_lease",
+    "job_coordinator",
+    "run_key_for",
+]
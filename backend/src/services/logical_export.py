@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+P2.65: Logical Export / Import (NDJSON)
+
+Table-by-table logical backups that run in bounded memory.
+
+Export:
+- One ``<table>.ndjson[.gz]`` file per table, one JSON object per row
+- Rows are streamed from a server-side cursor in ``batch_size`` partitions
+- ``manifest.json`` records the table order, columns and row counts
+
+Import:
+- Tables are loaded parents first (foreign-key order of the target schema)
+- Rows are inserted in executemany batches inside one transaction with
+  foreign-key checks deferred to commit, so cycles and self references load
+- Memory use is one batch per table, whatever the table size
+
+Both directions report progress through a ``TransferProgress`` snapshot.
+"""
+
+import base64
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from sqlalchemy import MetaData, func, select, text
+from sqlalchemy import types as sqltypes
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 5000))
+MANIFEST_NAME = "manifest.json"
+SKIPPED_TABLE_PREFIXES = ("alembic_", "sqlite_")
+
+
+@dataclass
+class TransferProgress:
+    """Progress of an export or import run."""
+
+    operation: str  # 'export', 'import'
+    tables_total: int = 0
+    tables_done: int = 0
+    rows_total: int = 0
+    rows_done: int = 0
+    table: Optional[str] = None
+    table_rows_done: int = 0
+    table_rows_total: int = 0
+    finished: bool = False
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "operation": self.operation,
+            "table": self.table,
+            "tables_done": self.tables_done,
+            "tables_total": self.tables_total,
+            "table_rows_done": self.table_rows_done,
+            "table_rows_total": self.table_rows_total,
+            "rows_done": self.rows_done,
+            "rows_total": self.rows_total,
+            "percent": (
+                round(100.0 * self.rows_done / self.rows_total, 1)
+                if self.rows_total
+                else (100.0 if self.finished else 0.0)
+            ),
+            "rows_per_second": round(self.rows_done / elapsed) if elapsed else 0,
+            "elapsed_seconds": round(elapsed, 2),
+            "finished": self.finished,
+        }
+
+
+ProgressCallback = Callable[[TransferProgress], None]
+
+
+# =============================================================================
+# Value encoding
+# =============================================================================
+
+
+def _encode_value(value):
+    """``json.dumps`` default: types the JSON encoder does not know."""
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    return str(value)
+
+
+def _column_decoder(column_type) -> Optional[Callable[[Any], Any]]:
+    """Reverse of ``_encode_value`` for one column type (None = as is)."""
+    if isinstance(column_type, sqltypes.DateTime):
+        return datetime.fromisoformat
+    if isinstance(column_type, sqltypes.Date):
+        return date.fromisoformat
+    if isinstance(column_type, sqltypes.Time):
+        return dt_time.fromisoformat
+    if isinstance(column_type, sqltypes.Numeric) and not isinstance(
+        column_type, sqltypes.Float
+    ):
+        return Decimal
+    if isinstance(column_type, sqltypes._Binary):
+        return base64.b64decode
+    return None
+
+
+def _row_decoder(table) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    decoders = {}
+    for column in table.columns:
+        try:
+            decoder = _column_decoder(column.type)
+        except NotImplementedError:  # pragma: no cover - exotic types
+            decoder = None
+        if decoder:
+            decoders[column.name] = decoder
+    if not decoders:
+        return lambda row: row
+
+    def decode(row):
+        for name, decoder in decoders.items():
+            value = row.get(name)
+            if isinstance(value, str):
+                row[name] = decoder(value)
+        return row
+
+    return decode
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+
+def _get_engine(engine=None):
+    if engine is not None:
+        return engine
+    from src.database import db
+
+    return db.engine
+
+
+def _sorted_tables(engine, names: Optional[List[str]] = None):
+    """Reflected tables of ``engine`` in foreign-key order (parents first)."""
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    return [
+        table
+        for table in metadata.sorted_tables
+        if not table.name.startswith(SKIPPED_TABLE_PREFIXES)
+        and (names is None or table.name in names)
+    ]
+
+
+def _open_text(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _defer_constraints(conn):
+    """Check foreign keys at commit instead of per statement."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        # Reset by SQLite at the end of the transaction
+        conn.execute(text("PRAGMA defer_foreign_keys = ON"))
+    elif dialect == "postgresql":
+        # Affects constraints declared DEFERRABLE
+        conn.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+
+
+def _reset_sequences(conn, tables):
+    """PostgreSQL: move serial sequences past the imported ids."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        for column in table.primary_key.columns:
+            if not isinstance(column.type, sqltypes.Integer):
+                continue
+            conn.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence(:table, :column), "
+                    f'COALESCE((SELECT MAX("{column.name}") FROM "{table.name}"), 0) + 1, '
+                    "false) WHERE pg_get_serial_sequence(:table, :column) IS NOT NULL"
+                ),
+                {"table": table.name, "column": column.name},
+            )
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+
+def iter_table_rows(
+    conn, table, batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the rows of ``table`` as lists of dicts, ``batch_size`` at a time."""
+    result = conn.execution_options(
+        stream_results=True, yield_per=batch_size
+    ).execute(select(table))
+    columns = list(result.keys())
+    for partition in result.partitions():
+        yield [dict(zip(columns, row)) for row in partition]
+
+
+def export_tables(
+    output_dir: Union[str, Path],
+    tables: Optional[List[str]] = None,
+    compress: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    engine=None,
+) -> Dict[str, Any]:
+    """
+    Export tables to one NDJSON file each.
+
+    Args:
+        output_dir: Directory for the table files and manifest.json
+        tables: Table names (default: all application tables)
+        compress: Write ``.ndjson.gz`` files
+        batch_size: Rows fetched per cursor round trip
+        progress: Called after every batch with a TransferProgress
+        engine: SQLAlchemy engine (default: the application engine)
+
+    Returns:
+        The manifest that was written
+    """
+    engine = _get_engine(engine)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sorted_tables = _sorted_tables(engine, tables)
+    state = TransferProgress("export", tables_total=len(sorted_tables))
+    manifest = {
+        "version": 1,
+        "format": "ndjson",
+        "dialect": engine.dialect.name,
+        "created_at": datetime.now().isoformat(),
+        "tables": [],
+    }
+
+    with engine.connect() as conn:
+        counts = {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in sorted_tables
+        }
+        state.rows_total = sum(counts.values())
+
+        for table in sorted_tables:
+            filename = f"{table.name}.ndjson" + (".gz" if compress else "")
+            state.table = table.name
+            state.table_rows_total = counts[table.name]
+            state.table_rows_done = 0
+            with _open_text(output_dir / filename, "w") as f:
+                for batch in iter_table_rows(conn, table, batch_size):
+                    f.writelines(
+                        json.dumps(
+                            row,
+                            default=_encode_value,
+                            ensure_ascii=False,
+                            separators=(",", ":"),
+                        )
+                        + "\n"
+                        for row in batch
+                    )
+                    state.table_rows_done += len(batch)
+                    state.rows_done += len(batch)
+                    if progress:
+                        progress(state)
+
+            manifest["tables"].append(
+                {
+                    "name": table.name,
+                    "file": filename,
+                    "rows": state.table_rows_done,
+                    "columns": [column.name for column in table.columns],
+                }
+            )
+            state.tables_done += 1
+
+    with open(output_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    state.finished = True
+    if progress:
+        progress(state)
+    logger.info(
+        f"P2.65: Exported {state.rows_done} rows from "
+        f"{state.tables_done} tables to {output_dir}"
+    )
+    return manifest
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+
+def _read_batches(path: Path, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    with _open_text(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def import_tables(
+    input_dir: Union[str, Path],
+    tables: Optional[List[str]] = None,
+    clear_existing: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    engine=None,
+) -> TransferProgress:
+    """
+    Load an ``export_tables`` directory into the database.
+
+    Everything runs in one transaction: a failure leaves the database
+    unchanged.
+
+    Args:
+        input_dir: Directory written by export_tables
+        tables: Subset of the exported tables to load
+        clear_existing: Delete current rows first (children first)
+        batch_size: Rows per executemany call
+        progress: Called after every batch with a TransferProgress
+        engine: SQLAlchemy engine (default: the application engine)
+
+    Returns:
+        The final TransferProgress
+    """
+    engine = _get_engine(engine)
+    input_dir = Path(input_dir)
+    with open(input_dir / MANIFEST_NAME, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    entries = {
+        entry["name"]: entry
+        for entry in manifest["tables"]
+        if tables is None or entry["name"] in tables
+    }
+    sorted_tables = [
+        table for table in _sorted_tables(engine, list(entries)) if table.name in entries
+    ]
+    missing = set(entries) - {table.name for table in sorted_tables}
+    if missing:
+        raise ValueError(f"Tables not found in target database: {sorted(missing)}")
+
+    state = TransferProgress(
+        "import",
+        tables_total=len(sorted_tables),
+        rows_total=sum(entry["rows"] for entry in entries.values()),
+    )
+
+    with engine.begin() as conn:
+        _defer_constraints(conn)
+        if clear_existing:
+            for table in reversed(sorted_tables):
+                conn.execute(table.delete())
+
+        for table in sorted_tables:
+            entry = entries[table.name]
+            decode = _row_decoder(table)
+            insert = table.insert()
+            state.table = table.name
+            state.table_rows_total = entry["rows"]
+            state.table_rows_done = 0
+            for batch in _read_batches(input_dir / entry["file"], batch_size):
+                conn.execute(insert, [decode(row) for row in batch])
+                state.table_rows_done += len(batch)
+                state.rows_done += len(batch)
+                if progress:
+                    progress(state)
+            state.tables_done += 1
+
+        _reset_sequences(conn, sorted_tables)
+
+    state.finished = True
+    if progress:
+        progress(state)
+    logger.info(
+        f"P2.65: Imported {state.rows_done} rows into {state.tables_done} tables"
+    )
+    return state
+
+
+__all__ = [
+    "TransferProgress",
+    "export_tables",
+    "import_tables",
+    "iter_table_rows",
+    "EXPORT_BATCH_SIZE",
+]
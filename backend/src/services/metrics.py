@@ -0,0 +1,668 @@
+"""
+نظام المقاييس: زمن الاستجابة والمئينات لكل مسار
+Metrics subsystem: per-route latency percentiles with bounded memory
+
+Latency is recorded in ``LatencySketch`` (DDSketch): values fall in
+logarithmic bins so any quantile is within ``METRICS_RELATIVE_ACCURACY``
+(1%) of the true value, memory is capped at ``METRICS_MAX_BUCKETS`` bins per
+series whatever the traffic, and sketches from different processes merge by
+adding bin counts.
+
+Series are keyed by (route template, method, status class) so cardinality
+stays bounded: ``/api/products/<int:product_id>`` not ``/api/products/42``.
+
+Multiprocess (gunicorn): with ``PROMETHEUS_MULTIPROC_DIR`` set, every worker
+writes its state to ``metrics_<pid>.json`` there (at most every
+``METRICS_FLUSH_INTERVAL`` seconds, and at exit). The worker answering a
+scrape merges all files: counters and histograms are summed over every
+worker that ever ran; gauges over live workers only. Dead workers' files are
+folded into ``metrics_archive.json`` so the directory stays small. Empty the
+directory when the service (re)starts, as with prometheus_client.
+
+Exposition (``/metrics``, ``/api/metrics?format=prometheus``):
+- ``http_request_duration_seconds`` histogram (fixed ``le`` buckets, for
+  ``histogram_quantile`` in Grafana) and ``http_requests_total``;
+- ``http_request_latency_seconds`` summary: p50/p95/p99 over the last
+  ``METRICS_WINDOW`` to 2x ``METRICS_WINDOW`` seconds, from the merged sketches;
+- ``db_queries_total`` / ``db_query_duration_seconds`` per route;
+- ``db_connections_active`` / ``db_connections_idle`` / pool size gauges;
+- ``cache_hits_total`` / ``cache_misses_total`` / ``cache_entries``.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:  # POSIX only: archive compaction is skipped without it
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_RELATIVE_ACCURACY = float(os.environ.get("METRICS_RELATIVE_ACCURACY", 0.01))
+METRICS_MAX_BUCKETS = int(os.environ.get("METRICS_MAX_BUCKETS", 2048))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", 300))
+METRICS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get(
+    "METRICS_MULTIPROC_DIR"
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, Labels]
+
+
+class LatencySketch:
+    """Relative-error quantile sketch (DDSketch) with a fixed bin budget."""
+
+    MIN_VALUE = 1e-9  # values at or below this count as zero
+
+    __slots__ = ("alpha", "gamma", "_log_gamma", "max_buckets", "bins", "zero",
+                 "count", "sum", "min", "max")
+
+    def __init__(
+        self,
+        relative_accuracy: float = METRICS_RELATIVE_ACCURACY,
+        max_buckets: int = METRICS_MAX_BUCKETS,
+    ):
+        self.alpha = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.bins: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float, count: int = 1):
+        if value <= self.MIN_VALUE:
+            self.zero += count
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + count
+            if len(self.bins) > self.max_buckets:
+                self._collapse()
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        """Fold the lowest bins together: the tail (p95/p99) keeps full accuracy."""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_buckets
+        if excess <= 0:
+            return
+        target = keys[excess]
+        self.bins[target] += sum(self.bins.pop(k) for k in keys[:excess])
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def merge(self, other: "LatencySketch"):
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self._collapse()
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def count_le(self, bound: float) -> int:
+        """Observations <= ``bound`` (within the sketch's relative accuracy)."""
+        return self.zero + sum(n for key, n in self.bins.items() if self._value(key) <= bound)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "alpha": self.alpha,
+            "bins": {str(k): n for k, n in self.bins.items()},
+            "zero": self.zero,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencySketch":
+        sketch = cls(relative_accuracy=data.get("alpha", METRICS_RELATIVE_ACCURACY))
+        sketch.bins = {int(k): n for k, n in data["bins"].items()}
+        sketch.zero = data["zero"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"] if data.get("min") is not None else math.inf
+        sketch.max = data["max"]
+        return sketch
+
+
+def _labels(labels: Optional[Dict[str, Any]]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:  # exists, owned by someone else
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Counters, sketches and gauge collectors of one process (+ merge of all)."""
+
+    def __init__(
+        self,
+        multiproc_dir: Optional[str] = METRICS_MULTIPROC_DIR,
+        flush_interval: float = METRICS_FLUSH_INTERVAL,
+        window: int = METRICS_WINDOW,
+    ):
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self.window = window
+        self.families: Dict[str, Dict[str, Any]] = {}
+        self.collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters: Dict[SeriesKey, float] = {}
+        self._sketches: Dict[SeriesKey, LatencySketch] = {}
+        self._windows: Dict[SeriesKey, Dict[int, LatencySketch]] = {}
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # a worker forked from a master that already recorded starts empty
+        if os.getpid() != self._pid:
+            self._reset()
+
+    # -- declaration -------------------------------------------------------
+
+    def counter(self, name: str, help: str):
+        self.families[name] = {"type": "counter", "help": help}
+
+    def gauge(self, name: str, help: str):
+        self.families[name] = {"type": "gauge", "help": help}
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+        count_name: Optional[str] = None,
+        summary_name: Optional[str] = None,
+    ):
+        """
+        A sketch-backed series exported as a Prometheus histogram with
+        ``buckets``, plus optionally its count as counter ``count_name`` and
+        recent-window quantiles as summary ``summary_name``.
+        """
+        self.families[name] = {
+            "type": "histogram",
+            "help": help,
+            "buckets": buckets,
+            "count_name": count_name,
+            "summary_name": summary_name,
+        }
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """``collector()`` yields ``(family, labels, value)`` read at flush/scrape time."""
+        self.collectors.append(collector)
+        return collector
+
+    # -- recording ---------------------------------------------------------
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Optional[Dict[str, Any]], value: float):
+        key = (name, _labels(labels))
+        index = int(time.time() // self.window)
+        with self._lock:
+            self._check_fork()
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = LatencySketch()
+            sketch.add(value)
+            windows = self._windows.setdefault(key, {})
+            if index not in windows:
+                for old in [i for i in windows if i < index - 1]:
+                    del windows[old]
+                windows[index] = LatencySketch()
+            windows[index].add(value)
+
+    # -- snapshots and multiprocess merge ------------------------------------
+
+    def _collected(self) -> Tuple[Dict[SeriesKey, float], Dict[SeriesKey, float]]:
+        counters, gauges = {}, {}
+        for collector in self.collectors:
+            try:
+                for name, labels, value in collector():
+                    family = self.families.get(name, {"type": "gauge"})
+                    target = counters if family["type"] == "counter" else gauges
+                    key = (name, _labels(labels))
+                    target[key] = target.get(key, 0) + value
+            except Exception as e:  # noqa: BLE001 - never fail a scrape on one source
+                logger.debug(f"Metrics collector failed: {e}")
+        return counters, gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's state in the on-disk (JSON) format."""
+        collected, gauges = self._collected()
+        with self._lock:
+            self._check_fork()
+            counters = dict(self._counters)
+            for key, value in collected.items():
+                counters[key] = counters.get(key, 0) + value
+            return {
+                "pid": self._pid,
+                "counters": [[n, list(map(list, labels)), v] for (n, labels), v in counters.items()],
+                "gauges": [[n, list(map(list, labels)), v] for (n, labels), v in gauges.items()],
+                "sketches": [
+                    [n, list(map(list, labels)), s.to_dict()] for (n, labels), s in self._sketches.items()
+                ],
+                "windows": [
+                    [n, list(map(list, labels)), index, s.to_dict()]
+                    for (n, labels), windows in self._windows.items()
+                    for index, s in windows.items()
+                ],
+            }
+
+    def _path(self, pid) -> str:
+        return os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+
+    def _write(self):
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        data = self.snapshot()
+        _write_json(self._path(data["pid"]), data)
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        if not self.multiproc_dir:
+            return
+        with self._flush_lock:
+            self._write()
+
+    def maybe_flush(self):
+        if not self.multiproc_dir or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        # another thread is already flushing: skip rather than queue behind it
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._write()
+        except OSError as e:
+            logger.warning(f"Metrics flush failed: {e}")
+        finally:
+            self._flush_lock.release()
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def _compact(self, dead: List[Tuple[str, Dict[str, Any]]]):
+        """Fold dead workers' counters, sketches and recent windows into the archive."""
+        if fcntl is None or not dead:
+            return
+        archive_path = os.path.join(self.multiproc_dir, "metrics_archive.json")
+        with open(os.path.join(self.multiproc_dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                merged = _Merged(window_floor=int(time.time() // self.window) - 1)
+                archive = self._read(archive_path)
+                if archive:
+                    merged.add(archive, live=False)
+                for path, data in dead:
+                    if os.path.exists(path):
+                        merged.add(data, live=False)
+                _write_json(archive_path, merged.to_dict())
+                for path, _ in dead:
+                    if os.path.exists(path):
+                        os.remove(path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def collect(self) -> "_Merged":
+        """State of every process: this one live, the others from their files."""
+        merged = _Merged(window_floor=int(time.time() // self.window) - 1)
+        own = self.snapshot()
+        merged.add(own, live=True)
+        if not self.multiproc_dir or not os.path.isdir(self.multiproc_dir):
+            return merged
+
+        dead = []
+        for entry in os.listdir(self.multiproc_dir):
+            if not (entry.startswith("metrics_") and entry.endswith(".json")):
+                continue
+            path = os.path.join(self.multiproc_dir, entry)
+            data = self._read(path)
+            if data is None or data.get("pid") == own["pid"]:
+                continue
+            live = data.get("pid") is not None and _pid_alive(data["pid"])
+            merged.add(data, live=live)
+            if data.get("pid") is not None and not live:
+                dead.append((path, data))
+        try:
+            self._compact(dead)
+        except OSError as e:
+            logger.warning(f"Metrics archive compaction failed: {e}")
+        return merged
+
+    # -- output ------------------------------------------------------------
+
+    def render_prometheus(self) -> str:
+        """Text exposition format 0.0.4."""
+        merged = self.collect()
+        lines: List[str] = []
+
+        def family(name, kind, help):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, spec in sorted(self.families.items()):
+            kind = spec["type"]
+            if kind in ("counter", "gauge"):
+                source = merged.counters if kind == "counter" else merged.gauges
+                series = sorted((labels, v) for (n, labels), v in source.items() if n == name)
+                if series:
+                    family(name, kind, spec["help"])
+                    lines.extend(f"{name}{_fmt_labels(labels)} {_fmt(v)}" for labels, v in series)
+                continue
+
+            sketches = sorted((labels, s) for (n, labels), s in merged.sketches.items() if n == name)
+            if not sketches:
+                continue
+            family(name, "histogram", spec["help"])
+            for labels, sketch in sketches:
+                for bound in spec["buckets"]:
+                    lines.append(
+                        f"{name}_bucket{_fmt_labels(labels + (('le', _fmt(bound)),))} "
+                        f"{sketch.count_le(bound)}"
+                    )
+                lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {sketch.count}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt(sketch.sum)}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {sketch.count}")
+            if spec.get("count_name"):
+                family(spec["count_name"], "counter", f"Total observations of {name}")
+                lines.extend(
+                    f"{spec['count_name']}{_fmt_labels(labels)} {s.count}" for labels, s in sketches
+                )
+            if spec.get("summary_name"):
+                summary = spec["summary_name"]
+                family(summary, "summary", f"Recent-window quantiles of {name}")
+                for labels, _ in sketches:
+                    recent = merged.recent(name, labels)
+                    if recent is None:
+                        continue
+                    for q in QUANTILES:
+                        lines.append(
+                            f"{summary}{_fmt_labels(labels + (('quantile', str(q)),))} "
+                            f"{_fmt(recent.quantile(q))}"
+                        )
+                    lines.append(f"{summary}_sum{_fmt_labels(labels)} {_fmt(recent.sum)}")
+                    lines.append(f"{summary}_count{_fmt_labels(labels)} {recent.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name: str = "http_request_duration_seconds") -> List[Dict[str, Any]]:
+        """Per-series percentiles (seconds), lifetime and recent window."""
+        merged = self.collect()
+        rows = []
+        for (n, labels), sketch in sorted(merged.sketches.items()):
+            if n != name:
+                continue
+            recent = merged.recent(name, labels)
+            rows.append(
+                {
+                    **dict(labels),
+                    "count": sketch.count,
+                    "mean": sketch.sum / sketch.count if sketch.count else None,
+                    **{f"p{int(q * 100)}": sketch.quantile(q) for q in QUANTILES},
+                    "recent": {
+                        "count": recent.count if recent else 0,
+                        **{f"p{int(q * 100)}": recent.quantile(q) if recent else None
+                           for q in QUANTILES},
+                    },
+                }
+            )
+        return rows
+
+
+class _Merged:
+    """Sum of several process snapshots."""
+
+    def __init__(self, window_floor: Optional[int] = None):
+        self.window_floor = window_floor
+        self.counters: Dict[SeriesKey, float] = {}
+        self.gauges: Dict[SeriesKey, float] = {}
+        self.sketches: Dict[SeriesKey, LatencySketch] = {}
+        self.windows: Dict[Tuple[SeriesKey, int], LatencySketch] = {}
+
+    @staticmethod
+    def _key(name, labels) -> SeriesKey:
+        return name, tuple(tuple(pair) for pair in labels)
+
+    def add(self, data: Dict[str, Any], live: bool):
+        for name, labels, value in data.get("counters", []):
+            key = self._key(name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+        if live:
+            for name, labels, value in data.get("gauges", []):
+                key = self._key(name, labels)
+                self.gauges[key] = self.gauges.get(key, 0) + value
+        for name, labels, sketch in data.get("sketches", []):
+            self._merge(self.sketches, self._key(name, labels), sketch)
+        if self.window_floor is not None:
+            for name, labels, index, sketch in data.get("windows", []):
+                if index >= self.window_floor:
+                    self._merge(self.windows, (self._key(name, labels), index), sketch)
+
+    @staticmethod
+    def _merge(target, key, sketch):
+        sketch = LatencySketch.from_dict(sketch)
+        if key in target:
+            target[key].merge(sketch)
+        else:
+            target[key] = sketch
+
+    def recent(self, name: str, labels: Labels) -> Optional[LatencySketch]:
+        """Merged sketch of the current and previous windows."""
+        recent = None
+        for (key, _), sketch in self.windows.items():
+            if key == (name, labels):
+                if recent is None:
+                    recent = LatencySketch(sketch.alpha)
+                recent.merge(sketch)
+        return recent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pid": None,
+            "counters": [[n, list(map(list, labels)), v] for (n, labels), v in self.counters.items()],
+            "sketches": [
+                [n, list(map(list, labels)), s.to_dict()] for (n, labels), s in self.sketches.items()
+            ],
+            "windows": [
+                [n, list(map(list, labels)), index, s.to_dict()]
+                for ((n, labels), index), s in self.windows.items()
+            ],
+        }
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    """Atomic replace through a temp file unique to this writer."""
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+# -- application metrics ------------------------------------------------------
+
+metrics = MetricsRegistry()
+metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status class",
+    LATENCY_BUCKETS,
+    count_name="http_requests_total",
+    summary_name="http_request_latency_seconds",
+)
+metrics.histogram(
+    "db_query_duration_seconds",
+    "SQL statement duration by route template",
+    DB_BUCKETS,
+    count_name="db_queries_total",
+)
+metrics.gauge("db_connections_active", "Pooled connections checked out")
+metrics.gauge("db_connections_idle", "Pooled connections idle in the pool")
+metrics.gauge("db_pool_size", "Configured connection pool size")
+metrics.gauge("db_pool_overflow", "Connections opened beyond the pool size")
+metrics.counter("cache_hits_total", "Cache hits by cache")
+metrics.counter("cache_misses_total", "Cache misses (loads) by cache")
+metrics.gauge("cache_entries", "Entries held by cache")
+
+
+def _cache_collector():
+    from src.services.reference_data import reference_data
+    from src.services.stats_rollups import stats_cache
+
+    stats = stats_cache.stats()
+    yield "cache_hits_total", {"cache": "stats"}, stats["hits"]
+    yield "cache_misses_total", {"cache": "stats"}, stats["misses"]
+    yield "cache_entries", {"cache": "stats"}, stats["entries"]
+    yield "cache_misses_total", {"cache": "reference_data"}, reference_data.loads
+
+
+metrics.register_collector(_cache_collector)
+
+
+def _route_label() -> str:
+    from flask import request
+
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def init_metrics(app, registry: MetricsRegistry = None):
+    """Record request latency on ``app`` and gauge its connection pool."""
+    from flask import g, request
+
+    registry = registry or metrics
+
+    def _start():
+        g._metrics_started = time.perf_counter()
+
+    def _record(response):
+        started = g.pop("_metrics_started", None)
+        if started is None or request.blueprint == "metrics":
+            return response
+        registry.observe(
+            "http_request_duration_seconds",
+            {
+                "route": _route_label(),
+                "method": request.method,
+                "status": f"{response.status_code // 100}xx",
+            },
+            time.perf_counter() - started,
+        )
+        registry.maybe_flush()
+        return response
+
+    app.before_request_funcs.setdefault(None, []).insert(0, _start)
+    app.after_request(_record)
+
+    def _pool_collector():
+        from src.database import db
+
+        with app.app_context():
+            pool = db.engine.pool
+        if not hasattr(pool, "checkedout"):
+            return
+        yield "db_connections_active", {}, pool.checkedout()
+        yield "db_connections_idle", {}, pool.checkedin()
+        if hasattr(pool, "size"):
+            yield "db_pool_size", {}, pool.size()
+            yield "db_pool_overflow", {}, max(pool.overflow(), 0)
+
+    registry.register_collector(_pool_collector)
+
+    profiler = app.extensions.get("query_profiler")
+    if profiler is not None:
+
+        def _record_queries(profile):
+            route = _route_label()
+            for query in profile.queries:
+                registry.observe("db_query_duration_seconds", {"route": route}, query["duration"])
+
+        profiler.subscribe(_record_queries)
+
+    if registry.multiproc_dir:
+        atexit.register(registry.flush)
+    app.extensions["metrics"] = registry
+    return registry
+
+
+__all__ = [
+    "LatencySketch",
+    "MetricsRegistry",
+    "init_metrics",
+    "metrics",
+]
@@ -0,0 +1,678 @@
+"""
+محرك التسعير والخصومات
+Compiled pricing and discount rules engine
+
+Active discounts and coupons are compiled once into in-memory indexes
+(by product, category, coupon code and validity window) and a whole cart
+is priced in one pass over its lines, instead of evaluating
+``Discount.is_valid`` / ``calculate_discount`` per object with lazily
+loaded relationships.
+
+Rules:
+- Discounts are applied by priority (highest first, then id).
+- A non-stackable discount only applies to lines no other discount has
+  touched and locks them; stackable discounts skip locked lines.
+- ``min_purchase`` is checked against the cart subtotal, ``min_quantity``
+  against the quantity of the lines the discount covers.
+- Discounts that have coupons apply only when one of their codes is given.
+  CUSTOMER-scoped discounts cover the whole cart.
+- Usage limits (total, per customer and per coupon) are honoured.
+
+Hot reload: the snapshot is recompiled when a commit touches one of the
+discount tables (write versions of ``stats_rollups``, shared through Redis
+when STATS_CACHE_REDIS_URL is set) and at least every PRICING_RELOAD_TTL
+seconds. Validity windows need no reload: the active view is cached per
+window between start/end dates.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_, select
+
+from src.models.discount import (
+    Coupon,
+    CouponUsage,
+    Discount,
+    DiscountCategory,
+    DiscountProduct,
+    DiscountScope,
+    DiscountType,
+)
+
+logger = logging.getLogger(__name__)
+
+PRICING_RELOAD_TTL = float(os.environ.get("PRICING_RELOAD_TTL", 300))
+PRICING_TABLES = ("discounts", "discount_products", "discount_categories", "coupons")
+
+CENT = Decimal("0.01")
+_ZERO = Decimal("0")
+_HUNDRED = Decimal("100")
+# end dates are inclusive; the window closes just after them
+_END_EPSILON = timedelta(microseconds=1)
+
+
+def _money(value) -> Decimal:
+    if value is None:
+        return _ZERO
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _decimal(value) -> Optional[Decimal]:
+    return None if value is None else Decimal(str(value))
+
+
+def _remaining(limit, count) -> Optional[int]:
+    return None if not limit else limit - (count or 0)
+
+
+# ==================== Compiled rules ====================
+
+
+@dataclass(frozen=True)
+class DiscountRule:
+    """A discount compiled from a ``Discount`` row and its scope links."""
+
+    id: int
+    name: str
+    discount_type: str = DiscountType.PERCENTAGE
+    value: Decimal = _ZERO
+    scope: str = DiscountScope.ALL
+    product_ids: FrozenSet[int] = frozenset()
+    category_ids: FrozenSet[int] = frozenset()
+    max_discount: Optional[Decimal] = None
+    min_purchase: Decimal = _ZERO
+    min_quantity: int = 0
+    buy_quantity: int = 0
+    get_quantity: int = 0
+    get_discount: Decimal = _HUNDRED
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    usage_remaining: Optional[int] = None
+    per_customer_limit: Optional[int] = None
+    priority: int = 0
+    stackable: bool = False
+    coupon_only: bool = False
+
+    def valid_at(self, now: datetime) -> bool:
+        if self.start_date and now < self.start_date:
+            return False
+        if self.end_date and now > self.end_date:
+            return False
+        return self.usage_remaining is None or self.usage_remaining > 0
+
+
+@dataclass(frozen=True)
+class CouponRule:
+    """A coupon code compiled from a ``Coupon`` row."""
+
+    id: int
+    code: str
+    discount_id: int
+    customer_id: Optional[int] = None
+    first_purchase_only: bool = False
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    usage_remaining: Optional[int] = None
+
+    def valid_at(self, now: datetime) -> bool:
+        if self.start_date and now < self.start_date:
+            return False
+        if self.end_date and now > self.end_date:
+            return False
+        return self.usage_remaining is None or self.usage_remaining > 0
+
+
+@dataclass(frozen=True)
+class ActiveView:
+    """Indexes of the rules valid during one validity window."""
+
+    by_product: Dict[int, Tuple[DiscountRule, ...]]
+    by_category: Dict[int, Tuple[DiscountRule, ...]]
+    cart_wide: Tuple[DiscountRule, ...]
+    valid_ids: FrozenSet[int]
+
+
+class PricingSnapshot:
+    """Immutable compiled rule set; active views are cached per window."""
+
+    def __init__(self, rules: Iterable[DiscountRule], coupons: Iterable[CouponRule] = ()):
+        self.rules: Dict[int, DiscountRule] = {r.id: r for r in rules}
+        self.coupons: Dict[str, CouponRule] = {c.code.upper(): c for c in coupons}
+        boundaries = set()
+        for item in (*self.rules.values(), *self.coupons.values()):
+            if item.start_date:
+                boundaries.add(item.start_date)
+            if item.end_date:
+                boundaries.add(item.end_date + _END_EPSILON)
+        self._boundaries = sorted(boundaries)
+        self._views: Dict[int, ActiveView] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def active(self, now: datetime) -> ActiveView:
+        window = bisect.bisect_right(self._boundaries, now)
+        view = self._views.get(window)
+        if view is None:
+            view = self._build_view(now)
+            with self._lock:
+                self._views[window] = view
+        return view
+
+    def _build_view(self, now: datetime) -> ActiveView:
+        by_product: Dict[int, List[DiscountRule]] = {}
+        by_category: Dict[int, List[DiscountRule]] = {}
+        cart_wide: List[DiscountRule] = []
+        valid_ids = set()
+        for rule in self.rules.values():
+            if not rule.valid_at(now):
+                continue
+            valid_ids.add(rule.id)
+            if rule.coupon_only:
+                continue
+            if rule.scope == DiscountScope.PRODUCT:
+                for product_id in rule.product_ids:
+                    by_product.setdefault(product_id, []).append(rule)
+            elif rule.scope == DiscountScope.CATEGORY:
+                for category_id in rule.category_ids:
+                    by_category.setdefault(category_id, []).append(rule)
+            else:
+                cart_wide.append(rule)
+        return ActiveView(
+            by_product={k: tuple(v) for k, v in by_product.items()},
+            by_category={k: tuple(v) for k, v in by_category.items()},
+            cart_wide=tuple(cart_wide),
+            valid_ids=frozenset(valid_ids),
+        )
+
+
+def compile_snapshot(
+    discounts: Iterable[Dict[str, Any]],
+    product_links: Iterable[Tuple[int, int]] = (),
+    category_links: Iterable[Tuple[int, int]] = (),
+    coupons: Iterable[Dict[str, Any]] = (),
+    gated_discount_ids: Optional[Iterable[int]] = None,
+) -> PricingSnapshot:
+    """
+    Compile discount rows (mappings of ``Discount`` columns), their
+    (discount_id, product_id) / (discount_id, category_id) links and coupon
+    rows into a snapshot.
+
+    ``gated_discount_ids`` are the discounts that have any coupon at all
+    (usable or not); they only apply with a valid code. Defaults to the
+    discounts of ``coupons``.
+    """
+    coupons = list(coupons)
+    products: Dict[int, set] = {}
+    for discount_id, product_id in product_links:
+        products.setdefault(discount_id, set()).add(product_id)
+    categories: Dict[int, set] = {}
+    for discount_id, category_id in category_links:
+        categories.setdefault(discount_id, set()).add(category_id)
+
+    coupon_rules = [
+        CouponRule(
+            id=c["id"],
+            code=c["code"].upper(),
+            discount_id=c["discount_id"],
+            customer_id=c.get("customer_id"),
+            first_purchase_only=bool(c.get("first_purchase_only")),
+            start_date=c.get("start_date"),
+            end_date=c.get("end_date"),
+            usage_remaining=_remaining(c.get("usage_limit"), c.get("usage_count")),
+        )
+        for c in coupons
+        if c.get("is_active", True)
+    ]
+    # an exhausted, expired or inactive coupon still gates its discount
+    if gated_discount_ids is None:
+        gated_discount_ids = (c["discount_id"] for c in coupons)
+    gated = set(gated_discount_ids)
+
+    rules = []
+    for d in discounts:
+        if not d.get("is_active", True):
+            continue
+        get_discount = d.get("get_discount")
+        rules.append(
+            DiscountRule(
+                id=d["id"],
+                name=d.get("name") or "",
+                discount_type=d.get("discount_type") or DiscountType.PERCENTAGE,
+                value=_decimal(d.get("value")) or _ZERO,
+                scope=d.get("scope") or DiscountScope.ALL,
+                product_ids=frozenset(products.get(d["id"], ())),
+                category_ids=frozenset(categories.get(d["id"], ())),
+                max_discount=_decimal(d.get("max_discount")),
+                min_purchase=_decimal(d.get("min_purchase")) or _ZERO,
+                min_quantity=d.get("min_quantity") or 0,
+                buy_quantity=d.get("buy_quantity") or 0,
+                get_quantity=d.get("get_quantity") or 0,
+                get_discount=_HUNDRED if get_discount is None else _decimal(get_discount),
+                start_date=d.get("start_date"),
+                end_date=d.get("end_date"),
+                usage_remaining=_remaining(d.get("usage_limit"), d.get("usage_count")),
+                per_customer_limit=d.get("per_customer_limit"),
+                priority=d.get("priority") or 0,
+                stackable=bool(d.get("stackable")),
+                coupon_only=d["id"] in gated,
+            )
+        )
+    return PricingSnapshot(rules, coupon_rules)
+
+
+def load_snapshot(session, now: Optional[datetime] = None) -> PricingSnapshot:
+    """Load active discounts with five flat queries and compile them."""
+    now = now or datetime.utcnow()
+    discounts = session.execute(
+        select(Discount.__table__).where(
+            Discount.is_active.is_(True),
+            or_(Discount.end_date.is_(None), Discount.end_date >= now),
+            or_(Discount.usage_limit.is_(None), Discount.usage_count < Discount.usage_limit),
+        )
+    ).mappings().all()
+    coupons = session.execute(
+        select(Coupon.__table__).where(
+            Coupon.is_active.is_(True),
+            or_(Coupon.end_date.is_(None), Coupon.end_date >= now),
+            or_(Coupon.usage_limit.is_(None), Coupon.usage_count < Coupon.usage_limit),
+        )
+    ).mappings().all()
+    product_links = session.execute(
+        select(DiscountProduct.discount_id, DiscountProduct.product_id)
+    ).all()
+    category_links = session.execute(
+        select(DiscountCategory.discount_id, DiscountCategory.category_id)
+    ).all()
+    gated = session.execute(select(Coupon.discount_id).distinct()).scalars().all()
+    return compile_snapshot(discounts, product_links, category_links, coupons, gated)
+
+
+def load_customer_usage(session, customer_id: Optional[int]) -> Dict[int, int]:
+    """Number of uses per discount id by one customer (one grouped query)."""
+    if not customer_id:
+        return {}
+    rows = session.execute(
+        select(Coupon.discount_id, func.count(CouponUsage.id))
+        .join(CouponUsage, CouponUsage.coupon_id == Coupon.id)
+        .where(CouponUsage.customer_id == customer_id)
+        .group_by(Coupon.discount_id)
+    ).all()
+    return {discount_id: count for discount_id, count in rows}
+
+
+# ==================== Cart evaluation ====================
+
+
+@dataclass
+class CartLine:
+    product_id: int
+    quantity: int
+    unit_price: Any
+    category_id: Optional[int] = None
+
+
+@dataclass
+class AppliedDiscount:
+    discount_id: int
+    name: str
+    amount: Decimal
+    lines: List[int]
+    coupon_code: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "discount_id": self.discount_id,
+            "name": self.name,
+            "amount": float(self.amount),
+            "lines": self.lines,
+            "coupon_code": self.coupon_code,
+        }
+
+
+@dataclass
+class PricingResult:
+    subtotal: Decimal
+    discount_total: Decimal
+    total: Decimal
+    line_discounts: List[Decimal]
+    line_totals: List[Decimal]
+    applied: List[AppliedDiscount] = field(default_factory=list)
+    free_shipping: bool = False
+    rejected_coupons: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "subtotal": float(self.subtotal),
+            "discount_total": float(self.discount_total),
+            "total": float(self.total),
+            "lines": [
+                {"discount": float(d), "total": float(t)}
+                for d, t in zip(self.line_discounts, self.line_totals)
+            ],
+            "applied_discounts": [a.to_dict() for a in self.applied],
+            "free_shipping": self.free_shipping,
+            "rejected_coupons": self.rejected_coupons,
+        }
+
+
+def _allocate(amount: Decimal, bases: Sequence[Decimal]) -> List[Decimal]:
+    """Split ``amount`` over ``bases`` proportionally, in whole cents."""
+    total = sum(bases, _ZERO)
+    if amount <= 0 or total <= 0:
+        return [_ZERO] * len(bases)
+    shares = [(amount * b / total).quantize(CENT, rounding=ROUND_HALF_UP) for b in bases]
+    # the rounding remainder goes to the largest line that can absorb it
+    diff = amount - sum(shares, _ZERO)
+    if diff:
+        order = sorted(range(len(bases)), key=lambda i: bases[i], reverse=True)
+        for i in order:
+            adjusted = shares[i] + diff
+            if _ZERO <= adjusted <= bases[i]:
+                shares[i] = adjusted
+                break
+    return shares
+
+
+def _buy_x_get_y(
+    rule: DiscountRule, lines: List[int], quantities: List[int], net: List[Decimal]
+) -> List[Decimal]:
+    """Discount the cheapest units: every buy+get units, get units are off."""
+    group = rule.buy_quantity + rule.get_quantity
+    amounts = [_ZERO] * len(lines)
+    if rule.get_quantity <= 0 or group <= 0:
+        return amounts
+    free_units = sum(quantities[i] for i in lines) // group * rule.get_quantity
+    rate = rule.get_discount / _HUNDRED
+    for pos in sorted(range(len(lines)), key=lambda p: net[lines[p]] / quantities[lines[p]]):
+        if free_units <= 0:
+            break
+        i = lines[pos]
+        units = min(free_units, quantities[i])
+        amounts[pos] = min(net[i], _money(net[i] / quantities[i] * units * rate))
+        free_units -= units
+    return amounts
+
+
+def evaluate_cart(
+    snapshot: PricingSnapshot,
+    lines: Sequence[CartLine],
+    coupon_codes: Iterable[str] = (),
+    customer_id: Optional[int] = None,
+    customer_usage: Optional[Dict[int, int]] = None,
+    first_purchase: Optional[bool] = None,
+    now: Optional[datetime] = None,
+) -> PricingResult:
+    """
+    Price ``lines`` against ``snapshot``.
+
+    ``customer_usage`` maps discount ids to the customer's previous uses
+    (see ``load_customer_usage``); ``first_purchase=False`` rejects
+    first-purchase-only coupons.
+    """
+    now = now or datetime.utcnow()
+    view = snapshot.active(now)
+    customer_usage = customer_usage or {}
+
+    quantities = [int(line.quantity) for line in lines]
+    gross = [_money(_money(line.unit_price) * q) for line, q in zip(lines, quantities)]
+    subtotal = sum(gross, _ZERO)
+    net = list(gross)
+
+    # candidate rule -> line indexes, gathered in one pass over the cart
+    candidates: Dict[int, List[int]] = {}
+    for i, line in enumerate(lines):
+        if quantities[i] <= 0:
+            continue
+        for rule in view.by_product.get(line.product_id, ()):
+            candidates.setdefault(rule.id, []).append(i)
+        if line.category_id is not None:
+            for rule in view.by_category.get(line.category_id, ()):
+                lst = candidates.setdefault(rule.id, [])
+                if not lst or lst[-1] != i:
+                    lst.append(i)
+    live = [i for i, q in enumerate(quantities) if q > 0]
+    for rule in view.cart_wide:
+        candidates[rule.id] = live
+
+    codes: Dict[int, str] = {}
+    rejected: Dict[str, str] = {}
+    for raw in coupon_codes:
+        code = (raw or "").strip().upper()
+        if not code:
+            continue
+        coupon = snapshot.coupons.get(code)
+        if coupon is None:
+            rejected[code] = "الكوبون غير موجود"
+        elif not coupon.valid_at(now) or coupon.discount_id not in view.valid_ids:
+            rejected[code] = "الكوبون غير صالح أو منتهي الصلاحية"
+        elif coupon.customer_id and coupon.customer_id != customer_id:
+            rejected[code] = "هذا الكوبون مخصص لعميل آخر"
+        elif coupon.first_purchase_only and first_purchase is False:
+            rejected[code] = "هذا الكوبون للطلب الأول فقط"
+        elif coupon.discount_id in codes:
+            rejected[code] = "تم تطبيق كوبون لنفس الخصم"
+        else:
+            rule = snapshot.rules[coupon.discount_id]
+            if rule.scope == DiscountScope.PRODUCT:
+                covered = [i for i in live if lines[i].product_id in rule.product_ids]
+            elif rule.scope == DiscountScope.CATEGORY:
+                covered = [i for i in live if lines[i].category_id in rule.category_ids]
+            else:
+                covered = live
+            codes[rule.id] = code
+            candidates[rule.id] = covered
+
+    ordered = sorted(
+        (snapshot.rules[rule_id] for rule_id in candidates),
+        key=lambda r: (-r.priority, r.id),
+    )
+
+    touched = [False] * len(lines)
+    locked = [False] * len(lines)
+    applied: List[AppliedDiscount] = []
+    free_shipping = False
+
+    for rule in ordered:
+        code = codes.get(rule.id)
+        reason = None
+        if subtotal < rule.min_purchase:
+            reason = "لم يتم الوصول للحد الأدنى للشراء"
+        elif (
+            customer_id
+            and rule.per_customer_limit
+            and customer_usage.get(rule.id, 0) >= rule.per_customer_limit
+        ):
+            reason = "لقد استخدمت هذا الكوبون الحد الأقصى من المرات"
+        if reason:
+            if code:
+                rejected[code] = reason
+            continue
+
+        if rule.discount_type == DiscountType.FREE_SHIPPING:
+            if sum(quantities[i] for i in candidates[rule.id]) >= rule.min_quantity:
+                free_shipping = True
+                applied.append(AppliedDiscount(rule.id, rule.name, _ZERO, [], code))
+            continue
+
+        if rule.stackable:
+            eligible = [i for i in candidates[rule.id] if not locked[i] and net[i] > 0]
+        else:
+            eligible = [i for i in candidates[rule.id] if not touched[i] and net[i] > 0]
+        if not eligible or sum(quantities[i] for i in eligible) < rule.min_quantity:
+            if code:
+                rejected[code] = "لا تنطبق شروط الكوبون على السلة"
+            continue
+
+        bases = [net[i] for i in eligible]
+        if rule.discount_type == DiscountType.PERCENTAGE:
+            amount = _money(sum(bases, _ZERO) * rule.value / _HUNDRED)
+            if rule.max_discount is not None:
+                amount = min(amount, _money(rule.max_discount))
+            amounts = _allocate(amount, bases)
+        elif rule.discount_type == DiscountType.FIXED:
+            amounts = _allocate(min(_money(rule.value), sum(bases, _ZERO)), bases)
+        elif rule.discount_type == DiscountType.BUY_X_GET_Y:
+            amounts = _buy_x_get_y(rule, eligible, quantities, net)
+        else:
+            continue
+
+        total = sum(amounts, _ZERO)
+        if total <= 0:
+            if code:
+                rejected[code] = "لا تنطبق شروط الكوبون على السلة"
+            continue
+        for i, amount in zip(eligible, amounts):
+            net[i] -= amount
+            touched[i] = True
+            if not rule.stackable:
+                locked[i] = True
+        applied.append(
+            AppliedDiscount(
+                rule.id,
+                rule.name,
+                total,
+                [i for i, a in zip(eligible, amounts) if a > 0],
+                code,
+            )
+        )
+
+    line_discounts = [g - n for g, n in zip(gross, net)]
+    discount_total = sum(line_discounts, _ZERO)
+    return PricingResult(
+        subtotal=subtotal,
+        discount_total=discount_total,
+        total=subtotal - discount_total,
+        line_discounts=line_discounts,
+        line_totals=net,
+        applied=applied,
+        free_shipping=free_shipping,
+        rejected_coupons=rejected,
+    )
+
+
+# ==================== Engine ====================
+
+
+class PricingEngine:
+    """Holds the compiled snapshot and recompiles it when discounts change."""
+
+    def __init__(
+        self,
+        load: Callable[[], PricingSnapshot],
+        versions=None,
+        tables: Tuple[str, ...] = PRICING_TABLES,
+        ttl: float = PRICING_RELOAD_TTL,
+    ):
+        if versions is None:
+            from src.services.stats_rollups import stats_cache
+
+            versions = stats_cache.versions
+        self._load = load
+        self._versions = versions
+        self.tables = tables
+        self.ttl = ttl
+        self._snapshot: Optional[PricingSnapshot] = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _current_version(self):
+        try:
+            return self._versions.get(self.tables)
+        except Exception as e:  # Redis down: fall back to TTL only
+            logger.warning(f"Pricing version lookup failed: {e}")
+            return None
+
+    def _fresh(self, version) -> bool:
+        return (
+            self._snapshot is not None
+            and version is not None
+            and version == self._version
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def snapshot(self) -> PricingSnapshot:
+        version = self._current_version()
+        if self._fresh(version):
+            return self._snapshot
+        with self._lock:
+            if not self._fresh(version):
+                self._snapshot = self._load()
+                self._version = version
+                self._loaded_at = time.monotonic()
+                self.reloads += 1
+                logger.debug(f"Pricing rules compiled: {len(self._snapshot)} discounts")
+        return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def price(self, lines: Sequence[CartLine], **kwargs) -> PricingResult:
+        return evaluate_cart(self.snapshot(), lines, **kwargs)
+
+
+_engine: Optional[PricingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_pricing_engine() -> PricingEngine:
+    """Process-wide engine reading the discount tables through db.session."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from src.database import db
+
+                _engine = PricingEngine(lambda: load_snapshot(db.session))
+    return _engine
+
+
+def price_cart(
+    lines: Sequence[CartLine],
+    coupon_codes: Iterable[str] = (),
+    customer_id: Optional[int] = None,
+    first_purchase: Optional[bool] = None,
+) -> PricingResult:
+    """Price a cart with the process-wide engine (inside an app context)."""
+    from src.database import db
+
+    usage = load_customer_usage(db.session, customer_id) if customer_id else None
+    return get_pricing_engine().price(
+        lines,
+        coupon_codes=coupon_codes,
+        customer_id=customer_id,
+        customer_usage=usage,
+        first_purchase=first_purchase,
+    )
+
+
+__all__ = [
+    "CartLine",
+    "AppliedDiscount",
+    "PricingResult",
+    "DiscountRule",
+    "CouponRule",
+    "PricingSnapshot",
+    "PricingEngine",
+    "compile_snapshot",
+    "load_snapshot",
+    "load_customer_usage",
+    "evaluate_cart",
+    "get_pricing_engine",
+    "price_cart",
+    "PRICING_TABLES",
+]
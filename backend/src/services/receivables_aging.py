@@ -0,0 +1,155 @@
+"""
+أعمار الذمم المدينة
+Receivables aging
+
+Outstanding credit (unsettled positive ``credit_transactions``) is bucketed
+by days past due in ONE grouped query per run: the bucket edges are turned
+into due-date cut-offs so the database only compares dates and sums
+``CASE`` expressions, grouped by credit account.
+
+Buckets: current (not yet due), 0-30, 31-60, 61-90 and 90+ days overdue.
+
+Reports are cached per day (``as_of`` date) until a commit writes the
+credit tables, reusing the write versions of ``stats_rollups``.
+"""
+
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import case, func, select
+
+from src.services.credit_service import CreditTransaction, CustomerCredit
+from src.services.stats_rollups import StatsCache, stats_cache
+
+AGING_CACHE_TTL = float(os.environ.get("AGING_CACHE_TTL", 24 * 3600))
+AGING_TABLES = (CreditTransaction.__tablename__, CustomerCredit.__tablename__)
+
+# (key, first day overdue, last day overdue)
+AGING_BUCKETS: Tuple[Tuple[str, int, Optional[int]], ...] = (
+    ("0_30", 0, 30),
+    ("31_60", 31, 60),
+    ("61_90", 61, 90),
+    ("90_plus", 91, None),
+)
+
+aging_cache = StatsCache(ttl=AGING_CACHE_TTL, versions=stats_cache.versions)
+
+
+def _day(value: Union[date, datetime, None]) -> date:
+    if value is None:
+        return datetime.utcnow().date()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _bucket_columns(end: datetime):
+    """
+    SUM(CASE ...) per bucket. ``end`` is midnight after the report day, so
+    an amount is ``n`` days overdue when ``end - (n+1) days <= due < end - n days``.
+    """
+    due = CreditTransaction.due_date
+    amount = CreditTransaction.amount
+    columns = [
+        func.coalesce(
+            func.sum(case(((due.is_(None)) | (due >= end), amount), else_=0)), 0
+        ).label("current")
+    ]
+    for key, first, last in AGING_BUCKETS:
+        condition = due < end - timedelta(days=first)
+        if last is not None:
+            condition = condition & (due >= end - timedelta(days=last + 1))
+        columns.append(
+            func.coalesce(func.sum(case((condition, amount), else_=0)), 0).label(key)
+        )
+    return columns
+
+
+def aging_rows(
+    session, as_of: Union[date, datetime, None] = None, min_days_overdue: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Aged outstanding balance per customer, computed by one grouped query.
+
+    ``min_days_overdue`` > 0 keeps only customers with an amount at least
+    that many days overdue.
+    """
+    day = _day(as_of)
+    end = datetime.combine(day + timedelta(days=1), time.min)
+    due = CreditTransaction.due_date
+    query = (
+        select(
+            CustomerCredit.id,
+            CustomerCredit.customer_id,
+            CustomerCredit.credit_limit,
+            *_bucket_columns(end),
+            func.min(case((due < end, due))).label("oldest_due_date"),
+        )
+        .join(CreditTransaction, CreditTransaction.credit_account_id == CustomerCredit.id)
+        .where(CreditTransaction.is_settled.is_(False), CreditTransaction.amount > 0)
+        .group_by(CustomerCredit.id, CustomerCredit.customer_id, CustomerCredit.credit_limit)
+    )
+    if min_days_overdue > 0:
+        cutoff = end - timedelta(days=min_days_overdue)
+        query = query.having(func.sum(case((due < cutoff, 1), else_=0)) > 0)
+
+    keys = ["current", *(key for key, _, _ in AGING_BUCKETS)]
+    report = []
+    for row in session.execute(query).mappings():
+        buckets = {key: round(float(row[key]), 2) for key in keys}
+        overdue = round(sum(buckets[key] for key, _, _ in AGING_BUCKETS), 2)
+        oldest = row["oldest_due_date"]
+        if isinstance(oldest, str):  # SQLite returns MIN() of a CASE as text
+            oldest = datetime.fromisoformat(oldest)
+        report.append(
+            {
+                "credit_account_id": row["id"],
+                "customer_id": row["customer_id"],
+                "credit_limit": row["credit_limit"],
+                "buckets": buckets,
+                "total_overdue": overdue,
+                "total_outstanding": round(overdue + buckets["current"], 2),
+                "oldest_due_date": oldest.isoformat() if oldest else None,
+                "oldest_overdue_days": (day - oldest.date()).days if oldest else 0,
+            }
+        )
+    return report
+
+
+def aging_report(
+    session, as_of: Union[date, datetime, None] = None, min_days_overdue: int = 0
+) -> Dict[str, Any]:
+    """Aging rows plus bucket totals (uncached)."""
+    rows = aging_rows(session, as_of, min_days_overdue)
+    keys = ["current", *(key for key, _, _ in AGING_BUCKETS)]
+    totals = {key: round(sum(r["buckets"][key] for r in rows), 2) for key in keys}
+    return {
+        "as_of": _day(as_of).isoformat(),
+        "customers": rows,
+        "totals": {
+            **totals,
+            "total_overdue": round(sum(r["total_overdue"] for r in rows), 2),
+            "total_outstanding": round(sum(r["total_outstanding"] for r in rows), 2),
+            "customer_count": len(rows),
+        },
+    }
+
+
+def cached_aging_report(
+    session, as_of: Union[date, datetime, None] = None, min_days_overdue: int = 0
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Aging report cached per day until the credit tables change: (data, meta)."""
+    day = _day(as_of)
+    return aging_cache.get_or_compute(
+        f"receivables_aging:{day.isoformat()}:{min_days_overdue}",
+        AGING_TABLES,
+        lambda: aging_report(session, day, min_days_overdue),
+    )
+
+
+__all__ = [
+    "AGING_BUCKETS",
+    "aging_cache",
+    "aging_rows",
+    "aging_report",
+    "cached_aging_report",
+]
@@ -0,0 +1,594 @@
+"""
+فهرسة سجلات النظام للبحث الدلالي
+ERP record index for RAG
+
+Products, customers, suppliers and invoices are projected into short text
+documents and stored in their own Chroma collection (RAG_RECORDS_COLLECTION)
+with metadata for filtering (entity, warehouse_id, category_id, date).
+
+- Records are loaded with the columnar list serializers (one query per
+  batch plus one IN query per related name / child collection)
+- Session hooks collect the ids of records written by a commit (invoice
+  items map to their invoice) and hand them to a background queue, which
+  re-projects, embeds and upserts them in batches; ids that no longer
+  exist are deleted from the collection
+- ``search`` runs one ANN query with a metadata ``where`` filter; query
+  embeddings are memoized
+
+Enable with RAG_RECORD_INDEX_ENABLED=1 (requires chromadb and
+sentence-transformers). ``RecordIndexer.reindex_all`` backfills the
+collection, e.g. after bulk imports that bypass the ORM unit of work.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.utils.serializers import Children, ListSerializer, Related, money
+
+logger = logging.getLogger(__name__)
+
+RECORDS_COLLECTION = os.environ.get("RAG_RECORDS_COLLECTION", "erp_records")
+RECORD_INDEX_ENABLED = os.environ.get("RAG_RECORD_INDEX_ENABLED", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+RECORD_INDEX_BATCH = int(os.environ.get("RAG_RECORD_INDEX_BATCH", 256))
+RECORD_INDEX_DELAY = float(os.environ.get("RAG_RECORD_INDEX_DELAY", 0.5))
+
+MetadataDict = Dict[str, Any]
+
+
+# ==================== Projections ====================
+
+
+@dataclass(frozen=True)
+class RecordSpec:
+    """How one entity is loaded, rendered to text and filtered."""
+
+    entity: str
+    serializer: ListSerializer
+    render: Callable[[Dict[str, Any]], str]
+    metadata: Callable[[Dict[str, Any]], MetadataDict]
+    include: Tuple[str, ...] = ()
+
+    @property
+    def model(self):
+        return self.serializer.model
+
+    def watched_tables(self) -> Dict[str, str]:
+        """table -> attribute holding this entity's id (children included)."""
+        tables = {self.model.__tablename__: "id"}
+        for name in self.include:
+            child = self.serializer.children[name]
+            tables[child.serializer.model.__tablename__] = child.foreign_key
+        return tables
+
+
+def doc_id(entity: str, record_id: Any) -> str:
+    return f"{entity}:{record_id}"
+
+
+def date_key(value) -> Optional[int]:
+    """ISO date/datetime -> YYYYMMDD (Chroma range filters are numeric)."""
+    if not value:
+        return None
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return int(str(value)[:10].replace("-", ""))
+
+
+def _text(*parts) -> str:
+    return " | ".join(str(p) for p in parts if p not in (None, "", [], ()))
+
+
+def _labeled(label: str, value) -> Optional[str]:
+    return f"{label}: {value}" if value not in (None, "") else None
+
+
+def _meta(entity: str, row: Dict[str, Any], **extra) -> MetadataDict:
+    meta = {"entity": entity, "record_id": row["id"], **extra}
+    # Chroma metadata values cannot be None
+    return {k: v for k, v in meta.items() if v is not None}
+
+
+def render_product(row):
+    return _text(
+        row.get("name"),
+        row.get("name_en"),
+        _labeled("SKU", row.get("sku")),
+        _labeled("barcode", row.get("barcode")),
+        _labeled("category", row.get("category_name")),
+        _labeled("supplier", row.get("supplier_name")),
+        _labeled("variety", row.get("variety")),
+        _labeled("active ingredient", row.get("active_ingredient")),
+        _labeled("origin", row.get("origin_country")),
+        row.get("description"),
+    )
+
+
+def product_metadata(row):
+    return _meta(
+        "product",
+        row,
+        category_id=row.get("category_id"),
+        supplier_id=row.get("default_supplier_id"),
+        is_active=row.get("is_active"),
+        date=date_key(row.get("created_at")),
+    )
+
+
+def render_partner(kind: str):
+    def render(row):
+        return _text(
+            f"{kind} {row.get('name')}",
+            row.get("company_name"),
+            _labeled("type", row.get("supplier_type") or row.get("category")),
+            ", ".join(p for p in (row.get("city"), row.get("country")) if p) or None,
+            _labeled("contact", row.get("contact_person")),
+            row.get("phone") or row.get("mobile"),
+            row.get("email"),
+            row.get("notes"),
+        )
+
+    return render
+
+
+def partner_metadata(entity: str):
+    def metadata(row):
+        return _meta(
+            entity,
+            row,
+            is_active=row.get("is_active"),
+            date=date_key(row.get("created_at")),
+        )
+
+    return metadata
+
+
+def render_invoice(row):
+    kind = str(row.get("invoice_type") or "sales").replace("_", " ").capitalize()
+    items = ", ".join(
+        f"{item.get('product_name') or item.get('product_id')} x {item.get('quantity')}"
+        for item in row.get("items", [])
+    )
+    return _text(
+        f"{kind} invoice {row.get('invoice_number')}",
+        _labeled("date", row.get("invoice_date")),
+        _labeled("customer", row.get("customer_name")),
+        _labeled("supplier", row.get("supplier_name")),
+        _labeled("warehouse", row.get("warehouse_name")),
+        _labeled("status", row.get("status")),
+        _labeled("total", row.get("total_amount")),
+        _labeled("items", items),
+        row.get("notes"),
+    )
+
+
+def invoice_metadata(row):
+    return _meta(
+        "invoice",
+        row,
+        invoice_type=row.get("invoice_type"),
+        warehouse_id=row.get("warehouse_id"),
+        customer_id=row.get("customer_id"),
+        supplier_id=row.get("supplier_id"),
+        status=row.get("status"),
+        date=date_key(row.get("invoice_date")),
+    )
+
+
+@lru_cache(maxsize=None)
+def default_specs() -> Tuple[RecordSpec, ...]:
+    """Specs for the unified models (imported lazily)."""
+    from src.models.customer import Customer
+    from src.models.inventory import Category, Warehouse
+    from src.models.invoice_unified import Invoice, InvoiceItem
+    from src.models.product_unified import Product
+    from src.models.supplier import Supplier
+
+    products = ListSerializer(
+        Product,
+        [
+            "id",
+            "name",
+            "name_en",
+            "sku",
+            "barcode",
+            "description",
+            "category_id",
+            "default_supplier_id",
+            "variety",
+            "active_ingredient",
+            "origin_country",
+            "is_active",
+            "created_at",
+        ],
+        related={
+            "category_name": Related("category_id", Category.name),
+            "supplier_name": Related("default_supplier_id", Supplier.name),
+        },
+    )
+    partner_fields = [
+        "id",
+        "name",
+        "company_name",
+        "city",
+        "country",
+        "phone",
+        "mobile",
+        "email",
+        "notes",
+        "is_active",
+        "created_at",
+    ]
+    customers = ListSerializer(Customer, [*partner_fields, "category"])
+    suppliers = ListSerializer(
+        Supplier, [*partner_fields, "supplier_type", "contact_person"]
+    )
+    invoices = ListSerializer(
+        Invoice,
+        [
+            "id",
+            "invoice_number",
+            "invoice_type",
+            "invoice_date",
+            "customer_id",
+            "supplier_id",
+            "warehouse_id",
+            "status",
+            "total_amount",
+            "notes",
+        ],
+        converters={"total_amount": money},
+        related={
+            "customer_name": Related("customer_id", Customer.name),
+            "supplier_name": Related("supplier_id", Supplier.name),
+            "warehouse_name": Related("warehouse_id", Warehouse.name),
+        },
+        children={
+            "items": Children(
+                ListSerializer(InvoiceItem, ["product_id", "product_name", "quantity"]),
+                "invoice_id",
+            )
+        },
+    )
+    return (
+        RecordSpec("product", products, render_product, product_metadata),
+        RecordSpec("customer", customers, render_partner("Customer"), partner_metadata("customer")),
+        RecordSpec("supplier", suppliers, render_partner("Supplier"), partner_metadata("supplier")),
+        RecordSpec("invoice", invoices, render_invoice, invoice_metadata, ("items",)),
+    )
+
+
+def build_where(
+    entity: Union[str, Sequence[str], None] = None,
+    warehouse_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    date_from=None,
+    date_to=None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Chroma ``where`` filter for the given metadata constraints; ``entity``
+    is one record kind or a list of them.
+    """
+    clauses: List[Dict[str, Any]] = []
+    if isinstance(entity, str):
+        clauses.append({"entity": entity})
+    elif entity is not None:
+        clauses.append({"entity": {"$in": list(entity)}})
+    if warehouse_id is not None:
+        clauses.append({"warehouse_id": int(warehouse_id)})
+    if category_id is not None:
+        clauses.append({"category_id": int(category_id)})
+    if date_from:
+        clauses.append({"date": {"$gte": date_key(date_from)}})
+    if date_to:
+        clauses.append({"date": {"$lte": date_key(date_to)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+# ==================== Indexer ====================
+
+
+class RecordIndexer:
+    """Projects records into a Chroma collection and searches it."""
+
+    def __init__(
+        self,
+        collection,
+        specs: Sequence[RecordSpec],
+        encode: Optional[Callable[[Sequence[str]], Any]] = None,
+        batch_size: int = RECORD_INDEX_BATCH,
+    ):
+        if encode is None:
+            from src.rag_ingest import encode_texts as encode
+        self.collection = collection
+        self.specs = {spec.entity: spec for spec in specs}
+        self.encode = encode
+        self.batch_size = batch_size
+        self._encode_query = lru_cache(maxsize=1024)(self._embed_query)
+
+    def _embed_query(self, text: str) -> Tuple[float, ...]:
+        return tuple(float(v) for v in self.encode([text])[0])
+
+    def project(self, session, entity: str, ids: Iterable[Any]):
+        """(doc ids, documents, metadatas) of the records that exist; missing ids."""
+        spec = self.specs[entity]
+        ids = list(dict.fromkeys(ids))
+        rows = (
+            session.query(spec.model)
+            .filter(spec.model.id.in_(ids))
+            .with_entities(*spec.serializer.columns)
+            .all()
+        )
+        dumped = spec.serializer.dump_rows(rows, spec.include, session)
+        found = {row["id"] for row in dumped}
+        missing = [record_id for record_id in ids if record_id not in found]
+        return (
+            [doc_id(entity, row["id"]) for row in dumped],
+            [spec.render(row) for row in dumped],
+            [spec.metadata(row) for row in dumped],
+            missing,
+        )
+
+    def sync(self, session, entity: str, ids: Iterable[Any]) -> Tuple[int, int]:
+        """Re-index ``ids`` of ``entity``: upsert existing, delete missing."""
+        ids = list(ids)
+        upserted = deleted = 0
+        for start in range(0, len(ids), self.batch_size):
+            doc_ids, documents, metadatas, missing = self.project(
+                session, entity, ids[start : start + self.batch_size]
+            )
+            if doc_ids:
+                self.collection.upsert(
+                    ids=doc_ids,
+                    documents=documents,
+                    metadatas=metadatas,
+                    embeddings=self.encode(documents),
+                )
+                upserted += len(doc_ids)
+            if missing:
+                self.collection.delete(ids=[doc_id(entity, i) for i in missing])
+                deleted += len(missing)
+        return upserted, deleted
+
+    def reindex_all(self, session, entities: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Backfill every record of ``entities`` (default: all)."""
+        counts = {}
+        for entity in entities or self.specs:
+            model = self.specs[entity].model
+            ids = [row[0] for row in session.query(model.id).order_by(model.id)]
+            counts[entity] = self.sync(session, entity, ids)[0]
+        return counts
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        entity: Union[str, Sequence[str], None] = None,
+        warehouse_id: Optional[int] = None,
+        category_id: Optional[int] = None,
+        date_from=None,
+        date_to=None,
+    ) -> Dict[str, Any]:
+        """Metadata-filtered ANN search over the record collection."""
+        started = time.perf_counter()
+        where = build_where(entity, warehouse_id, category_id, date_from, date_to)
+        kwargs = {"where": where} if where else {}
+        results = self.collection.query(
+            query_embeddings=[list(self._encode_query(query.strip()))],
+            n_results=top_k,
+            include=["metadatas", "documents", "distances"],
+            **kwargs,
+        )
+        hits = []
+        ids = (results.get("ids") or [[]])[0]
+        for i, hit_id in enumerate(ids):
+            meta = results["metadatas"][0][i] or {}
+            distance = float(results["distances"][0][i] or 0.0)
+            hits.append(
+                {
+                    "id": hit_id,
+                    "entity": meta.get("entity"),
+                    "record_id": meta.get("record_id"),
+                    "text": results["documents"][0][i],
+                    "score": round(1.0 - distance, 4),
+                    "meta": meta,
+                }
+            )
+        return {
+            "results": hits,
+            "filters": where or {},
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+# ==================== Background queue ====================
+
+
+class IndexQueue:
+    """Coalesces (entity, id) changes and syncs them on a worker thread."""
+
+    def __init__(
+        self,
+        indexer: RecordIndexer,
+        session_scope: Callable[[], Any],
+        max_batch: int = RECORD_INDEX_BATCH,
+        max_delay: float = RECORD_INDEX_DELAY,
+    ):
+        self.indexer = indexer
+        self.session_scope = session_scope
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.processed = 0
+        self.errors = 0
+
+    def put(self, changes: Iterable[Tuple[str, Any]]):
+        for change in changes:
+            self._queue.put(change)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="record-index", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def join(self):
+        """Block until every queued change has been processed."""
+        self._queue.join()
+
+    def _take_batch(self) -> List[Tuple[str, Any]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                by_entity: Dict[str, Dict[Any, None]] = {}
+                for entity, record_id in batch:
+                    by_entity.setdefault(entity, {})[record_id] = None
+                with self.session_scope() as session:
+                    for entity, ids in by_entity.items():
+                        self.indexer.sync(session, entity, list(ids))
+                self.processed += len(batch)
+            except Exception as e:  # keep the worker alive
+                self.errors += 1
+                logger.error(f"Record index sync failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+# ==================== Session hooks ====================
+
+_PENDING_KEY = "record_index_changes"
+_hooks: Dict[str, Any] = {}
+
+
+def install_hooks(index_queue: IndexQueue, specs: Sequence[RecordSpec]):
+    """Send records written by committed transactions to ``index_queue``."""
+    watched: Dict[str, List[Tuple[str, str]]] = {}
+    for spec in specs:
+        for table, attr in spec.watched_tables().items():
+            watched.setdefault(table, []).append((spec.entity, attr))
+    _hooks["queue"] = index_queue
+    _hooks["watched"] = watched
+    if not _hooks.get("installed"):
+        event.listen(Session, "after_flush", _collect_changes)
+        event.listen(Session, "after_commit", _enqueue_changes)
+        event.listen(Session, "after_rollback", _discard_changes)
+        _hooks["installed"] = True
+
+
+def remove_hooks():
+    if _hooks.pop("installed", False):
+        event.remove(Session, "after_flush", _collect_changes)
+        event.remove(Session, "after_commit", _enqueue_changes)
+        event.remove(Session, "after_rollback", _discard_changes)
+    _hooks.clear()
+
+
+def _collect_changes(session, flush_context):
+    watched = _hooks.get("watched")
+    if not watched:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        for entity, attr in watched.get(getattr(instance, "__tablename__", None), ()):
+            record_id = getattr(instance, attr, None)
+            if record_id is not None:
+                pending.add((entity, record_id))
+
+
+def _enqueue_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes and _hooks.get("queue") is not None:
+        _hooks["queue"].put(changes)
+
+
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ==================== Flask wiring ====================
+
+
+def _app_session_scope(app):
+    from src.database import db
+
+    @contextmanager
+    def scope():
+        with app.app_context():
+            try:
+                yield db.session
+            finally:
+                db.session.remove()
+
+    return scope
+
+
+def get_record_collection():
+    from src import rag_ingest
+
+    if not rag_ingest.CHROMADB_AVAILABLE:
+        raise RuntimeError("chromadb is not installed")
+    rag_ingest.PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    client = rag_ingest.chromadb.PersistentClient(path=str(rag_ingest.PERSIST_DIR))
+    return client.get_or_create_collection(
+        name=RECORDS_COLLECTION, metadata={"hnsw:space": "cosine"}
+    )
+
+
+def init_record_index(app, enabled: bool = RECORD_INDEX_ENABLED) -> Optional[RecordIndexer]:
+    """Create the indexer, start its queue and install the commit hooks."""
+    if not enabled:
+        return None
+    specs = default_specs()
+    indexer = RecordIndexer(get_record_collection(), specs)
+    index_queue = IndexQueue(indexer, _app_session_scope(app)).start()
+    install_hooks(index_queue, specs)
+    app.extensions["record_index"] = indexer
+    app.extensions["record_index_queue"] = index_queue
+    return indexer
+
+
+__all__ = [
+    "RecordSpec",
+    "RecordIndexer",
+    "IndexQueue",
+    "build_where",
+    "date_key",
+    "default_specs",
+    "install_hooks",
+    "remove_hooks",
+    "init_record_index",
+    "get_record_collection",
+]
@@ -0,0 +1,294 @@
+"""
+ذاكرة البيانات المرجعية لكل عملية
+Per-process reference data cache
+
+Small lookup tables (categories, warehouses, roles, settings, currencies)
+are read in nearly every request. Each one is loaded once per process (and
+database engine) into an immutable ``ReferenceSnapshot`` indexed by id and
+by its key columns (code, name, key...).
+
+Freshness:
+- Snapshots carry the write versions of their table (``stats_rollups``
+  versions: bumped when an ORM commit writes the table, shared across
+  workers when ``STATS_CACHE_REDIS_URL`` is set).
+- The version is checked at most once per request per table (memoised on
+  ``flask.g``), so a request touching a table ten times pays one dict
+  lookup (or one Redis MGET).
+- ``REFERENCE_DATA_TTL`` bounds staleness for writes made outside the ORM
+  or in other workers without shared versions; lookups that miss fall back
+  to the database, so a row created elsewhere is never reported missing.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from flask import g, has_request_context
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import select
+
+from src.database import db
+from src.services.stats_rollups import stats_cache
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_DATA_TTL = float(os.environ.get("REFERENCE_DATA_TTL", 60))
+
+
+class ReferenceRow(Mapping):
+    """Read-only row: ``row["name"]`` and ``row.name`` both work."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Dict[str, Any]):
+        object.__setattr__(self, "_data", dict(data))
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("reference rows are read-only")
+
+    def __repr__(self):
+        return f"ReferenceRow({self._data!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._data)
+
+
+class ReferenceSnapshot:
+    """Immutable rows of one table with id and key-column indexes."""
+
+    def __init__(
+        self,
+        name: str,
+        rows: List[Dict[str, Any]],
+        keys: Tuple[str, ...] = (),
+        casefold: bool = True,
+    ):
+        self.name = name
+        self.casefold = casefold
+        self.rows: Tuple[ReferenceRow, ...] = tuple(ReferenceRow(r) for r in rows)
+        self._by_id = {r.get("id"): r for r in self.rows}
+        self._indexes: Dict[str, Dict[Any, ReferenceRow]] = {}
+        for key in keys:
+            index = self._indexes[key] = {}
+            for row in self.rows:
+                value = self._normal(row.get(key))
+                if value is not None:
+                    index.setdefault(value, row)
+
+    def _normal(self, value):
+        if self.casefold and isinstance(value, str):
+            return value.strip().casefold()
+        return value
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[ReferenceRow]:
+        return iter(self.rows)
+
+    def get(self, id) -> Optional[ReferenceRow]:
+        try:
+            return self._by_id.get(int(id))
+        except (TypeError, ValueError):
+            return None
+
+    def lookup(self, key: str, value) -> Optional[ReferenceRow]:
+        """Row whose ``key`` column equals ``value`` (case-insensitive text by default)."""
+        return self._indexes[key].get(self._normal(value))
+
+    def by_code(self, code) -> Optional[ReferenceRow]:
+        return self.lookup("code", code)
+
+    def by_name(self, name) -> Optional[ReferenceRow]:
+        return self.lookup("name", name)
+
+    def active(self) -> List[ReferenceRow]:
+        return [r for r in self.rows if r.get("is_active", True)]
+
+    def first(self, active_only: bool = True) -> Optional[ReferenceRow]:
+        """Lowest-id row (the default warehouse, currency...)."""
+        rows = self.active() if active_only else self.rows
+        return rows[0] if rows else None
+
+
+@dataclass
+class ReferenceTable:
+    """Registration: which model to load and which columns to index."""
+
+    name: str
+    model_path: str  # "module:Class", imported on first use
+    keys: Tuple[str, ...] = ()
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+    casefold: bool = True
+    _model: Any = field(default=None, repr=False)
+
+    @property
+    def model(self):
+        if self._model is None:
+            module, _, cls = self.model_path.partition(":")
+            self._model = getattr(importlib.import_module(module), cls)
+        return self._model
+
+    @property
+    def table(self) -> str:
+        return self.model.__table__.name
+
+    def load(self, session) -> ReferenceSnapshot:
+        table = self.model.__table__
+        rows = [
+            dict(row)
+            for row in session.execute(select(table).order_by(*table.primary_key)).mappings()
+        ]
+        if self.transform:
+            rows = [self.transform(row) for row in rows]
+        return ReferenceSnapshot(self.name, rows, self.keys, self.casefold)
+
+
+def _typed_setting(row: Dict[str, Any]) -> Dict[str, Any]:
+    from types import SimpleNamespace
+
+    from src.models.settings import Setting
+
+    return {**row, "typed_value": Setting.get_value(SimpleNamespace(**row))}
+
+
+class ReferenceDataCache:
+    """Snapshots per engine and table, reloaded when the table's version moves."""
+
+    def __init__(self, versions=None, ttl: float = REFERENCE_DATA_TTL):
+        self.versions = versions or stats_cache.versions
+        self.ttl = ttl
+        self.tables: Dict[str, ReferenceTable] = {}
+        self._entries: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def register(self, spec: ReferenceTable):
+        self.tables[spec.name] = spec
+
+    def _session(self, session):
+        return session or db.session
+
+    def _store(self, session) -> Dict[str, Tuple[Tuple[int, ...], float, ReferenceSnapshot]]:
+        engine = session.get_bind()
+        engine = getattr(engine, "engine", engine)
+        with self._lock:
+            return self._entries.setdefault(engine, {})
+
+    def _fresh(self, entry, version) -> bool:
+        return (
+            entry is not None
+            and entry[0] == version
+            and time.monotonic() - entry[1] <= self.ttl
+        )
+
+    def get(self, name: str, session=None) -> ReferenceSnapshot:
+        """Current snapshot of ``name``; the version is checked once per request."""
+        session = self._session(session)
+        memo = None
+        if has_request_context():
+            memo = g.setdefault("_reference_snapshots", {})
+            snapshot = memo.get(name)
+            if snapshot is not None:
+                return snapshot
+
+        spec = self.tables[name]
+        store = self._store(session)
+        version = self.versions.get((spec.table,))
+        entry = store.get(name)
+        if not self._fresh(entry, version):
+            with self._lock:
+                entry = store.get(name)
+                if not self._fresh(entry, version):
+                    entry = (version, time.monotonic(), spec.load(session))
+                    store[name] = entry
+                    self.loads += 1
+        if memo is not None:
+            memo[name] = entry[2]
+        return entry[2]
+
+    def invalidate(self, name: Optional[str] = None, session=None):
+        """Drop ``name`` (or every table) so the next access reloads."""
+        store = self._store(self._session(session))
+        with self._lock:
+            for key in [name] if name else list(store):
+                store.pop(key, None)
+        if has_request_context():
+            memo = g.get("_reference_snapshots") or {}
+            for key in [name] if name else list(memo):
+                memo.pop(key, None)
+
+    def find(self, table: str, session=None, id=None, **criteria) -> Optional[ReferenceRow]:
+        """
+        Row by id or by one indexed column, from the snapshot. A miss is
+        confirmed against the database; a hit there (row written in another
+        worker) reloads the snapshot.
+        """
+        session = self._session(session)
+        snapshot = self.get(table, session)
+        if id is not None:
+            row = snapshot.get(id)
+        else:
+            (key, value), = criteria.items()
+            row = snapshot.lookup(key, value)
+        if row is not None:
+            return row
+
+        model = self.tables[table].model
+        if id is not None:
+            found = session.get(model, id)
+        else:
+            found = session.query(model).filter_by(**criteria).first()
+        if found is None:
+            return None
+        self.invalidate(table, session)
+        return ReferenceRow(
+            {c.key: getattr(found, c.key) for c in sa_inspect(model).column_attrs}
+        )
+
+
+reference_data = ReferenceDataCache()
+
+for _spec in (
+    ReferenceTable("categories", "src.models.category:Category", ("name", "name_ar")),
+    ReferenceTable("warehouses", "src.models.inventory:Warehouse", ("code", "name")),
+    ReferenceTable("roles", "src.models.user:Role", ("code", "name")),
+    ReferenceTable(
+        "settings",
+        "src.models.settings:Setting",
+        ("key",),
+        transform=_typed_setting,
+        casefold=False,
+    ),
+    ReferenceTable("currencies", "src.models.supporting_models:Currency", ("code",)),
+):
+    reference_data.register(_spec)
+
+
+__all__ = [
+    "ReferenceDataCache",
+    "ReferenceRow",
+    "ReferenceSnapshot",
+    "ReferenceTable",
+    "reference_data",
+]
@@ -4,17 +4,27 @@
 P2.68: Scheduled Tasks (Cron) Service
 
 Background job scheduler using APScheduler.
+
+Every worker process runs its own scheduler; each fire goes through
+``job_coordinator`` (services/job_lease.py) so a job runs once per window
+across all workers, never overlaps itself, and leaves a run history.
 """
 
 import os
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Callable, Dict, Any, List, Optional
 from dataclasses import dataclass
 from functools import wraps
 
+from src.services.job_lease import job_coordinator, run_key_for
+
 logger = logging.getLogger(__name__)
 
+# Interval jobs without a start_date are anchored here, so every worker
+# fires them at the same times (e.g. on the hour for hourly jobs)
+INTERVAL_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
 
 @dataclass
 class ScheduledJob:
@@ -60,6 +70,7 @@ class TaskScheduler:
     def init_app(self, app):
         """Initialize with Flask app."""
         self.app = app
+        job_coordinator.init_app(app)
 
         try:
             from apscheduler.schedulers.background import BackgroundScheduler
@@ -97,6 +108,7 @@ class TaskScheduler:
         id: str,
         name: str = None,
         description: str = None,
+        shards: int = 1,
         **trigger_args,
     ):
         """
@@ -108,20 +120,48 @@ class TaskScheduler:
             id: Unique job ID
             name: Human-readable name
             description: Job description
+            shards: Split the job into N independently leased shards;
+                ``func(shard, shards)`` is called once per shard
             **trigger_args: Trigger-specific arguments
         """
         if not self.scheduler:
             logger.warning(f"P2.68: Scheduler not available, job {id} not added")
             return
 
-        # Wrap function with error handling
+        schedule = str(trigger_args)
+        window = self._run_window(trigger, trigger_args)
+        origin = None
+        if trigger == "interval":
+            origin = trigger_args.setdefault("start_date", INTERVAL_ORIGIN)
+            if not isinstance(origin, datetime):
+                origin = datetime.fromisoformat(str(origin))
+
+        # Wrap function with single-leader execution and error handling
         @wraps(func)
-        def wrapped_func():
+        def wrapped_func(run_key: Optional[str] = None):
+            # the scheduled slot, identical in every worker that fires it
+            run_key = run_key or run_key_for(datetime.utcnow(), window, origin)
             try:
                 with self.app.app_context():
-                    logger.info(f"P2.68: Running job {id}")
-                    func()
-                    self._jobs[id]["last_run"] = datetime.utcnow()
+                    if shards > 1:
+                        results = job_coordinator.run_sharded(
+                            id, func, shards, window=window, run_key=run_key
+                        )
+                    else:
+                        results = [
+                            job_coordinator.run(id, func, window=window, run_key=run_key)
+                        ]
+                    executed = [r for r in results if r.executed]
+                    if executed:
+                        logger.info(
+                            f"P2.68: Ran job {id} "
+                            f"({len(executed)}/{len(results)} shards here)"
+                        )
+                        self._jobs[id]["last_run"] = datetime.utcnow()
+                    else:
+                        logger.debug(
+                            f"P2.68: Skipped job {id}: {results[0].reason}"
+                        )
             except Exception as e:
                 logger.error(f"P2.68: Job {id} failed: {e}")
 
@@ -140,7 +180,8 @@ class TaskScheduler:
             "name": name or id,
             "description": description or "",
             "trigger": trigger,
-            "schedule": str(trigger_args),
+            "schedule": schedule,
+            "shards": shards,
             "last_run": None,
             "enabled": True,
         }
@@ -173,14 +214,36 @@ class TaskScheduler:
                 self._jobs[job_id]["enabled"] = True
             logger.info(f"P2.68: Resumed job {job_id}")
 
+    @staticmethod
+    def _run_window(trigger: str, trigger_args: Dict[str, Any]) -> float:
+        """
+        Seconds one run covers: the interval of interval jobs (anchored to
+        their start_date, so all workers fire the same slots), one minute
+        for cron and date jobs (every worker fires at the same minute).
+        """
+        if trigger == "interval":
+            seconds = timedelta(
+                weeks=trigger_args.get("weeks", 0),
+                days=trigger_args.get("days", 0),
+                hours=trigger_args.get("hours", 0),
+                minutes=trigger_args.get("minutes", 0),
+                seconds=trigger_args.get("seconds", 0),
+            ).total_seconds()
+            return seconds or 60
+        return 60
+
     def run_job_now(self, job_id: str):
-        """Run a job immediately."""
+        """Run a job immediately (still skipped while it is running elsewhere)."""
         if self.scheduler:
             job = self.scheduler.get_job(job_id)
             if job:
-                job.func()
+                job.func(run_key=f"manual:{datetime.utcnow().isoformat()}")
                 logger.info(f"P2.68: Manually triggered job {job_id}")
 
+    def get_job_history(self, job_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Latest runs of a job across all workers (newest first)."""
+        return job_coordinator.history(job_id, limit)
+
     def get_jobs(self) -> List[ScheduledJob]:
         """Get list of all scheduled jobs."""
         jobs = []
@@ -255,17 +318,29 @@ class TaskScheduler:
             hours=1,
         )
 
-        # Low stock alerts
+        # Low stock alerts (sharded by product id)
         self.add_job(
             func=self._job_low_stock_alerts,
             trigger="cron",
             id="low_stock_alerts",
             name="Low Stock Alerts",
             description="Sends alerts for low stock items",
+            shards=int(os.environ.get("LOW_STOCK_ALERT_SHARDS", 4)),
             hour=8,
             minute=0,
         )
 
+        # Rebuild the daily_sales rollup read by the sales charts
+        self.add_job(
+            func=self._job_refresh_daily_sales,
+            trigger="cron",
+            id="refresh_daily_sales",
+            name="Refresh Daily Sales",
+            description="Rebuilds the daily_sales rollup from invoices",
+            hour=1,
+            minute=30,
+        )
+
         # Cleanup audit logs
         self.add_job(
             func=self._job_cleanup_audit_logs,
@@ -314,14 +389,15 @@ class TaskScheduler:
 
         logger.info("P2.68: Token cleanup completed")
 
-    def _job_low_stock_alerts(self):
-        """Send low stock alerts."""
-        from src.models.product import Product
+    def _job_low_stock_alerts(self, shard: int = 0, shards: int = 1):
+        """Send low stock alerts for the products of one shard."""
+        from src.models.inventory import Product
         from src.services.notification_service import NotificationService
         from src.models.user import User
 
         low_stock = Product.query.filter(
-            Product.quantity <= Product.min_stock_level
+            Product.current_stock <= Product.min_stock_level,
+            Product.id % shards == shard,
         ).all()
 
         if low_stock:
@@ -333,12 +409,22 @@ class TaskScheduler:
                     NotificationService.notify_low_stock(
                         user_id=admin.id,
                         product_name=product.name,
-                        quantity=product.quantity,
+                        quantity=product.current_stock,
                         min_level=product.min_stock_level,
                     )
 
         logger.info(f"P2.68: Low stock alerts sent for {len(low_stock)} products")
 
+    def _job_refresh_daily_sales(self):
+        """Rebuild daily_sales (the last DAILY_SALES_REFRESH_DAYS days, or all)."""
+        from src.database import db
+        from src.services.time_series import rebuild_daily_sales
+
+        days = int(os.environ.get("DAILY_SALES_REFRESH_DAYS", 0)) or None
+        rows = rebuild_daily_sales(db.session, days)
+        db.session.commit()
+        logger.info(f"P2.68: Refreshed {rows} daily sales rows")
+
     def _job_cleanup_audit_logs(self):
         """Archive old audit logs."""
         from src.services.audit_service import AuditService
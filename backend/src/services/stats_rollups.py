@@ -0,0 +1,351 @@
+"""
+إحصائيات مجمعة مع تخزين مؤقت
+Cached statistics rollups
+
+Each statistics endpoint is served from a single grouped aggregation per
+entity (one scan of the table) and the result is cached until a write
+touches one of the tables it was computed from.
+
+Invalidation:
+- A session listener records the tables of new/dirty/deleted instances at
+  flush time and of ORM bulk UPDATE/DELETE statements, and bumps their
+  version on commit (rollback discards them).
+- Versions are kept per process; with STATS_CACHE_REDIS_URL they are kept
+  in Redis so a write in one worker invalidates every worker.
+- STATS_CACHE_TTL bounds staleness for writes made outside the ORM.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_TTL = float(os.environ.get("STATS_CACHE_TTL", 300))
+STATS_CACHE_REDIS_URL = os.environ.get("STATS_CACHE_REDIS_URL", "")
+
+
+class _LocalVersions:
+    """Table write versions of this process."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(t, 0) for t in tables)
+
+    def bump(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+class _RedisVersions:
+    """Table write versions shared by all workers."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.from_url(url)
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        values = self._client.mget([f"stats:version:{t}" for t in tables])
+        return tuple(int(v or 0) for v in values)
+
+    def bump(self, tables: Iterable[str]):
+        pipe = self._client.pipeline()
+        for table in tables:
+            pipe.incr(f"stats:version:{table}")
+        pipe.execute()
+
+
+class StatsCache:
+    """Computed rollups keyed by name, valid while their tables are unchanged."""
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL, versions=None):
+        self.ttl = ttl
+        self.versions = versions or _LocalVersions()
+        self._entries: Dict[str, Tuple[Tuple[int, ...], float, str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(
+        self, name: str, tables: Tuple[str, ...], compute: Callable[[], Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Return (data, meta); meta carries the freshness timestamp.
+
+        ``compute`` runs only when the cached value is missing, expired or
+        one of ``tables`` was written since it was computed.
+        """
+        try:
+            version = self.versions.get(tables)
+        except Exception as e:  # Redis down: fall back to TTL only
+            logger.warning(f"Stats version lookup failed: {e}")
+            version = None
+
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if (
+            entry is not None
+            and version is not None
+            and entry[0] == version
+            and now - entry[1] < self.ttl
+        ):
+            self.hits += 1
+            return entry[3], {
+                "generated_at": entry[2],
+                "age_seconds": round(now - entry[1], 3),
+                "cached": True,
+            }
+
+        self.misses += 1
+        data = compute()
+        generated_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._entries[name] = (version, now, generated_at, data)
+        return data, {"generated_at": generated_at, "age_seconds": 0.0, "cached": False}
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        tables = set(tables)
+        if not tables:
+            return
+        try:
+            self.versions.bump(tables)
+        except Exception as e:
+            logger.warning(f"Stats version bump failed: {e}")
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _make_cache() -> StatsCache:
+    if STATS_CACHE_REDIS_URL:
+        try:
+            return StatsCache(versions=_RedisVersions(STATS_CACHE_REDIS_URL))
+        except ImportError:
+            logger.warning("redis not installed; stats cache versions are per process")
+    return StatsCache()
+
+
+stats_cache = _make_cache()
+
+
+# ==================== Write tracking ====================
+
+_PENDING_KEY = "stats_rollups_tables"
+
+
+def _pending(session) -> set:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    tables = _pending(session)
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _pending(orm_execute_state.session).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        stats_cache.invalidate_tables(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ==================== Rollups ====================
+
+
+def _key(value):
+    return getattr(value, "value", value)
+
+
+def invoice_rollup(session, Invoice) -> Dict[str, Any]:
+    """One GROUP BY (invoice_type, status) scan of the invoices table."""
+    rows = session.execute(
+        select(
+            Invoice.invoice_type,
+            Invoice.status,
+            func.count(),
+            func.coalesce(func.sum(Invoice.total_amount), 0),
+            func.coalesce(func.sum(Invoice.paid_amount), 0),
+            func.coalesce(func.sum(Invoice.remaining_amount), 0),
+        ).group_by(Invoice.invoice_type, Invoice.status)
+    ).all()
+
+    by_type: Dict[str, int] = {}
+    by_status: Dict[str, int] = {}
+    amount_by_type: Dict[str, float] = {}
+    total = paid = remaining = 0.0
+    for invoice_type, status, count, amount, paid_sum, remaining_sum in rows:
+        invoice_type, status = _key(invoice_type), _key(status)
+        by_type[invoice_type] = by_type.get(invoice_type, 0) + count
+        by_status[status] = by_status.get(status, 0) + count
+        amount_by_type[invoice_type] = amount_by_type.get(invoice_type, 0.0) + float(
+            amount
+        )
+        paid += float(paid_sum)
+        remaining += float(remaining_sum)
+        total += count
+
+    return {
+        "total_invoices": int(total),
+        "by_type": {
+            "sales": by_type.get("sales", 0),
+            "purchase": by_type.get("purchase", 0),
+        },
+        "by_status": {
+            "draft": by_status.get("draft", 0),
+            "confirmed": by_status.get("confirmed", 0),
+            "paid": by_status.get("paid", 0),
+        },
+        "amounts": {
+            "total_sales": amount_by_type.get("sales", 0.0),
+            "total_purchases": amount_by_type.get("purchase", 0.0),
+            "total_paid": paid,
+            "total_remaining": remaining,
+        },
+    }
+
+
+def product_rollup(
+    session, Product, ProductType=None, Category=None
+) -> Dict[str, Any]:
+    """One GROUP BY (product_type, is_active, category_id) scan of products."""
+    group_cols = [Product.is_active]
+    if ProductType is not None and hasattr(Product, "product_type"):
+        group_cols.append(Product.product_type)
+    if hasattr(Product, "category_id"):
+        group_cols.append(Product.category_id)
+
+    columns = [*group_cols, func.count()]
+    has_stock = hasattr(Product, "current_stock")
+    if has_stock:
+        stock = Product.current_stock
+        columns.append(func.coalesce(func.sum(stock), 0))
+        if hasattr(Product, "min_quantity"):
+            columns.append(
+                func.sum(
+                    case(
+                        ((stock <= Product.min_quantity) & (stock > 0), 1), else_=0
+                    )
+                )
+            )
+            columns.append(func.sum(case((stock <= 0, 1), else_=0)))
+        if hasattr(Product, "cost_price"):
+            columns.append(func.coalesce(func.sum(Product.cost_price * stock), 0))
+
+    rows = session.execute(select(*columns).group_by(*group_cols)).all()
+
+    n_group = len(group_cols)
+    stats: Dict[str, Any] = {"total_products": 0, "active_products": 0}
+    by_type: Dict[str, int] = {}
+    by_category_id: Dict[Any, int] = {}
+    extra = [0.0] * (len(columns) - n_group - 1)
+    for row in rows:
+        group, count, values = row[:n_group], row[n_group], row[n_group + 1 :]
+        stats["total_products"] += count
+        if group[0]:
+            stats["active_products"] += count
+        if ProductType is not None and n_group > 1 and group[1] is not None:
+            key = _key(group[1])
+            by_type[key] = by_type.get(key, 0) + count
+        if hasattr(Product, "category_id") and group[-1] is not None:
+            by_category_id[group[-1]] = by_category_id.get(group[-1], 0) + count
+        for i, value in enumerate(values):
+            extra[i] += float(value or 0)
+
+    stats["inactive_products"] = stats["total_products"] - stats["active_products"]
+    if has_stock:
+        extra_iter = iter(extra)
+        stats["total_stock"] = next(extra_iter)
+        if hasattr(Product, "min_quantity"):
+            stats["low_stock_products"] = int(next(extra_iter))
+            stats["out_of_stock_products"] = int(next(extra_iter))
+        if hasattr(Product, "cost_price"):
+            stats["total_inventory_value"] = next(extra_iter)
+
+    if ProductType is not None and n_group > 1:
+        stats["by_type"] = {ptype.value: by_type.get(ptype.value, 0) for ptype in ProductType}
+
+    if Category is not None and by_category_id:
+        # categories is a small lookup table, not a second products scan
+        names = dict(
+            session.execute(
+                select(Category.id, Category.name).where(
+                    Category.id.in_(list(by_category_id))
+                )
+            ).all()
+        )
+        by_name: Dict[str, int] = {}
+        for category_id, count in by_category_id.items():
+            if category_id in names:
+                by_name[names[category_id]] = by_name.get(names[category_id], 0) + count
+        stats["by_category"] = [
+            {"category": name, "count": count} for name, count in by_name.items()
+        ]
+
+    return stats
+
+
+def invoice_stats(session, Invoice) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Cached invoice rollup: (data, meta)."""
+    return stats_cache.get_or_compute(
+        "invoices",
+        (Invoice.__tablename__,),
+        lambda: invoice_rollup(session, Invoice),
+    )
+
+
+def product_stats(
+    session, Product, ProductType=None, Category=None
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Cached product rollup: (data, meta)."""
+    tables = (Product.__tablename__,)
+    if Category is not None:
+        tables += (Category.__tablename__,)
+    return stats_cache.get_or_compute(
+        f"products:{Product.__tablename__}",
+        tables,
+        lambda: product_rollup(session, Product, ProductType, Category),
+    )
+
+
+__all__ = [
+    "StatsCache",
+    "stats_cache",
+    "invoice_rollup",
+    "product_rollup",
+    "invoice_stats",
+    "product_stats",
+    "STATS_CACHE_TTL",
+]
@@ -4,14 +4,21 @@
 P2.85: Tax Calculation System
 
 Flexible tax calculation service supporting multiple tax types.
+
+Tax rates are served from an in-memory registry loaded with one query and
+reloaded when a commit writes ``tax_configurations`` (or after
+TAX_REGISTRY_TTL seconds), so pricing N invoice lines costs no queries.
 """
 
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
 from decimal import Decimal, ROUND_HALF_UP
 from src.database import db
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -98,11 +105,201 @@ class TaxConfiguration(db.Model):
         }
 
 
+# =============================================================================
+# Tax Registry
+# =============================================================================
+
+TAX_REGISTRY_TTL = float(os.environ.get("TAX_REGISTRY_TTL", 300))
+TAX_TABLES = ("tax_configurations",)
+
+CENT = Decimal("0.01")
+_ZERO = Decimal("0")
+_ONE = Decimal("1")
+_HUNDRED = Decimal("100")
+
+# (rate, rate as a fraction, valid_from, valid_until)
+_Entry = Tuple[TaxRate, Decimal, Optional[datetime], Optional[datetime]]
+
+
+def _to_decimal(value) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value or 0)
+
+
+def _round(value: Decimal) -> Decimal:
+    """The single rounding policy: half-up to cents."""
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _load_configurations() -> List[Dict[str, Any]]:
+    """All active tax configurations in one flat query."""
+    table = TaxConfiguration.__table__
+    return [
+        dict(row)
+        for row in db.session.execute(
+            db.select(table).where(table.c.is_active.is_(True))
+        ).mappings()
+    ]
+
+
+class TaxRegistry:
+    """In-memory tax rates, reloaded when ``tax_configurations`` changes."""
+
+    def __init__(self, load=None, versions=None, ttl: float = TAX_REGISTRY_TTL):
+        if versions is None:
+            from src.services.stats_rollups import stats_cache
+
+            versions = stats_cache.versions
+        self._load = load or _load_configurations
+        self._versions = versions
+        self.ttl = ttl
+        self._entries: Optional[Dict[str, Tuple[_Entry, ...]]] = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _current_version(self):
+        try:
+            return self._versions.get(TAX_TABLES)
+        except Exception as e:  # Redis down: fall back to TTL only
+            logger.warning(f"Tax registry version lookup failed: {e}")
+            return None
+
+    def _fresh(self, version) -> bool:
+        return (
+            self._entries is not None
+            and version is not None
+            and version == self._version
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def entries(self) -> Dict[str, Tuple[_Entry, ...]]:
+        version = self._current_version()
+        if self._fresh(version):
+            return self._entries
+        with self._lock:
+            if not self._fresh(version):
+                self._entries = self._compile(self._load())
+                self._version = version
+                self._loaded_at = time.monotonic()
+                self.loads += 1
+        return self._entries
+
+    @staticmethod
+    def _compile(rows) -> Dict[str, Tuple[_Entry, ...]]:
+        entries: Dict[str, List[_Entry]] = {}
+        for row in rows:
+            rate = TaxRate(
+                code=row["code"],
+                name=row["name"],
+                name_ar=row.get("name_ar"),
+                rate=row["rate"],
+                is_inclusive=bool(row.get("is_inclusive")),
+                is_compound=bool(row.get("is_compound")),
+                apply_to=row.get("apply_to") or "all",
+            )
+            entries.setdefault(rate.code, []).append(
+                (
+                    rate,
+                    _to_decimal(rate.rate) / _HUNDRED,
+                    row.get("valid_from"),
+                    row.get("valid_until"),
+                )
+            )
+        # database rows take precedence over the defaults
+        for code, rate in DEFAULT_TAX_RATES.items():
+            entries.setdefault(code, []).append(
+                (rate, _to_decimal(rate.rate) / _HUNDRED, None, None)
+            )
+        return {code: tuple(items) for code, items in entries.items()}
+
+    @staticmethod
+    def _pick(entries: Tuple[_Entry, ...], at: datetime) -> Optional[_Entry]:
+        for entry in entries:
+            if entry[2] and at < entry[2]:
+                continue
+            if entry[3] and at > entry[3]:
+                continue
+            return entry
+        return None
+
+    def lookup(self, tax_code: str, at: Optional[datetime] = None) -> Optional[_Entry]:
+        entries = self.entries().get(tax_code)
+        if not entries:
+            return None
+        return self._pick(entries, at or datetime.utcnow())
+
+    def get(self, tax_code: str, at: Optional[datetime] = None) -> Optional[TaxRate]:
+        entry = self.lookup(tax_code, at)
+        return entry[0] if entry else None
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+
+
+tax_registry = TaxRegistry()
+
+
 # =============================================================================
 # Tax Calculation Service
 # =============================================================================
 
 
+@dataclass
+class LineTax:
+    """Exact per-line tax result (Decimal, rounded once)."""
+
+    subtotal: Decimal
+    tax: Decimal
+    total: Decimal
+    taxes: Dict[str, Decimal]
+
+
+@dataclass
+class _TaxPlan:
+    """Tax coefficients of one tax-code combination."""
+
+    taxes: List[Tuple[TaxRate, Decimal]]  # (rate, tax as a multiple of the net)
+    inclusive_factor: Decimal  # gross / net for the inclusive taxes
+    inclusive_codes: Tuple[str, ...]
+
+
+def _tax_plan(codes: Sequence[str], at: datetime) -> _TaxPlan:
+    """
+    Resolve codes into coefficients of the net amount.
+
+    Inclusive taxes are extracted from the price first, then exclusive
+    taxes are added; within each group simple taxes come before compound
+    ones, and a compound tax is charged on the net plus the taxes before it.
+    """
+    resolved = []
+    for code in codes:
+        entry = tax_registry.lookup(code, at)
+        if entry and entry[1]:
+            resolved.append(entry)
+    ordered = sorted(
+        resolved, key=lambda e: (not e[0].is_inclusive, e[0].is_compound)
+    )
+
+    taxes: List[Tuple[TaxRate, Decimal]] = []
+    accumulated = _ZERO
+    inclusive_factor = _ONE
+    inclusive_codes = []
+    for rate, fraction, _, _ in ordered:
+        coefficient = fraction * (_ONE + accumulated) if rate.is_compound else fraction
+        accumulated += coefficient
+        taxes.append((rate, coefficient))
+        if rate.is_inclusive:
+            inclusive_factor = _ONE + accumulated
+            inclusive_codes.append(rate.code)
+    return _TaxPlan(taxes, inclusive_factor, tuple(inclusive_codes))
+
+
 @dataclass
 class TaxBreakdown:
     """Breakdown of tax calculation."""
@@ -123,6 +320,7 @@ class TaxResult:
     total_tax: float
     total: float
     breakdown: List[TaxBreakdown]
+    lines: List[LineTax] = field(default_factory=list)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -156,90 +354,115 @@ class TaxService:
 
     @staticmethod
     def get_tax_rate(tax_code: str) -> Optional[TaxRate]:
-        """Get tax rate by code."""
-        # First check database
-        config = TaxConfiguration.query.filter_by(code=tax_code, is_active=True).first()
-
-        if config:
-            return TaxRate(
-                code=config.code,
-                name=config.name,
-                name_ar=config.name_ar,
-                rate=config.rate,
-                is_inclusive=config.is_inclusive,
-                is_compound=config.is_compound,
-                apply_to=config.apply_to,
-            )
-
-        # Fall back to defaults
-        return DEFAULT_TAX_RATES.get(tax_code)
+        """Get tax rate by code (database configuration, then defaults)."""
+        return tax_registry.get(tax_code)
 
     @staticmethod
-    def calculate_tax(
-        amount: float, tax_code: str = "VAT", quantity: int = 1
+    def calculate_batch(
+        items: Sequence[Dict[str, Any]],
+        default_tax_code: Optional[str] = "VAT",
+        at: Optional[datetime] = None,
     ) -> TaxResult:
         """
-        Calculate tax for an amount.
+        Calculate taxes for N lines in exact Decimal arithmetic.
 
         Args:
-            amount: Unit price or total amount
-            tax_code: Tax rate code to apply
-            quantity: Quantity (for unit price calculation)
+            items: Lines with 'amount' (unit price), 'quantity', optional
+                'discount' (line amount) and 'tax_code' (a code or a list
+                of codes for stacked / compound taxes)
+            default_tax_code: Code for lines without 'tax_code'
+            at: Date the rates must be valid at (default now)
 
         Returns:
-            TaxResult with breakdown
+            TaxResult with consolidated breakdown and exact per-line results;
+            every amount is rounded once, half-up to cents, and the totals
+            are the sums of the rounded lines.
         """
-        tax_rate = TaxService.get_tax_rate(tax_code)
-
-        if not tax_rate or tax_rate.rate == 0:
-            return TaxResult(
-                subtotal=amount * quantity,
-                total_tax=0,
-                total=amount * quantity,
-                breakdown=[],
-            )
-
-        base_amount = amount * quantity
+        at = at or datetime.utcnow()
+        plans: Dict[Tuple[str, ...], _TaxPlan] = {}
+        taxable: Dict[str, Decimal] = {}
+        collected: Dict[str, Decimal] = {}
+        rates: Dict[str, TaxRate] = {}
+        lines: List[LineTax] = []
+        total_subtotal = _ZERO
+        total_tax = _ZERO
 
-        if tax_rate.is_inclusive:
-            # Price includes tax
-            tax_amount = base_amount - (base_amount / (1 + tax_rate.rate / 100))
-            subtotal = base_amount - tax_amount
-        else:
-            # Tax on top
-            subtotal = base_amount
-            tax_amount = base_amount * (tax_rate.rate / 100)
-
-        # Round to 2 decimal places
-        tax_amount = float(
-            Decimal(str(tax_amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        )
-        subtotal = float(
-            Decimal(str(subtotal)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        )
+        for item in items:
+            codes = item.get("tax_code", default_tax_code)
+            key = tuple(codes) if isinstance(codes, (list, tuple)) else ((codes,) if codes else ())
+            plan = plans.get(key)
+            if plan is None:
+                plan = plans[key] = _tax_plan(key, at)
+
+            gross = _to_decimal(item.get("amount", 0)) * _to_decimal(
+                item.get("quantity", 1)
+            ) - _to_decimal(item.get("discount", 0))
+            net = gross / plan.inclusive_factor if plan.inclusive_codes else gross
+
+            taxes = {}
+            for rate, coefficient in plan.taxes:
+                taxes[rate.code] = taxes.get(rate.code, _ZERO) + _round(net * coefficient)
+            line_tax = sum(taxes.values(), _ZERO)
+            if plan.inclusive_codes:
+                # the price stays exact; the net absorbs the rounding
+                subtotal = _round(gross) - sum(
+                    (taxes[code] for code in plan.inclusive_codes), _ZERO
+                )
+            else:
+                subtotal = _round(gross)
+            total = subtotal + line_tax
+            lines.append(LineTax(subtotal, line_tax, total, taxes))
+
+            total_subtotal += subtotal
+            total_tax += line_tax
+            for rate, _ in plan.taxes:
+                rates.setdefault(rate.code, rate)
+            for code, amount in taxes.items():
+                taxable[code] = taxable.get(code, _ZERO) + subtotal
+                collected[code] = collected.get(code, _ZERO) + amount
 
         breakdown = [
             TaxBreakdown(
-                tax_code=tax_rate.code,
-                tax_name=tax_rate.name_ar or tax_rate.name,
-                rate=tax_rate.rate,
-                taxable_amount=subtotal,
-                tax_amount=tax_amount,
-                is_inclusive=tax_rate.is_inclusive,
+                tax_code=code,
+                tax_name=rates[code].name_ar or rates[code].name,
+                rate=rates[code].rate,
+                taxable_amount=float(taxable[code]),
+                tax_amount=float(amount),
+                is_inclusive=rates[code].is_inclusive,
             )
+            for code, amount in collected.items()
         ]
-
         return TaxResult(
-            subtotal=subtotal,
-            total_tax=tax_amount,
-            total=subtotal + tax_amount,
+            subtotal=float(total_subtotal),
+            total_tax=float(total_tax),
+            total=float(total_subtotal + total_tax),
             breakdown=breakdown,
+            lines=lines,
+        )
+
+    @staticmethod
+    def calculate_tax(
+        amount: float, tax_code: str = "VAT", quantity: int = 1
+    ) -> TaxResult:
+        """
+        Calculate tax for an amount.
+
+        Args:
+            amount: Unit price or total amount
+            tax_code: Tax rate code to apply
+            quantity: Quantity (for unit price calculation)
+
+        Returns:
+            TaxResult with breakdown
+        """
+        return TaxService.calculate_batch(
+            [{"amount": amount, "quantity": quantity, "tax_code": tax_code}]
         )
 
     @staticmethod
     def calculate_line_items(
         items: List[Dict[str, Any]], default_tax_code: str = "VAT"
-    ) -> Dict[str, Any]:
+    ) -> TaxResult:
         """
         Calculate taxes for multiple line items.
 
@@ -250,42 +473,7 @@ class TaxService:
         Returns:
             Combined tax calculation result
         """
-        total_subtotal = 0
-        total_tax = 0
-        all_breakdowns = []
-
-        for item in items:
-            amount = item.get("amount", 0)
-            quantity = item.get("quantity", 1)
-            tax_code = item.get("tax_code", default_tax_code)
-
-            result = TaxService.calculate_tax(amount, tax_code, quantity)
-
-            total_subtotal += result.subtotal
-            total_tax += result.total_tax
-            all_breakdowns.extend(result.breakdown)
-
-        # Consolidate breakdowns by tax code
-        consolidated = {}
-        for bd in all_breakdowns:
-            if bd.tax_code not in consolidated:
-                consolidated[bd.tax_code] = TaxBreakdown(
-                    tax_code=bd.tax_code,
-                    tax_name=bd.tax_name,
-                    rate=bd.rate,
-                    taxable_amount=0,
-                    tax_amount=0,
-                    is_inclusive=bd.is_inclusive,
-                )
-            consolidated[bd.tax_code].taxable_amount += bd.taxable_amount
-            consolidated[bd.tax_code].tax_amount += bd.tax_amount
-
-        return TaxResult(
-            subtotal=total_subtotal,
-            total_tax=total_tax,
-            total=total_subtotal + total_tax,
-            breakdown=list(consolidated.values()),
-        )
+        return TaxService.calculate_batch(items, default_tax_code)
 
     @staticmethod
     def extract_tax_from_inclusive(
@@ -318,6 +506,9 @@ class TaxService:
 
 __all__ = [
     "TaxService",
+    "TaxRegistry",
+    "tax_registry",
+    "LineTax",
     "TaxConfiguration",
     "TaxRate",
     "TaxResult",
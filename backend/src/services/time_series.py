@@ -0,0 +1,449 @@
+"""
+سلاسل زمنية للتقارير والرسوم البيانية
+Time-bucketed report series
+
+Series are read with half-open ranges (``start <= column < end``) on the raw,
+indexed date column, so the database can use the index instead of evaluating
+``DATE(column)`` on every row. Rows are grouped by a dialect-aware bucket
+expression (``strftime``/``date`` on SQLite, ``date_trunc`` on PostgreSQL;
+other dialects group per day and are rolled up here) and the gaps are filled
+with zero-valued buckets, so charts always get one point per bucket.
+
+Sales series read from the ``daily_sales`` rollup when the table exists (see
+``refresh_daily_sales``) and holds an unbroken run of days from the start of
+the range, and from ``invoices`` for the rest. The scheduler's nightly
+``refresh_daily_sales`` job (services/scheduler.py) builds the rollup with
+``rebuild_daily_sales``; set ``DAILY_SALES_REFRESH_DAYS`` to rebuild only the
+most recent days, or call it from ``flask shell`` for a one-off backfill. Invoice writes made through the
+ORM rebuild the rollup rows of their days in the same transaction; bulk
+UPDATE/DELETE statements on ``invoices`` drop the rollup until the next
+refresh.
+"""
+
+import threading
+import weakref
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import DateTime, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from src.database import db
+from src.models.invoice_unified import Invoice, InvoiceStatus, InvoiceType
+
+GRANULARITIES = ("day", "week", "month")
+
+MONTH_LABELS = (
+    "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec",
+)
+
+DateLike = Union[date, datetime, str]
+
+
+class DailySales(db.Model):
+    """
+    ملخص المبيعات اليومي
+    Pre-aggregated invoice totals per day and invoice type.
+    """
+
+    __tablename__ = "daily_sales"
+
+    day = db.Column(db.Date, primary_key=True)
+    invoice_type = db.Column(db.String(20), primary_key=True)
+    total_amount = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ==================== Buckets ====================
+
+
+def _check(granularity: str) -> str:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    return granularity
+
+
+def as_date(value: DateLike) -> date:
+    """Normalise a bucket key returned by any dialect to a ``date``."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def floor_bucket(day: DateLike, granularity: str) -> date:
+    """First day of the bucket holding ``day`` (weeks start on Monday)."""
+    day = as_date(day)
+    if _check(granularity) == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, granularity: str) -> date:
+    """First day of the bucket after the one starting at ``start``."""
+    if _check(granularity) == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_starts(start: date, end: date, granularity: str) -> List[date]:
+    """Every bucket overlapping the half-open range ``[start, end)``."""
+    buckets = []
+    current = floor_bucket(start, granularity)
+    while current < end:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def bucket_label(start: date, granularity: str) -> str:
+    """Chart label: ``2026-03-01``, ``W9/2026`` (ISO week) or ``Mar 2026``."""
+    if _check(granularity) == "week":
+        year, week, _ = start.isocalendar()
+        return f"W{week}/{year}"
+    if granularity == "month":
+        return f"{MONTH_LABELS[start.month - 1]} {start.year}"
+    return start.isoformat()
+
+
+def bucket_expression(column, granularity: str, dialect: str):
+    """
+    SQL expression for the bucket start of ``column``.
+
+    Returns ``None`` when the dialect has no cheap truncation; callers then
+    group per day and roll the days up in Python.
+    """
+    _check(granularity)
+    if dialect == "sqlite":
+        if granularity == "week":
+            # back to the Monday on or before the day
+            return func.date(column, "-6 days", "weekday 1")
+        if granularity == "month":
+            return func.strftime("%Y-%m-01", column)
+        return func.date(column)
+    if dialect == "postgresql":
+        return func.date_trunc(granularity, column)
+    return None
+
+
+def half_open(column, start: date, end: date):
+    """``start <= column < end`` against the raw column (index friendly)."""
+    if isinstance(column.type, DateTime):
+        start = datetime.combine(start, time.min)
+        end = datetime.combine(end, time.min)
+    return (column >= start) & (column < end)
+
+
+def _dialect(session) -> str:
+    return session.get_bind().dialect.name
+
+
+def grouped_totals(
+    session,
+    column,
+    measures: Dict[str, Any],
+    start: date,
+    end: date,
+    granularity: str,
+    filters: Sequence[Any] = (),
+) -> Dict[date, Dict[str, float]]:
+    """
+    One grouped query: additive ``measures`` (SUM/COUNT expressions) per
+    bucket of ``column`` inside ``[start, end)``. Only non-empty buckets.
+    """
+    bucket = bucket_expression(column, granularity, _dialect(session))
+    rollup = bucket is None
+    if rollup:
+        bucket = func.date(column)
+    query = select(
+        bucket.label("bucket"),
+        *(func.coalesce(expr, 0).label(name) for name, expr in measures.items()),
+    )
+    query = query.where(half_open(column, start, end), *filters).group_by(bucket)
+
+    totals: Dict[date, Dict[str, float]] = {}
+    for row in session.execute(query).mappings():
+        key = floor_bucket(row["bucket"], granularity) if rollup else as_date(row["bucket"])
+        values = totals.setdefault(key, dict.fromkeys(measures, 0.0))
+        for name in measures:
+            values[name] += float(row[name] or 0)
+    return totals
+
+
+def fill_gaps(
+    totals: Dict[date, Dict[str, float]],
+    start: date,
+    end: date,
+    granularity: str,
+    measures: Iterable[str],
+) -> List[Dict[str, Any]]:
+    """One point per bucket of ``[start, end)``, zero where nothing was sold."""
+    zero = dict.fromkeys(measures, 0.0)
+    return [
+        {
+            "bucket": day.isoformat(),
+            "label": bucket_label(day, granularity),
+            **{name: round(value, 2) for name, value in totals.get(day, zero).items()},
+        }
+        for day in bucket_starts(start, end, granularity)
+    ]
+
+
+# ==================== Sales series ====================
+
+_rollup_tables: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_rollup_lock = threading.Lock()
+
+
+def _has_rollup(session) -> bool:
+    engine = session.get_bind()
+    engine = getattr(engine, "engine", engine)
+    with _rollup_lock:
+        if engine not in _rollup_tables:
+            # the session's own connection: checking out another one could reset
+            # its pending transaction (one shared connection on in-memory SQLite)
+            _rollup_tables[engine] = inspect(session.connection()).has_table(
+                DailySales.__tablename__
+            )
+        return _rollup_tables[engine]
+
+
+def _type_value(invoice_type: Union[InvoiceType, str]) -> str:
+    return invoice_type.value if isinstance(invoice_type, InvoiceType) else invoice_type
+
+
+def _invoice_totals(session, start, end, granularity, invoice_type):
+    return grouped_totals(
+        session,
+        Invoice.invoice_date,
+        {"total": func.sum(Invoice.total_amount), "count": func.count(Invoice.id)},
+        start,
+        end,
+        granularity,
+        filters=(
+            Invoice.invoice_type == InvoiceType(_type_value(invoice_type)),
+            Invoice.status != InvoiceStatus.CANCELLED,
+        ),
+    )
+
+
+def _rollup_covered_until(session, start, end, invoice_type) -> Optional[date]:
+    """
+    Last day of the rollup's run of days from ``start``, or None when the
+    rollup does not hold every day from ``start`` up to its last day.
+    """
+    if not _has_rollup(session):
+        return None
+    first, last, days = session.execute(
+        select(
+            func.min(DailySales.day), func.max(DailySales.day), func.count()
+        ).where(
+            DailySales.invoice_type == _type_value(invoice_type),
+            half_open(DailySales.day, start, end),
+        )
+    ).one()
+    if first is None or as_date(first) != start:
+        return None
+    last = as_date(last)
+    return last if (last - start).days + 1 == days else None
+
+
+def sales_totals(
+    session,
+    start: date,
+    end: date,
+    granularity: str = "day",
+    invoice_type: Union[InvoiceType, str] = InvoiceType.SALES,
+) -> Dict[date, Dict[str, float]]:
+    """
+    ``{bucket_start: {"total", "count"}}`` for non-cancelled invoices in
+    ``[start, end)``; days covered by ``daily_sales`` are read from it.
+    """
+    covered = _rollup_covered_until(session, start, end, invoice_type)
+    if covered is None:
+        return _invoice_totals(session, start, end, granularity, invoice_type)
+
+    split = covered + timedelta(days=1)
+    totals = grouped_totals(
+        session,
+        DailySales.day,
+        {
+            "total": func.sum(DailySales.total_amount),
+            "count": func.sum(DailySales.invoice_count),
+        },
+        start,
+        split,
+        granularity,
+        filters=(DailySales.invoice_type == _type_value(invoice_type),),
+    )
+    if split < end:
+        for key, values in _invoice_totals(
+            session, split, end, granularity, invoice_type
+        ).items():
+            merged = totals.setdefault(key, {"total": 0.0, "count": 0.0})
+            for name, value in values.items():
+                merged[name] += value
+    return totals
+
+
+def sales_series(
+    session,
+    start: date,
+    end: date,
+    granularity: str = "day",
+    invoice_type: Union[InvoiceType, str] = InvoiceType.SALES,
+) -> List[Dict[str, Any]]:
+    """Gap-filled sales points (``bucket``, ``label``, ``total``, ``count``)."""
+    totals = sales_totals(session, start, end, granularity, invoice_type)
+    return fill_gaps(totals, start, end, granularity, ("total", "count"))
+
+
+def period_total(
+    session,
+    start: date,
+    end: date,
+    invoice_type: Union[InvoiceType, str] = InvoiceType.SALES,
+) -> float:
+    """Total of the invoices in ``[start, end)``."""
+    return round(
+        sum(v["total"] for v in sales_totals(session, start, end, "month", invoice_type).values()),
+        2,
+    )
+
+
+def refresh_daily_sales(session, start: date, end: date) -> int:
+    """
+    Rebuild the ``daily_sales`` rows of ``[start, end)`` from ``invoices``.
+
+    Every day and invoice type gets a row, zero when nothing was invoiced, so
+    a run of days is covered when it has one row per day. Returns the rows
+    written.
+    """
+    DailySales.__table__.create(session.connection(), checkfirst=True)
+    days = bucket_starts(start, end, "day")
+    types = [t.value for t in InvoiceType]
+    totals = {
+        t: _invoice_totals(session, start, end, "day", t) for t in types
+    }
+    session.execute(
+        DailySales.__table__.delete().where(half_open(DailySales.day, start, end))
+    )
+    now = datetime.utcnow()
+    rows = [
+        {
+            "day": day,
+            "invoice_type": t,
+            "total_amount": round(totals[t].get(day, {}).get("total", 0.0), 2),
+            "invoice_count": int(totals[t].get(day, {}).get("count", 0)),
+            "refreshed_at": now,
+        }
+        for day in days
+        for t in types
+    ]
+    if rows:
+        session.execute(DailySales.__table__.insert(), rows)
+    engine = session.get_bind()
+    with _rollup_lock:
+        _rollup_tables[getattr(engine, "engine", engine)] = True
+    return len(rows)
+
+
+def rebuild_daily_sales(session, days: Optional[int] = None) -> int:
+    """
+    Refresh ``daily_sales`` up to today: the last ``days`` days, or every
+    day since the first invoice. Returns the rows written (not committed).
+    """
+    end = date.today() + timedelta(days=1)
+    if days:
+        start = end - timedelta(days=days)
+    else:
+        first = session.execute(select(func.min(Invoice.invoice_date))).scalar()
+        if first is None:
+            return 0
+        start = first.date() if isinstance(first, datetime) else first
+    return refresh_daily_sales(session, start, end)
+
+
+# ==================== Rollup upkeep ====================
+
+_DIRTY_DAYS_KEY = "time_series_invoice_days"
+_BULK_WRITE_KEY = "time_series_invoice_bulk"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_invoice_days(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Invoice):
+            # old and new invoice_date of moved invoices
+            history = inspect(instance).attrs.invoice_date.history
+            session.info.setdefault(_DIRTY_DAYS_KEY, set()).update(
+                as_date(day) for day in history.sum() if day is not None
+            )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_invoice_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is Invoice:
+            orm_execute_state.session.info[_BULK_WRITE_KEY] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_invoice_days(session):
+    """Rebuild the rollup rows of the days whose invoices were written."""
+    session.flush()  # commit flushes next anyway; track its invoices first
+    if not (session.info.get(_DIRTY_DAYS_KEY) or session.info.get(_BULK_WRITE_KEY)):
+        return
+    days = session.info.pop(_DIRTY_DAYS_KEY, set())
+    bulk = session.info.pop(_BULK_WRITE_KEY, False)
+    if not _has_rollup(session):
+        return
+    if bulk:
+        # unknown days: read invoices until the next refresh_daily_sales
+        session.execute(DailySales.__table__.delete())
+        return
+    rolled = session.execute(
+        select(DailySales.day).where(DailySales.day.in_(days)).distinct()
+    ).scalars()
+    for day in sorted(as_date(d) for d in rolled):
+        refresh_daily_sales(session, day, day + timedelta(days=1))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invoice_days(session):
+    session.info.pop(_DIRTY_DAYS_KEY, None)
+    session.info.pop(_BULK_WRITE_KEY, None)
+
+
+def inclusive_range(start: date, last: date) -> Tuple[date, date]:
+    """``(start, last)`` inclusive dates as a half-open ``(start, last + 1 day)``."""
+    return start, last + timedelta(days=1)
+
+
+__all__ = [
+    "GRANULARITIES",
+    "DailySales",
+    "as_date",
+    "bucket_expression",
+    "bucket_label",
+    "bucket_starts",
+    "fill_gaps",
+    "floor_bucket",
+    "grouped_totals",
+    "half_open",
+    "inclusive_range",
+    "next_bucket",
+    "period_total",
+    "rebuild_daily_sales",
+    "refresh_daily_sales",
+    "sales_series",
+    "sales_totals",
+]
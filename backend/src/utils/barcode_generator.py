@@ -4,16 +4,139 @@
 P2.60: Barcode and QR Code Generation
 
 Utilities for generating barcodes and QR codes for products.
+
+Rendered images are kept in a content-keyed LRU cache (data + type +
+options -> bytes) whose key doubles as the HTTP ETag, and label sheets
+(PDF / PNG pages) for thousands of products are rendered in a worker
+pool and streamed page by page.
 """
 
 import io
+import os
 import base64
+import hashlib
 import logging
-from typing import Optional, Tuple
-from dataclasses import dataclass
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from dataclasses import astuple, dataclass
 
 logger = logging.getLogger(__name__)
 
+BARCODE_CACHE_MAX_BYTES = int(
+    os.environ.get("BARCODE_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+)
+LABEL_WORKERS = int(os.environ.get("LABEL_WORKERS", min(8, os.cpu_count() or 2)))
+LABEL_SHEET_MAX_ITEMS = int(os.environ.get("LABEL_SHEET_MAX_ITEMS", 2000))
+
+
+# =============================================================================
+# Render Cache
+# =============================================================================
+
+
+class RenderCache:
+    """Rendered images keyed by their content, evicted least recently used."""
+
+    def __init__(self, max_bytes: int = BARCODE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Stable key of the render inputs; also used as the ETag."""
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        # render outside the lock; a concurrent miss renders the same bytes
+        data = render()
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries and len(data) <= self.max_bytes:
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+render_cache = RenderCache()
+
+
+@lru_cache(maxsize=None)
+def _barcode_lib():
+    """Import python-barcode once."""
+    try:
+        import barcode
+        from barcode.writer import ImageWriter, SVGWriter
+    except ImportError:
+        logger.error(
+            "python-barcode not installed. Install with: pip install python-barcode[images]"
+        )
+        raise ImportError("python-barcode required for barcode generation")
+    return barcode, ImageWriter, SVGWriter
+
+
+@lru_cache(maxsize=None)
+def _qrcode_lib():
+    """Import qrcode once."""
+    try:
+        import qrcode
+        from qrcode.constants import (
+            ERROR_CORRECT_L,
+            ERROR_CORRECT_M,
+            ERROR_CORRECT_Q,
+            ERROR_CORRECT_H,
+        )
+    except ImportError:
+        logger.error("qrcode not installed. Install with: pip install qrcode[pil]")
+        raise ImportError("qrcode required for QR code generation")
+    levels = {
+        "L": ERROR_CORRECT_L,
+        "M": ERROR_CORRECT_M,
+        "Q": ERROR_CORRECT_Q,
+        "H": ERROR_CORRECT_H,
+    }
+    return qrcode, levels
+
+
+_writers = threading.local()
+
+
+def _image_writer():
+    """One ImageWriter per thread (writers keep per-render state)."""
+    writer = getattr(_writers, "image", None)
+    if writer is None:
+        writer = _writers.image = _barcode_lib()[1]()
+    return writer
+
 
 @dataclass
 class BarcodeConfig:
@@ -69,42 +192,33 @@ class BarcodeGenerator:
         Returns:
             Barcode image as bytes
         """
-        try:
-            import barcode
-            from barcode.writer import ImageWriter
-        except ImportError:
-            logger.error(
-                "python-barcode not installed. Install with: pip install python-barcode[images]"
-            )
-            raise ImportError("python-barcode required for barcode generation")
+        return self.render(data, barcode_type, config)[0]
 
+    def render(
+        self, data: str, barcode_type: str = "code128", config: BarcodeConfig = None
+    ) -> Tuple[bytes, str]:
+        """Generate a barcode image through the render cache: (bytes, etag)."""
         cfg = config or self.config
+        options = {
+            "module_width": 0.2,
+            "module_height": 15,
+            "font_size": cfg.font_size,
+            "text_distance": 5,
+            "quiet_zone": 6.5,
+            "write_text": cfg.include_text,
+        }
+        key = RenderCache.key("barcode", barcode_type, data, sorted(options.items()))
 
-        # Get barcode class
-        barcode_class = barcode.get_barcode_class(barcode_type)
-
-        # Configure writer
-        writer = ImageWriter()
-
-        # Generate barcode
-        barcode_obj = barcode_class(data, writer=writer)
-
-        # Write to bytes
-        output = io.BytesIO()
-        barcode_obj.write(
-            output,
-            options={
-                "module_width": 0.2,
-                "module_height": 15,
-                "font_size": cfg.font_size,
-                "text_distance": 5,
-                "quiet_zone": 6.5,
-                "write_text": cfg.include_text,
-            },
-        )
-        output.seek(0)
+        def render() -> bytes:
+            barcode = _barcode_lib()[0]
+            barcode_obj = barcode.get_barcode_class(barcode_type)(
+                data, writer=_image_writer()
+            )
+            output = io.BytesIO()
+            barcode_obj.write(output, options=options)
+            return output.getvalue()
 
-        return output.getvalue()
+        return render_cache.get_or_render(key, render), key
 
     def generate_base64(
         self, data: str, barcode_type: str = "code128", config: BarcodeConfig = None
@@ -115,20 +229,18 @@ class BarcodeGenerator:
 
     def generate_svg(self, data: str, barcode_type: str = "code128") -> str:
         """Generate barcode as SVG string."""
-        try:
-            import barcode
-            from barcode.writer import SVGWriter
-        except ImportError:
-            raise ImportError("python-barcode required for barcode generation")
+        barcode, _, SVGWriter = _barcode_lib()
 
-        barcode_class = barcode.get_barcode_class(barcode_type)
-        barcode_obj = barcode_class(data, writer=SVGWriter())
-
-        output = io.BytesIO()
-        barcode_obj.write(output)
-        output.seek(0)
+        def render() -> bytes:
+            barcode_obj = barcode.get_barcode_class(barcode_type)(
+                data, writer=SVGWriter()
+            )
+            output = io.BytesIO()
+            barcode_obj.write(output)
+            return output.getvalue()
 
-        return output.getvalue().decode("utf-8")
+        key = RenderCache.key("barcode-svg", barcode_type, data)
+        return render_cache.get_or_render(key, render).decode("utf-8")
 
     @staticmethod
     def validate_ean13(data: str) -> bool:
@@ -180,52 +292,42 @@ class QRCodeGenerator:
         Returns:
             QR code image as bytes
         """
-        try:
-            import qrcode
-            from qrcode.constants import (
-                ERROR_CORRECT_L,
-                ERROR_CORRECT_M,
-                ERROR_CORRECT_Q,
-                ERROR_CORRECT_H,
-            )
-        except ImportError:
-            logger.error("qrcode not installed. Install with: pip install qrcode[pil]")
-            raise ImportError("qrcode required for QR code generation")
+        return self.render(data, config)[0]
 
+    def render(self, data: str, config: QRCodeConfig = None) -> Tuple[bytes, str]:
+        """Generate a QR code through the render cache: (bytes, etag)."""
         cfg = config or self.config
+        key = RenderCache.key("qr", data, astuple(cfg))
 
-        # Map error correction levels
-        error_levels = {
-            "L": ERROR_CORRECT_L,
-            "M": ERROR_CORRECT_M,
-            "Q": ERROR_CORRECT_Q,
-            "H": ERROR_CORRECT_H,
-        }
+        def render() -> bytes:
+            qrcode, error_levels = _qrcode_lib()
 
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=error_levels.get(cfg.error_correction, ERROR_CORRECT_M),
-            box_size=10,
-            border=cfg.border,
-        )
+            # Create QR code
+            qr = qrcode.QRCode(
+                version=1,
+                error_correction=error_levels.get(
+                    cfg.error_correction, error_levels["M"]
+                ),
+                box_size=10,
+                border=cfg.border,
+            )
 
-        qr.add_data(data)
-        qr.make(fit=True)
+            qr.add_data(data)
+            qr.make(fit=True)
 
-        # Create image
-        img = qr.make_image(fill_color=cfg.fill_color, back_color=cfg.back_color)
+            # Create image
+            img = qr.make_image(fill_color=cfg.fill_color, back_color=cfg.back_color)
 
-        # Resize if needed
-        if cfg.size != 200:
-            img = img.resize((cfg.size, cfg.size))
+            # Resize if needed
+            if cfg.size != 200:
+                img = img.resize((cfg.size, cfg.size))
 
-        # Write to bytes
-        output = io.BytesIO()
-        img.save(output, format=cfg.format)
-        output.seek(0)
+            # Write to bytes
+            output = io.BytesIO()
+            img.save(output, format=cfg.format)
+            return output.getvalue()
 
-        return output.getvalue()
+        return render_cache.get_or_render(key, render), key
 
     def generate_base64(self, data: str, config: QRCodeConfig = None) -> str:
         """Generate QR code and return as base64 string."""
@@ -299,6 +401,268 @@ class QRCodeGenerator:
         return self.generate(data)
 
 
+# =============================================================================
+# Label Sheets
+# =============================================================================
+
+_MM_PER_INCH = 25.4
+_PT_PER_INCH = 72
+
+
+@dataclass
+class LabelSheetConfig:
+    """Layout of a label sheet page."""
+
+    columns: int = 3
+    rows: int = 8
+    page_width_mm: float = 210  # A4
+    page_height_mm: float = 297
+    margin_mm: float = 8
+    dpi: int = 200
+    barcode_type: str = "code128"
+    show_price: bool = True
+
+    @property
+    def per_page(self) -> int:
+        return self.columns * self.rows
+
+    def pixels(self, mm: float) -> int:
+        return int(round(mm / _MM_PER_INCH * self.dpi))
+
+
+@dataclass
+class LabelItem:
+    """One shelf label."""
+
+    code: str
+    name: str = ""
+    price: Optional[float] = None
+
+
+class LabelSheetRenderer:
+    """
+    Render label sheets in a worker pool.
+
+    Labels of upcoming pages are rendered ahead in the pool while earlier
+    pages are composed and streamed, so memory stays bounded by a few
+    pages regardless of the number of labels.
+    """
+
+    def __init__(
+        self,
+        config: LabelSheetConfig = None,
+        generator: BarcodeGenerator = None,
+        workers: int = LABEL_WORKERS,
+    ):
+        self.config = config or LabelSheetConfig()
+        self.generator = generator or BarcodeGenerator()
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # a pool created before fork() has no threads in the child
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="labels"
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def page_count(self, n_items: int) -> int:
+        return max(1, -(-n_items // self.config.per_page))
+
+    def _cell_size(self) -> Tuple[int, int]:
+        cfg = self.config
+        margin = cfg.pixels(cfg.margin_mm)
+        width = (cfg.pixels(cfg.page_width_mm) - 2 * margin) // cfg.columns
+        height = (cfg.pixels(cfg.page_height_mm) - 2 * margin) // cfg.rows
+        return width, height
+
+    def render_label(self, item: LabelItem):
+        """Render one label cell as a grayscale image."""
+        from PIL import Image, ImageDraw, ImageFont
+
+        width, height = self._cell_size()
+        cell = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(cell)
+        font = _label_font(max(10, height // 10))
+        pad = max(2, width // 40)
+        line = font.size + pad if hasattr(font, "size") else 14
+
+        top = pad
+        if item.name:
+            draw.text((pad, top), _fit_text(draw, item.name, font, width - 2 * pad),
+                      fill=0, font=font)
+            top += line
+        bottom = height - pad
+        if self.config.show_price and item.price is not None:
+            bottom -= line
+            draw.text((pad, bottom), f"{item.price:.2f}", fill=0, font=font)
+
+        try:
+            png = self.generator.generate(item.code, self.config.barcode_type)
+        except Exception as e:  # invalid data for the type: fall back to code128
+            logger.warning(f"Label barcode for {item.code!r} failed: {e}")
+            png = self.generator.generate(item.code, "code128")
+        with Image.open(io.BytesIO(png)) as img:
+            barcode_img = img.convert("L")
+        box_w, box_h = width - 2 * pad, max(1, bottom - top - pad)
+        scale = min(box_w / barcode_img.width, box_h / barcode_img.height)
+        size = (max(1, int(barcode_img.width * scale)), max(1, int(barcode_img.height * scale)))
+        cell.paste(
+            barcode_img.resize(size, Image.NEAREST),
+            ((width - size[0]) // 2, top + (box_h - size[1]) // 2),
+        )
+        return cell
+
+    def pages(self, items: Iterable[LabelItem], prefetch_pages: int = 2) -> Iterator:
+        """Yield page images; labels are rendered ahead in the worker pool."""
+        from PIL import Image
+
+        cfg = self.config
+        per_page = cfg.per_page
+        pool = self._pool()
+        margin = cfg.pixels(cfg.margin_mm)
+        cell_w, cell_h = self._cell_size()
+        page_size = (cfg.pixels(cfg.page_width_mm), cfg.pixels(cfg.page_height_mm))
+
+        pending: List = []
+        iterator = iter(items)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < per_page * prefetch_pages:
+                item = next(iterator, None)
+                if item is None:
+                    exhausted = True
+                    break
+                pending.append(pool.submit(self.render_label, item))
+            if not pending:
+                return
+            page = Image.new("L", page_size, 255)
+            for index, future in enumerate(pending[:per_page]):
+                row, col = divmod(index, cfg.columns)
+                page.paste(future.result(), (margin + col * cell_w, margin + row * cell_h))
+            del pending[:per_page]
+            yield page
+
+    def render_png(self, items: List[LabelItem], page: int = 1) -> bytes:
+        """One page of the sheet as PNG (1-based page number)."""
+        per_page = self.config.per_page
+        chunk = items[(page - 1) * per_page : page * per_page]
+        output = io.BytesIO()
+        for image in self.pages(chunk, prefetch_pages=1):
+            image.save(output, format="PNG", optimize=True)
+        return output.getvalue()
+
+    def stream_pdf(self, items: Iterable[LabelItem]) -> Iterator[bytes]:
+        """Stream a PDF with one page per sheet as the pages are rendered."""
+        cfg = self.config
+        width_pt = cfg.page_width_mm / _MM_PER_INCH * _PT_PER_INCH
+        height_pt = cfg.page_height_mm / _MM_PER_INCH * _PT_PER_INCH
+        writer = _PdfStreamWriter()
+        yield writer.header()
+        for image in self.pages(items):
+            yield writer.page(image, width_pt, height_pt)
+        yield writer.finish()
+
+
+@lru_cache(maxsize=8)
+def _label_font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _fit_text(draw, text: str, font, max_width: int) -> str:
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > max_width:
+        text = text[:-1]
+    return text + "…"
+
+
+class _PdfStreamWriter:
+    """
+    Minimal PDF writer emitting one grayscale image page at a time.
+
+    Objects 1 (catalog) and 2 (page tree) are written last, so each page
+    can be sent as soon as it is rendered.
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._offsets: Dict[int, int] = {}
+        self._next = 3
+        self._pages: List[int] = []
+
+    def _emit(self, chunks: List[bytes], data: bytes) -> None:
+        chunks.append(data)
+        self._offset += len(data)
+
+    def _object(self, chunks: List[bytes], number: int, body: bytes) -> None:
+        self._offsets[number] = self._offset
+        self._emit(chunks, b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def header(self) -> bytes:
+        chunks: List[bytes] = []
+        self._emit(chunks, b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        return b"".join(chunks)
+
+    def page(self, image, width_pt: float, height_pt: float) -> bytes:
+        chunks: List[bytes] = []
+        image_no, content_no, page_no = self._next, self._next + 1, self._next + 2
+        self._next += 3
+
+        data = zlib.compress(image.convert("L").tobytes(), 6)
+        self._object(
+            chunks,
+            image_no,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+            b"/Length %d >>\nstream\n" % (image.width, image.height, len(data))
+            + data
+            + b"\nendstream",
+        )
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (width_pt, height_pt)
+        self._object(
+            chunks,
+            content_no,
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        )
+        self._object(
+            chunks,
+            page_no,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (width_pt, height_pt, image_no, content_no),
+        )
+        self._pages.append(page_no)
+        return b"".join(chunks)
+
+    def finish(self) -> bytes:
+        chunks: List[bytes] = []
+        kids = b" ".join(b"%d 0 R" % n for n in self._pages)
+        self._object(
+            chunks, 2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages))
+        )
+        self._object(chunks, 1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_at = self._offset
+        size = self._next
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        xref += [b"%010d 00000 n \n" % self._offsets[n] for n in range(1, size)]
+        self._emit(chunks, b"".join(xref))
+        self._emit(
+            chunks,
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, xref_at),
+        )
+        return b"".join(chunks)
+
+
 # =============================================================================
 # Flask Routes Integration
 # =============================================================================
@@ -306,14 +670,44 @@ class QRCodeGenerator:
 
 def init_barcode_routes(app):
     """Initialize barcode routes in Flask app."""
-    from flask import Blueprint, request, jsonify, make_response
+    from flask import Blueprint, Response, request, jsonify, make_response
+
+    try:
+        from src.permissions import require_permission, Permissions
+        from src.routes.auth_unified import token_required
+    except ImportError:
+        # Fallback if permissions not available
+        def require_permission(*args, **kwargs):
+            def decorator(f):
+                return f
+
+            return decorator
+
+        def token_required(f):
+            return f
+
+        class Permissions:
+            INVENTORY_VIEW = "inventory_view"
+            INVENTORY_EXPORT = "inventory_export"
 
     barcode_bp = Blueprint("barcode", __name__, url_prefix="/api/barcode")
 
     barcode_gen = BarcodeGenerator()
     qr_gen = QRCodeGenerator()
 
+    def image_response(image_data: bytes, etag: str, filename: str):
+        """PNG response revalidated by its render-cache key (ETag)."""
+        response = make_response(image_data)
+        response.headers["Content-Type"] = "image/png"
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response.make_conditional(request)
+
     @barcode_bp.route("/generate", methods=["POST"])
+    @token_required
+    @require_permission(Permissions.INVENTORY_VIEW)
     def generate_barcode():
         data = request.get_json()
 
@@ -349,19 +743,16 @@ def init_barcode_routes(app):
                 svg_data = barcode_gen.generate_svg(barcode_data, barcode_type)
                 return jsonify({"success": True, "data": {"svg": svg_data}})
             else:
-                image_data = barcode_gen.generate(barcode_data, barcode_type)
-                response = make_response(image_data)
-                response.headers["Content-Type"] = "image/png"
-                response.headers["Content-Disposition"] = (
-                    f"attachment; filename=barcode.png"
-                )
-                return response
+                image_data, etag = barcode_gen.render(barcode_data, barcode_type)
+                return image_response(image_data, etag, "barcode.png")
 
         except Exception as e:
             logger.error(f"Barcode generation error: {e}")
             return jsonify({"success": False, "error": str(e)}), 500
 
     @barcode_bp.route("/qr", methods=["POST"])
+    @token_required
+    @require_permission(Permissions.INVENTORY_VIEW)
     def generate_qr():
         data = request.get_json()
 
@@ -384,21 +775,18 @@ def init_barcode_routes(app):
                     }
                 )
             else:
-                image_data = qr_gen.generate(qr_data, config)
-                response = make_response(image_data)
-                response.headers["Content-Type"] = "image/png"
-                response.headers["Content-Disposition"] = (
-                    f"attachment; filename=qrcode.png"
-                )
-                return response
+                image_data, etag = qr_gen.render(qr_data, config)
+                return image_response(image_data, etag, "qrcode.png")
 
         except Exception as e:
             logger.error(f"QR code generation error: {e}")
             return jsonify({"success": False, "error": str(e)}), 500
 
     @barcode_bp.route("/product/<int:product_id>/barcode", methods=["GET"])
+    @token_required
+    @require_permission(Permissions.INVENTORY_VIEW)
     def get_product_barcode(product_id):
-        from src.models.product import Product
+        from src.models.inventory import Product
 
         product = Product.query.get_or_404(product_id)
 
@@ -422,20 +810,19 @@ def init_barcode_routes(app):
                     }
                 )
             else:
-                image_data = barcode_gen.generate(barcode_data, barcode_type)
-                response = make_response(image_data)
-                response.headers["Content-Type"] = "image/png"
-                response.headers["Content-Disposition"] = (
-                    f"attachment; filename=product_{product_id}_barcode.png"
+                image_data, etag = barcode_gen.render(barcode_data, barcode_type)
+                return image_response(
+                    image_data, etag, f"product_{product_id}_barcode.png"
                 )
-                return response
 
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
     @barcode_bp.route("/product/<int:product_id>/qr", methods=["GET"])
+    @token_required
+    @require_permission(Permissions.INVENTORY_VIEW)
     def get_product_qr(product_id):
-        from src.models.product import Product
+        from src.models.inventory import Product
 
         product = Product.query.get_or_404(product_id)
 
@@ -446,7 +833,7 @@ def init_barcode_routes(app):
             image_data = qr_gen.generate_product_qr(
                 product_id=product.id,
                 product_name=product.name,
-                price=product.price,
+                price=float(product.selling_price or 0),
                 sku=product.sku,
             )
 
@@ -462,16 +849,92 @@ def init_barcode_routes(app):
                     }
                 )
             else:
-                response = make_response(image_data)
-                response.headers["Content-Type"] = "image/png"
-                response.headers["Content-Disposition"] = (
-                    f"attachment; filename=product_{product_id}_qr.png"
+                return image_response(
+                    image_data,
+                    RenderCache.key("product-qr", image_data),
+                    f"product_{product_id}_qr.png",
                 )
-                return response
 
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
+    @barcode_bp.route("/labels", methods=["POST"])
+    @token_required
+    @require_permission(Permissions.INVENTORY_EXPORT)
+    def generate_labels():
+        """
+        Label sheet for many products in one request.
+
+        JSON: product_ids (list) or category_id, or all active products;
+        format (pdf | png), page (png), columns, rows, type, show_price.
+        """
+        from src.models.inventory import Product
+
+        data = request.get_json() or {}
+        barcode_type = data.get("type", "code128")
+        if barcode_type not in BarcodeGenerator.BARCODE_TYPES:
+            return jsonify({"success": False, "error": "Invalid barcode type"}), 400
+        try:
+            config = LabelSheetConfig(
+                columns=max(1, min(int(data.get("columns", 3)), 10)),
+                rows=max(1, min(int(data.get("rows", 8)), 30)),
+                barcode_type=barcode_type,
+                show_price=bool(data.get("show_price", True)),
+            )
+            page = int(data.get("page", 1))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Invalid layout"}), 400
+
+        # one flat query for the label fields
+        query = Product.query.with_entities(
+            Product.id, Product.name, Product.barcode, Product.sku, Product.selling_price
+        )
+        if data.get("product_ids"):
+            query = query.filter(Product.id.in_(data["product_ids"]))
+        else:
+            query = query.filter(Product.is_active.is_(True))
+            if data.get("category_id"):
+                query = query.filter(Product.category_id == data["category_id"])
+        rows = query.order_by(Product.id).limit(LABEL_SHEET_MAX_ITEMS + 1).all()
+        if not rows:
+            return jsonify({"success": False, "error": "No products found"}), 404
+        if len(rows) > LABEL_SHEET_MAX_ITEMS:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": f"Too many labels (max {LABEL_SHEET_MAX_ITEMS})",
+                    }
+                ),
+                400,
+            )
+
+        items = [
+            LabelItem(
+                code=barcode or sku or str(product_id),
+                name=name or "",
+                price=float(price) if price is not None else None,
+            )
+            for product_id, name, barcode, sku, price in rows
+        ]
+        renderer = LabelSheetRenderer(config, barcode_gen)
+        pages = renderer.page_count(len(items))
+
+        if data.get("format", "pdf") == "png":
+            if not 1 <= page <= pages:
+                return jsonify({"success": False, "error": "Page out of range"}), 404
+            response = make_response(renderer.render_png(items, page))
+            response.headers["Content-Type"] = "image/png"
+            response.headers["Content-Disposition"] = (
+                f"attachment; filename=labels_{page}.png"
+            )
+        else:
+            response = Response(renderer.stream_pdf(items), mimetype="application/pdf")
+            response.headers["Content-Disposition"] = "attachment; filename=labels.pdf"
+        response.headers["X-Label-Count"] = str(len(items))
+        response.headers["X-Total-Pages"] = str(pages)
+        return response
+
     app.register_blueprint(barcode_bp)
     return barcode_bp
 
@@ -481,5 +944,10 @@ __all__ = [
     "QRCodeGenerator",
     "BarcodeConfig",
     "QRCodeConfig",
+    "RenderCache",
+    "render_cache",
+    "LabelItem",
+    "LabelSheetConfig",
+    "LabelSheetRenderer",
     "init_barcode_routes",
 ]
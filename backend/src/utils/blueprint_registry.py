@@ -0,0 +1,172 @@
+"""
+Blueprint Registry
+Imports and registers route blueprints while keeping heavy dependencies
+(pandas, openpyxl, reportlab, numpy, sentence-transformers, chromadb) out of
+worker startup.
+
+Route modules reference those libraries through ``utils.lazy_imports``; the
+registry groups blueprints by the heavy libraries they need and imports a
+group's dependencies on the first request routed to it, or up-front via
+``warmup()`` / the ``WARMUP_ROUTE_GROUPS`` environment variable
+(``all`` or a comma separated list of groups).
+"""
+
+import logging
+import os
+import time
+
+from flask import request
+
+try:
+    from src.utils.lazy_imports import warm_modules
+except ImportError:
+    from utils.lazy_imports import warm_modules
+
+logger = logging.getLogger(__name__)
+
+# Heavy third-party dependencies per route group
+ROUTE_GROUP_DEPS = {
+    "excel": ("pandas", "openpyxl", "xlsxwriter"),
+    "pdf": ("reportlab.platypus", "reportlab.lib.styles"),
+    "rag": ("numpy", "sentence_transformers", "chromadb"),
+    "analytics": ("pandas", "numpy"),
+}
+
+# Route module -> group
+MODULE_GROUPS = {
+    "routes.excel_import": "excel",
+    "routes.excel_operations": "excel",
+    "routes.excel_templates": "excel",
+    "routes.import_data": "excel",
+    "routes.import_export_advanced": "excel",
+    "routes.financial_reports": "excel",
+    "routes.reports": "pdf",
+    "routes.financial_reports_advanced": "pdf",
+    "routes.lot_reports": "pdf",
+    "routes.rag": "rag",
+    "routes.interactive_dashboard": "analytics",
+}
+
+
+class BlueprintRegistry:
+    """Imports blueprints, registers them and warms route groups on demand"""
+
+    def __init__(self, group_deps=None, module_groups=None):
+        self.group_deps = dict(group_deps or ROUTE_GROUP_DEPS)
+        self.module_groups = dict(module_groups or MODULE_GROUPS)
+        self.blueprint_groups = {}  # blueprint name -> group
+        self.import_times = {}  # module -> seconds
+        self.warm_times = {}  # group -> {dependency: seconds}
+        self.failed = {}
+        self._warmed = set()
+        self._hooked_apps = set()
+
+    def import_blueprint(self, module_name, attr):
+        """Import ``attr`` from ``module_name``; returns None when unavailable"""
+        started = time.perf_counter()
+        try:
+            module = __import__(module_name, fromlist=[attr])
+            blueprint = getattr(module, attr)
+        except (ImportError, AttributeError) as e:
+            self.failed[attr] = str(e)
+            logger.warning("Blueprint %s from %s not available: %s", attr, module_name, e)
+            return None
+        finally:
+            self.import_times[module_name] = time.perf_counter() - started
+
+        logger.debug("Imported %s from %s", attr, module_name)
+        return blueprint
+
+    def import_all(self, specs):
+        """Import ``[(module_name, attr), ...]`` into ``{attr: blueprint or None}``"""
+        started = time.perf_counter()
+        blueprints = {attr: self.import_blueprint(module, attr) for module, attr in specs}
+        logger.info(
+            "Imported %d/%d blueprint modules in %.3fs",
+            sum(bp is not None for bp in blueprints.values()),
+            len(specs),
+            time.perf_counter() - started,
+        )
+        return blueprints
+
+    def register(self, app, blueprint, **options):
+        """Register ``blueprint`` on ``app`` and hook group warmup into it"""
+        app.register_blueprint(blueprint, **options)
+        group = self.group_for(blueprint)
+        if group:
+            self.blueprint_groups[blueprint.name] = group
+        self._install_hook(app)
+        logger.debug("Registered blueprint %s", blueprint.name)
+
+    def group_for(self, blueprint):
+        """Route group of ``blueprint`` from the module that defined it"""
+        module_name = blueprint.import_name
+        if module_name.startswith("src."):
+            module_name = module_name[len("src."):]
+        return self.module_groups.get(module_name)
+
+    def _install_hook(self, app):
+        if id(app) in self._hooked_apps:
+            return
+        self._hooked_apps.add(id(app))
+
+        @app.before_request
+        def _warm_route_group():
+            if request.blueprint is None:
+                return
+            group = self.blueprint_groups.get(request.blueprint.split(".", 1)[0])
+            if group is not None and group not in self._warmed:
+                self.warm_group(group)
+
+    def warm_group(self, group):
+        """Import the heavy dependencies of ``group`` (idempotent)"""
+        if group in self._warmed:
+            return self.warm_times.get(group, {})
+        self._warmed.add(group)
+        try:
+            self.warm_times[group] = warm_modules(self.group_deps.get(group, ()))
+        except Exception as e:  # noqa: BLE001 - a broken optional dep must not 500
+            logger.warning("Warming route group %s failed: %s", group, e)
+            self.warm_times[group] = {}
+        logger.info(
+            "Warmed route group %s in %.3fs",
+            group,
+            sum(self.warm_times[group].values()),
+        )
+        return self.warm_times[group]
+
+    def warmup(self, groups=None):
+        """Warm ``groups`` (default: every group with registered blueprints)"""
+        if groups is None:
+            groups = sorted(set(self.blueprint_groups.values()))
+        return {group: self.warm_group(group) for group in groups}
+
+    def warmup_from_env(self):
+        value = os.environ.get("WARMUP_ROUTE_GROUPS", "").strip()
+        if not value:
+            return {}
+        if value.lower() == "all":
+            return self.warmup()
+        return self.warmup([g.strip() for g in value.split(",") if g.strip()])
+
+    def stats(self):
+        return {
+            "import_seconds": {
+                module: round(seconds, 4)
+                for module, seconds in sorted(
+                    self.import_times.items(), key=lambda item: -item[1]
+                )
+            },
+            "groups": {
+                group: {
+                    "warmed": group in self._warmed,
+                    "dependencies": self.group_deps.get(group, ()),
+                }
+                for group in sorted(set(self.blueprint_groups.values()))
+            },
+            "failed": dict(self.failed),
+        }
+
+
+# Shared registry for the application entry points
+blueprint_registry = BlueprintRegistry()
@@ -11,6 +11,8 @@ Records all backend activity: startup, requests, database changes, user actions
 import logging
 import json
 import os
+import random
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
@@ -18,6 +20,11 @@ from functools import wraps
 from flask import request, g
 import traceback
 
+try:
+    from src.utils.log_pipeline import log_pipeline
+except ImportError:
+    from utils.log_pipeline import log_pipeline
+
 # استيراد JWT Manager لاستخراج معلومات المستخدم
 JWT_AVAILABLE = False
 try:
@@ -36,13 +43,37 @@ except ImportError:
         pass
 
 
+# الحقول والترويسات الحساسة التي لا تُكتب في السجلات
+SENSITIVE_BODY_KEYS = ("password", "token", "secret", "api_key")
+SENSITIVE_HEADERS = ("authorization", "cookie", "x-csrf-token", "x-api-key")
+
+# Default request-log sampling: path prefix -> fraction of requests logged.
+# Errors (5xx) and slow requests are always logged regardless of sampling.
+DEFAULT_SAMPLE_RATES = {
+    "/api/health": 0.01,
+    "/health": 0.01,
+    "/static/": 0.0,
+}
+DEFAULT_MAX_BODY_BYTES = 4096
+
+
+def _dumps(data):
+    """Serialize a log record once, on the calling thread"""
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
 class ComprehensiveLogger:
     """Comprehensive logging system for all backend operations"""
 
-    def __init__(self, app=None):
+    def __init__(self, app=None, log_dir=None, async_logging=None):
         self.app = app
-        self.log_dir = Path(__file__).parent.parent.parent / "logs"
+        self.log_dir = (
+            Path(log_dir) if log_dir else Path(__file__).parent.parent.parent / "logs"
+        )
+        self.async_logging = async_logging
         self.loggers = {}
+        self.sample_rates = dict(DEFAULT_SAMPLE_RATES)
+        self.max_body_bytes = DEFAULT_MAX_BODY_BYTES
 
         if app:
             self.init_app(app)
@@ -69,6 +100,10 @@ class ComprehensiveLogger:
             if not user_id:
                 return None, None
 
+            # اسم المستخدم ضمن claims يغني عن استعلام قاعدة البيانات
+            if payload.get("username"):
+                return user_id, payload["username"]
+
             # محاولة الحصول على اسم المستخدم من قاعدة البيانات
             try:
                 # استيراد lazy لتجنب circular imports
@@ -91,6 +126,10 @@ class ComprehensiveLogger:
     def init_app(self, app):
         """Initialize logging system with Flask app"""
         self.app = app
+        self.sample_rates.update(app.config.get("LOG_SAMPLE_RATES", {}))
+        self.max_body_bytes = app.config.get(
+            "LOG_MAX_BODY_BYTES", self.max_body_bytes
+        )
         self._create_log_directories()
         self._setup_loggers()
         self._register_handlers()
@@ -159,7 +198,8 @@ class ComprehensiveLogger:
 
             formatter = logging.Formatter(config["format"], datefmt="%Y-%m-%d %H:%M:%S")
             handler.setFormatter(formatter)
-            logger.addHandler(handler)
+            # File I/O happens on the pipeline's listener thread
+            log_pipeline.attach(logger, handler, use_queue=self.async_logging)
 
             self.loggers[name] = logger
 
@@ -171,83 +211,54 @@ class ComprehensiveLogger:
         @self.app.before_request
         def log_request_start():
             """Log request start"""
-            g.start_time = datetime.now(timezone.utc)
-
-            # Get client IP
-            if request.headers.get("X-Forwarded-For"):
-                ip = request.headers.get("X-Forwarded-For").split(",")[0]
-            else:
-                ip = request.remote_addr
-
-            # Get user info - أولاً من g.current_user، ثم من JWT
-            user = getattr(g, "current_user", None)
-            if user:
-                user_id = user.id
-                username = user.username
-            else:
-                # محاولة استخراج من JWT header
-                user_id, username = self._extract_user_from_jwt()
-                if user_id is None:
-                    user_id = "anonymous"
-                    username = "anonymous"
+            ctx = self._capture_request_context()
+            if not ctx["sampled"]:
+                return
 
             # Log request
             self.log_request(
-                method=request.method,
-                path=request.path,
-                ip=ip,
-                user_id=user_id,
-                username=username,
-                headers=dict(request.headers),
-                query_params=dict(request.args),
+                method=ctx["method"],
+                path=ctx["path"],
+                ip=ctx["ip"],
+                user_id=ctx["user_id"],
+                username=ctx["username"],
+                headers=self._get_safe_headers(),
+                query_params=request.args.to_dict(),
                 body=self._get_safe_body(),
             )
 
         @self.app.after_request
         def log_request_end(response):
             """Log request end"""
-            if hasattr(g, "start_time"):
-                duration = (datetime.now(timezone.utc) - g.start_time).total_seconds()
-
-                # Get client IP
-                if request.headers.get("X-Forwarded-For"):
-                    ip = request.headers.get("X-Forwarded-For").split(",")[0]
-                else:
-                    ip = request.remote_addr
-
-                # Get user info - أولاً من g.current_user، ثم من JWT
-                user = getattr(g, "current_user", None)
-                if user:
-                    user_id = user.id
-                    username = user.username
-                else:
-                    # محاولة استخراج من JWT header
-                    user_id, username = self._extract_user_from_jwt()
-                    if user_id is None:
-                        user_id = "anonymous"
-                        username = "anonymous"
-
-                # Log response
+            ctx = getattr(g, "log_context", None)
+            if ctx is None:
+                return response
+
+            duration = time.perf_counter() - ctx["started"]
+            slow = duration > 1.0  # Slow request (>1 second)
+
+            # Log response (server errors and slow requests bypass sampling)
+            if ctx["sampled"] or slow or response.status_code >= 500:
                 self.log_response(
-                    method=request.method,
-                    path=request.path,
+                    method=ctx["method"],
+                    path=ctx["path"],
                     status_code=response.status_code,
                     duration=duration,
-                    ip=ip,
-                    user_id=user_id,
-                    username=username,
+                    ip=ctx["ip"],
+                    user_id=ctx["user_id"],
+                    username=ctx["username"],
                 )
 
-                # Log performance if slow
-                if duration > 1.0:  # Slow request (>1 second)
-                    self.log_performance(
-                        event="slow_request",
-                        duration=duration,
-                        method=request.method,
-                        path=request.path,
-                        ip=ip,
-                        user_id=user_id,
-                    )
+            # Log performance if slow
+            if slow:
+                self.log_performance(
+                    event="slow_request",
+                    duration=duration,
+                    method=ctx["method"],
+                    path=ctx["path"],
+                    ip=ctx["ip"],
+                    user_id=ctx["user_id"],
+                )
 
             return response
 
@@ -263,20 +274,77 @@ class ComprehensiveLogger:
             )
             raise error
 
+    def _capture_request_context(self):
+        """Resolve client/user info once per request and keep it on ``g``"""
+        # Get client IP
+        forwarded = request.headers.get("X-Forwarded-For")
+        ip = forwarded.split(",")[0].strip() if forwarded else request.remote_addr
+
+        # Get user info - أولاً من g.current_user، ثم من JWT
+        user = getattr(g, "current_user", None)
+        if user:
+            user_id = user.id
+            username = user.username
+        else:
+            # محاولة استخراج من JWT header
+            user_id, username = self._extract_user_from_jwt()
+            if user_id is None:
+                user_id = "anonymous"
+                username = "anonymous"
+
+        ctx = {
+            "started": time.perf_counter(),
+            "method": request.method,
+            "path": request.path,
+            "ip": ip,
+            "user_id": user_id,
+            "username": username,
+            "sampled": self._should_sample(request.path),
+        }
+        g.log_context = ctx
+        return ctx
+
+    def _should_sample(self, path):
+        """Apply the longest matching path-prefix sampling rate"""
+        rate = 1.0
+        matched = -1
+        for prefix, prefix_rate in self.sample_rates.items():
+            if path.startswith(prefix) and len(prefix) > matched:
+                rate, matched = prefix_rate, len(prefix)
+        if rate >= 1.0:
+            return True
+        return rate > 0.0 and random.random() < rate
+
+    def _get_safe_headers(self):
+        """Request headers with credentials masked"""
+        return {
+            key: "***HIDDEN***" if key.lower() in SENSITIVE_HEADERS else value
+            for key, value in request.headers.items()
+        }
+
     def _get_safe_body(self):
-        """Get request body safely (hide passwords)"""
+        """Get request body safely (hide passwords, cap size)"""
         try:
-            if request.is_json:
-                body = request.get_json()
-                if isinstance(body, dict):
-                    # Hide sensitive fields
-                    safe_body = body.copy()
-                    for key in ["password", "token", "secret", "api_key"]:
-                        if key in safe_body:
-                            safe_body[key] = "***HIDDEN***"
-                    return safe_body
-                return body
-            return None
+            if not request.is_json:
+                return None
+
+            # لا نقرأ الأجسام الكبيرة إطلاقاً
+            length = request.content_length
+            if length is not None and length > self.max_body_bytes:
+                return {"_truncated": True, "size": length}
+
+            body = request.get_json(silent=True)
+            if isinstance(body, dict):
+                # Hide sensitive fields
+                safe_body = body.copy()
+                for key in SENSITIVE_BODY_KEYS:
+                    if key in safe_body:
+                        safe_body[key] = "***HIDDEN***"
+                body = safe_body
+
+            if length is None and len(_dumps(body)) > self.max_body_bytes:
+                return {"_truncated": True, "size": None}
+            return body
         except Exception:
             return None
 
@@ -296,7 +364,7 @@ class ComprehensiveLogger:
             "username": username,
             **kwargs,
         }
-        self.loggers["requests"].info(json.dumps(data, ensure_ascii=False))
+        self.loggers["requests"].info(_dumps(data))
 
     def log_response(self, method, path, status_code, duration, ip, user_id, username):
         """Log HTTP response"""
@@ -310,7 +378,7 @@ class ComprehensiveLogger:
             "user_id": user_id,
             "username": username,
         }
-        self.loggers["requests"].info(json.dumps(data, ensure_ascii=False))
+        self.loggers["requests"].info(_dumps(data))
 
     def log_database(self, operation, table, **kwargs):
         """Log database operations"""
@@ -325,7 +393,7 @@ class ComprehensiveLogger:
             ),
             **kwargs,
         }
-        self.loggers["database"].info(json.dumps(data, ensure_ascii=False))
+        self.loggers["database"].info(_dumps(data))
 
     def log_error(self, error, **kwargs):
         """Log errors"""
@@ -334,7 +402,7 @@ class ComprehensiveLogger:
             "error": str(error),
             **kwargs,
         }
-        self.loggers["errors"].error(json.dumps(data, ensure_ascii=False))
+        self.loggers["errors"].error(_dumps(data))
 
     def log_security(self, event, **kwargs):
         """Log security events"""
@@ -344,7 +412,7 @@ class ComprehensiveLogger:
             "ip": request.remote_addr if request else "unknown",
             **kwargs,
         }
-        self.loggers["security"].warning(json.dumps(data, ensure_ascii=False))
+        self.loggers["security"].warning(_dumps(data))
 
     def log_performance(self, event, duration, **kwargs):
         """Log performance metrics"""
@@ -354,7 +422,7 @@ class ComprehensiveLogger:
             "duration_seconds": round(duration, 3),
             **kwargs,
         }
-        self.loggers["performance"].info(json.dumps(data, ensure_ascii=False))
+        self.loggers["performance"].info(_dumps(data))
 
     def _format_log_message(self, event, **kwargs):
         """Format log message"""
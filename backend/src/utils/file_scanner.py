@@ -9,6 +9,12 @@ Provides comprehensive file upload security scanning including:
 - File size limits
 - Filename sanitization
 - MIME type verification
+
+Scanning is single-pass and streaming: content is read in fixed-size
+chunks, hashed incrementally, matched against dangerous patterns with an
+overlap between chunks, and abandoned at the first violation. Uploads are
+scanned while the form parser writes them (``ScanningSpool``), so a
+rejected file is never fully buffered.
 """
 
 import os
@@ -16,7 +22,8 @@ import re
 import hashlib
 import logging
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Any
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Optional, Tuple, List, Dict, Any
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
@@ -27,6 +34,9 @@ logger = logging.getLogger(__name__)
 
 MAX_FILE_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 16 * 1024 * 1024))  # 16MB default
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
+SCAN_CHUNK_SIZE = int(os.environ.get("UPLOAD_SCAN_CHUNK_SIZE", 64 * 1024))
+HEADER_SIZE = 8192  # type detection and header-only checks
+SPOOL_MEMORY_SIZE = 500 * 1024  # werkzeug's default before spilling to disk
 
 # Allowed file extensions by category
 ALLOWED_EXTENSIONS = {
@@ -48,7 +58,7 @@ MAGIC_SIGNATURES = {
     # Documents
     b"%PDF": "pdf",
     b"PK\x03\x04": "zip",  # Also docx, xlsx, pptx
-    b"\xd0\xcf\x11\xe0": "doc",  # MS Office
+    b"\xd0\xcf\x11\xe0": "doc",  # MS Office (OLE2: doc, xls, ppt)
     # Archives
     b"Rar!\x1a\x07": "rar",
     b"7z\xbc\xaf\x27\x1c": "7z",
@@ -73,6 +83,27 @@ DANGEROUS_PATTERNS = [
     b"_VBA_PROJECT",
 ]
 
+# Executable headers are only meaningful at the start of the file; two or
+# four bytes anywhere else are noise in compressed (xlsx, image) content.
+LEADING_SIGNATURES = (b"MZ", b"\x7fELF", b"#!/")
+
+# Short markers are matched in the header of text content only (random
+# image / zip bytes contain them by chance), longer ones in the whole stream
+# (case-insensitive, with an overlap so chunk borders are covered).
+_STREAM_PATTERN_MIN_LENGTH = 5
+_HEADER_PATTERNS = {
+    p.lower(): p
+    for p in DANGEROUS_PATTERNS
+    if p not in LEADING_SIGNATURES and len(p) < _STREAM_PATTERN_MIN_LENGTH
+}
+_STREAM_PATTERNS = {
+    p.lower(): p
+    for p in DANGEROUS_PATTERNS
+    if p not in LEADING_SIGNATURES and len(p) >= _STREAM_PATTERN_MIN_LENGTH
+}
+_OVERLAP = max(map(len, _STREAM_PATTERNS)) - 1
+TEXT_TYPES = {"csv", "txt", "json", "xml", "svg"}
+
 # Known malware hashes (example - would be updated regularly in production)
 MALWARE_HASHES = set(
     [
@@ -110,6 +141,140 @@ class ScanResult:
         }
 
 
+class StreamScan:
+    """
+    Incremental scan of one file: ``feed`` chunks in order, then ``result``.
+
+    The hash is updated per chunk, the type is detected from the first
+    ``HEADER_SIZE`` bytes, and ``feed`` returns False as soon as a threat is
+    found so the caller can stop reading (and buffering) the file.
+    """
+
+    def __init__(
+        self,
+        scanner: "FileScanner",
+        filename: str,
+        declared_size: Optional[int] = None,
+    ):
+        self.scanner = scanner
+        self.extension = Path(filename or "").suffix.lower().lstrip(".")
+        self.size = 0
+        self.threats: List[str] = []
+        self.detected_type: Optional[str] = None
+        self._sha256 = hashlib.sha256()
+        self._header = b""
+        self._header_checked = False
+        self._tail = b""
+        self._found: set = set()
+
+        if self.extension and self.extension not in scanner.allowed_extensions:
+            self.threats.append(f"File extension .{self.extension} is not allowed")
+        if declared_size is not None:
+            self._check_size(declared_size)
+
+    @property
+    def aborted(self) -> bool:
+        return bool(self.threats)
+
+    def feed(self, data: bytes) -> bool:
+        """Scan the next chunk. Returns False once the file is rejected."""
+        if self.threats:
+            return False
+        if not data:
+            return True
+
+        self.size += len(data)
+        if not self._check_size(self.size):
+            return False
+        self._sha256.update(data)
+
+        if not self._header_checked:
+            self._header += data[: HEADER_SIZE - len(self._header)]
+            if len(self._header) >= HEADER_SIZE:
+                self._check_header()
+
+        window = self._tail + data.lower()
+        for lowered, pattern in _STREAM_PATTERNS.items():
+            if lowered not in self._found and lowered in window:
+                self._found.add(lowered)
+                self.threats.append(_pattern_threat(pattern))
+        self._tail = window[-_OVERLAP:]
+
+        return not self.threats
+
+    def result(self) -> ScanResult:
+        """Finish the scan (idempotent) and build the ScanResult."""
+        if not self._header_checked and not self.threats:
+            self._check_header()
+
+        warnings = []
+        metadata: Dict[str, Any] = {
+            "file_size": self.size,
+            "declared_extension": self.extension,
+            "detected_type": self.detected_type,
+        }
+        if self.size == 0 and not self.threats:
+            warnings.append("File is empty")
+
+        threats = list(self.threats)
+        if threats:
+            # reading stopped at the violation: no hash of the full content
+            metadata["aborted"] = True
+        else:
+            file_hash = self._sha256.hexdigest()
+            metadata["sha256"] = file_hash
+            if file_hash in MALWARE_HASHES:
+                threats.append("Known malware signature detected")
+
+        return ScanResult(
+            is_safe=not threats,
+            file_type=self.detected_type,
+            detected_extension=self.extension,
+            file_size=self.size,
+            threats=threats,
+            warnings=warnings,
+            metadata=metadata,
+        )
+
+    def _check_size(self, size: int) -> bool:
+        if size > self.scanner.max_size:
+            self.threats.append(
+                f"File size ({size} bytes) exceeds maximum "
+                f"({self.scanner.max_size} bytes)"
+            )
+            return False
+        return True
+
+    def _check_header(self):
+        self._header_checked = True
+        header = self._header
+        self.detected_type = self.scanner._detect_file_type(header)
+
+        if self.detected_type and self.extension:
+            if not self.scanner._extension_matches_type(
+                self.extension, self.detected_type
+            ):
+                self.threats.append(
+                    f"Extension mismatch: declared .{self.extension}, "
+                    f"detected {self.detected_type}"
+                )
+
+        for signature in LEADING_SIGNATURES:
+            if header.startswith(signature):
+                self.threats.append(_pattern_threat(signature))
+
+        if self.detected_type is not None and self.detected_type not in TEXT_TYPES:
+            return
+        lowered_header = header.lower()
+        for lowered, pattern in _HEADER_PATTERNS.items():
+            if lowered in lowered_header:
+                self.threats.append(_pattern_threat(pattern))
+
+
+def _pattern_threat(pattern: bytes) -> str:
+    return f"Dangerous pattern detected: {pattern[:20]}..."
+
+
 # =============================================================================
 # Scanner Class
 # =============================================================================
@@ -152,10 +317,6 @@ class FileScanner:
         Returns:
             ScanResult with scan findings
         """
-        threats = []
-        warnings = []
-        metadata = {}
-
         path = Path(file_path)
 
         # Check if file exists
@@ -170,77 +331,23 @@ class FileScanner:
                 metadata={},
             )
 
-        # Get file size
-        file_size = path.stat().st_size
-        metadata["file_size"] = file_size
-
-        # Check file size
-        if file_size > self.max_size:
-            threats.append(
-                f"File size ({file_size} bytes) exceeds maximum ({self.max_size} bytes)"
-            )
-
-        if file_size == 0:
-            warnings.append("File is empty")
-
-        # Get file extension
         extension = path.suffix.lower().lstrip(".")
-        metadata["declared_extension"] = extension
-
-        # Check extension
-        if extension and extension not in self.allowed_extensions:
-            threats.append(f"File extension .{extension} is not allowed")
-
-        # Read file header for magic byte analysis
         try:
             with open(file_path, "rb") as f:
-                header = f.read(8192)  # Read first 8KB for analysis
-        except Exception as e:
+                return self.scan_stream(
+                    f, path.name, declared_size=path.stat().st_size
+                )
+        except OSError as e:
             return ScanResult(
                 is_safe=False,
                 file_type=None,
                 detected_extension=extension,
-                file_size=file_size,
+                file_size=0,
                 threats=[f"Cannot read file: {str(e)}"],
-                warnings=warnings,
-                metadata=metadata,
+                warnings=[],
+                metadata={"declared_extension": extension},
             )
 
-        # Detect file type from magic bytes
-        detected_type = self._detect_file_type(header)
-        metadata["detected_type"] = detected_type
-
-        # Verify extension matches content
-        if detected_type and extension:
-            if not self._extension_matches_type(extension, detected_type):
-                threats.append(
-                    f"Extension mismatch: declared .{extension}, detected {detected_type}"
-                )
-
-        # Scan for dangerous patterns
-        dangerous_findings = self._scan_for_dangerous_patterns(header)
-        threats.extend(dangerous_findings)
-
-        # Check for malware signatures
-        file_hash = self._calculate_hash(file_path)
-        metadata["sha256"] = file_hash
-
-        if file_hash in MALWARE_HASHES:
-            threats.append("Known malware signature detected")
-
-        # Determine if file is safe
-        is_safe = len(threats) == 0
-
-        return ScanResult(
-            is_safe=is_safe,
-            file_type=detected_type,
-            detected_extension=extension,
-            file_size=file_size,
-            threats=threats,
-            warnings=warnings,
-            metadata=metadata,
-        )
-
     def scan_bytes(self, content: bytes, filename: str) -> ScanResult:
         """
         Scan file content from bytes (for in-memory files).
@@ -252,64 +359,41 @@ class FileScanner:
         Returns:
             ScanResult with scan findings
         """
-        threats = []
-        warnings = []
-        metadata = {}
-
-        file_size = len(content)
-        metadata["file_size"] = file_size
-
-        # Check file size
-        if file_size > self.max_size:
-            threats.append(
-                f"File size ({file_size} bytes) exceeds maximum ({self.max_size} bytes)"
-            )
-
-        if file_size == 0:
-            warnings.append("File is empty")
-
-        # Get extension from filename
-        extension = Path(filename).suffix.lower().lstrip(".")
-        metadata["declared_extension"] = extension
-
-        # Check extension
-        if extension and extension not in self.allowed_extensions:
-            threats.append(f"File extension .{extension} is not allowed")
-
-        # Detect file type
-        header = content[:8192]
-        detected_type = self._detect_file_type(header)
-        metadata["detected_type"] = detected_type
-
-        # Verify extension matches content
-        if detected_type and extension:
-            if not self._extension_matches_type(extension, detected_type):
-                threats.append(
-                    f"Extension mismatch: declared .{extension}, detected {detected_type}"
-                )
-
-        # Scan for dangerous patterns
-        dangerous_findings = self._scan_for_dangerous_patterns(header)
-        threats.extend(dangerous_findings)
-
-        # Calculate hash
-        file_hash = hashlib.sha256(content).hexdigest()
-        metadata["sha256"] = file_hash
+        scan = StreamScan(self, filename, declared_size=len(content))
+        view = memoryview(content)
+        for start in range(0, len(content), SCAN_CHUNK_SIZE):
+            if not scan.feed(bytes(view[start : start + SCAN_CHUNK_SIZE])):
+                break
+        return scan.result()
+
+    def scan_stream(
+        self,
+        stream: BinaryIO,
+        filename: str,
+        declared_size: Optional[int] = None,
+        chunk_size: int = SCAN_CHUNK_SIZE,
+    ) -> ScanResult:
+        """
+        Scan a readable binary stream in a single pass.
 
-        if file_hash in MALWARE_HASHES:
-            threats.append("Known malware signature detected")
+        Reading stops at the first violation, so an oversized or disallowed
+        file costs at most one chunk past the point where it was rejected.
 
-        is_safe = len(threats) == 0
+        Args:
+            stream: Object with ``read(n)``, read from its current position
+            filename: Original filename (for the extension checks)
+            declared_size: Size announced by the caller, if known
+            chunk_size: Bytes read per step
 
-        return ScanResult(
-            is_safe=is_safe,
-            file_type=detected_type,
-            detected_extension=extension,
-            file_size=file_size,
-            threats=threats,
-            warnings=warnings,
-            metadata=metadata,
-        )
+        Returns:
+            ScanResult with scan findings
+        """
+        scan = StreamScan(self, filename, declared_size)
+        while not scan.aborted:
+            chunk = stream.read(chunk_size)
+            if not chunk or not scan.feed(chunk):
+                break
+        return scan.result()
 
     def _detect_file_type(self, header: bytes) -> Optional[str]:
         """Detect file type from magic bytes."""
@@ -328,7 +412,7 @@ class FileScanner:
             "bmp": ["bmp"],
             "pdf": ["pdf"],
             "zip": ["zip", "docx", "xlsx", "pptx"],  # Office files are zips
-            "doc": ["doc"],
+            "doc": ["doc", "xls", "ppt"],  # legacy Office files share OLE2
             "rar": ["rar"],
             "7z": ["7z"],
             "gz": ["gz", "tar.gz", "tgz"],
@@ -337,30 +421,6 @@ class FileScanner:
         allowed = type_extensions.get(detected_type, [detected_type])
         return extension in allowed
 
-    def _scan_for_dangerous_patterns(self, content: bytes) -> List[str]:
-        """Scan content for dangerous patterns."""
-        findings = []
-
-        for pattern in DANGEROUS_PATTERNS:
-            if (
-                pattern in content.lower()
-                if isinstance(pattern, bytes)
-                else pattern.encode() in content.lower()
-            ):
-                findings.append(f"Dangerous pattern detected: {pattern[:20]}...")
-
-        return findings
-
-    def _calculate_hash(self, file_path: str) -> str:
-        """Calculate SHA256 hash of file."""
-        sha256 = hashlib.sha256()
-
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(65536), b""):
-                sha256.update(chunk)
-
-        return sha256.hexdigest()
-
 
 # =============================================================================
 # Helper Functions
@@ -425,6 +485,50 @@ def get_safe_extension(filename: str) -> Optional[str]:
     return ext if ext in all_allowed else None
 
 
+class ScanningSpool:
+    """
+    Upload container that scans the file while the form parser writes it.
+
+    Returned from ``Request._get_file_stream`` (see ``init_file_scanner``):
+    each chunk werkzeug receives is hashed and scanned before it is spooled,
+    and once the file is rejected the rest is discarded instead of buffered.
+    Reads, seeks etc. are delegated to the underlying spooled file.
+    """
+
+    def __init__(
+        self,
+        scanner: "FileScanner",
+        filename: str,
+        content_length: Optional[int] = None,
+        max_memory: int = SPOOL_MEMORY_SIZE,
+    ):
+        self.scan = StreamScan(scanner, filename, content_length)
+        self._file = SpooledTemporaryFile(max_size=max_memory, mode="rb+")
+        self._discarded = False
+        self._result: Optional[ScanResult] = None
+
+    def write(self, data: bytes) -> int:
+        if self.scan.feed(data):
+            return self._file.write(data)
+        if not self._discarded:
+            self._file.seek(0)
+            self._file.truncate()
+            self._discarded = True
+        return len(data)
+
+    @property
+    def result(self) -> ScanResult:
+        if self._result is None:
+            self._result = self.scan.result()
+        return self._result
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
 def validate_upload(
     file_storage,
     allowed_categories: Optional[List[str]] = None,
@@ -433,6 +537,10 @@ def validate_upload(
     """
     Validate a Flask file upload.
 
+    Uploads parsed through ``init_file_scanner`` were already scanned while
+    they were received; with the default policy that result is reused.
+    Otherwise the stream is scanned chunk by chunk, never read whole.
+
     Args:
         file_storage: Flask FileStorage object
         allowed_categories: List of allowed file categories
@@ -441,16 +549,23 @@ def validate_upload(
     Returns:
         Tuple of (is_valid, scan_result)
     """
+    stream = file_storage.stream
+    if (
+        isinstance(stream, ScanningSpool)
+        and allowed_categories is None
+        and max_size is None
+    ):
+        result = stream.result
+        return result.is_safe, result
+
     scanner = FileScanner(
         max_size=max_size or MAX_FILE_SIZE, allowed_categories=allowed_categories
     )
 
-    # Read file content
-    content = file_storage.read()
-    file_storage.seek(0)  # Reset for later use
-
-    # Scan the file
-    result = scanner.scan_bytes(content, file_storage.filename or "")
+    start = stream.tell() if stream.seekable() else None
+    result = scanner.scan_stream(stream, file_storage.filename or "")
+    if start is not None:
+        stream.seek(start)  # Reset for later use
 
     return result.is_safe, result
 
@@ -460,22 +575,45 @@ def validate_upload(
 # =============================================================================
 
 
-def init_file_scanner(app):
+class ScanningRequestMixin:
+    """Request mixin that streams multipart file parts into ScanningSpools."""
+
+    upload_scanner: Optional[FileScanner] = None
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        if self.upload_scanner is None:
+            return super()._get_file_stream(
+                total_content_length, content_type, filename, content_length
+            )
+        return ScanningSpool(self.upload_scanner, filename or "", content_length)
+
+
+def init_file_scanner(app, scanner: Optional[FileScanner] = None):
     """
     Initialize file scanner for Flask app.
 
-    Adds a before_request hook to scan file uploads.
+    Swaps in a request class that scans uploads while they are parsed and
+    adds a before_request hook that rejects unsafe ones.
 
     Args:
         app: Flask application instance
+        scanner: Scanner policy (defaults to ``FileScanner()``)
     """
     from flask import request, jsonify
 
+    app.request_class = type(
+        "ScanningRequest",
+        (ScanningRequestMixin, app.request_class),
+        {"upload_scanner": scanner or FileScanner()},
+    )
+
     @app.before_request
     def _scan_uploads():
         """Scan all file uploads before processing."""
         if request.files:
-            for key, file in request.files.items():
+            for key, file in request.files.items(multi=True):
                 if file and file.filename:
                     is_safe, result = validate_upload(file)
 
@@ -504,6 +642,8 @@ def init_file_scanner(app):
 __all__ = [
     "FileScanner",
     "ScanResult",
+    "StreamScan",
+    "ScanningSpool",
     "sanitize_filename",
     "get_safe_extension",
     "validate_upload",
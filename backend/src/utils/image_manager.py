@@ -4,12 +4,22 @@
 P2.72: Image Upload and Management
 
 Utilities for handling image uploads, resizing, and optimization.
+
+Images are stored content-addressed (``<sha256>.<ext>``), so re-uploading
+the same picture reuses the stored file; a ``<file>.refs`` counter next to
+it records how many uploads share it, and delete() only removes the file
+when the last one is deleted. Thumbnails are rendered by a
+worker pool: a few sizes right after upload, the rest on first request,
+kept in a size-bounded on-disk cache.
 """
 
+import hashlib
 import os
+import threading
 import uuid
 import logging
-from typing import Tuple, Optional, Dict, Any, List
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Tuple, Optional, Dict, Any, Iterable, List
 from dataclasses import dataclass
 from pathlib import Path
 from werkzeug.utils import secure_filename
@@ -24,11 +34,22 @@ logger = logging.getLogger(__name__)
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
 MAX_IMAGE_SIZE = int(os.environ.get("MAX_IMAGE_SIZE", 5 * 1024 * 1024))  # 5MB
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+IMAGE_FOLDERS = ("products", "users", "categories")
 THUMBNAIL_SIZES = {
     "small": (150, 150),
     "medium": (400, 400),
     "large": (800, 800),
 }
+# Sizes rendered right after upload; the others are rendered when requested
+EAGER_THUMBNAIL_SIZES = tuple(
+    s for s in os.environ.get("EAGER_THUMBNAIL_SIZES", "small").split(",") if s
+)
+THUMBNAIL_CACHE_MAX_BYTES = int(
+    os.environ.get("THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+)
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+HASH_CHUNK_SIZE = 64 * 1024
 
 
 @dataclass
@@ -44,6 +65,8 @@ class ImageInfo:
     height: int
     format: str
     thumbnails: Dict[str, str]
+    content_hash: str = ""
+    duplicate: bool = False
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -55,28 +78,203 @@ class ImageInfo:
             "height": self.height,
             "format": self.format,
             "thumbnails": self.thumbnails,
+            "content_hash": self.content_hash,
+            "duplicate": self.duplicate,
         }
 
 
+def _replace_atomically(path: Path, write) -> None:
+    """Write to a temp file next to ``path`` then rename it into place."""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class ThumbnailCache:
+    """
+    Thumbnails rendered in a worker pool, kept in a bounded on-disk cache.
+
+    Files live at ``<root>/<folder>/<name>_<size>.<ext>``. When the cache
+    grows past ``max_bytes`` the least recently used files (by mtime, which
+    is refreshed on every hit) are removed down to 90% of the budget.
+    Concurrent requests for the same thumbnail share one render.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES,
+        workers: int = IMAGE_WORKERS,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._inflight: Dict[Path, Future] = {}
+        self._total: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def path_for(self, folder: str, filename: str, size_name: str) -> Path:
+        name, ext = filename.rsplit(".", 1)
+        return self.root / folder / f"{name}_{size_name}.{ext}"
+
+    def schedule(
+        self, source: Path, folder: str, filename: str, sizes: Iterable[str]
+    ) -> List[Future]:
+        """Queue renders of ``sizes`` that are not cached yet."""
+        return [
+            self._submit(source, self.path_for(folder, filename, size_name), size_name)
+            for size_name in sizes
+            if size_name in THUMBNAIL_SIZES
+            and not self.path_for(folder, filename, size_name).exists()
+        ]
+
+    def get(
+        self,
+        source: Path,
+        folder: str,
+        filename: str,
+        size_name: str,
+        timeout: Optional[float] = None,
+    ) -> Path:
+        """Path of a thumbnail, rendering it first if it is not cached."""
+        path = self.path_for(folder, filename, size_name)
+        if path.exists():
+            try:
+                os.utime(path)
+                return path
+            except FileNotFoundError:  # evicted meanwhile
+                pass
+        return self._submit(source, path, size_name).result(timeout)
+
+    def remove(self, folder: str, filename: str) -> None:
+        for size_name in THUMBNAIL_SIZES:
+            path = self.path_for(folder, filename, size_name)
+            if path.exists():
+                size = path.stat().st_size
+                path.unlink()
+                with self._lock:
+                    if self._total is not None:
+                        self._total -= size
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until queued renders finish."""
+        with self._lock:
+            pending = list(self._inflight.values())
+        wait(pending, timeout=timeout)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Worker threads do not survive a fork; build a fresh pool per process
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="thumbnails"
+            )
+            self._pid = os.getpid()
+            self._inflight = {}
+        return self._executor
+
+    def _submit(self, source: Path, path: Path, size_name: str) -> Future:
+        with self._lock:
+            future = self._inflight.get(path)
+            if future is None:
+                future = self._pool().submit(
+                    self._render, source, path, THUMBNAIL_SIZES[size_name]
+                )
+                self._inflight[path] = future
+            else:
+                return future
+        future.add_done_callback(lambda _f: self._done(path))
+        return future
+
+    def _done(self, path: Path) -> None:
+        with self._lock:
+            self._inflight.pop(path, None)
+
+    def _render(self, source: Path, path: Path, size: Tuple[int, int]) -> Path:
+        from PIL import Image
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(source) as img:
+            img_format = img.format
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            _replace_atomically(
+                path,
+                lambda tmp: img.save(tmp, format=img_format, quality=80, optimize=True),
+            )
+        self._account(path.stat().st_size)
+        return path
+
+    def _account(self, added: int) -> None:
+        with self._lock:
+            if self._total is None:
+                self._total = sum(f.stat().st_size for f in self._files())
+            else:
+                self._total += added
+            if self._total > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int) -> None:
+        entries = []
+        for f in self._files():
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+        entries.sort(key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, f in entries:
+            if total <= target:
+                break
+            try:
+                f.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
+
+    def _files(self):
+        return (
+            f
+            for f in self.root.rglob("*")
+            if f.is_file() and not f.name.startswith(".")
+        )
+
+
 class ImageManager:
     """
     P2.72: Image upload and management service.
 
     Features:
     - Image upload with validation
-    - Automatic resizing and thumbnail generation
+    - Content-addressed storage (duplicate uploads are stored once)
+    - Background and on-demand thumbnail generation
     - Image optimization
     - Multiple storage backends (local, S3)
     """
 
-    def __init__(self, upload_folder: str = None, url_prefix: str = "/uploads"):
+    def __init__(
+        self,
+        upload_folder: str = None,
+        url_prefix: str = "/uploads",
+        thumbnail_cache: Optional[ThumbnailCache] = None,
+    ):
         self.upload_folder = Path(upload_folder or UPLOAD_FOLDER)
         self.url_prefix = url_prefix
+        self.thumbnails = thumbnail_cache or ThumbnailCache(
+            self.upload_folder / "thumbnails"
+        )
+        self._refs_lock = threading.Lock()
         self._ensure_folders()
 
     def _ensure_folders(self):
         """Create upload folders if they don't exist."""
-        for folder in ["products", "users", "categories", "temp", "thumbnails"]:
+        for folder in [*IMAGE_FOLDERS, "temp", "thumbnails"]:
             (self.upload_folder / folder).mkdir(parents=True, exist_ok=True)
 
     def _allowed_file(self, filename: str) -> bool:
@@ -85,10 +283,33 @@ class ImageManager:
             "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
         )
 
-    def _generate_filename(self, original: str) -> str:
-        """Generate unique filename."""
-        ext = original.rsplit(".", 1)[1].lower() if "." in original else "jpg"
-        return f"{uuid.uuid4().hex}.{ext}"
+    def _content_hash(self, file, resize: Tuple[int, int] = None) -> str:
+        """SHA-256 of the upload (and of the resize target, which changes the output)."""
+        sha256 = hashlib.sha256()
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+        file.seek(0)
+        if resize:
+            sha256.update(f"|resize={resize[0]}x{resize[1]}".encode())
+        return sha256.hexdigest()
+
+    @staticmethod
+    def _refs_path(filepath: Path) -> Path:
+        return filepath.with_name(f"{filepath.name}.refs")
+
+    def _references(self, filepath: Path) -> int:
+        """Uploads sharing ``filepath`` (a stored file without a counter has one)."""
+        try:
+            return int(self._refs_path(filepath).read_text())
+        except (OSError, ValueError):
+            return 1 if filepath.exists() else 0
+
+    def _set_references(self, filepath: Path, count: int) -> None:
+        refs = self._refs_path(filepath)
+        if count <= 0:
+            refs.unlink(missing_ok=True)
+        else:
+            _replace_atomically(refs, lambda tmp: tmp.write_text(str(count)))
 
     def upload(
         self,
@@ -101,6 +322,10 @@ class ImageManager:
         """
         Upload and process an image.
 
+        The stored name is the content hash, so an image that is already
+        stored is returned as is (``duplicate=True``) without re-processing.
+        Thumbnails are queued, not rendered inside the request.
+
         Args:
             file: File object (from Flask request.files)
             folder: Subfolder to store the image
@@ -127,51 +352,81 @@ class ImageManager:
             logger.warning(f"P2.72: File type not allowed: {original_filename}")
             return None
 
-        # Generate unique filename
-        filename = self._generate_filename(original_filename)
         target_folder = self.upload_folder / folder
-        filepath = target_folder / filename
 
         try:
+            content_hash = self._content_hash(file, resize)
+
             # Open and validate image
             img = Image.open(file)
-            img.verify()  # Verify it's a valid image
-            file.seek(0)  # Reset file pointer
-            img = Image.open(file)
-
-            original_width, original_height = img.size
-            img_format = img.format or "JPEG"
-
-            # Convert RGBA to RGB for JPEG
-            if img.mode == "RGBA" and img_format.upper() == "JPEG":
-                background = Image.new("RGB", img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])
-                img = background
-
-            # Resize if specified
-            if resize:
-                img = self._resize_image(img, resize)
-
-            # Optimize
-            if optimize:
-                img = self._optimize_image(img)
-
-            # Save main image
-            save_kwargs = {"quality": 85, "optimize": True}
-            if img_format.upper() == "JPEG":
-                save_kwargs["progressive"] = True
+            img_format = (img.format or "JPEG").upper()
+            ext = FORMAT_EXTENSIONS.get(img_format)
+            if ext is None:
+                logger.warning(f"P2.72: Image format not allowed: {img_format}")
+                return None
 
-            img.save(filepath, format=img_format, **save_kwargs)
+            filename = f"{content_hash}.{ext}"
+            filepath = target_folder / filename
+            with self._refs_lock:
+                duplicate = filepath.exists()
+                if duplicate:
+                    self._set_references(filepath, self._references(filepath) + 1)
+
+            if duplicate:
+                with Image.open(filepath) as stored:
+                    width, height = stored.size
+            else:
+                img.verify()  # Verify it's a valid image
+                file.seek(0)  # Reset file pointer
+                img = Image.open(file)
+
+                # Convert RGBA to RGB for JPEG
+                if img.mode == "RGBA" and img_format == "JPEG":
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img, mask=img.split()[3])
+                    img = background
+
+                # Resize if specified
+                if resize:
+                    img = self._resize_image(img, resize)
+
+                # Optimize
+                if optimize:
+                    img = self._optimize_image(img)
+
+                # Save main image
+                save_kwargs = {"quality": 85, "optimize": True}
+                if img_format == "JPEG":
+                    save_kwargs["progressive"] = True
+
+                target_folder.mkdir(parents=True, exist_ok=True)
+                with self._refs_lock:
+                    # a concurrent upload of the same image may have won
+                    if filepath.exists():
+                        self._set_references(filepath, self._references(filepath) + 1)
+                        duplicate = True
+                    else:
+                        _replace_atomically(
+                            filepath,
+                            lambda tmp: img.save(tmp, format=img_format, **save_kwargs),
+                        )
+                        self._set_references(filepath, 1)
+                width, height = img.size
 
-            # Generate thumbnails
+            # Queue thumbnails; lazy sizes are rendered on first request
             thumbnails = {}
             if generate_thumbnails:
-                thumbnails = self._generate_thumbnails(img, folder, filename)
+                thumbnails = self.thumbnail_urls(folder, filename)
+                self.thumbnails.schedule(
+                    filepath, folder, filename, EAGER_THUMBNAIL_SIZES
+                )
 
             # Get file size
             file_size = filepath.stat().st_size
 
-            logger.info(f"P2.72: Uploaded image: {filename}")
+            logger.info(
+                f"P2.72: {'Reused' if duplicate else 'Uploaded'} image: {filename}"
+            )
 
             return ImageInfo(
                 original_filename=original_filename,
@@ -179,10 +434,12 @@ class ImageManager:
                 filepath=str(filepath),
                 url=f"{self.url_prefix}/{folder}/{filename}",
                 size=file_size,
-                width=img.size[0],
-                height=img.size[1],
+                width=width,
+                height=height,
                 format=img_format,
                 thumbnails=thumbnails,
+                content_hash=content_hash,
+                duplicate=duplicate,
             )
 
         except Exception as e:
@@ -202,61 +459,69 @@ class ImageManager:
         # Could add more optimization like color reduction, etc.
         return img
 
-    def _generate_thumbnails(self, img, folder: str, filename: str) -> Dict[str, str]:
-        """Generate thumbnail versions of the image."""
-        from PIL import Image
-
-        thumbnails = {}
-        thumb_folder = self.upload_folder / "thumbnails" / folder
-        thumb_folder.mkdir(parents=True, exist_ok=True)
-
+    def thumbnail_urls(self, folder: str, filename: str) -> Dict[str, str]:
+        """URLs of every thumbnail size (rendered on first request if needed)."""
         name, ext = filename.rsplit(".", 1)
+        return {
+            size_name: f"{self.url_prefix}/thumbnails/{folder}/{name}_{size_name}.{ext}"
+            for size_name in THUMBNAIL_SIZES
+        }
 
-        for size_name, size in THUMBNAIL_SIZES.items():
-            thumb = img.copy()
-            thumb.thumbnail(size, Image.Resampling.LANCZOS)
-
-            thumb_filename = f"{name}_{size_name}.{ext}"
-            thumb_path = thumb_folder / thumb_filename
-
-            thumb.save(thumb_path, quality=80, optimize=True)
-            thumbnails[size_name] = (
-                f"{self.url_prefix}/thumbnails/{folder}/{thumb_filename}"
-            )
+    def image_path(self, folder: str, filename: str) -> Optional[Path]:
+        """Stored image for a public folder/filename, or None."""
+        if (
+            folder not in IMAGE_FOLDERS
+            or filename != secure_filename(filename)
+            or not self._allowed_file(filename)
+        ):
+            return None
+        filepath = self.upload_folder / folder / filename
+        return filepath if filepath.is_file() else None
 
-        return thumbnails
+    def thumbnail(
+        self,
+        folder: str,
+        filename: str,
+        size_name: str,
+        timeout: Optional[float] = 30,
+    ) -> Optional[Path]:
+        """Cached thumbnail of a stored image, rendered on demand."""
+        source = self.image_path(folder, filename)
+        if source is None or size_name not in THUMBNAIL_SIZES:
+            return None
+        return self.thumbnails.get(source, folder, filename, size_name, timeout)
 
     def delete(self, url: str) -> bool:
-        """Delete an image and its thumbnails."""
+        """
+        Delete an image and its thumbnails.
+
+        Identical uploads share one file: deleting one of them only drops
+        its reference, and the file goes with the last one.
+        """
         try:
             # Extract path from URL
             relative_path = url.replace(self.url_prefix, "").lstrip("/")
             filepath = self.upload_folder / relative_path
 
-            if filepath.exists():
-                filepath.unlink()
-
-                # Delete thumbnails
-                parts = relative_path.split("/")
-                if len(parts) >= 2:
-                    folder = parts[0]
-                    filename = parts[1]
-                    name, ext = filename.rsplit(".", 1)
-
-                    for size_name in THUMBNAIL_SIZES.keys():
-                        thumb_path = (
-                            self.upload_folder
-                            / "thumbnails"
-                            / folder
-                            / f"{name}_{size_name}.{ext}"
-                        )
-                        if thumb_path.exists():
-                            thumb_path.unlink()
+            with self._refs_lock:
+                if not filepath.exists():
+                    return False
+                remaining = self._references(filepath) - 1
+                self._set_references(filepath, remaining)
+                if remaining <= 0:
+                    filepath.unlink()
 
-                logger.info(f"P2.72: Deleted image: {url}")
+            if remaining > 0:
+                logger.info(f"P2.72: Released image: {url} ({remaining} left)")
                 return True
 
-            return False
+            # Delete thumbnails
+            parts = relative_path.split("/")
+            if len(parts) >= 2:
+                self.thumbnails.remove(parts[0], parts[1])
+
+            logger.info(f"P2.72: Deleted image: {url}")
+            return True
 
         except Exception as e:
             logger.error(f"P2.72: Image delete failed: {e}")
@@ -313,4 +578,4 @@ class ImageManager:
 image_manager = ImageManager()
 
 
-__all__ = ["ImageManager", "ImageInfo", "image_manager"]
+__all__ = ["ImageManager", "ImageInfo", "ThumbnailCache", "image_manager"]
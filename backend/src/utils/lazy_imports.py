@@ -0,0 +1,94 @@
+"""
+Lazy Imports
+Defers heavy third-party imports (pandas, openpyxl, reportlab, numpy, ...)
+until first attribute access, so importing a route module stays cheap.
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+import types
+
+_lazy_modules = {}
+_load_times = {}
+_lock = threading.RLock()
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access.
+
+    After loading, the real module's namespace is copied onto the proxy so
+    later attribute lookups are plain dict hits.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_loaded"] = False
+
+    def _load(self):
+        with _lock:
+            if not self.__dict__["_lazy_loaded"]:
+                started = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                _load_times[self.__name__] = time.perf_counter() - started
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_loaded"] = True
+        return self
+
+    def __getattr__(self, attr):
+        # Only called for names missing from the proxy's own __dict__
+        if self.__dict__["_lazy_loaded"]:
+            raise AttributeError(f"module {self.__name__!r} has no attribute {attr!r}")
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_loaded"] else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_module(name):
+    """Return a shared lazy proxy for ``name`` (e.g. ``pd = lazy_module("pandas")``)"""
+    with _lock:
+        proxy = _lazy_modules.get(name)
+        if proxy is None:
+            proxy = _lazy_modules[name] = LazyModule(name)
+        return proxy
+
+
+def module_available(name):
+    """Check that a module can be imported without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def warm_modules(names):
+    """Import ``names`` now; returns {name: seconds} for modules that loaded.
+
+    Missing optional dependencies are skipped silently.
+    """
+    loaded = {}
+    for name in names:
+        if not module_available(name):
+            continue
+        started = time.perf_counter()
+        lazy_module(name)._load()
+        loaded[name] = time.perf_counter() - started
+    return loaded
+
+
+def lazy_import_stats():
+    """Which lazy modules have been loaded and how long each import took"""
+    with _lock:
+        return {
+            name: {
+                "loaded": proxy.__dict__["_lazy_loaded"],
+                "import_seconds": round(_load_times.get(name, 0.0), 4),
+            }
+            for name, proxy in _lazy_modules.items()
+        }
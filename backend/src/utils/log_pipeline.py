@@ -0,0 +1,165 @@
+"""
+Non-blocking log pipeline
+
+Request threads only build the JSON message and push the record onto an
+in-memory queue; a single background ``QueueListener`` thread owns the file
+handlers and does the actual disk I/O.  Records are routed to their file
+handler by logger name, so one listener thread serves every specialised
+logger (comprehensive.*, AdvancedLogger files, ...).  Records of child
+loggers (``security.auth`` under ``security``) go to the handler of the
+logger that queued them, as with ordinary propagation.
+
+Set ``LOG_ASYNC=false`` to attach handlers directly (synchronous writes).
+"""
+
+import atexit
+import copy
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_QUEUE_SIZE = 10000
+
+
+def async_logging_enabled():
+    """Whether handlers should be fed through the background queue"""
+    return os.getenv("LOG_ASYNC", "true").lower() not in ("0", "false", "no", "off")
+
+
+class PreSerializedQueueHandler(QueueHandler):
+    """QueueHandler for records whose message is already a final string.
+
+    The stock ``prepare`` re-formats and copies every record; our messages are
+    JSON built on the caller thread, so only the lazy ``%`` args are merged and
+    exception info is rendered once before crossing the thread boundary.
+    """
+
+    def __init__(self, log_queue, pipeline, route=None):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+        self.route = route
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.route is not None and record.name != self.route:
+            # propagated from a child logger: every queueing ancestor gets
+            # its own copy, tagged with the route it was queued for
+            record = copy.copy(record)
+            record.log_route = self.route
+        self.pipeline.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging: drop and count instead
+            self.pipeline.dropped += 1
+
+
+class _RoutingHandler(logging.Handler):
+    """Dispatches dequeued records to the handler registered for their logger"""
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+
+    def handle(self, record):
+        # nearest registered logger: name == key or name.startswith(key + ".")
+        name = getattr(record, "log_route", record.name)
+        while name and name not in self.routes:
+            name = name.rpartition(".")[0]
+        for handler in self.routes.get(name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record):  # pragma: no cover - handle() is overridden
+        self.handle(record)
+
+
+class LogPipeline:
+    """Shared queue + single listener thread for file based loggers"""
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.router = _RoutingHandler()
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def attach(self, logger, handler, use_queue=None):
+        """Route ``logger`` output to ``handler``.
+
+        Replaces whatever handlers the logger had.  With ``use_queue`` False (or
+        ``LOG_ASYNC=false``) the handler is attached directly to the logger.
+        """
+        if use_queue is None:
+            use_queue = async_logging_enabled()
+
+        logger.handlers.clear()
+        with self._lock:
+            for old in self.router.routes.pop(logger.name, []):
+                old.close()
+
+        if not use_queue:
+            logger.addHandler(handler)
+            return handler
+
+        with self._lock:
+            self.router.routes[logger.name] = [handler]
+        logger.addHandler(PreSerializedQueueHandler(self.queue, self, logger.name))
+        self.ensure_started()
+        return handler
+
+    def ensure_started(self):
+        """Start the listener, restarting it in forked worker processes"""
+        pid = os.getpid()
+        if self._listener is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._listener is not None and self._pid == pid:
+                return
+            # After a fork the parent's listener thread does not exist here
+            self._listener = QueueListener(self.queue, self.router)
+            self._listener.start()
+            self._pid = pid
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self._listener is None or self._pid != os.getpid():
+            return
+        self.stop()
+        self.ensure_started()
+
+    def stop(self):
+        """Drain the queue and stop the listener thread"""
+        with self._lock:
+            listener, self._listener = self._listener, None
+            owned = self._pid == os.getpid()
+        if listener is not None and owned:
+            listener.stop()
+        for handlers in list(self.router.routes.values()):
+            for handler in handlers:
+                handler.flush()
+
+    def stats(self):
+        return {
+            "running": self._listener is not None,
+            "queued": self.queue.qsize(),
+            "dropped": self.dropped,
+            "routes": sorted(self.router.routes),
+        }
+
+
+# Process-wide pipeline shared by all file loggers
+log_pipeline = LogPipeline()
+atexit.register(log_pipeline.stop)
@@ -0,0 +1,284 @@
+"""
+List Serializers
+Columnar serialization for list endpoints.
+
+A ``ListSerializer`` is built once per endpoint from a model and a field
+list. At that point every field gets a converter picked from its column
+type (Numeric -> float, Date/DateTime -> ISO string, Enum -> value), so
+serializing a page is a tight loop over plain Core rows instead of per-row
+``to_dict`` calls:
+
+- Only the listed columns are selected (``query.with_entities``), and no
+  ORM instances are built
+- Related names (e.g. ``customer_name``) are fetched with one ``IN`` query
+  per page instead of one query per row
+- Child collections (e.g. invoice items) are loaded on request with one
+  ``IN`` query per page, the same SQL ``selectinload`` would issue
+- ``json_response`` encodes with orjson when it is installed
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import select
+from sqlalchemy import types as sqltypes
+from sqlalchemy.orm import load_only
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+# ==================== Converters ====================
+
+
+def money(value):
+    """Numeric -> float, missing amounts as 0.0 (matches the to_dict methods)."""
+    return float(value) if value else 0.0
+
+
+def number(value):
+    """Numeric -> float, None stays None."""
+    return None if value is None else float(value)
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def enum_value(value):
+    return getattr(value, "value", value)
+
+
+def converter_for(column_type) -> Optional[Callable[[Any], Any]]:
+    """Converter for a column type; None when the DB value is already JSON-ready."""
+    if isinstance(column_type, sqltypes.Enum):
+        return enum_value
+    if isinstance(column_type, (sqltypes.Date, sqltypes.DateTime, sqltypes.Time)):
+        return iso
+    if isinstance(column_type, sqltypes.Numeric) and not isinstance(
+        column_type, sqltypes.Float
+    ):
+        return number
+    return None
+
+
+@dataclass(frozen=True)
+class Related:
+    """A value looked up in another table through a foreign key of the row."""
+
+    via: str  # foreign key field of the row, e.g. "customer_id"
+    column: Any  # mapped column to fetch, e.g. Customer.name
+
+
+@dataclass(frozen=True)
+class Children:
+    """A child collection loaded with one IN query per page."""
+
+    serializer: "ListSerializer"
+    foreign_key: str  # child column pointing at the parent id
+
+
+class ListSerializer:
+    """Serialize lists of one model from Core rows."""
+
+    def __init__(
+        self,
+        model,
+        fields: Sequence[str],
+        converters: Optional[Dict[str, Optional[Callable[[Any], Any]]]] = None,
+        related: Optional[Dict[str, Related]] = None,
+        children: Optional[Dict[str, Children]] = None,
+        constants: Optional[Dict[str, Any]] = None,
+    ):
+        self.model = model
+        self.keys: Tuple[str, ...] = tuple(fields)
+        # keys to_dict always emits with a fixed value (no column behind them)
+        self.constants = dict(constants or {})
+        self.columns = [getattr(model, name) for name in self.keys]
+        self.related = related or {}
+        self.children = children or {}
+
+        overrides = converters or {}
+        self._converters: List[Tuple[str, Callable[[Any], Any]]] = []
+        for name, attr in zip(self.keys, self.columns):
+            if name in overrides:
+                fn = overrides[name]
+            else:
+                fn = converter_for(attr.property.columns[0].type)
+            if fn is not None:
+                self._converters.append((name, fn))
+
+    @classmethod
+    def from_model(cls, model, exclude: Iterable[str] = (), **kwargs):
+        """Serializer for every mapped column of ``model``."""
+        exclude = set(exclude)
+        fields = [
+            attr.key
+            for attr in sa_inspect(model).column_attrs
+            if attr.key not in exclude
+        ]
+        return cls(model, fields, **kwargs)
+
+    # -------------------------------------------------------------- queries
+    def load_options(self):
+        """``load_only`` option for callers that still need ORM instances."""
+        return (load_only(*self.columns),)
+
+    def paginate(
+        self,
+        query,
+        page: int,
+        per_page: int,
+        include: Iterable[str] = (),
+        session=None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Serialize one page of ``query`` (a filtered, ordered ``Model.query``).
+
+        Returns:
+            (rows, pagination) with the same pagination keys as
+            Flask-SQLAlchemy's ``paginate``
+        """
+        page = max(page or 1, 1)
+        per_page = per_page if per_page and per_page > 0 else 20
+        total = query.order_by(None).count()
+        rows = (
+            query.with_entities(*self.columns)
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+            .all()
+        )
+        pages = -(-total // per_page) if total else 0
+        return self.dump_rows(rows, include, session), {
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "pages": pages,
+            "has_next": page < pages,
+            "has_prev": page > 1,
+        }
+
+    # -------------------------------------------------------------- dumping
+    def dump_rows(
+        self, rows: Iterable[Sequence[Any]], include: Iterable[str] = (), session=None
+    ) -> List[Dict[str, Any]]:
+        """Rows selected with ``self.columns`` -> list of dicts."""
+        keys = self.keys
+        converters = self._converters
+        constants = self.constants
+        out = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            for name, fn in converters:
+                item[name] = fn(item[name])
+            if constants:
+                item.update(constants)
+            out.append(item)
+
+        if out and (self.related or include):
+            session = session or _default_session()
+            for key, related in self.related.items():
+                self._attach_related(out, key, related, session)
+            for name in include:
+                if name in self.children:
+                    self._attach_children(out, name, self.children[name], session)
+        return out
+
+    def dump_objects(self, objects: Iterable[Any], include=(), session=None):
+        """ORM instances -> list of dicts (same output as dump_rows)."""
+        keys = self.keys
+        return self.dump_rows(
+            ([getattr(obj, key) for key in keys] for obj in objects), include, session
+        )
+
+    @staticmethod
+    def _attach_related(out, key, related: Related, session):
+        ids = {item[related.via] for item in out if item.get(related.via)}
+        if not ids:
+            return
+        target = related.column.class_
+        pk = sa_inspect(target).primary_key[0]
+        values = dict(
+            session.execute(select(pk, related.column).where(pk.in_(ids))).all()
+        )
+        for item in out:
+            value = values.get(item.get(related.via))
+            if value is not None:
+                item[key] = value
+
+    @staticmethod
+    def _attach_children(out, name, children: Children, session):
+        child = children.serializer
+        fk = getattr(child.model, children.foreign_key)
+        by_parent: Dict[Any, List[Dict[str, Any]]] = {item["id"]: [] for item in out}
+        rows = session.execute(
+            select(fk, *child.columns).where(fk.in_(list(by_parent)))
+        ).all()
+        dumped = child.dump_rows((row[1:] for row in rows), session=session)
+        for row, item in zip(rows, dumped):
+            by_parent[row[0]].append(item)
+        for item in out:
+            item[name] = by_parent[item["id"]]
+
+
+def _default_session():
+    from src.database import db
+
+    return db.session
+
+
+# ==================== JSON output ====================
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if hasattr(value, "value"):
+        return value.value
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload) -> bytes:
+    """Encode ``payload`` as UTF-8 JSON (orjson when available)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        payload, default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def json_response(payload, status: int = 200):
+    """``jsonify`` replacement for large list payloads."""
+    from flask import current_app
+
+    return current_app.response_class(
+        dumps(payload), status=status, mimetype="application/json"
+    )
+
+
+__all__ = [
+    "ListSerializer",
+    "Related",
+    "Children",
+    "converter_for",
+    "money",
+    "number",
+    "iso",
+    "enum_value",
+    "dumps",
+    "json_response",
+    "ORJSON_AVAILABLE",
+]
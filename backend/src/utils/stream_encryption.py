@@ -0,0 +1,425 @@
+"""
+Streaming File Encryption
+
+Chunked AES-256-GCM format for backups and uploaded files. Files of any size
+are encrypted and decrypted in constant memory, and the encryptor is a
+file-like writer so a compressor can write straight into it:
+
+    cipher = StreamCipher(master_key)
+    with open(path, "wb") as raw, cipher.writer(raw) as enc, \\
+            gzip.GzipFile(fileobj=enc, mode="wb") as gz:
+        shutil.copyfileobj(db_file, gz)
+
+Format (SEF1):
+    header  = b"SEF1" | version (1 byte) | chunk_size (uint32 BE) | salt (16 bytes)
+    chunk_i = AES-GCM(key, nonce=i as 96-bit BE, aad=header | final flag)
+
+- ``key`` is derived per file with HKDF-SHA256(master key, salt), so nonces
+  never repeat across files.
+- Every chunk carries its own tag; the final-chunk flag in the AAD detects
+  truncation and the counter nonce detects reordering.
+
+Files written by the old one-shot ``Fernet.encrypt`` are still readable:
+``decrypt_stream`` detects them and verifies/decrypts them in two streaming
+passes (HMAC first, then AES-CBC) when the source is seekable.
+"""
+
+import base64
+import binascii
+import hmac
+import io
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"SEF1"
+VERSION = 1
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MiB plaintext per chunk
+TAG_SIZE = 16
+SALT_SIZE = 16
+_HEADER = struct.Struct(">4sBI16s")
+HEADER_SIZE = _HEADER.size
+_HKDF_INFO = b"store-erp/stream-file/v1"
+_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+_FERNET_PREFIX = b"gAAAAA"  # base64 of the 0x80 Fernet version byte
+_COPY_BUFFER = 256 * 1024
+
+
+class StreamDecryptionError(ValueError):
+    """Encrypted stream is corrupted, truncated or was encrypted with another key"""
+
+
+def _normalize_master_key(master_key):
+    if isinstance(master_key, str):
+        master_key = master_key.encode()
+    if len(master_key) == 44:  # urlsafe base64 Fernet key
+        return base64.urlsafe_b64decode(master_key)
+    if len(master_key) != 32:
+        raise ValueError("master key must be 32 raw bytes or a Fernet key")
+    return master_key
+
+
+def _nonce(counter):
+    return counter.to_bytes(12, "big")
+
+
+def is_stream_encrypted(source):
+    """True if ``source`` (path, bytes or readable) starts with the SEF1 header"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:4]) == MAGIC
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(4) == MAGIC
+    return source.peek(4)[:4] == MAGIC if hasattr(source, "peek") else False
+
+
+class EncryptingWriter(io.RawIOBase):
+    """Write-only stream that encrypts into ``dst`` chunk by chunk."""
+
+    def __init__(self, cipher, dst, close_dst=False):
+        super().__init__()
+        self._dst = dst
+        self._close_dst = close_dst
+        self._chunk_size = cipher.chunk_size
+        salt = os.urandom(SALT_SIZE)
+        self._header = _HEADER.pack(MAGIC, VERSION, self._chunk_size, salt)
+        self._aead = AESGCM(cipher.derive_key(salt))
+        self._buffer = bytearray()
+        self._counter = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._emit(self._header)
+
+    def writable(self):
+        return True
+
+    def _emit(self, data):
+        self._dst.write(data)
+        self.bytes_out += len(data)
+
+    def _seal(self, chunk, final):
+        aad = self._header + (b"\x01" if final else b"\x00")
+        self._emit(self._aead.encrypt(_nonce(self._counter), bytes(chunk), aad))
+        self._counter += 1
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed EncryptingWriter")
+        view = memoryview(data).cast("B")
+        self.bytes_in += len(view)
+        self._buffer += view
+        # Keep at least one byte buffered: the last chunk must carry the final flag
+        while len(self._buffer) > self._chunk_size:
+            self._seal(self._buffer[: self._chunk_size], final=False)
+            del self._buffer[: self._chunk_size]
+        return len(view)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._seal(self._buffer, final=True)
+            self._buffer = bytearray()
+            self._dst.flush()
+            if self._close_dst:
+                self._dst.close()
+        finally:
+            super().close()
+
+
+class DecryptingReader(io.RawIOBase):
+    """Read-only stream over a SEF1 source; yields verified plaintext chunks."""
+
+    def __init__(self, cipher, src, close_src=False):
+        super().__init__()
+        self._src = src
+        self._close_src = close_src
+        header = _read_exact(src, HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise StreamDecryptionError("stream is too short for a SEF1 header")
+        magic, version, chunk_size, salt = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise StreamDecryptionError("not a SEF1 stream")
+        if not 0 < chunk_size <= _MAX_CHUNK_SIZE:
+            raise StreamDecryptionError("invalid chunk size in header")
+        self._header = header
+        self._aead = AESGCM(cipher.derive_key(salt))
+        self._sealed_size = chunk_size + TAG_SIZE
+        self._counter = 0
+        self._pending = _read_exact(src, self._sealed_size)
+        self._plain = b""
+        self._offset = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def _next_chunk(self):
+        sealed = self._pending
+        self._pending = _read_exact(self._src, self._sealed_size)
+        final = not self._pending
+        if len(sealed) < TAG_SIZE:
+            raise StreamDecryptionError("stream truncated")
+        aad = self._header + (b"\x01" if final else b"\x00")
+        try:
+            plain = self._aead.decrypt(_nonce(self._counter), sealed, aad)
+        except InvalidTag as e:
+            raise StreamDecryptionError(
+                f"authentication failed for chunk {self._counter} "
+                "(wrong key, corrupted or truncated file)"
+            ) from e
+        self._counter += 1
+        self._done = final
+        return plain
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._plain):
+            if self._done:
+                return 0
+            self._plain = self._next_chunk()
+            self._offset = 0
+        n = min(len(buffer), len(self._plain) - self._offset)
+        buffer[:n] = self._plain[self._offset : self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self):
+        if not self.closed and self._close_src:
+            self._src.close()
+        super().close()
+
+
+def _read_exact(src, size):
+    data = src.read(size)
+    if not data or len(data) == size:
+        return data or b""
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        more = src.read(remaining)
+        if not more:
+            break
+        parts.append(more)
+        remaining -= len(more)
+    return b"".join(parts)
+
+
+class StreamCipher:
+    """Chunked AES-256-GCM encryption bound to one master key"""
+
+    def __init__(self, master_key, chunk_size=DEFAULT_CHUNK_SIZE):
+        if not 0 < chunk_size <= _MAX_CHUNK_SIZE:
+            raise ValueError("chunk_size out of range")
+        self._master_key = _normalize_master_key(master_key)
+        self.chunk_size = chunk_size
+
+    def derive_key(self, salt):
+        return HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=salt, info=_HKDF_INFO
+        ).derive(self._master_key)
+
+    # ------------------------------------------------------------------ streams
+    def writer(self, dst, close_dst=False):
+        """File-like writer encrypting into ``dst`` (use as a context manager)"""
+        return EncryptingWriter(self, dst, close_dst=close_dst)
+
+    def reader(self, src, close_src=False):
+        """File-like reader decrypting a SEF1 ``src``"""
+        return io.BufferedReader(
+            DecryptingReader(self, src, close_src=close_src), _COPY_BUFFER
+        )
+
+    def encrypt_stream(self, src, dst):
+        """Encrypt readable ``src`` into writable ``dst``; returns bytes written"""
+        with self.writer(dst) as enc:
+            _copy(src, enc)
+        return enc.bytes_out
+
+    def decrypt_stream(self, src, dst):
+        """Decrypt ``src`` (SEF1, or legacy Fernet) into ``dst``; returns plaintext size"""
+        start = src.tell() if _is_seekable(src) else None
+        head = src.read(len(_FERNET_PREFIX))
+        # Hand the sniffed bytes back: rewind when possible, else re-attach them
+        src = _Prepended(head, src) if start is None else src
+        if start is not None:
+            src.seek(start)
+        if head.startswith(MAGIC):
+            with self.reader(src) as dec:
+                return _copy(dec, dst)
+        if head == _FERNET_PREFIX:
+            return decrypt_fernet_stream(self._master_key, src, dst)
+        raise StreamDecryptionError("unknown encrypted file format")
+
+    # -------------------------------------------------------------------- files
+    def encrypt_file(self, path, output_path):
+        with open(path, "rb") as src:
+            return _atomic_write(output_path, lambda dst: self.encrypt_stream(src, dst))
+
+    def decrypt_file(self, path, output_path):
+        # Plaintext only replaces output_path once every chunk has verified
+        with open(path, "rb") as src:
+            return _atomic_write(output_path, lambda dst: self.decrypt_stream(src, dst))
+
+
+class _Prepended(io.RawIOBase):
+    """Re-attach bytes consumed while sniffing the format"""
+
+    def __init__(self, head, src):
+        super().__init__()
+        self._head = head
+        self._src = src
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if self._head:
+            if size is None or size < 0:
+                data, self._head = self._head + self._src.read(), b""
+                return data
+            data, self._head = self._head[:size], self._head[size:]
+            if len(data) < size:
+                data += self._src.read(size - len(data))
+            return data
+        return self._src.read(size)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _is_seekable(f):
+    try:
+        return f.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def _copy(src, dst):
+    total = 0
+    while True:
+        block = src.read(_COPY_BUFFER)
+        if not block:
+            return total
+        dst.write(block)
+        total += len(block)
+
+
+def _atomic_write(output_path, produce):
+    output_path = Path(output_path)
+    fd, tmp = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            result = produce(dst)
+        os.replace(tmp, output_path)
+        return result
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+# ---------------------------------------------------------------- legacy Fernet
+
+
+def _b64_blocks(src, start=0):
+    """Decode an unpadded-or-padded urlsafe base64 stream in 4-char aligned blocks"""
+    src.seek(start)
+    carry = b""
+    while True:
+        block = src.read(_COPY_BUFFER)
+        if not block:
+            break
+        block = carry + block.strip()
+        cut = len(block) - len(block) % 4
+        carry = block[cut:]
+        if cut:
+            yield _b64decode(block[:cut])
+    if carry:
+        yield _b64decode(carry + b"=" * (-len(carry) % 4))
+
+
+def _b64decode(data):
+    try:
+        return base64.urlsafe_b64decode(data)
+    except binascii.Error as e:
+        raise StreamDecryptionError("legacy Fernet file is not valid base64") from e
+
+
+def decrypt_fernet_stream(master_key, src, dst):
+    """
+    Decrypt a file produced by ``Fernet.encrypt(whole_file)``.
+
+    Seekable sources are handled in two constant-memory passes: the HMAC is
+    verified over the whole token first, then AES-128-CBC is streamed into
+    ``dst``. Non-seekable sources fall back to ``Fernet.decrypt``.
+    """
+    key = _normalize_master_key(master_key)
+    if not _is_seekable(src):
+        try:
+            plain = Fernet(base64.urlsafe_b64encode(key)).decrypt(src.read())
+        except InvalidToken as e:
+            raise StreamDecryptionError("legacy Fernet file failed verification") from e
+        dst.write(plain)
+        return len(plain)
+
+    signing_key, encryption_key = key[:16], key[16:]
+    start = src.tell()
+
+    # Pass 1: authenticate version | timestamp | iv | ciphertext against the trailing HMAC
+    mac = hmac.new(signing_key, digestmod="sha256")
+    tail = b""
+    prefix = b""
+    for block in _b64_blocks(src, start):
+        if len(prefix) < 25:
+            prefix += block[: 25 - len(prefix)]
+        data = tail + block
+        mac.update(data[:-32])
+        tail = data[-32:]
+    if len(prefix) < 25 or prefix[0] != 0x80 or len(tail) < 32:
+        raise StreamDecryptionError("legacy Fernet file is malformed")
+    if not hmac.compare_digest(mac.digest(), tail):
+        raise StreamDecryptionError("legacy Fernet file failed verification")
+
+    # Pass 2: decrypt the verified ciphertext
+    iv = prefix[9:25]
+    decryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(iv)).decryptor()
+    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+    skip = 25
+    held = b""
+    total = 0
+    for block in _b64_blocks(src, start):
+        if skip:
+            dropped = min(skip, len(block))
+            block, skip = block[dropped:], skip - dropped
+        data = held + block
+        data, held = data[:-32], data[-32:]
+        out = unpadder.update(decryptor.update(data))
+        dst.write(out)
+        total += len(out)
+    try:
+        out = unpadder.update(decryptor.finalize()) + unpadder.finalize()
+    except ValueError as e:
+        raise StreamDecryptionError("legacy Fernet file has invalid padding") from e
+    dst.write(out)
+    return total + len(out)
+
+
+__all__ = [
+    "StreamCipher",
+    "StreamDecryptionError",
+    "EncryptingWriter",
+    "DecryptingReader",
+    "decrypt_fernet_stream",
+    "is_stream_encrypted",
+    "DEFAULT_CHUNK_SIZE",
+]
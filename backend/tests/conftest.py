@@ -95,7 +95,9 @@ def _preload_models():
 # Session setup hook
 def pytest_configure(config):
     """Setup for entire test session"""
-    pass  # Can add logging, env setup here
+    # Per-endpoint SQL query budgets (tests/query_budget.py)
+    if not config.pluginmanager.has_plugin("tests.query_budget"):
+        config.pluginmanager.import_plugin("tests.query_budget")
 
 
 # Pre-test cleanup hook
@@ -0,0 +1,67 @@
+"""
+Pytest plugin: fail tests whose requests exceed a query budget.
+
+Registered by ``tests/conftest.py`` (elsewhere: ``pytest -p tests.query_budget``).
+Requests are profiled by ``src.middleware.query_profiler`` on apps where
+``init_query_profiler(app)`` ran; a test fails when one of its requests
+exceeds
+
+- the budget declared on the endpoint (``@query_budget`` / ``QUERY_BUDGETS``), or
+- a budget declared on the test itself::
+
+    @pytest.mark.query_budget(5, max_duplicates=1, endpoint="products.get_products")
+    def test_products_list(client): ...
+
+The ``query_profiles`` fixture gives the profiles of the test's requests.
+"""
+
+import pytest
+
+from src.middleware.query_profiler import QueryBudget, query_profiler
+
+_PROFILES = pytest.StashKey[list]()
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries=None, max_duplicates=None, endpoint=None): "
+        "fail when a request made by the test issues more SQL than allowed",
+    )
+
+
+def budget_failures(profiles, markers) -> list:
+    """Violations of endpoint budgets and of ``query_budget`` markers."""
+    failures = []
+    for profile in profiles:
+        failures.extend(profile.violations())
+        for marker in markers:
+            endpoint = marker.kwargs.get("endpoint")
+            if endpoint is not None and endpoint != profile.endpoint:
+                continue
+            budget = QueryBudget(
+                marker.args[0] if marker.args else marker.kwargs.get("max_queries"),
+                marker.kwargs.get("max_duplicates"),
+            )
+            failures.extend(budget.check(profile))
+    return failures
+
+
+@pytest.fixture
+def query_profiles(request):
+    """Profiles (``RequestProfile``) of the requests made so far by this test."""
+    return request.node.stash.setdefault(_PROFILES, [])
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    profiles = item.stash.setdefault(_PROFILES, [])
+    unsubscribe = query_profiler.subscribe(profiles.append)
+    try:
+        result = yield
+    finally:
+        unsubscribe()
+    failures = budget_failures(profiles, list(item.iter_markers("query_budget")))
+    if failures:
+        pytest.fail("Query budget exceeded:\n" + "\n".join(failures), pytrace=False)
+    return result
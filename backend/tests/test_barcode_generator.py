@@ -0,0 +1,145 @@
+"""
+Tests for barcode / QR rendering and label sheets (utils/barcode_generator.py).
+
+Covers:
+- Content-keyed render cache: hits, LRU eviction by size
+- ETag / conditional GET on rendered images
+- Label sheets: PNG pages and a streamed, well-formed PDF
+- Batch label endpoint over products loaded in one query
+- Routes require a token and an inventory permission; label count is capped
+"""
+
+import io
+import re
+
+import jwt
+import pytest
+from flask import Flask, g
+from PIL import Image
+
+import src.models.user  # noqa: F401  (tables referenced by products)
+from src.database import db
+from src.models.inventory import Product
+from src.utils import barcode_generator
+from src.utils.barcode_generator import (
+    BarcodeGenerator,
+    LabelItem,
+    LabelSheetConfig,
+    LabelSheetRenderer,
+    QRCodeGenerator,
+    RenderCache,
+    init_barcode_routes,
+)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RenderCache()
+    monkeypatch.setattr(barcode_generator, "render_cache", cache)
+    return cache
+
+
+def test_render_cache(cache):
+    gen = BarcodeGenerator()
+    first, etag = gen.render("ABC-123")
+    assert gen.generate("ABC-123") == first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert gen.render("ABC-124")[1] != etag
+    assert gen.render("ABC-123", "code39")[1] != etag
+
+    qr = QRCodeGenerator()
+    png, qr_etag = qr.render("https://example.com")
+    assert qr.generate("https://example.com") == png and qr_etag != etag
+    assert Image.open(io.BytesIO(png)).format == "PNG"
+
+    small = RenderCache(max_bytes=25)
+    for key in "abcd":
+        small.get_or_render(key, lambda: b"x" * 10)
+    small.get_or_render("c", lambda: b"unused")
+    small.get_or_render("e", lambda: b"y" * 10)
+    assert list(small._entries) == ["c", "e"]
+    assert small.stats()["bytes"] == 20
+
+
+def _items(n):
+    return [LabelItem(f"P{i:05d}", f"Product {i}", i * 1.5) for i in range(n)]
+
+
+def test_label_sheets(cache):
+    renderer = LabelSheetRenderer(LabelSheetConfig(columns=2, rows=3, dpi=100), workers=4)
+    assert renderer.page_count(13) == 3
+
+    png = renderer.render_png(_items(13), page=3)
+    page = Image.open(io.BytesIO(png))
+    assert page.size == (827, 1169)
+    # the last page holds one label: top-left cell inked, the rest blank
+    assert page.crop((0, 0, 400, 380)).getextrema()[0] == 0
+    assert page.crop((420, 0, 827, 1169)).getextrema() == (255, 255)
+
+    chunks = list(renderer.stream_pdf(_items(13)))
+    assert len(chunks) == 5  # header, three pages, trailer
+    pdf = b"".join(chunks)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    assert b"/Count 3" in pdf
+    # every xref offset points at its object
+    xref_at = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+    entries = pdf[xref_at:].split(b"\n")[3:]
+    for number, entry in enumerate(entries[: pdf.count(b" 0 obj")], start=1):
+        offset = int(entry[:10])
+        assert pdf[offset:].startswith(b"%d 0 obj" % number)
+
+
+def test_routes_etag_and_labels(cache, monkeypatch):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SECRET_KEY"] = "test-secret"
+    db.init_app(app)
+    init_barcode_routes(app)
+    role = {"name": "admin"}
+    app.before_request(lambda: setattr(g, "current_user_role", role["name"]))
+    token = jwt.encode({"user_id": 1, "username": "u", "type": "access"}, "test-secret")
+    client = app.test_client()
+    assert client.post("/api/barcode/generate", json={"data": "X1"}).status_code == 401
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    response = client.post("/api/barcode/generate", json={"data": "X1", "format": "png"})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{BarcodeGenerator().render("X1")[1]}"'
+    assert "max-age=86400" in response.headers["Cache-Control"]
+
+    with app.app_context():
+        Product.__table__.create(db.engine)
+        db.session.add_all(
+            Product(id=i, name=f"p{i}", sku=f"SKU{i}", selling_price=i, is_active=i != 3)
+            for i in range(1, 31)
+        )
+        db.session.commit()
+
+        response = client.get("/api/barcode/product/2/barcode?format=png")
+        etag = response.headers["ETag"]
+        assert client.get(
+            "/api/barcode/product/2/barcode?format=png", headers={"If-None-Match": etag}
+        ).status_code == 304
+
+        response = client.post("/api/barcode/labels", json={"columns": 2, "rows": 4})
+        assert response.status_code == 200
+        assert response.headers["X-Label-Count"] == "29"
+        assert response.headers["X-Total-Pages"] == "4"
+        assert response.data.endswith(b"%%EOF\n")
+
+        response = client.post(
+            "/api/barcode/labels", json={"product_ids": [1, 2, 3], "format": "png"}
+        )
+        assert response.headers["X-Label-Count"] == "3"
+        assert Image.open(io.BytesIO(response.data)).format == "PNG"
+        assert client.post(
+            "/api/barcode/labels", json={"format": "png", "page": 9}
+        ).status_code == 404
+
+        monkeypatch.setattr(barcode_generator, "LABEL_SHEET_MAX_ITEMS", 20)
+        assert client.post("/api/barcode/labels", json={}).status_code == 400
+
+        role["name"] = "user"  # may view inventory, not export it
+        assert client.get("/api/barcode/product/2/barcode").status_code == 200
+        assert client.post("/api/barcode/labels", json={}).status_code == 403
+        db.session.remove()
@@ -0,0 +1,165 @@
+"""
+Tests for the streaming upload scanner (utils/file_scanner.py).
+
+Covers:
+- Incremental hash and pattern matching across chunk borders
+- Type detection from the header only; leading executable signatures
+- Script openers (<%) checked in text content only, not in binary payloads
+- Early abort on size / extension violations (reading stops)
+- Uploads scanned while parsed, rejected ones never buffered
+"""
+
+import hashlib
+import io
+import os
+
+from flask import Flask, request
+
+from src.utils.file_scanner import (
+    FileScanner,
+    ScanningRequestMixin,
+    ScanningSpool,
+    init_file_scanner,
+    validate_upload,
+)
+
+
+def _csv(rows):
+    return b"".join(b"%d,item-%d,%d.50\n" % (i, i, i * 3) for i in range(rows))
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, n=-1):
+        self.reads += 1
+        return super().read(n)
+
+
+def test_single_pass_hash_and_patterns_across_chunks():
+    scanner = FileScanner(max_size=10 * 1024 * 1024)
+    body = b"a" * 20_000 + b"<scr" + b"IPT>alert(1)" + b"b" * 20_000
+    for chunk_size in (7, 4096, 20_002):
+        result = scanner.scan_stream(io.BytesIO(body), "page.txt", chunk_size=chunk_size)
+        assert not result.is_safe
+        assert result.threats == ["Dangerous pattern detected: b'<script'..."]
+
+    clean = _csv(20_000)
+    result = scanner.scan_stream(io.BytesIO(clean), "data.csv", chunk_size=1000)
+    assert result.is_safe, result.threats
+    assert result.file_size == len(clean)
+    assert result.metadata["sha256"] == hashlib.sha256(clean).hexdigest()
+    assert scanner.scan_bytes(clean, "data.csv").metadata == result.metadata
+
+
+def test_header_checks():
+    scanner = FileScanner()
+    png = b"\x89PNG\r\n\x1a\n" + b"MZ" * 10_000
+    assert scanner.scan_bytes(png, "logo.png").is_safe
+    mismatch = scanner.scan_bytes(png, "report.pdf")
+    assert mismatch.file_type == "png"
+    assert mismatch.threats == ["Extension mismatch: declared .pdf, detected png"]
+
+    exe = scanner.scan_bytes(b"MZ\x90\x00" + b"\x00" * 100, "setup.txt")
+    assert exe.threats == ["Dangerous pattern detected: b'MZ'..."]
+    # macro markers are matched case-insensitively anywhere in the stream
+    xlsx = b"PK\x03\x04" + b"\x00" * 50_000 + b"xl/vbaProject.bin"
+    assert not scanner.scan_bytes(xlsx, "book.xlsx").is_safe
+    assert scanner.scan_bytes(b"", "empty.txt").warnings == ["File is empty"]
+
+    # '<%' is two bytes: binary content contains it by chance
+    noise = b"<%" + os.urandom(4096)
+    for magic, name in [
+        (b"\x89PNG\r\n\x1a\n", "logo.png"),
+        (b"\xff\xd8\xff\xe0", "photo.jpg"),
+        (b"PK\x03\x04", "book.xlsx"),
+    ]:
+        assert scanner.scan_bytes(magic + noise, name).is_safe
+    # legacy Office formats all start with the OLE2 header
+    ole = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 4096
+    for name in ("letter.doc", "stock.xls", "slides.ppt"):
+        assert scanner.scan_bytes(ole, name).is_safe, name
+    script = scanner.scan_bytes(b"id,name\n1,<% Response.Write(1) %>", "import.csv")
+    assert script.threats == ["Dangerous pattern detected: b'<%'..."]
+
+
+def test_early_abort(tmp_path):
+    scanner = FileScanner(max_size=10_000)
+    stream = CountingStream(b"0" * 1_000_000)
+    result = scanner.scan_stream(stream, "big.csv", chunk_size=1000)
+    assert not result.is_safe and result.metadata["aborted"]
+    assert "exceeds maximum" in result.threats[0]
+    assert stream.reads == 11
+
+    stream = CountingStream(b"x" * 5000)
+    assert not scanner.scan_stream(stream, "tool.exe").is_safe
+    assert stream.reads == 0
+
+    path = tmp_path / "big.csv"
+    path.write_bytes(b"0" * 20_000)
+    assert "exceeds maximum" in scanner.scan_file(str(path)).threats[0]
+    assert scanner.scan_file(str(tmp_path / "missing.csv")).threats == ["File not found"]
+
+
+def _upload_app():
+    app = Flask(__name__)
+    init_file_scanner(app, FileScanner(max_size=200_000))
+    seen = {}
+
+    @app.route("/upload", methods=["POST"])
+    def upload():
+        file = request.files["file"]
+        seen["stream"] = file.stream
+        seen["content"] = file.read()
+        return {"sha256": validate_upload(file)[1].metadata["sha256"]}
+
+    return app, seen
+
+
+def test_uploads_scanned_while_parsed():
+    app, seen = _upload_app()
+    client = app.test_client()
+    content = _csv(8_000)
+
+    response = client.post(
+        "/upload", data={"file": (io.BytesIO(content), "prices.csv")}
+    )
+    assert response.status_code == 200
+    assert response.get_json()["sha256"] == hashlib.sha256(content).hexdigest()
+    assert isinstance(seen["stream"], ScanningSpool)
+    assert seen["content"] == content
+
+    ole = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 4096
+    response = client.post("/upload", data={"file": (io.BytesIO(ole), "stock.xls")})
+    assert response.status_code == 200
+
+    # every file of a multi-file field is scanned, not just the first
+    response = client.post(
+        "/upload",
+        data={"file": [(io.BytesIO(content), "a.csv"), (io.BytesIO(b"MZ\x90\x00"), "b.csv")]},
+    )
+    assert response.status_code == 400
+
+    for data, name in [
+        (b"<?php system($_GET['c']); ?>", "import.csv"),
+        (b"0" * 300_000, "big.csv"),
+        (b"MZ\x90\x00", "tool.exe"),
+    ]:
+        response = client.post("/upload", data={"file": (io.BytesIO(data), name)})
+        assert response.status_code == 400
+        assert response.get_json()["error"]["code"] == "FILE_SECURITY_ERROR"
+
+
+def test_rejected_upload_is_not_buffered():
+    scanner = FileScanner(max_size=1000)
+    spool = ScanningSpool(scanner, "big.csv")
+    for _ in range(100):
+        spool.write(b"0" * 600)
+    assert spool.tell() == 0
+    assert not spool.result.is_safe
+
+    from src.main import app
+
+    assert issubclass(app.request_class, ScanningRequestMixin)
@@ -0,0 +1,259 @@
+"""
+Tests for pooled keep-alive sessions, hedging and the asyncio client
+(resilience/session_pool.py, resilience/http_client.py,
+resilience/async_http_client.py).
+
+Covers:
+- One shared session per service, rebuilt after a fork or reconfiguration
+- Connection reuse against a local keep-alive server
+- Hedged GETs return the fast copy; non-idempotent requests are never hedged
+- Async client retries and trips the same CircuitBreaker
+- A cancelled half-open probe frees its slot without closing the breaker
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.resilience import session_pool
+from src.resilience.async_http_client import async_http_get, async_http_post
+from src.resilience.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from src.resilience.http_client import http_get, http_post
+from src.resilience.session_pool import (
+    close_sessions,
+    configure_service_pool,
+    get_session,
+    pool_stats,
+)
+
+
+class MockResponse:
+    def __init__(self, status_code, tag=""):
+        self.status_code = status_code
+        self.tag = tag
+
+    def raise_for_status(self):
+        if 500 <= self.status_code <= 599:
+            raise requests.HTTPError(f"{self.status_code} Server Error")
+
+
+class SlowThenFastSession:
+    """First call stalls, later calls answer immediately"""
+
+    def __init__(self, stall=0.5):
+        self.stall = stall
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, **kwargs):  # noqa: ARG002
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(self.stall)
+            return MockResponse(200, "slow")
+        return MockResponse(200, "fast")
+
+
+@pytest.fixture(autouse=True)
+def _fresh_sessions():
+    close_sessions()
+    yield
+    close_sessions()
+
+
+class TestSessionPool:
+    def test_one_session_per_service(self):
+        assert get_session("crm") is get_session("crm")
+        assert get_session("crm") is not get_session("sms")
+
+    def test_pool_size_configurable(self):
+        configure_service_pool("erp-sync", pool_maxsize=3, pool_connections=2)
+        get_session("erp-sync")
+        stats = pool_stats()["erp-sync"]
+        assert stats["pool_maxsize"] == 3
+        assert stats["pool_connections"] == 2
+
+    def test_sessions_rebuilt_after_fork(self, monkeypatch):
+        before = get_session("crm")
+        monkeypatch.setattr(session_pool, "_pid", -1)
+        assert get_session("crm") is not before
+
+    def test_http_client_uses_pooled_session(self, monkeypatch):
+        seen = []
+
+        def fake_request(self, method, url, timeout=None, **kwargs):  # noqa: ARG002
+            seen.append(self)
+            return MockResponse(200)
+
+        monkeypatch.setattr(requests.Session, "request", fake_request)
+        http_get("pooled-svc", "https://example.com/a", retries=0)
+        http_get("pooled-svc", "https://example.com/b", retries=0)
+
+        assert seen[0] is seen[1] is get_session("pooled-svc")
+
+
+class TestHedging:
+    def test_hedged_get_returns_fast_copy(self):
+        sess = SlowThenFastSession(stall=0.5)
+        resp = http_get(
+            "hedge-svc", "https://example.com", session=sess, retries=0, hedge_after=0.02
+        )
+
+        assert resp.tag == "fast"  # the stalled first copy was not waited for
+        assert sess.calls == 2
+
+    def test_post_is_never_hedged(self):
+        sess = SlowThenFastSession(stall=0.05)
+        resp = http_post(
+            "hedge-svc", "https://example.com", session=sess, retries=0, hedge_after=0.01
+        )
+        assert resp.tag == "slow"
+        assert sess.calls == 1
+
+    def test_no_hedge_when_first_answer_is_fast(self):
+        sess = SlowThenFastSession(stall=0.0)
+        http_get("hedge-svc", "https://example.com", session=sess, retries=0, hedge_after=0.2)
+        assert sess.calls == 1
+
+
+class FakeAsyncClient:
+    def __init__(self, statuses, delays=None):
+        self.statuses = list(statuses)
+        self.delays = list(delays or [])
+        self.calls = 0
+
+    async def request(self, method, url, timeout=None, **kwargs):  # noqa: ARG002
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0
+        status = self.statuses.pop(0) if self.statuses else 200
+        if delay:
+            await asyncio.sleep(delay)
+        return MockResponse(status, f"call-{self.calls}")
+
+
+class TestAsyncClient:
+    def test_retries_server_errors_with_async_backoff(self):
+        client = FakeAsyncClient([503, 200])
+        resp = asyncio.run(
+            async_http_get("async-retry", "https://example.com", client=client, backoff_base=0.001)
+        )
+        assert resp.status_code == 200
+        assert client.calls == 2
+
+    def test_shares_circuit_breaker_semantics(self):
+        service = "async-breaker"
+        breaker = get_circuit_breaker(
+            service,
+            min_throughput=2,
+            failure_threshold=0.5,
+            open_state_seconds=60,
+        )
+        client = FakeAsyncClient([500, 500, 500])
+
+        async def run():
+            for _ in range(2):
+                with pytest.raises(requests.HTTPError):
+                    await async_http_get(service, "https://example.com", client=client, retries=0)
+            with pytest.raises(CircuitOpenError):
+                await async_http_get(service, "https://example.com", client=client, retries=0)
+
+        asyncio.run(run())
+        assert breaker.state == "OPEN"
+        assert client.calls == 2
+
+    def test_async_hedging(self):
+        client = FakeAsyncClient([200, 200], delays=[0.5, 0])
+        resp = asyncio.run(
+            async_http_get(
+                "async-hedge", "https://example.com", client=client, retries=0, hedge_after=0.02
+            )
+        )
+        assert resp.tag == "call-2"
+
+        post_client = FakeAsyncClient([200], delays=[0.05])
+        asyncio.run(
+            async_http_post(
+                "async-hedge", "https://example.com", client=post_client, hedge_after=0.01
+            )
+        )
+        assert post_client.calls == 1
+
+    def test_cancelled_probe_leaves_breaker_half_open(self):
+        service = "async-cancel"
+        breaker = get_circuit_breaker(
+            service, open_state_seconds=0, half_open_max_in_flight=1
+        )
+        with breaker._lock:
+            breaker._open(time.time())
+        client = FakeAsyncClient([200], delays=[5])
+
+        async def run():
+            task = asyncio.ensure_future(
+                async_http_get(service, "https://example.com", client=client, retries=0)
+            )
+            await asyncio.sleep(0.01)
+            assert breaker.state == "HALF_OPEN"
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        # no success was recorded and the probe slot is free again
+        assert breaker.state == "HALF_OPEN"
+        breaker.before_call()
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _CountingHandler.lock:
+            _CountingHandler.connections += 1
+
+    def do_GET(self):  # noqa: N802
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # silence test output
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CountingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _CountingHandler.connections = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}/status"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pooled_session_reuses_connection(local_server):
+    """Per-call session (old behaviour) vs pooled keep-alive session"""
+    calls = 50
+
+    for _ in range(calls):
+        http_get("bench-fresh", local_server, session=requests.Session(), retries=0)
+    fresh_connections = _CountingHandler.connections
+
+    _CountingHandler.connections = 0
+    for _ in range(calls):
+        http_get("bench-pooled", local_server, retries=0)
+    pooled_connections = _CountingHandler.connections
+
+    assert fresh_connections == calls
+    assert pooled_connections == 1
@@ -0,0 +1,140 @@
+"""
+Tests for the image pipeline (utils/image_manager.py, routes/images.py).
+
+Covers:
+- Content-addressed storage: identical uploads are stored once
+- A shared file is kept until its last upload is deleted
+- Eager thumbnails rendered in the worker pool, other sizes on demand
+- Bounded thumbnail cache evicts least recently used files
+- ETag / conditional GET on stored images and thumbnails
+"""
+
+import io
+import os
+import time
+
+from flask import Flask
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from src.routes.images import images_bp
+from src.utils.image_manager import ImageManager, ThumbnailCache
+
+
+def _png(color, size=(900, 600)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _upload(manager, data, name="photo.png", **kwargs):
+    return manager.upload(FileStorage(io.BytesIO(data), filename=name), **kwargs)
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    manager = ImageManager(str(tmp_path))
+    red = _png("red")
+
+    first = _upload(manager, red, "a.png")
+    second = _upload(manager, red, "copy of a.png")
+    other = _upload(manager, _png("blue"), "b.png")
+    resized = _upload(manager, red, "a.png", resize=(300, 300))
+
+    assert first.filename == second.filename == f"{first.content_hash}.png"
+    assert (first.duplicate, second.duplicate) == (False, True)
+    assert second.width == 900 and second.url == first.url
+    assert other.filename != first.filename
+    assert resized.filename not in (first.filename, other.filename)
+    assert resized.width == 300
+    assert len(list((tmp_path / "products").glob("*.png"))) == 3
+
+    # a PNG uploaded under a .jpg name is stored under its real format
+    assert _upload(manager, _png("green"), "c.jpg").filename.endswith(".png")
+    assert _upload(manager, b"not an image", "d.png") is None
+
+
+def test_shared_file_survives_until_last_delete(tmp_path):
+    manager = ImageManager(str(tmp_path))
+    red = _png("red")
+    first = _upload(manager, red, "a.png")
+    second = _upload(manager, red, "b.png")
+    manager.thumbnails.wait()
+    stored = tmp_path / "products" / first.filename
+    small = tmp_path / "thumbnails" / "products" / f"{first.content_hash}_small.png"
+
+    assert manager.delete(first.url)
+    assert stored.exists() and small.exists()
+    assert manager.image_path("products", second.filename) == stored
+
+    assert manager.delete(second.url)
+    assert not stored.exists() and not small.exists()
+    assert not list((tmp_path / "products").iterdir())
+    assert not manager.delete(second.url)
+
+
+def test_thumbnails_eager_and_lazy(tmp_path):
+    manager = ImageManager(str(tmp_path))
+    info = _upload(manager, _png("red"))
+    manager.thumbnails.wait()
+
+    thumbs = tmp_path / "thumbnails" / "products"
+    name = info.content_hash
+    assert set(info.thumbnails) == {"small", "medium", "large"}
+    assert (thumbs / f"{name}_small.png").exists()
+    assert not (thumbs / f"{name}_large.png").exists()
+
+    path = manager.thumbnail("products", info.filename, "large")
+    assert path == thumbs / f"{name}_large.png"
+    with Image.open(path) as img:
+        assert img.size == (800, 533)
+    assert manager.thumbnail("products", info.filename, "huge") is None
+    assert manager.thumbnail("products", "../secrets.png", "small") is None
+
+    assert manager.delete(info.url)
+    assert not list(thumbs.glob(f"{name}_*"))
+
+
+def test_thumbnail_cache_is_bounded(tmp_path):
+    cache = ThumbnailCache(tmp_path / "thumbs", max_bytes=3000)
+    sources = []
+    for i in range(6):
+        src = tmp_path / f"img{i}.png"
+        src.write_bytes(_png((i * 40, 0, 0), size=(400, 400)))
+        sources.append(src)
+
+    paths = []
+    for i, src in enumerate(sources):
+        paths.append(cache.get(src, "products", src.name, "medium"))
+        os.utime(paths[-1], (time.time() - 100 + i, time.time() - 100 + i))
+
+    total = sum(f.stat().st_size for f in (tmp_path / "thumbs").rglob("*.png"))
+    assert total <= 3000
+    assert paths[-1].exists() and not paths[0].exists()
+
+
+def test_conditional_get(tmp_path):
+    manager = ImageManager(str(tmp_path))
+    info = _upload(manager, _png("red"))
+    app = Flask(__name__)
+    app.register_blueprint(images_bp)
+    app.extensions["image_manager"] = manager
+    client = app.test_client()
+
+    response = client.get(info.url)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{info.content_hash}"'
+    assert "immutable" in response.headers["Cache-Control"]
+    assert (
+        client.get(info.url, headers={"If-None-Match": response.headers["ETag"]}).status_code
+        == 304
+    )
+
+    response = client.get(info.thumbnails["medium"])
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{info.content_hash}_medium"'
+    etag = response.headers["ETag"]
+    assert client.get(info.thumbnails["medium"], headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.get("/uploads/products/missing.png").status_code == 404
+    assert client.get("/uploads/temp/x.png").status_code == 404
+    assert client.get(f"/uploads/thumbnails/products/{info.content_hash}_xl.png").status_code == 404
@@ -0,0 +1,223 @@
+"""
+Tests for single-leader job execution (services/job_lease.py).
+
+Covers:
+- One execution per run window across concurrent "workers"
+- Overlap prevention while a lease is held, takeover after expiry
+- Crash recovery of runs left ``running``; per-job run history
+- A job whose lease is lost cannot commit and is not recorded as finished
+- Sharded jobs and the file-lock backend
+- TaskScheduler / AutomationService fires going through the coordinator
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+from sqlalchemy import update
+
+from src.database import db
+from src.services import job_lease
+from src.services.job_lease import (
+    FileLeaseBackend,
+    JobCoordinator,
+    JobLease,
+    LeaseLostError,
+    SqlLeaseBackend,
+    run_key_for,
+)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    db.init_app(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def _workers(coordinator, n, func, **kwargs):
+    """``n`` threads (distinct lease owners) firing the same job at once."""
+    barrier = threading.Barrier(n)
+    results = []
+
+    def fire():
+        barrier.wait()
+        results.append(coordinator.run("nightly", func, **kwargs))
+
+    threads = [threading.Thread(target=fire) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_runs_once_per_window_and_records_history(app):
+    coordinator = JobCoordinator(SqlLeaseBackend(), ttl=5)
+    coordinator.init_app(app)
+    calls = []
+
+    def job():
+        calls.append(1)
+        time.sleep(0.05)
+
+    results = _workers(coordinator, 6, job, run_key="2026-03-01T02:00:00")
+    assert len(calls) == 1
+    assert sorted(r.status for r in results) == ["skipped"] * 5 + ["success"]
+    assert {r.reason for r in results if r.status == "skipped"} <= {
+        "running elsewhere", "already ran",
+    }
+    # a late worker firing in the same window after the run finished
+    assert coordinator.run("nightly", job, run_key="2026-03-01T02:00:00").reason == "already ran"
+
+    coordinator.run("nightly", lambda: 1 / 0, run_key="2026-03-02T02:00:00")
+    history = coordinator.history("nightly")
+    assert [(h["run_key"][:10], h["status"]) for h in history] == [
+        ("2026-03-02", "failed"), ("2026-03-01", "success"),
+    ]
+    assert "division by zero" in history[0]["error"]
+    assert history[1]["duration_ms"] >= 50
+
+    assert run_key_for(datetime(2026, 3, 1, 10, 59, 59), 3600) == "2026-03-01T10:00:00"
+    origin = datetime(2026, 1, 1, 0, 30, tzinfo=timezone.utc)
+    assert run_key_for(datetime(2026, 3, 1, 10, 29, 59), 3600, origin) == "2026-03-01T09:30:00"
+    assert run_key_for(datetime(2026, 3, 1, 10, 30, 1), 3600, origin) == "2026-03-01T10:30:00"
+
+
+def test_overlap_expiry_and_crash_recovery(app):
+    backend = SqlLeaseBackend()
+    coordinator = JobCoordinator(backend, ttl=0.3)
+    coordinator.init_app(app)
+
+    # another worker holds the lease and keeps it alive with heartbeats
+    assert backend.acquire("sync", 0, "other:1", 0.3)
+    assert coordinator.run("sync", lambda: None, run_key="a").reason == "running elsewhere"
+    assert backend.heartbeat("sync", 0, "other:1", 0.3)
+    time.sleep(0.35)
+    # it died: the lease expired and the next fire takes over
+    assert coordinator.run("sync", lambda: None, run_key="a").status == "success"
+
+    # a run left "running" by a crashed worker is retried once its lease is gone
+    assert backend.begin_run("sync", 0, 1, "b", "crashed:2")
+    result = coordinator.run("sync", lambda: None, run_key="b")
+    assert result.status == "success"
+    assert coordinator.history("sync")[0]["attempts"] == 2
+
+    # the heartbeat keeps a long job's lease ahead of its ttl
+    seen = []
+
+    def long_job():
+        time.sleep(0.5)
+        seen.append(db.session.get(JobLease, ("sync", 0)).expires_at)
+
+    assert coordinator.run("sync", long_job, run_key="c").status == "success"
+    assert seen[0] > datetime.utcnow() + timedelta(seconds=0.05)
+
+
+def test_lost_lease_stops_the_job(app):
+    backend = SqlLeaseBackend()
+    coordinator = JobCoordinator(backend, ttl=0.3)
+    coordinator.init_app(app)
+    committed = []
+
+    def job():
+        # the lease expires and another worker takes the run over
+        with backend.engine().begin() as conn:
+            conn.execute(
+                update(JobLease.__table__).values(
+                    owner="other:1", expires_at=datetime.utcnow() + timedelta(seconds=5)
+                )
+            )
+        time.sleep(0.25)
+        db.session.add(JobLease(job_id="x", shard=0, owner="me",
+                                acquired_at=datetime.utcnow(),
+                                expires_at=datetime.utcnow()))
+        try:
+            db.session.commit()
+            committed.append(1)
+        except LeaseLostError:
+            db.session.rollback()
+            raise
+
+    result = coordinator.run("sync", job, run_key="a")
+    assert (result.status, result.reason) == ("failed", "lease lost")
+    assert not committed and db.session.get(JobLease, ("x", 0)) is None
+    assert coordinator.history("sync")[0]["status"] == "running"  # left to the new owner
+
+    # outside a job (and in a later job) commits are not affected
+    db.session.add(JobLease(job_id="y", shard=0, owner="me",
+                            acquired_at=datetime.utcnow(), expires_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_sharded_jobs(app):
+    coordinator = JobCoordinator(SqlLeaseBackend(), ttl=5)
+    coordinator.init_app(app)
+    done = []
+    results = coordinator.run_sharded(
+        "reindex", lambda shard, count: done.append((shard, count)), shards=4, run_key="k"
+    )
+    assert sorted(done) == [(0, 4), (1, 4), (2, 4), (3, 4)]
+    assert all(r.status == "success" for r in results)
+    assert all(r.reason == "already ran"
+               for r in coordinator.run_sharded("reindex", print, shards=4, run_key="k"))
+    assert len(coordinator.history("reindex")) == 4
+
+
+def test_file_backend(tmp_path):
+    coordinator = JobCoordinator(FileLeaseBackend(str(tmp_path / "locks")), ttl=5)
+    calls = []
+    results = _workers(coordinator, 5, lambda: (calls.append(1), time.sleep(0.05)),
+                       run_key="w1")
+    assert len(calls) == 1
+    assert sum(r.status == "success" for r in results) == 1
+    assert coordinator.run("nightly", lambda: None, run_key="w1").reason == "already ran"
+    assert coordinator.run("nightly", lambda: None, run_key="w2").status == "success"
+    assert [h["run_key"] for h in coordinator.history("nightly")] == ["w2", "w1"]
+
+
+def test_scheduler_and_automation_use_the_coordinator(app, monkeypatch):
+    from src.services.automation_service import AutomationService
+    from src.services.scheduler import TaskScheduler
+
+    coordinator = JobCoordinator(SqlLeaseBackend(), ttl=5)
+    monkeypatch.setattr(job_lease, "job_coordinator", coordinator)
+    monkeypatch.setattr("src.services.scheduler.job_coordinator", coordinator)
+
+    workers = [TaskScheduler(app) for _ in range(3)]
+    calls = []
+    for scheduler in workers:
+        scheduler.add_job(lambda: calls.append(1), "interval", id="tick", hours=1)
+        assert scheduler._jobs["cleanup_tokens"]["shards"] == 1
+    for scheduler in workers:
+        scheduler.scheduler.get_job("tick").func()
+    assert len(calls) == 1
+    assert TaskScheduler._run_window("interval", {"hours": 1}) == 3600
+
+    # interval jobs fire the same slots in every worker, whenever it started
+    now = datetime.now(timezone.utc)
+    fires = {
+        scheduler.scheduler.get_job("tick").trigger.get_next_fire_time(None, now)
+        for scheduler in workers
+    }
+    (next_fire,) = fires
+    assert next_fire.minute == next_fire.second == next_fire.microsecond == 0
+    assert TaskScheduler._run_window("cron", {"hour": 2}) == 60
+
+    # manual runs are not deduplicated against the schedule
+    workers[0].run_job_now("tick")
+    assert len(calls) == 2
+    assert len(workers[0].get_job_history("tick")) == 2
+
+    services = [AutomationService() for _ in range(3)]
+    executed = []
+    for service in services:
+        service.scheduled_tasks["t1"] = {"name": "t1", "action": "noop"}
+        service._execute_task = lambda task_id: executed.append(task_id)
+        service._execute_task_once("t1")
+    assert executed == ["t1"]
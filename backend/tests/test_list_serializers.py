@@ -0,0 +1,228 @@
+"""
+Tests for columnar list serializers (utils/serializers.py).
+
+Covers:
+- Converters picked from column types (Numeric, Date/DateTime, Enum)
+- Pagination keys match Flask-SQLAlchemy's paginate
+- Related names and child collections cost one query per page
+- orjson / json output with Decimal and date support
+- 1000-row page vs per-row to_dict with a dynamic relationship (same rows, 4 queries)
+- Constant keys kept for to_dict compatibility
+"""
+
+import enum
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    create_engine,
+    event,
+)
+from sqlalchemy.orm import Session, declarative_base, relationship
+
+from src.utils.serializers import Children, ListSerializer, Related, dumps, money
+
+Base = declarative_base()
+
+
+class Status(enum.Enum):
+    DRAFT = "draft"
+    PAID = "paid"
+
+
+class Customer(Base):
+    __tablename__ = "customers"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100))
+
+
+class Invoice(Base):
+    __tablename__ = "invoices"
+    id = Column(Integer, primary_key=True)
+    number = Column(String(20))
+    customer_id = Column(Integer, ForeignKey("customers.id"))
+    total = Column(Numeric(15, 2))
+    paid = Column(Numeric(15, 2))
+    status = Column(Enum(Status))
+    invoice_date = Column(Date)
+    created_at = Column(DateTime)
+    items = relationship("Item", lazy="select")
+    payments = relationship("Payment", lazy="dynamic")
+
+    def to_dict(self):
+        customer = self.customer_id and SESSION.get(Customer, self.customer_id)
+        return {
+            "id": self.id,
+            "number": self.number,
+            "customer_id": self.customer_id,
+            "total": float(self.total) if self.total else 0.0,
+            "paid": float(self.paid) if self.paid else 0.0,
+            "status": self.status.value if hasattr(self.status, "value") else self.status,
+            "invoice_date": self.invoice_date.isoformat() if self.invoice_date else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "customer_name": customer.name if customer else None,
+            "items": [item.to_dict() for item in self.items],
+            "payments_total": sum(float(p.amount) for p in self.payments),
+        }
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    quantity = Column(Numeric(10, 3))
+    price = Column(Numeric(15, 2))
+
+    def to_dict(self):
+        return {"id": self.id, "quantity": float(self.quantity), "price": float(self.price)}
+
+
+class Payment(Base):
+    __tablename__ = "payments"
+    id = Column(Integer, primary_key=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    amount = Column(Numeric(15, 2))
+
+
+SESSION = None
+
+ITEMS = ListSerializer(Item, ["id", "quantity", "price"])
+INVOICES = ListSerializer(
+    Invoice,
+    ["id", "number", "customer_id", "total", "paid", "status", "invoice_date", "created_at"],
+    converters={"total": money, "paid": money},
+    related={"customer_name": Related("customer_id", Customer.name)},
+    children={"items": Children(ITEMS, "invoice_id")},
+)
+
+
+@pytest.fixture
+def session():
+    global SESSION
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as sess:
+        sess.add_all(Customer(id=i, name=f"عميل {i}") for i in range(1, 11))
+        for i in range(1, 1201):
+            sess.add(
+                Invoice(
+                    id=i,
+                    number=f"INV-{i:05d}",
+                    customer_id=(i % 11) or None,
+                    total=Decimal("100.50") + i,
+                    paid=None if i % 3 else Decimal("10.00"),
+                    status=Status.PAID if i % 2 else Status.DRAFT,
+                    invoice_date=date(2024, 1, 1 + i % 28),
+                    created_at=datetime(2024, 1, 1, 12, 0, i % 60),
+                    items=[
+                        Item(quantity=Decimal("2.5"), price=Decimal("4.00")),
+                        Item(quantity=Decimal("1"), price=Decimal("9.99")),
+                    ],
+                    payments=[Payment(amount=Decimal("5.00"))],
+                )
+            )
+        sess.commit()
+        sess.statements = statements
+        SESSION = sess
+        yield sess
+
+
+def test_converters_and_related(session):
+    rows, pagination = INVOICES.paginate(
+        session.query(Invoice).order_by(Invoice.id), 1, 3, session=session
+    )
+    assert rows[0] == {
+        "id": 1,
+        "number": "INV-00001",
+        "customer_id": 1,
+        "total": 101.5,
+        "paid": 0.0,
+        "status": "paid",
+        "invoice_date": "2024-01-02",
+        "created_at": "2024-01-01T12:00:01",
+        "customer_name": "عميل 1",
+    }
+    assert pagination == {
+        "page": 1,
+        "per_page": 3,
+        "total": 1200,
+        "pages": 400,
+        "has_next": True,
+        "has_prev": False,
+    }
+
+
+def test_related_key_omitted_when_missing(session):
+    rows, _ = INVOICES.paginate(
+        session.query(Invoice).filter(Invoice.id == 11), 1, 10, session=session
+    )
+    assert rows[0]["customer_id"] is None
+    assert "customer_name" not in rows[0]
+
+
+def test_children_loaded_with_one_query(session):
+    session.statements.clear()
+    rows, _ = INVOICES.paginate(
+        session.query(Invoice).order_by(Invoice.id), 2, 50, include=["items"], session=session
+    )
+    # count + page + customer names + items
+    assert len(session.statements) == 4
+    assert rows[0]["id"] == 51
+    assert rows[0]["items"] == [
+        {"id": 101, "quantity": 2.5, "price": 4.0},
+        {"id": 102, "quantity": 1.0, "price": 9.99},
+    ]
+
+
+def test_from_model_and_dump_objects(session):
+    serializer = ListSerializer.from_model(Item, exclude=["invoice_id"])
+    assert serializer.keys == ("id", "quantity", "price")
+    items = session.query(Item).order_by(Item.id).limit(2).all()
+    assert serializer.dump_objects(items) == [
+        {"id": 1, "quantity": 2.5, "price": 4.0},
+        {"id": 2, "quantity": 1.0, "price": 9.99},
+    ]
+    legacy = ListSerializer(Item, ["id"], constants={"created_by": None})
+    assert legacy.dump_objects(items) == [
+        {"id": 1, "created_by": None},
+        {"id": 2, "created_by": None},
+    ]
+
+
+def test_dumps_handles_decimal_dates_and_unicode():
+    payload = {"total": Decimal("1.25"), "on": date(2024, 5, 1), "name": "فاتورة"}
+    assert json.loads(dumps(payload)) == {"total": 1.25, "on": "2024-05-01", "name": "فاتورة"}
+
+
+def test_1000_row_page_matches_to_dict(session):
+    """Serializer page vs per-row to_dict (lazy items, dynamic payments)"""
+    query = session.query(Invoice).order_by(Invoice.id)
+
+    session.expire_all()
+    session.statements.clear()
+    legacy = [invoice.to_dict() for invoice in query.limit(1000).all()]
+    legacy_queries = len(session.statements)
+
+    session.expire_all()
+    session.statements.clear()
+    rows, _ = INVOICES.paginate(query, 1, 1000, include=["items"], session=session)
+    fast_queries = len(session.statements)
+
+    assert len(rows) == len(legacy) == 1000
+    assert [r["items"] for r in rows] == [r["items"] for r in legacy]
+    assert fast_queries == 4
+    assert legacy_queries > 1000
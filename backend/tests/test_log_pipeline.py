@@ -0,0 +1,195 @@
+"""
+Tests for the non-blocking log pipeline and ComprehensiveLogger request hooks.
+
+Covers:
+- Queue based delivery to per-logger file handlers (child loggers included)
+- Per-request context resolved once (single JWT decode)
+- Route sampling and size-capped body capture
+- Per-request logging overhead benchmark (sync vs queued)
+"""
+
+import json
+import logging
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from src.utils import comprehensive_logger as cl_module
+from src.utils.comprehensive_logger import ComprehensiveLogger
+from src.utils.log_pipeline import LogPipeline, log_pipeline
+
+
+def _make_app(tmp_path, async_logging=True, **config):
+    app = Flask(__name__)
+    app.config.update(TESTING=True, **config)
+
+    @app.route("/api/items", methods=["GET", "POST"])
+    def items():
+        return jsonify({"ok": True})
+
+    @app.route("/api/health")
+    def health():
+        return jsonify({"status": "up"})
+
+    @app.route("/api/boom")
+    def boom():
+        return jsonify({"error": "boom"}), 503
+
+    clogger = ComprehensiveLogger(log_dir=tmp_path, async_logging=async_logging)
+    clogger.init_app(app)
+    return app, clogger
+
+
+def _request_lines(tmp_path):
+    log_pipeline.flush()
+    path = tmp_path / "requests" / "requests.log"
+    if not path.exists():
+        return []
+    lines = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        lines.append(json.loads(line.split(" - [REQUEST] - ", 1)[1]))
+    return lines
+
+
+class TestLogPipeline:
+    def test_routes_records_to_attached_handler(self, tmp_path):
+        pipeline = LogPipeline()
+        logger = logging.getLogger("test.pipeline.route")
+        logger.setLevel(logging.INFO)
+        handler = logging.FileHandler(tmp_path / "out.log", encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        pipeline.attach(logger, handler, use_queue=True)
+
+        logger.info("hello %s", "world")
+        pipeline.stop()
+
+        assert (tmp_path / "out.log").read_text(encoding="utf-8") == "hello world\n"
+
+    def test_child_loggers_are_routed(self, tmp_path):
+        pipeline = LogPipeline()
+        handlers = {}
+        for name in ("test.pipeline.security", "test.pipeline.security.audit"):
+            logger = logging.getLogger(name)
+            logger.setLevel(logging.INFO)
+            handlers[name] = logging.FileHandler(tmp_path / f"{name}.log", encoding="utf-8")
+            handlers[name].setFormatter(logging.Formatter("%(name)s %(message)s"))
+            pipeline.attach(logger, handlers[name], use_queue=True)
+
+        logging.getLogger("test.pipeline.security.auth").info("login")
+        logging.getLogger("test.pipeline.security.audit").info("export")
+        logging.getLogger("test.pipeline.securityx").info("unrelated")
+        pipeline.stop()
+
+        read = lambda name: (tmp_path / f"{name}.log").read_text(encoding="utf-8")  # noqa: E731
+        assert read("test.pipeline.security") == (
+            "test.pipeline.security.auth login\ntest.pipeline.security.audit export\n"
+        )
+        assert read("test.pipeline.security.audit") == "test.pipeline.security.audit export\n"
+
+    def test_full_queue_drops_instead_of_blocking(self, tmp_path):
+        pipeline = LogPipeline(maxsize=1)
+        logger = logging.getLogger("test.pipeline.full")
+        logger.setLevel(logging.INFO)
+        pipeline.attach(logger, logging.NullHandler(), use_queue=True)
+        pipeline.stop()  # nobody drains the queue now
+        pipeline.ensure_started = lambda: None
+
+        logger.info("first")
+        logger.info("second")
+
+        assert pipeline.dropped == 1
+
+    def test_sync_mode_attaches_handler_directly(self, tmp_path):
+        pipeline = LogPipeline()
+        logger = logging.getLogger("test.pipeline.sync")
+        handler = logging.NullHandler()
+        pipeline.attach(logger, handler, use_queue=False)
+
+        assert logger.handlers == [handler]
+        assert pipeline.stats()["running"] is False
+
+
+class TestComprehensiveLoggerRequests:
+    def test_request_and_response_logged(self, tmp_path):
+        app, _ = _make_app(tmp_path)
+        app.test_client().get("/api/items?page=2")
+
+        lines = _request_lines(tmp_path)
+        assert len(lines) == 2
+        assert lines[0]["query_params"] == {"page": "2"}
+        assert lines[1]["status_code"] == 200
+
+    def test_jwt_decoded_once_per_request(self, tmp_path, monkeypatch):
+        calls = []
+
+        class FakeJWT:
+            @staticmethod
+            def decode_token(token, verify=True):
+                calls.append(token)
+                return {"user_id": 7, "username": "cashier"}
+
+        monkeypatch.setattr(cl_module, "JWT_AVAILABLE", True)
+        monkeypatch.setattr(cl_module, "JWTManager", FakeJWT, raising=False)
+        app, _ = _make_app(tmp_path)
+
+        app.test_client().get(
+            "/api/items", headers={"Authorization": "Bearer abc"}
+        )
+
+        assert calls == ["abc"]
+        lines = _request_lines(tmp_path)
+        assert {line["username"] for line in lines} == {"cashier"}
+        assert lines[0]["headers"]["Authorization"] == "***HIDDEN***"
+
+    def test_sampled_out_route_still_logs_server_errors(self, tmp_path):
+        app, _ = _make_app(
+            tmp_path, LOG_SAMPLE_RATES={"/api/health": 0.0, "/api/boom": 0.0}
+        )
+        client = app.test_client()
+        client.get("/api/health")
+        client.get("/api/boom")
+
+        lines = _request_lines(tmp_path)
+        assert [line["path"] for line in lines] == ["/api/boom"]
+        assert lines[0]["status_code"] == 503
+
+    def test_large_body_not_captured(self, tmp_path):
+        app, _ = _make_app(tmp_path, LOG_MAX_BODY_BYTES=64)
+        client = app.test_client()
+        client.post("/api/items", json={"note": "x" * 500})
+        client.post("/api/items", json={"note": "short", "password": "p"})
+
+        bodies = [line["body"] for line in _request_lines(tmp_path) if "body" in line]
+        assert bodies[0]["_truncated"] is True
+        assert bodies[1] == {"note": "short", "password": "***HIDDEN***"}
+
+
+def _per_request_ms(app, requests=300):
+    client = app.test_client()
+    for _ in range(20):  # warm up
+        client.post("/api/items", json={"sku": "A-1", "qty": 3})
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.post("/api/items", json={"sku": "A-1", "qty": 3})
+    return (time.perf_counter() - start) * 1000 / requests
+
+
+@pytest.mark.slow
+def test_benchmark_logging_overhead(tmp_path):
+    """Per-request logging overhead: synchronous file writes vs queued pipeline"""
+    bare = Flask(__name__)
+
+    @bare.route("/api/items", methods=["POST"])
+    def items():
+        return jsonify({"ok": True})
+
+    baseline = _per_request_ms(bare)
+    sync_app, _ = _make_app(tmp_path / "sync", async_logging=False)
+    sync_ms = _per_request_ms(sync_app) - baseline
+    queued_app, _ = _make_app(tmp_path / "queued", async_logging=True)
+    queued_ms = _per_request_ms(queued_app) - baseline
+    log_pipeline.flush()
+
+    # The queued path must not cost more than the synchronous one
+    assert queued_ms <= max(sync_ms * 1.5, sync_ms + 0.2)
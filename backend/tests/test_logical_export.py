@@ -0,0 +1,186 @@
+"""
+Tests for streaming NDJSON logical export/import (services/logical_export.py).
+
+Covers:
+- Round trip of dates, decimals, binary and NULL values through NDJSON
+- One file per table, gzip option and manifest row counts
+- Import in foreign-key order with self references and enforced FKs
+- All-or-nothing import and progress reporting
+- Export memory stays bounded by the batch size
+"""
+
+import json
+import tracemalloc
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    create_engine,
+    event,
+    func,
+    select,
+)
+
+from src.services.logical_export import export_tables, import_tables
+
+
+def _schema():
+    metadata = MetaData()
+    Table(
+        "categories",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", String(50)),
+        Column("parent_id", Integer, ForeignKey("categories.id")),
+    )
+    Table(
+        "products",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("category_id", Integer, ForeignKey("categories.id"), nullable=False),
+        Column("name", String(100)),
+        Column("price", Numeric(12, 2)),
+        Column("created_at", DateTime),
+        Column("expires_on", Date),
+        Column("thumbnail", LargeBinary),
+    )
+    return metadata
+
+
+def _engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _fk_on(dbapi_conn, _):
+        dbapi_conn.execute("PRAGMA foreign_keys = ON")
+
+    _schema().create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def source(tmp_path):
+    engine = _engine(tmp_path / "source.db")
+    tables = _schema().tables
+    with engine.begin() as conn:
+        conn.execute(
+            tables["categories"].insert(),
+            [
+                {"id": 1, "name": "أدوات", "parent_id": None},
+                {"id": 2, "name": "Hand tools", "parent_id": 1},
+            ],
+        )
+        conn.execute(
+            tables["products"].insert(),
+            [
+                {
+                    "id": i,
+                    "category_id": 2,
+                    "name": f"product {i}",
+                    "price": Decimal("19.99") + i,
+                    "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000),
+                    "expires_on": date(2025, 6, 30) if i % 2 else None,
+                    "thumbnail": bytes([i % 256]) * 10,
+                }
+                for i in range(1, 251)
+            ],
+        )
+    return engine
+
+
+def _rows(engine, table):
+    with engine.connect() as conn:
+        return [
+            tuple(row)
+            for row in conn.execute(select(_schema().tables[table]).order_by("id"))
+        ]
+
+
+def test_round_trip(source, tmp_path):
+    manifest = export_tables(tmp_path / "dump", engine=source, batch_size=64)
+
+    assert [t["name"] for t in manifest["tables"]] == ["categories", "products"]
+    assert [t["rows"] for t in manifest["tables"]] == [2, 250]
+    first = json.loads((tmp_path / "dump" / "products.ndjson").read_text().splitlines()[0])
+    assert first["created_at"] == "2024-01-02T03:04:05.678000"
+
+    target = _engine(tmp_path / "target.db")
+    state = import_tables(tmp_path / "dump", engine=target, batch_size=64)
+
+    assert state.rows_done == 252 and state.finished
+    for table in ("categories", "products"):
+        assert _rows(target, table) == _rows(source, table)
+
+
+def test_gzip_and_table_subset(source, tmp_path):
+    manifest = export_tables(
+        tmp_path / "dump", tables=["categories"], compress=True, engine=source
+    )
+    assert [t["file"] for t in manifest["tables"]] == ["categories.ndjson.gz"]
+
+    target = _engine(tmp_path / "target.db")
+    import_tables(tmp_path / "dump", engine=target)
+    assert _rows(target, "categories") == _rows(source, "categories")
+
+
+def test_clear_existing_and_atomic_failure(source, tmp_path):
+    export_tables(tmp_path / "dump", engine=source)
+    target = _engine(tmp_path / "target.db")
+    import_tables(tmp_path / "dump", engine=target)
+
+    # Loading twice without clearing hits primary keys: nothing is applied
+    with pytest.raises(Exception):
+        import_tables(tmp_path / "dump", engine=target)
+    assert len(_rows(target, "products")) == 250
+
+    import_tables(tmp_path / "dump", engine=target, clear_existing=True)
+    assert len(_rows(target, "products")) == 250
+
+
+def test_progress_reports(source, tmp_path):
+    seen = []
+    export_tables(
+        tmp_path / "dump",
+        engine=source,
+        batch_size=100,
+        progress=lambda p: seen.append(p.to_dict()),
+    )
+    assert [s["rows_done"] for s in seen] == [2, 102, 202, 252, 252]
+    assert seen[-1]["finished"] and seen[-1]["percent"] == 100.0
+    assert seen[1]["table"] == "products" and seen[1]["table_rows_total"] == 250
+
+
+def test_export_memory_is_bounded(tmp_path):
+    engine = _engine(tmp_path / "big.db")
+    products = _schema().tables["products"]
+    with engine.begin() as conn:
+        conn.execute(_schema().tables["categories"].insert(), {"id": 1, "name": "c"})
+        for start in range(0, 60_000, 10_000):
+            conn.execute(
+                products.insert(),
+                [
+                    {"category_id": 1, "name": "x" * 80, "price": Decimal("1.50")}
+                    for _ in range(10_000)
+                ],
+            )
+        assert conn.execute(select(func.count()).select_from(products)).scalar() == 60_000
+
+    tracemalloc.start()
+    export_tables(tmp_path / "dump", engine=engine, batch_size=500)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = (tmp_path / "dump" / "products.ndjson").stat().st_size
+    assert size > 8 * 1024 * 1024
+    assert peak < 4 * 1024 * 1024
@@ -0,0 +1,207 @@
+"""
+Tests for the metrics subsystem (services/metrics.py, routes/metrics.py).
+
+Covers:
+- DDSketch quantiles within the relative accuracy, bounded bins, merging
+- Per (route template, method, status class) series and DB query histograms
+- Prometheus exposition (histogram buckets, summary quantiles, gauges)
+- Multiprocess aggregation: worker files, dead workers archived, live gauges
+- Concurrent flushes from request threads
+- /metrics and /api/metrics endpoints with optional bearer token
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import threading
+
+from flask import Flask
+
+from src.database import db
+from src.middleware.query_profiler import QueryProfiler
+from src.models.category import Category
+from src.routes import metrics as metrics_routes
+from src.routes.metrics import metrics_bp
+from src.services.metrics import LatencySketch, MetricsRegistry, init_metrics
+from src.services.metrics import metrics as app_metrics
+
+
+def _registry(**kwargs):
+    registry = MetricsRegistry(**kwargs)
+    registry.histogram("latency_seconds", "test", (0.1, 1.0), count_name="calls_total",
+                       summary_name="latency_recent_seconds")
+    registry.gauge("busy", "test")
+    return registry
+
+
+def test_sketch_accuracy_bounds_and_merge():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-3, 1.5) for _ in range(20000)]
+    sketch = LatencySketch()
+    for v in values:
+        sketch.add(v)
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99, 0.999):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.01 + 1e-9
+    assert len(sketch.bins) < 1500 and sketch.count == 20000
+
+    small = LatencySketch(max_buckets=300)
+    for v in values:
+        small.add(v)
+    assert len(small.bins) == 300
+    exact = ordered[int(0.99 * (len(ordered) - 1))]
+    assert abs(small.quantile(0.99) - exact) / exact <= 0.01 + 1e-9  # tail kept
+
+    a, b = LatencySketch(), LatencySketch()
+    for i, v in enumerate(values):
+        (a if i % 2 else b).add(v)
+    a.merge(LatencySketch.from_dict(b.to_dict()))
+    assert a.bins == sketch.bins and a.count == sketch.count
+    assert a.quantile(0.99) == sketch.quantile(0.99)
+    assert LatencySketch().quantile(0.5) is None
+    assert sketch.count_le(math.inf) == 20000
+
+
+def test_request_series_and_exposition(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'm.db'}"
+    db.init_app(app)
+
+    @app.route("/items/<int:item_id>")
+    def item(item_id):
+        Category.query.count()
+        return {"id": item_id}, 200 if item_id < 100 else 404
+
+    QueryProfiler(app)
+    registry = MetricsRegistry(multiproc_dir=None)
+    registry.families.update(app_metrics.families)
+    init_metrics(app, registry)
+    with app.app_context():
+        Category.__table__.create(db.engine)
+
+    client = app.test_client()
+    for i in range(20):
+        client.get(f"/items/{i}")
+    client.get("/items/500")
+    client.get("/missing")
+
+    rows = {(r["route"], r["status"]): r for r in registry.summary()}
+    assert set(rows) == {
+        ("/items/<int:item_id>", "2xx"), ("/items/<int:item_id>", "4xx"), ("<unmatched>", "4xx"),
+    }
+    ok = rows[("/items/<int:item_id>", "2xx")]
+    assert ok["count"] == 20 and ok["recent"]["count"] == 20
+    assert 0 < ok["p50"] <= ok["p95"] <= ok["p99"]
+
+    text = registry.render_prometheus()
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/items/<int:item_id>",status="2xx"} 20'
+        in text
+    )
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="4xx"} 1' in text
+    assert 'le="+Inf"} 20' in text
+    assert 'http_request_latency_seconds{method="GET",route="/items/<int:item_id>",' \
+           'status="2xx",quantile="0.99"}' in text
+    assert 'db_queries_total{route="/items/<int:item_id>"} 21' in text
+    assert "db_connections_idle 1" in text and "db_connections_active 0" in text
+    assert "cache_hits_total" not in text  # cache collectors live on the app registry
+
+
+def _worker(directory, n, stay, ready):
+    registry = _registry(multiproc_dir=directory)
+    registry.register_collector(lambda: [("busy", {}, 1)])
+    for i in range(n):
+        registry.observe("latency_seconds", {"route": "/x"}, 0.01 * (i + 1))
+    registry.flush()
+    ready.set()
+    if stay is not None:
+        stay.wait(30)
+
+
+def test_multiprocess_aggregation(tmp_path):
+    directory = str(tmp_path)
+    ctx = multiprocessing.get_context("fork")
+    done = [ctx.Event() for _ in range(3)]
+    finished = [ctx.Process(target=_worker, args=(directory, 10, None, done[i])) for i in range(2)]
+    stay = ctx.Event()
+    alive = ctx.Process(target=_worker, args=(directory, 5, stay, done[2]))
+    for proc in finished + [alive]:
+        proc.start()
+    for proc in finished:
+        proc.join()
+    done[2].wait(30)
+
+    try:
+        scraper = _registry(multiproc_dir=directory)
+        scraper.register_collector(lambda: [("busy", {}, 1)])
+        scraper.observe("latency_seconds", {"route": "/x"}, 5.0)
+        merged = scraper.collect()
+        key = ("latency_seconds", (("route", "/x"),))
+        assert merged.sketches[key].count == 26
+        assert merged.sketches[key].max == 5.0
+        assert merged.gauges[("busy", ())] == 2  # scraper + live worker only
+        assert merged.recent("latency_seconds", (("route", "/x"),)).count == 26
+
+        # dead workers were folded into the archive; totals unchanged
+        files = sorted(os.listdir(directory))
+        assert "metrics_archive.json" in files
+        assert f"metrics_{alive.pid}.json" in files
+        assert not any(f"metrics_{p.pid}.json" in files for p in finished)
+        text = scraper.render_prometheus()
+        assert 'calls_total{route="/x"} 26' in text
+        assert 'latency_seconds_bucket{route="/x",le="1"} 25' in text
+        assert 'latency_recent_seconds_count{route="/x"} 26' in text
+        assert "busy 2" in text
+    finally:
+        stay.set()
+        alive.join()
+
+
+def test_concurrent_flushes(tmp_path):
+    registry = _registry(multiproc_dir=str(tmp_path), flush_interval=0)
+    errors = []
+
+    def work():
+        try:
+            for i in range(50):
+                registry.observe("latency_seconds", {"route": "/x"}, 0.01)
+                (registry.flush if i % 2 else registry.maybe_flush)()
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.flush()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == [f"metrics_{os.getpid()}.json"]  # no temp files left
+    data = registry._read(str(tmp_path / f"metrics_{os.getpid()}.json"))
+    assert data["sketches"][0][2]["count"] == 400
+
+
+def test_endpoints_and_token(monkeypatch):
+    registry = _registry(multiproc_dir=None)
+    registry.observe("latency_seconds", {"route": "/x"}, 0.2)
+    monkeypatch.setattr(metrics_routes, "metrics", registry)
+    app = Flask(__name__)
+    app.register_blueprint(metrics_bp)
+    client = app.test_client()
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert 'calls_total{route="/x"} 1' in response.get_data(as_text=True)
+    assert "calls_total" in client.get("/api/metrics?format=prometheus").get_data(as_text=True)
+
+    monkeypatch.setenv("METRICS_AUTH_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    headers = {"Authorization": "Bearer s3cret"}
+    assert client.get("/metrics", headers=headers).status_code == 200
+    data = client.get("/api/metrics", headers=headers).get_json()["data"]
+    assert data["db"] == [] and data["routes"] == []  # no request histogram in this registry
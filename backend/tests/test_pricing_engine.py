@@ -0,0 +1,294 @@
+"""
+Tests for the compiled pricing engine (services/pricing_engine.py).
+
+Covers:
+- Priority and stacking across product / category / cart-wide discounts
+- Buy-X-get-Y on the cheapest units, min purchase / quantity, usage limits
+- Coupon-gated discounts and rejection reasons
+- Validity windows without recompiling; hot reload on table writes
+- 100-line carts against thousands of promotions in a few ms
+- POS quote and sale routes (promotions opt-in on sales)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.models.discount import (
+    Coupon,
+    CouponUsage,
+    Discount,
+    DiscountCategory,
+    DiscountProduct,
+)
+from src.services.pricing_engine import (
+    CartLine,
+    PricingEngine,
+    compile_snapshot,
+    evaluate_cart,
+    load_customer_usage,
+    load_snapshot,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def _d(id, value=10, **kwargs):
+    return {"id": id, "name": f"d{id}", "value": value, **kwargs}
+
+
+def _cart():
+    return [
+        CartLine(1, 2, "50.00", category_id=10),
+        CartLine(2, 1, "30.00", category_id=10),
+        CartLine(3, 4, "5.00", category_id=20),
+    ]
+
+
+def test_priority_and_stacking():
+    snapshot = compile_snapshot(
+        [
+            _d(1, 20, scope="product", priority=5),
+            _d(2, 50, scope="category", priority=1),
+            _d(3, 10, scope="all", stackable=True),
+            _d(4, 5, discount_type="fixed", scope="category", priority=9, stackable=True),
+        ],
+        product_links=[(1, 1)],
+        category_links=[(2, 10), (4, 20)],
+    )
+    result = evaluate_cart(snapshot, _cart(), now=NOW)
+
+    # 4 (stackable) on line 2, then 1 locks line 0, 2 locks line 1 (untouched),
+    # 3 stacks only on line 2 which no non-stackable discount locked
+    assert [a.discount_id for a in result.applied] == [4, 1, 2, 3]
+    assert result.line_discounts == [Decimal("20.00"), Decimal("15.00"), Decimal("6.50")]
+    assert result.subtotal == Decimal("150.00")
+    assert result.total == Decimal("108.50")
+    assert result.to_dict()["discount_total"] == 41.5
+
+
+def test_buy_x_get_y_and_conditions():
+    snapshot = compile_snapshot(
+        [
+            _d(1, 0, discount_type="buy_x_get_y", scope="category",
+               buy_quantity=2, get_quantity=1),
+            _d(2, 10, min_purchase=1000),
+            _d(3, 10, scope="product", min_quantity=3, stackable=True),
+            _d(4, 50, max_discount=4, scope="product", usage_limit=5, usage_count=5),
+            _d(5, 0, discount_type="free_shipping", min_purchase=100, stackable=True),
+        ],
+        product_links=[(3, 3), (4, 3)],
+        category_links=[(1, 10)],
+    )
+    result = evaluate_cart(snapshot, _cart(), now=NOW)
+
+    # 3 units in category 10 -> the cheapest one (30.00) is free
+    assert result.line_discounts[:2] == [Decimal("0.00"), Decimal("30.00")]
+    assert result.line_discounts[2] == Decimal("2.00")
+    assert {a.discount_id for a in result.applied} == {1, 3, 5}
+    assert result.free_shipping
+
+    usage = {3: 2}
+    snapshot = compile_snapshot([_d(3, 10, per_customer_limit=2)])
+    assert evaluate_cart(snapshot, _cart(), customer_id=7, customer_usage=usage,
+                         now=NOW).discount_total == 0
+    assert evaluate_cart(snapshot, _cart(), customer_id=8, customer_usage={},
+                         now=NOW).discount_total == Decimal("15.00")
+
+
+def test_coupons():
+    snapshot = compile_snapshot(
+        [_d(1, 25, max_discount=20), _d(2, 10), _d(3, 5, min_purchase=500)],
+        coupons=[
+            {"id": 1, "code": "save25", "discount_id": 1},
+            {"id": 2, "code": "VIP", "discount_id": 2, "customer_id": 9},
+            {"id": 3, "code": "USED", "discount_id": 2, "usage_limit": 1, "usage_count": 1},
+            {"id": 4, "code": "BIG", "discount_id": 3},
+        ],
+    )
+    # coupon-gated discounts need their code
+    assert evaluate_cart(snapshot, _cart(), now=NOW).applied == []
+
+    result = evaluate_cart(
+        snapshot, _cart(), coupon_codes=[" Save25", "VIP", "USED", "BIG", "NOPE"],
+        customer_id=1, now=NOW,
+    )
+    assert [(a.discount_id, a.coupon_code) for a in result.applied] == [(1, "SAVE25")]
+    assert result.discount_total == Decimal("20.00")
+    assert set(result.rejected_coupons) == {"VIP", "USED", "BIG", "NOPE"}
+    assert result.rejected_coupons["NOPE"] == "الكوبون غير موجود"
+    assert result.rejected_coupons["VIP"] == "هذا الكوبون مخصص لعميل آخر"
+
+
+def test_validity_windows_and_hot_reload():
+    snapshot = compile_snapshot(
+        [_d(1, 10, start_date=NOW, end_date=NOW + timedelta(days=1))]
+    )
+    cart = _cart()
+    assert evaluate_cart(snapshot, cart, now=NOW - timedelta(seconds=1)).applied == []
+    assert evaluate_cart(snapshot, cart, now=NOW).applied
+    assert evaluate_cart(snapshot, cart, now=NOW + timedelta(days=1)).applied
+    assert evaluate_cart(snapshot, cart, now=NOW + timedelta(days=1, seconds=1)).applied == []
+
+    class Versions:
+        value = 0
+
+        def get(self, tables):
+            return (self.value,)
+
+    rows = [_d(1, 10)]
+    versions = Versions()
+    engine = PricingEngine(lambda: compile_snapshot(list(rows)), versions=versions)
+    assert engine.price(cart, now=NOW).discount_total == Decimal("15.00")
+    rows[0] = _d(1, 20)
+    engine.price(cart, now=NOW)
+    assert engine.reloads == 1
+    versions.value += 1
+    assert engine.price(cart, now=NOW).discount_total == Decimal("30.00")
+    assert engine.reloads == 2
+
+
+def test_load_from_tables():
+    engine = create_engine("sqlite://")
+    for model in (Discount, DiscountProduct, DiscountCategory, Coupon, CouponUsage):
+        model.__table__.create(engine)
+    start = NOW - timedelta(days=7)
+    with Session(engine) as session:
+        session.add_all([
+            Discount(id=1, name="a", value=10, scope="product", start_date=start),
+            Discount(id=2, name="old", value=50, end_date=NOW - timedelta(days=1)),
+            DiscountProduct(discount_id=1, product_id=1),
+            Coupon(id=1, code="A1", discount_id=1, start_date=start, usage_limit=None),
+            CouponUsage(coupon_id=1, customer_id=5),
+        ])
+        session.commit()
+
+        snapshot = load_snapshot(session, now=NOW)
+        assert set(snapshot.rules) == {1}
+        assert snapshot.rules[1].coupon_only
+        assert load_customer_usage(session, 5) == {1: 1}
+        result = evaluate_cart(snapshot, _cart(), coupon_codes=["a1"], now=NOW)
+        assert result.discount_total == Decimal("10.00")
+
+
+def _gated_snapshot(**coupon):
+    engine = create_engine("sqlite://")
+    for model in (Discount, DiscountProduct, DiscountCategory, Coupon, CouponUsage):
+        model.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all([
+            Discount(id=1, name="vip", value=20, scope="all"),
+            Coupon(id=1, code="VIP", discount_id=1, **coupon),
+        ])
+        session.commit()
+        return load_snapshot(session, now=NOW)
+
+
+def test_exhausted_coupon_keeps_its_discount_gated():
+    snapshot = _gated_snapshot(usage_limit=1, usage_count=1)
+    assert snapshot.rules[1].coupon_only
+    assert evaluate_cart(snapshot, _cart(), now=NOW).discount_total == Decimal("0")
+    result = evaluate_cart(snapshot, _cart(), coupon_codes=["VIP"], now=NOW)
+    assert result.discount_total == Decimal("0")
+
+
+def test_expired_coupon_keeps_its_discount_gated():
+    snapshot = _gated_snapshot(end_date=NOW - timedelta(days=1))
+    assert snapshot.rules[1].coupon_only
+    assert evaluate_cart(snapshot, _cart(), now=NOW).discount_total == Decimal("0")
+
+
+def test_large_cart_is_fast():
+    discounts = [
+        _d(i, 1 + i % 30, scope="product" if i % 3 else "category", priority=i % 7,
+           stackable=i % 2 == 0, discount_type="buy_x_get_y" if i % 11 == 0 else "percentage",
+           buy_quantity=2, get_quantity=1)
+        for i in range(1, 5001)
+    ]
+    snapshot = compile_snapshot(
+        discounts,
+        product_links=[(i, i % 500) for i in range(1, 5001) if i % 3],
+        category_links=[(i, i % 50) for i in range(1, 5001) if not i % 3],
+    )
+    lines = [CartLine(p, 1 + p % 4, "12.34", category_id=p % 50) for p in range(100)]
+    evaluate_cart(snapshot, lines, now=NOW)
+
+    start = time.perf_counter()
+    for _ in range(10):
+        result = evaluate_cart(snapshot, lines, now=NOW)
+    elapsed = (time.perf_counter() - start) / 10
+    assert result.discount_total > 0
+    assert all(total >= 0 for total in result.line_totals)
+    assert elapsed < 0.05, elapsed
+
+
+
+# Runs in a subprocess: src.models.sale and src.models.shift relate to "User"
+# by name, and conftest also loads the legacy models.user, so configuring
+# their mappers here would fail and break the shared registry for the rest of
+# the session.
+_POS_SCRIPT = """
+import json
+from decimal import Decimal
+from flask import Flask
+from sqlalchemy.schema import CreateTable
+import src.models.customer, src.models.inventory, src.models.shift, src.models.supplier, src.models.user
+from src.database import db
+from src.models.discount import Discount, DiscountCategory, DiscountProduct, Coupon, CouponUsage
+from src.models.lot_advanced import LotAdvanced
+from src.models.product_advanced import ProductAdvanced
+from src.models.sale import Sale, SaleItem
+from src.routes.pos import pos_bp
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+db.init_app(app)
+app.register_blueprint(pos_bp, url_prefix="/api/pos")
+with app.app_context():
+    for model in (ProductAdvanced, LotAdvanced, Sale, SaleItem, Discount,
+                  DiscountProduct, DiscountCategory, Coupon, CouponUsage):
+        db.session.execute(CreateTable(model.__table__, include_foreign_key_constraints=()))
+    db.session.add_all([
+        ProductAdvanced(id=1, name="Seeds", sku="SD-1", sale_price=Decimal("25.00")),
+        LotAdvanced(id=1, product_id=1, batch_number="L1", quantity=10, status="active"),
+        Discount(id=1, name="seeds", value=20, scope="product"),
+        DiscountProduct(discount_id=1, product_id=1),
+    ])
+    db.session.commit()
+    client = app.test_client()
+    sale = {"user_id": 1, "items": [{"product_id": 1, "quantity": 2}]}
+    out = {
+        "quote": client.post("/api/pos/pricing/quote", json={"items": sale["items"]}).get_json(),
+        "plain": client.post("/api/pos/sales", json=sale).get_json(),
+        "promoted": client.post("/api/pos/sales", json={**sale, "apply_promotions": True}).get_json(),
+        "lot_quantity": db.session.get(LotAdvanced, 1).quantity,
+        "usage_count": db.session.get(Discount, 1).usage_count,
+    }
+print(json.dumps(out))
+"""
+
+
+def test_pos_quote_and_sale_routes():
+    proc = subprocess.run(
+        [sys.executable, "-c", _POS_SCRIPT],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    assert out["quote"]["success"], out["quote"]
+    assert out["quote"]["pricing"]["discount_total"] == 10.0
+    assert out["plain"]["success"] and out["plain"]["sale"]["total"] == 50.0  # opt-in
+    assert out["promoted"]["success"] and out["promoted"]["sale"]["total"] == 40.0
+    assert out["lot_quantity"] == 6
+    assert out["usage_count"] == 1
@@ -0,0 +1,173 @@
+"""
+Tests for the request-level query profiler (middleware/query_profiler.py).
+
+Covers:
+- Per-request query count / DB time and the Server-Timing header (debug/testing)
+- N+1 detection by statement fingerprint, sampled slow-request log
+- Endpoint budgets (@query_budget, QUERY_BUDGETS) and nested QueryTrackers
+- The pytest plugin (tests/query_budget.py): markers and query_profiles
+"""
+
+import logging
+
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import text
+
+from src.database import db
+from src.database.query_optimizer import QueryTracker, statement_fingerprint
+from src.middleware.performance_middleware import performance_monitor
+from src.middleware.query_profiler import QueryProfiler, query_budget, query_profiler
+from src.models.category import Category
+from tests.query_budget import budget_failures
+
+
+def _make_app(profiler=None, **config):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config.update(config)
+    db.init_app(app)
+
+    @app.route("/categories")
+    @query_budget(1)
+    def list_categories():
+        return jsonify([c.name for c in Category.query.order_by(Category.id)])
+
+    @app.route("/report")
+    @query_budget(3, max_duplicates=2)
+    def report():
+        ids = [row[0] for row in db.session.execute(text("SELECT id FROM categories"))]
+        names = [
+            db.session.execute(
+                text("SELECT name FROM categories WHERE id = :id"), {"id": i}
+            ).scalar()
+            for i in ids
+        ]
+        with QueryTracker() as inner:
+            db.session.execute(text("SELECT 1"))
+        return jsonify(names=names, inner=inner.get_summary()["count"])
+
+    @app.route("/plain")
+    def plain():
+        return jsonify(count=Category.query.count())
+
+    @app.route("/broken")
+    def broken():
+        try:
+            db.session.execute(text("SELECT nope FROM missing"))
+        except Exception:
+            db.session.rollback()
+        return jsonify(count=Category.query.count())
+
+    (profiler or query_profiler).init_app(app)
+    with app.app_context():
+        Category.__table__.create(db.engine)
+        db.session.add_all([Category(id=i, name=f"C{i}") for i in range(1, 7)])
+        db.session.commit()
+    return app
+
+
+def test_profiles_server_timing_and_n_plus_one(caplog):
+    profiler = QueryProfiler()
+    app = _make_app(
+        profiler,
+        TESTING=True,
+        QUERY_PROFILER_SLOW_MS=0,
+        QUERY_PROFILER_SLOW_SAMPLE_RATE=1,
+        QUERY_PROFILER_N_PLUS_ONE=5,
+        QUERY_BUDGETS={"plain": 0},
+    )
+    profiles = []
+    unsubscribe = profiler.subscribe(profiles.append)
+    before = performance_monitor.metrics["total_queries"]
+    client = app.test_client()
+
+    with caplog.at_level(logging.WARNING, logger="src.middleware.query_profiler"):
+        response = client.get("/report")
+        client.get("/categories")
+        client.get("/plain")
+    unsubscribe()
+
+    assert response.get_json()["inner"] == 1
+    report, listing, plain = profiles
+    # 1 list query + 6 per-row lookups + 1 inside the nested tracker
+    assert report.count == 8 and report.endpoint == "report"
+    assert report.get_duplicates()[0] == {
+        "fingerprint": "SELECT name FROM categories WHERE id = ?",
+        "count": 6,
+        "total_time": pytest.approx(report.get_duplicates()[0]["total_time"]),
+    }
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=") and 'desc="8 queries"' in timing and "app;dur=" in timing
+
+    assert report.violations() == [
+        "GET /report (report): 8 queries > budget 3",
+        "GET /report (report): statement run 6x (max duplicates 2): "
+        "SELECT name FROM categories WHERE id = ?",
+    ]
+    assert listing.count == 1 and listing.violations() == []
+    assert plain.violations() == ["GET /plain (plain): 1 queries > budget 0"]
+
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("Probable N+1 on GET /report: 6x SELECT name") for m in messages)
+    assert sum(m.startswith("Query budget exceeded") for m in messages) == 3
+    slow = [m for m in messages if m.startswith("Slow request")]
+    assert len(slow) == 3 and "SELECT id FROM categories" in slow[0]
+
+    assert performance_monitor.metrics["total_queries"] - before == 10
+    assert profiler.stats.get_most_frequent(1)[0]["count"] == 6
+    assert statement_fingerprint("SELECT * FROM t WHERE a IN (1, 2, 'x')") == (
+        "SELECT * FROM t WHERE a IN (?)"
+    )
+
+    # disabled: no hooks, no header; no header by default outside debug/testing
+    quiet = _make_app(QueryProfiler(), QUERY_PROFILER_ENABLED=False)
+    assert "Server-Timing" not in quiet.test_client().get("/report").headers
+    production = _make_app(QueryProfiler())
+    assert "Server-Timing" not in production.test_client().get("/report").headers
+
+
+def test_failed_statements_are_not_timed():
+    profiler = QueryProfiler()
+    app = _make_app(profiler)
+    profiles = []
+    profiler.subscribe(profiles.append)
+    client = app.test_client()
+    client.get("/broken")
+    client.get("/plain")
+
+    broken, plain = profiles
+    # the failed SELECT is not recorded and leaves no start time behind
+    assert broken.count == 1 and "count(*)" in broken.queries[0]["query"]
+    assert plain.count == 1 and 0 <= plain.queries[0]["duration"] < 1
+    with app.app_context():
+        assert not db.engine.raw_connection().info.get("query_tracker_start")
+
+
+@pytest.mark.query_budget(1, endpoint="list_categories")
+@pytest.mark.query_budget(max_duplicates=0, endpoint="plain")
+def test_plugin_markers_and_fixture(query_profiles):
+    client = _make_app().test_client()
+    client.get("/categories")
+    client.get("/plain")
+    assert [(p.endpoint, p.count) for p in query_profiles] == [
+        ("list_categories", 1), ("plain", 1),
+    ]
+
+
+def test_plugin_reports_overruns():
+    profiler = QueryProfiler()
+    app = _make_app(profiler)
+    profiles = []
+    profiler.subscribe(profiles.append)
+    client = app.test_client()
+    client.get("/categories")
+    client.get("/plain")
+
+    marks = [
+        pytest.mark.query_budget(0, endpoint="list_categories").mark,
+        pytest.mark.query_budget(max_queries=5).mark,
+    ]
+    assert budget_failures(profiles, marks) == [
+        "GET /categories (list_categories): 1 queries > budget 0",
+    ]
@@ -0,0 +1,194 @@
+"""
+Tests for RAG evaluation (rag_evaluation.py, rag_eval_runner.py).
+
+Covers:
+- Vectorized run metrics equal the per-example metric functions
+- Bit-parallel LCS / ROUGE-L equal the dynamic-programming table
+- Evaluation runner: configs over a process pool, retrieval cache reuse,
+  latency percentiles, chunking settings as separate cache keys
+- Corpus changes invalidate cached retrieval; MMR diversity is applied
+"""
+
+import json
+import random
+import zlib
+
+import numpy as np
+import pytest
+
+from src.rag_eval_runner import (
+    EvalConfig,
+    GoldenQuery,
+    RetrievalCache,
+    evaluate_configs,
+    load_golden_set,
+    main,
+)
+from src.rag_evaluation import (
+    GenerationMetrics,
+    RetrievalExample,
+    RetrievalMetrics,
+    batch_retrieval_metrics,
+    lcs_length_bitparallel,
+)
+
+
+def _lcs_table(a, b):
+    dp = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                dp[i][j] = dp[i - 1][j - 1] + 1
+            else:
+                dp[i][j] = max(dp[i - 1][j], dp[i][j - 1])
+    return dp[-1][-1]
+
+
+def test_batch_metrics_match_per_example():
+    rng = random.Random(3)
+    docs = [f"d{i}" for i in range(30)]
+    examples = [
+        RetrievalExample(
+            query=f"q{n}",
+            retrieved_docs=rng.sample(docs, rng.randint(0, 12)),
+            relevant_docs=set(rng.sample(docs, rng.randint(0, 4))),
+        )
+        for n in range(300)
+    ]
+    m = RetrievalMetrics
+    per_query = batch_retrieval_metrics(
+        [e.retrieved_docs for e in examples], [e.relevant_docs for e in examples], [1, 3, 5, 10]
+    )
+    for i, e in enumerate(examples):
+        r, rel = e.retrieved_docs, e.relevant_docs
+        assert per_query["mrr"][i] == pytest.approx(m.mrr(r, rel))
+        assert per_query["map"][i] == pytest.approx(m.average_precision(r, rel))
+        for k in (1, 3, 5, 10):
+            assert per_query[f"precision@{k}"][i] == pytest.approx(m.precision_at_k(r, rel, k))
+            assert per_query[f"recall@{k}"][i] == pytest.approx(m.recall_at_k(r, rel, k))
+            assert per_query[f"ndcg@{k}"][i] == pytest.approx(m.ndcg_at_k(r, rel, k))
+            assert per_query[f"hit_rate@{k}"][i] == m.hit_rate(r, rel, k)
+
+    averaged = RetrievalMetrics().evaluate(examples)
+    assert averaged["mrr"] == pytest.approx(per_query["mrr"].mean())
+    assert RetrievalMetrics().evaluate([])["map"] == 0
+
+
+def test_lcs_and_rouge_l():
+    rng = random.Random(5)
+    for _ in range(500):
+        a = [rng.choice("abcdef") for _ in range(rng.randint(0, 40))]
+        b = [rng.choice("abcdef") for _ in range(rng.randint(0, 40))]
+        assert lcs_length_bitparallel(a, b) == _lcs_table(a, b)
+
+    rouge = GenerationMetrics().rouge_l_score("the cat sat on the mat", "the cat on a mat")
+    assert rouge["precision"] == pytest.approx(4 / 6)
+    assert rouge["recall"] == pytest.approx(4 / 5)
+
+
+SOURCES = [
+    ("docs/stock.md", "# Stock\n\nWarehouse transfers move stock between sites.\n"),
+    ("docs/invoices.md", "# Invoices\n\nSales invoices record revenue and tax.\n"),
+    ("docs/seeds.md", "# Seeds\n\nTomato seed germination rate and purity.\n"),
+    ("docs/backup.md", "# Backup\n\nNightly backups are encrypted and compressed.\n"),
+]
+GOLDEN = [
+    GoldenQuery("how do warehouse transfers work", {"docs/stock.md"}),
+    GoldenQuery("sales invoice tax", {"docs/invoices.md"}),
+    GoldenQuery("tomato germination", {"docs/seeds.md"}),
+    GoldenQuery("encrypted backups", {"docs/backup.md"}),
+    GoldenQuery("purity of seed lots", {"docs/seeds.md"}),
+]
+
+
+def test_runner_pool_cache_and_latency(tmp_path):
+    configs = [
+        EvalConfig("bm25", retriever="bm25", fetch_k=4, top_k=3),
+        EvalConfig("bm25+hybrid", retriever="bm25", fetch_k=4, rerank="hybrid", top_k=3),
+        EvalConfig("bm25-small-chunks", retriever="bm25", fetch_k=4, chunk_tokens=3, top_k=3),
+    ]
+    cache = RetrievalCache(tmp_path / "cache.sqlite")
+
+    first = evaluate_configs(GOLDEN, configs, SOURCES, cache, workers=2, shard_size=2)
+    assert [r.cache_hits for r in first] == [0, 0, 0]
+    assert first[0].metrics["mrr"] == 1.0
+    assert first[0].metrics["hit_rate@1"] == 1.0
+    assert set(first[0].latency_ms) == {"retrieval", "rerank", "total"}
+    assert set(first[0].latency_ms["total"]) == {"p50", "p95", "p99", "mean"}
+
+    # same retrieval settings share the cache; chunking is part of the key
+    assert configs[0].retrieval_hash() == configs[1].retrieval_hash()
+    assert configs[0].retrieval_hash() != configs[2].retrieval_hash()
+    assert configs[0].config_hash() != configs[1].config_hash()
+
+    second = evaluate_configs(GOLDEN, configs, SOURCES, cache, workers=1)
+    assert [r.cache_hits for r in second] == [5, 5, 5]
+    for a, b in zip(first, second):
+        assert a.metrics == b.metrics
+    # cache hits report the stored retrieval time, not ~0
+    assert second[2].latency_ms["retrieval"] == first[2].latency_ms["retrieval"]
+    assert second[0].latency_ms["retrieval"] == second[1].latency_ms["retrieval"]
+    assert second[0].latency_ms["retrieval"] in (
+        first[0].latency_ms["retrieval"], first[1].latency_ms["retrieval"]
+    )
+
+    # an edited corpus must not be served from the old cache entries
+    edited = SOURCES[:-1] + [("docs/backup.md", "# Backup\n\nBackups are kept offsite.\n")]
+    third = evaluate_configs(GOLDEN, configs[:1], edited, cache, workers=1)
+    assert third[0].cache_hits == 0
+    cache.close()
+
+
+def _bag_of_words(texts):
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+def test_runner_diversity(monkeypatch):
+    monkeypatch.setattr("src.rag_ingest.encode_texts", _bag_of_words)
+    sources = SOURCES + [("docs/stock-copy.md", SOURCES[0][1])]
+    golden = [GoldenQuery("warehouse stock transfers between sites", {"docs/stock.md"})]
+    configs = [
+        EvalConfig("plain", fetch_k=5, top_k=2),
+        EvalConfig("mmr", fetch_k=5, top_k=2, use_diversity=True, diversity_lambda=0.3),
+        EvalConfig("bm25", fetch_k=5, top_k=2, rerank="bm25"),
+        EvalConfig("bm25+mmr", fetch_k=5, top_k=2, rerank="bm25", use_diversity=True,
+                   diversity_lambda=0.3),
+    ]
+    reports = evaluate_configs(golden, configs, sources, workers=1)
+    ranked = {r.name: r.per_query[0]["ranked"] for r in reports}
+
+    # the duplicate document fills the second slot unless MMR is on
+    assert set(ranked["plain"]) == {"docs/stock.md", "docs/stock-copy.md"}
+    assert set(ranked["bm25"]) == {"docs/stock.md", "docs/stock-copy.md"}
+    for name in ("mmr", "bm25+mmr"):
+        assert len(ranked[name]) == 2
+        assert not {"docs/stock.md", "docs/stock-copy.md"} <= set(ranked[name])
+
+
+def test_cli(tmp_path, monkeypatch):
+    golden = tmp_path / "golden.jsonl"
+    golden.write_text(
+        "\n".join(json.dumps({"query": g.query, "relevant": sorted(g.relevant)}) for g in GOLDEN)
+    )
+    assert [g.query for g in load_golden_set(golden)] == [g.query for g in GOLDEN]
+
+    configs = tmp_path / "configs.json"
+    configs.write_text(json.dumps([{"name": "bm25", "fetch_k": 4, "k_values": [1, 3]}]))
+    monkeypatch.setattr("src.rag_ingest.iter_file_sources", lambda: iter(SOURCES))
+    out = tmp_path / "report.json"
+    summary = main(
+        [
+            "--golden", str(golden),
+            "--configs", str(configs),
+            "--workers", "1",
+            "--cache", str(tmp_path / "c.sqlite"),
+            "--out", str(out),
+        ]
+    )
+    assert json.loads(out.read_text()) == summary
+    assert summary[0]["metrics"]["hit_rate@1"] == 1.0
+    assert "per_query" not in summary[0]
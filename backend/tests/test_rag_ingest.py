@@ -0,0 +1,190 @@
+"""
+Tests for incremental RAG ingestion (rag_ingest.py).
+
+Covers:
+- Heading/paragraph chunking with a token budget (fences kept intact)
+- Manifest-driven change detection: only new chunk texts are embedded
+- Orphaned chunks deleted (edited and removed files, legacy path:idx ids)
+- Bounded batches, also through a process pool
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from src import rag_ingest
+from src.rag_ingest import build_chunks, chunk_markdown, ingest, split_sections
+
+DOC_A = """# Inventory
+
+Stock moves between warehouses.
+
+## Transfers
+
+A transfer has a source and a destination.
+
+```bash
+# not a heading
+make transfer
+```
+
+## Counts
+
+Cycle counts adjust quantities.
+"""
+
+DOC_B = """# Invoices
+
+Sales invoices post revenue.
+
+Purchase invoices post costs.
+"""
+
+
+ENCODED = []
+
+
+def fake_encode(texts):
+    """Deterministic vectors; records batch sizes in this process."""
+    ENCODED.append(len(texts))
+    return np.array(
+        [
+            np.frombuffer(hashlib.sha256(t.encode()).digest()[:16], dtype=np.uint8)
+            / 255.0
+            for t in texts
+        ],
+        dtype=np.float32,
+    )
+
+
+class MemoryCollection:
+    """The subset of the Chroma collection API used by ingest()."""
+
+    def __init__(self):
+        self.items = {}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, doc, meta, emb in zip(ids, documents, metadatas, embeddings):
+            self.items[i] = {"document": doc, "meta": dict(meta), "embedding": emb}
+
+    def update(self, ids, metadatas):
+        for i, meta in zip(ids, metadatas):
+            self.items[i]["meta"] = dict(meta)
+
+    def delete(self, ids=None, where=None):
+        if ids is not None:
+            for i in ids:
+                self.items.pop(i, None)
+        if where is not None:
+            for i in [i for i, v in self.items.items() if v["meta"].get("path") == where["path"]]:
+                del self.items[i]
+
+
+@pytest.fixture
+def store(tmp_path):
+    ENCODED.clear()
+    return MemoryCollection(), tmp_path / "manifest.json"
+
+
+def _run(store, sources, **kwargs):
+    collection, manifest = store
+    return ingest(collection, sources.items(), manifest, encode=fake_encode, **kwargs)
+
+
+def test_split_sections_and_fences():
+    sections = split_sections(DOC_A)
+    assert [s for s, _ in sections] == [
+        "Inventory",
+        "Inventory > Transfers",
+        "Inventory > Counts",
+    ]
+    transfers = sections[1][1]
+    assert transfers[1].startswith("```bash\n# not a heading")
+
+
+def test_chunk_markdown_token_budget():
+    paragraphs = "\n\n".join(" ".join(["word"] * 40) for _ in range(5))
+    long_para = " ".join(f"w{i}" for i in range(250))
+    chunks = chunk_markdown(f"# Title\n\n{paragraphs}\n\n{long_para}\n", max_tokens=100)
+    assert all(section == "Title" for section, _ in chunks)
+    assert all(text.startswith("Title\n\n") for _, text in chunks)
+    bodies = [text[len("Title\n\n") :] for _, text in chunks]
+    # 2 paragraphs of 40 fit in 100, the third starts a new chunk
+    assert [len(b.split()) for b in bodies[:3]] == [80, 80, 40]
+    # oversized paragraph split into overlapping windows
+    assert bodies[3].split()[0] == "w0" and len(bodies[3].split()) == 100
+    assert bodies[4].split()[0] == "w80"
+
+
+def test_duplicate_chunks_get_distinct_ids():
+    chunks = build_chunks("a.md", "# A\n\nsame\n\n# A\n\nsame\n")
+    assert len({c.id for c in chunks}) == 2
+
+
+def test_incremental_reingest(store):
+    collection, manifest = store
+    sources = {"docs/a.md": DOC_A, "docs/b.md": DOC_B}
+
+    first = _run(store, sources)
+    assert first.changed == 2 and first.chunks_embedded == len(collection.items)
+
+    ENCODED.clear()
+    again = _run(store, sources)
+    assert again.unchanged == 2 and again.chunks_embedded == 0 and ENCODED == []
+
+    # edit one section of one file: only that chunk is embedded again
+    before = set(collection.items)
+    sources["docs/a.md"] = DOC_A.replace("Cycle counts", "Blind cycle counts")
+    edited = _run(store, sources)
+    assert edited.changed_keys == ["docs/a.md"]
+    assert edited.chunks_embedded == 1 and edited.chunks_deleted == 1
+    assert edited.chunks_reused == len(build_chunks("docs/a.md", DOC_A)) - 1
+    assert len(set(collection.items) ^ before) == 2
+
+    # removed file: its chunks are deleted
+    del sources["docs/b.md"]
+    removed = _run(store, sources)
+    assert removed.removed == 1
+    assert {v["meta"]["path"] for v in collection.items.values()} == {"docs/a.md"}
+
+
+def test_legacy_ids_and_setting_changes(store):
+    collection, _ = store
+    collection.upsert(["docs/a.md:0"], ["old"], [{"path": "docs/a.md", "chunk": 0}], [[0.0]])
+
+    _run(store, {"docs/a.md": DOC_A})
+    assert "docs/a.md:0" not in collection.items
+
+    ENCODED.clear()
+    stats = _run(store, {"docs/a.md": DOC_A}, max_tokens=50)
+    assert stats.changed == 1 and sum(ENCODED) == stats.chunks_embedded > 0
+
+    # the chunk overlap is a chunking setting too
+    assert _run(store, {"docs/a.md": DOC_A}, max_tokens=50).changed == 0
+    assert _run(store, {"docs/a.md": DOC_A}, max_tokens=50, overlap=5).changed == 1
+
+
+def test_bounded_batches_and_process_pool(store, monkeypatch):
+    sources = {f"docs/{i}.md": f"# Doc {i}\n\nBody {i}.\n" for i in range(23)}
+    _run(store, sources, batch_size=5)
+    assert ENCODED == [5, 5, 5, 5, 3]
+
+    collection = MemoryCollection()
+    pooled = ingest(
+        collection,
+        sources.items(),
+        store[1].with_name("pooled.json"),
+        encode=fake_encode,
+        batch_size=5,
+        workers=2,
+    )
+    assert pooled.chunks_embedded == 23
+    for key, item in collection.items.items():
+        assert np.array_equal(item["embedding"], store[0].items[key]["embedding"])
+
+
+def test_main_requires_chromadb(monkeypatch):
+    monkeypatch.setattr(rag_ingest, "CHROMADB_AVAILABLE", False)
+    with pytest.raises(RuntimeError):
+        rag_ingest.get_collection()
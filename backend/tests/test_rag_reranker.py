@@ -0,0 +1,166 @@
+"""
+Tests for the vectorized rerank stage (rag_reranker.py).
+
+Covers:
+- MMR picks the same documents as the pairwise pure-Python loop
+- Zero / mismatched embeddings count as cosine 0
+- BM25 score_all matches per-document score
+- Hybrid fusion keeps the max / min-max normalization, z-score option
+- 500-candidate MMR benchmark (>= 50x the pure-Python loop, slow)
+"""
+
+import math
+import time
+
+import numpy as np
+import pytest
+
+from src.rag_reranker import (
+    BM25Scorer,
+    HybridReranker,
+    MMRDiversifier,
+    RAGReranker,
+    normalize_scores,
+)
+
+
+def _cosine(vec1, vec2):
+    if not vec1 or not vec2 or len(vec1) != len(vec2):
+        return 0.0
+    dot = sum(a * b for a, b in zip(vec1, vec2))
+    norm1 = math.sqrt(sum(a * a for a in vec1))
+    norm2 = math.sqrt(sum(b * b for b in vec2))
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return dot / (norm1 * norm2)
+
+
+def _loop_mmr(query, embeddings, top_k, lam):
+    """The previous pairwise implementation, as the reference."""
+    relevance = [_cosine(query, emb) for emb in embeddings]
+    selected, remaining = [], list(range(len(embeddings)))
+    while len(selected) < top_k and remaining:
+        best_idx, best_mmr = None, float("-inf")
+        for idx in remaining:
+            max_sim = 0.0
+            for sel in selected:
+                max_sim = max(max_sim, _cosine(embeddings[idx], embeddings[sel]))
+            mmr = lam * relevance[idx] - (1 - lam) * max_sim
+            if mmr > best_mmr:
+                best_mmr, best_idx = mmr, idx
+        selected.append(best_idx)
+        remaining.remove(best_idx)
+    return selected
+
+
+def _candidates(n, dim, seed=7):
+    rng = np.random.default_rng(seed)
+    # clustered vectors so diversity actually changes the order
+    centers = rng.normal(size=(8, dim))
+    vectors = centers[rng.integers(0, 8, n)] + 0.3 * rng.normal(size=(n, dim))
+    query = centers[0] + 0.1 * rng.normal(size=dim)
+    docs = [{"id": f"d{i}", "text": f"doc {i}"} for i in range(n)]
+    return query.tolist(), docs, vectors.tolist()
+
+
+@pytest.mark.parametrize("lam", [0.3, 0.5, 0.9])
+def test_mmr_matches_pairwise_loop(lam):
+    query, docs, vectors = _candidates(120, 32)
+    picked = MMRDiversifier(lam).diversify(query, docs, vectors, top_k=15)
+    assert [d["id"] for d in picked] == [
+        f"d{i}" for i in _loop_mmr(query, vectors, 15, lam)
+    ]
+
+
+def test_mmr_zero_and_mismatched_vectors():
+    docs = [{"id": i} for i in range(4)]
+    vectors = [[1.0, 0.0], [0.0, 0.0], [1.0, 0.1, 3.0], [0.9, 0.2]]
+    picked = MMRDiversifier(0.5).diversify([1.0, 0.0], docs, vectors, top_k=4)
+    assert [d["id"] for d in picked] == _loop_mmr([1.0, 0.0], vectors, 4, 0.5)
+    # more documents than embeddings: only embedded ones are selectable
+    assert len(MMRDiversifier().diversify([1.0, 0.0], docs, vectors[:2])) == 2
+
+
+def test_bm25_score_all_matches_score():
+    texts = [
+        "fertilizer nitrogen bag",
+        "seed tomato hybrid seed",
+        "nitrogen nitrogen urea",
+        "",
+        "tomato fertilizer",
+    ]
+    bm25 = BM25Scorer().fit(texts)
+    query = "nitrogen tomato seed nitrogen"
+    expected = [bm25.score(query, text, i) for i, text in enumerate(texts)]
+    assert bm25.score_all(query) == pytest.approx(expected)
+
+
+def test_normalize_scores():
+    scores = [2.0, 4.0, 8.0]
+    assert normalize_scores(scores, "max").tolist() == [0.25, 0.5, 1.0]
+    assert normalize_scores(scores, "minmax").tolist() == pytest.approx([0, 1 / 3, 1])
+    z = normalize_scores(scores, "zscore")
+    assert z.mean() == pytest.approx(0) and z.std() == pytest.approx(1)
+    assert normalize_scores([3.0, 3.0], "zscore").tolist() == [0.0, 0.0]
+    with pytest.raises(ValueError):
+        normalize_scores(scores, "rank")
+
+
+def test_hybrid_rerank_scores_and_order():
+    docs = [
+        {"id": "a", "text": "urea nitrogen fertilizer", "distance": 0.4},
+        {"id": "b", "text": "tomato seeds", "distance": 0.1},
+        {"id": "c", "text": "nitrogen", "distance": 0.3},
+    ]
+    reranker = HybridReranker(use_cross_encoder=False)
+    results = reranker.rerank("nitrogen", docs, top_k=3)
+
+    bm25 = BM25Scorer().fit([d["text"] for d in docs])
+    raw = [bm25.score("nitrogen", d["text"], i) for i, d in enumerate(docs)]
+    expected = {
+        d["id"]: 0.5 * (1 - d["distance"]) + 0.3 * raw[i] / max(raw)
+        for i, d in enumerate(docs)
+    }
+    assert [r.id for r in results] == sorted(expected, key=expected.get, reverse=True)
+    assert [r.rank for r in results] == [1, 2, 3]
+    for r in results:
+        assert r.final_score == pytest.approx(expected[r.id])
+        assert isinstance(r.final_score, float)
+
+    zscored = HybridReranker(use_cross_encoder=False, normalization="zscore")
+    assert len(zscored.rerank("nitrogen", docs, top_k=2)) == 2
+
+
+def test_rag_reranker_aligns_embeddings_with_reranked_order():
+    docs = [
+        {"id": "far", "text": "x", "distance": 0.9},
+        {"id": "near", "text": "x", "distance": 0.0},
+    ]
+    embeddings = np.array([[0.0, 1.0], [1.0, 0.0]])
+    reranker = RAGReranker(strategy="bm25", top_k=1, use_diversity=True)
+    picked = reranker.rerank("x", docs, [1.0, 0.0], embeddings)
+    # bm25 ties keep input order; MMR then picks the embedding closest to the query
+    assert [d["id"] for d in picked] == ["far"]
+    reranker.top_k = 2
+    assert reranker.rerank("x", docs, [1.0, 0.0], embeddings)[0]["id"] == "near"
+
+
+@pytest.mark.slow
+def test_benchmark_mmr_500_candidates():
+    """Vectorized MMR vs the pairwise loop at n=500, k=10"""
+    query, docs, vectors = _candidates(500, 128)
+    diversifier = MMRDiversifier(0.5)
+
+    started = time.perf_counter()
+    expected = _loop_mmr(query, vectors, 10, 0.5)
+    loop_s = time.perf_counter() - started
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    runs = 20
+    started = time.perf_counter()
+    for _ in range(runs):
+        picked = diversifier.diversify(query, docs, matrix, top_k=10)
+    fast_s = (time.perf_counter() - started) / runs
+
+    assert [d["id"] for d in picked] == [f"d{i}" for i in expected]
+    assert loop_s / fast_s >= 50
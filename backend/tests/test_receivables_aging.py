@@ -0,0 +1,123 @@
+"""
+Tests for receivables aging and payment settlement.
+
+Covers:
+- Buckets (current, 0-30, 31-60, 61-90, 90+) per customer in one query
+- Overdue customers without per-customer transaction loads
+- FIFO settlement with a single window-function UPDATE
+- Per-day caching invalidated by credit writes
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+import src.models.user  # noqa: F401  (users table for the created_by FK)
+from src.database import db
+from src.models.customer import Customer
+from src.services.credit_service import CreditService, CreditTransaction, CustomerCredit
+from src.services.receivables_aging import aging_rows
+
+AS_OF = date(2026, 6, 30)
+
+
+def _at(days_overdue):
+    """A due date ``days_overdue`` days before AS_OF (noon)."""
+    return datetime(2026, 6, 30, 12) - timedelta(days=days_overdue)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        for model in (Customer, CustomerCredit, CreditTransaction):
+            model.__table__.create(db.engine)
+        yield app
+        db.session.remove()
+
+
+def _account(customer_id, *due_amounts, settled=()):
+    db.session.add(Customer(id=customer_id, name=f"c{customer_id}"))
+    credit = CustomerCredit(id=customer_id, customer_id=customer_id, credit_limit=1000)
+    db.session.add(credit)
+    for i, (days, amount) in enumerate(due_amounts):
+        db.session.add(
+            CreditTransaction(
+                credit_account_id=customer_id,
+                transaction_type="invoice_credit",
+                amount=amount,
+                due_date=_at(days) if days is not None else None,
+                is_settled=i in settled,
+            )
+        )
+    return credit
+
+
+def test_buckets_in_one_query(app):
+    _account(1, (-5, 10), (0, 20), (30, 30), (31, 40), (60, 50), (61, 60), (90, 70), (91, 80))
+    _account(2, (100, 5), (10, 7), settled=(0,))
+    _account(3, (-1, 9), (None, 1))
+    db.session.add(CreditTransaction(credit_account_id=1, transaction_type="credit_payment",
+                                     amount=-500, due_date=_at(200)))
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    rows = {r["customer_id"]: r for r in aging_rows(db.session, AS_OF)}
+    assert len(statements) == 1
+
+    assert rows[1]["buckets"] == {
+        "current": 10.0, "0_30": 50.0, "31_60": 90.0, "61_90": 130.0, "90_plus": 80.0,
+    }
+    assert rows[1]["total_overdue"] == 350.0
+    assert rows[1]["oldest_overdue_days"] == 91
+    assert rows[2]["buckets"]["0_30"] == 7.0 and rows[2]["total_outstanding"] == 7.0
+    assert rows[3]["total_overdue"] == 0 and rows[3]["buckets"]["current"] == 10.0
+
+    assert {r["customer_id"] for r in aging_rows(db.session, AS_OF, min_days_overdue=31)} == {1}
+
+
+def test_overdue_customers_and_settlement(app):
+    _account(1, (40, 100), (20, 50), (5, 30), (-10, 20))
+    _account(2, (-3, 10))
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    now = datetime.utcnow()
+    for txn in CreditTransaction.query.all():
+        txn.due_date = now + (txn.due_date - datetime(2026, 6, 30, 12))
+    db.session.commit()
+    statements.clear()
+
+    overdue = CreditService.get_overdue_customers(days_overdue=10)
+    assert len(statements) == 2
+    assert [(c["customer_id"], c["overdue_amount"]) for c in overdue] == [(1, 150)]
+    assert overdue[0]["is_overdue"] and overdue[0]["oldest_overdue_days"] == 40
+    assert overdue[0]["customer_name"] == "c1"
+
+    statements.clear()
+    assert CreditService._settle_transactions(1, 170) == 2
+    assert sum("UPDATE" in s for s in statements) == 1
+    db.session.commit()
+    settled = {t.amount for t in CreditTransaction.query.filter_by(is_settled=True)}
+    assert settled == {100, 50}
+
+
+def test_report_cached_per_day(app):
+    _account(1, (45, 100))
+    db.session.commit()
+
+    first = CreditService.get_aging_report(AS_OF)
+    assert first["totals"]["31_60"] == 100.0 and not first["meta"]["cached"]
+    assert CreditService.get_aging_report(AS_OF)["meta"]["cached"]
+    assert not CreditService.get_aging_report(AS_OF + timedelta(days=1))["meta"]["cached"]
+
+    CreditTransaction.query.filter_by(credit_account_id=1).update({"is_settled": True})
+    db.session.commit()
+    report = CreditService.get_aging_report(AS_OF)
+    assert not report["meta"]["cached"] and report["customers"] == []
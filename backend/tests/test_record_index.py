@@ -0,0 +1,355 @@
+"""
+Tests for the ERP record index (services/record_index.py).
+
+Covers:
+- Projection of products / invoices (related names, invoice items) to text
+- Metadata filters translated to Chroma ``where`` clauses
+- Commit hooks -> background queue -> upsert / delete; rollbacks ignored
+- /api/rag/records/search endpoint: token, permissions, per-role record kinds
+"""
+
+import hashlib
+import re
+from contextlib import contextmanager
+from datetime import date
+
+import jwt
+import numpy as np
+import pytest
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    create_engine,
+)
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import StaticPool
+
+from src.services.record_index import (
+    IndexQueue,
+    RecordIndexer,
+    RecordSpec,
+    build_where,
+    install_hooks,
+    invoice_metadata,
+    product_metadata,
+    remove_hooks,
+    render_invoice,
+    render_product,
+)
+from src.utils.serializers import Children, ListSerializer, Related, money
+
+Base = declarative_base()
+
+
+class Category(Base):
+    __tablename__ = "ri_categories"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+
+class Supplier(Base):
+    __tablename__ = "ri_suppliers"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+
+class Product(Base):
+    __tablename__ = "ri_products"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100))
+    sku = Column(String(20))
+    category_id = Column(Integer, ForeignKey("ri_categories.id"))
+    default_supplier_id = Column(Integer)
+    is_active = Column(Boolean, default=True)
+
+
+class Invoice(Base):
+    __tablename__ = "ri_invoices"
+    id = Column(Integer, primary_key=True)
+    invoice_number = Column(String(20))
+    invoice_type = Column(String(20))
+    invoice_date = Column(Date)
+    supplier_id = Column(Integer, ForeignKey("ri_suppliers.id"))
+    warehouse_id = Column(Integer)
+    total_amount = Column(Numeric(15, 2))
+
+
+class InvoiceItem(Base):
+    __tablename__ = "ri_invoice_items"
+    id = Column(Integer, primary_key=True)
+    invoice_id = Column(Integer, ForeignKey("ri_invoices.id"))
+    product_name = Column(String(100))
+    quantity = Column(Numeric(10, 2))
+
+
+SPECS = (
+    RecordSpec(
+        "product",
+        ListSerializer(
+            Product,
+            ["id", "name", "sku", "category_id", "default_supplier_id", "is_active"],
+            related={
+                "category_name": Related("category_id", Category.name),
+                "supplier_name": Related("default_supplier_id", Supplier.name),
+            },
+        ),
+        render_product,
+        product_metadata,
+    ),
+    RecordSpec(
+        "invoice",
+        ListSerializer(
+            Invoice,
+            [
+                "id",
+                "invoice_number",
+                "invoice_type",
+                "invoice_date",
+                "supplier_id",
+                "warehouse_id",
+                "total_amount",
+            ],
+            converters={"total_amount": money},
+            related={"supplier_name": Related("supplier_id", Supplier.name)},
+            children={
+                "items": Children(
+                    ListSerializer(InvoiceItem, ["product_name", "quantity"]),
+                    "invoice_id",
+                )
+            },
+        ),
+        render_invoice,
+        invoice_metadata,
+        ("items",),
+    ),
+)
+
+
+def encode(texts):
+    """Bag-of-words hashing vectors: shared words -> similar vectors."""
+    out = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            out[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.where(norms == 0, 1, norms)
+
+
+def _matches(meta, where):
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(meta, clause) for clause in where["$and"])
+    (key, cond), = where.items()
+    value = meta.get(key)
+    if isinstance(cond, dict):
+        (op, bound), = cond.items()
+        if op == "$in":
+            return value in bound
+        return value is not None and (value >= bound if op == "$gte" else value <= bound)
+    return value == cond
+
+
+class MemoryCollection:
+    """The subset of the Chroma collection API used by RecordIndexer."""
+
+    def __init__(self):
+        self.items = {}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, doc, meta, emb in zip(ids, documents, metadatas, embeddings):
+            assert all(v is not None for v in meta.values())
+            self.items[i] = (doc, dict(meta), np.asarray(emb))
+
+    def delete(self, ids):
+        for i in ids:
+            self.items.pop(i, None)
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        q = np.asarray(query_embeddings[0])
+        hits = sorted(
+            (
+                (1 - float(emb @ q), i)
+                for i, (_, meta, emb) in self.items.items()
+                if _matches(meta, where)
+            )
+        )[:n_results]
+        return {
+            "ids": [[i for _, i in hits]],
+            "distances": [[d for d, _ in hits]],
+            "documents": [[self.items[i][0] for _, i in hits]],
+            "metadatas": [[self.items[i][1] for _, i in hits]],
+        }
+
+
+@pytest.fixture
+def env():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    with Session(engine) as sess:
+        sess.add_all(
+            [
+                Category(id=1, name="Seeds"),
+                Category(id=2, name="Fertilizers"),
+                Supplier(id=1, name="Nile Agro"),
+                Supplier(id=2, name="Delta Chem"),
+                Product(id=1, name="Tomato seeds hybrid", sku="TS-1", category_id=1, default_supplier_id=1),
+                Product(id=2, name="Urea nitrogen fertilizer", sku="UR-5", category_id=2, default_supplier_id=2),
+                Invoice(
+                    id=1,
+                    invoice_number="PUR-001",
+                    invoice_type="purchase",
+                    invoice_date=date(2024, 3, 5),
+                    supplier_id=2,
+                    warehouse_id=7,
+                    total_amount=500,
+                ),
+                InvoiceItem(invoice_id=1, product_name="Urea nitrogen fertilizer", quantity=10),
+            ]
+        )
+        sess.commit()
+
+    collection = MemoryCollection()
+    indexer = RecordIndexer(collection, SPECS, encode=encode)
+
+    @contextmanager
+    def scope():
+        with Session(engine) as session:
+            yield session
+
+    yield engine, collection, indexer, scope
+    remove_hooks()
+
+
+def test_projection_text_and_metadata(env):
+    engine, collection, indexer, scope = env
+    with scope() as session:
+        assert indexer.reindex_all(session) == {"product": 2, "invoice": 1}
+
+    doc, meta, _ = collection.items["product:1"]
+    assert doc == "Tomato seeds hybrid | SKU: TS-1 | category: Seeds | supplier: Nile Agro"
+    assert meta == {
+        "entity": "product",
+        "record_id": 1,
+        "category_id": 1,
+        "supplier_id": 1,
+        "is_active": True,
+    }
+    doc, meta, _ = collection.items["invoice:1"]
+    assert doc.startswith("Purchase invoice PUR-001 | date: 2024-03-05 | supplier: Delta Chem")
+    assert "items: Urea nitrogen fertilizer x 10.0" in doc
+    assert meta["warehouse_id"] == 7 and meta["date"] == 20240305
+
+
+def test_build_where():
+    assert build_where() is None
+    assert build_where(entity="product") == {"entity": "product"}
+    assert build_where(entity=["product"]) == {"entity": {"$in": ["product"]}}
+    assert build_where("invoice", warehouse_id=7, date_from="2024-03-01") == {
+        "$and": [
+            {"entity": "invoice"},
+            {"warehouse_id": 7},
+            {"date": {"$gte": 20240301}},
+        ]
+    }
+
+
+def test_search_with_filters(env):
+    engine, collection, indexer, scope = env
+    with scope() as session:
+        indexer.reindex_all(session)
+
+    result = indexer.search("which supplier sells urea fertilizer", top_k=3)
+    assert result["results"][0]["id"] in ("product:2", "invoice:1")
+    assert result["took_ms"] >= 0
+
+    only_products = indexer.search("urea", entity="product")
+    assert {hit["entity"] for hit in only_products["results"]} == {"product"}
+
+    assert indexer.search("urea", entity="invoice", warehouse_id=8)["results"] == []
+    assert indexer.search("urea", date_from=date(2024, 3, 6), entity="invoice")["results"] == []
+
+
+def test_commit_hooks_feed_the_queue(env):
+    engine, collection, indexer, scope = env
+    index_queue = IndexQueue(indexer, scope, max_delay=0.01).start()
+    install_hooks(index_queue, SPECS)
+
+    with Session(engine) as session:
+        session.add(Product(id=3, name="Drip irrigation pipe", sku="DP-3"))
+        session.commit()
+        index_queue.join()
+        assert "Drip irrigation pipe" in collection.items["product:3"][0]
+
+        # an edited invoice item re-indexes its invoice
+        item = session.get(InvoiceItem, 1)
+        item.quantity = 25
+        session.commit()
+        index_queue.join()
+        assert "x 25.0" in collection.items["invoice:1"][0]
+
+        # rolled back writes are not indexed
+        session.add(Product(id=4, name="Never committed"))
+        session.flush()
+        session.rollback()
+
+        session.delete(session.get(Product, 3))
+        session.commit()
+        index_queue.join()
+
+    assert "product:3" not in collection.items
+    assert "product:4" not in collection.items
+    assert index_queue.errors == 0
+
+
+def test_records_search_endpoint(env, monkeypatch):
+    from src.main import app
+    from src.routes import rag
+
+    engine, collection, indexer, scope = env
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", False)
+    role = {"name": "admin"}
+    monkeypatch.setattr(rag, "get_current_user_role", lambda: role["name"])
+    monkeypatch.setattr("src.permissions.get_current_user_role", lambda: role["name"])
+    client = app.test_client()
+    url = "/api/rag/records/search"
+    assert client.post(url, json={"query": "urea"}).status_code == 401
+    with app.app_context():
+        token = jwt.encode(
+            {"user_id": 1, "username": "u", "type": "access"},
+            app.config.get("JWT_SECRET_KEY", app.config["SECRET_KEY"]),
+            algorithm="HS256",
+        )
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    app.extensions.pop("record_index", None)
+    assert client.post(url, json={"query": "urea"}).status_code == 503
+
+    with scope() as session:
+        indexer.reindex_all(session)
+    app.extensions["record_index"] = indexer
+    try:
+        response = client.post(url, json={"query": "urea", "entity": "product", "top_k": 1})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["success"] is True
+        assert [hit["id"] for hit in body["results"]] == ["product:2"]
+        assert client.post(url, json={"query": "x", "entity": "order"}).status_code == 400
+
+        # a role that may only read products gets neither invoices nor customers
+        role["name"] = "user"
+        body = client.post(url, json={"query": "urea fertilizer invoice"}).get_json()
+        assert {hit["entity"] for hit in body["results"]} == {"product"}
+        assert client.post(url, json={"query": "x", "entity": "invoice"}).status_code == 403
+        assert client.post(url, json={"query": "x", "entity": "customer"}).status_code == 403
+    finally:
+        app.extensions.pop("record_index", None)
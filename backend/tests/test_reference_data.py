@@ -0,0 +1,141 @@
+"""
+Tests for the per-process reference data cache (services/reference_data.py).
+
+Covers:
+- Immutable snapshots indexed by id / code / name, loaded once
+- Reload after ORM writes (version bump), one version check per request
+- Misses confirmed against the database (rows written by other workers)
+- Hot paths (role lookup, settings, category checks) issue one query
+- Setting writes are visible to later reads in the same request
+"""
+
+import pytest
+from flask import Flask, request
+from sqlalchemy import event, text
+
+from src.database import db
+from src.models.category import Category
+from src.models.inventory import Warehouse
+from src.models.settings import Setting
+from src.models.user import Role, User
+from src.permissions import get_current_user_role
+from src.services.reference_data import ReferenceDataCache, reference_data
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        for model in (User, Role, Category, Warehouse, Setting):
+            model.__table__.create(db.engine)
+        db.session.add_all([
+            Role(id=1, code="admin", name="Admin", permissions=["*"]),
+            Role(id=2, code="cashier", name="Cashier"),
+            Category(id=1, name="Food"),
+            Category(id=2, name="Tools", is_active=False),
+            Warehouse(id=3, name="Main", code="WH-1"),
+            Warehouse(id=5, name="Annex", code="WH-2"),
+            Setting(key="tax_enabled", value="true", value_type="bool"),
+            Setting(key="Company", value='{"name": "X"}', value_type="json"),
+            User(username="u", email="u@example.com", full_name="U", role_id=2),
+        ])
+        db.session.commit()
+        reference_data.invalidate()
+        yield app
+        db.session.remove()
+
+
+def test_snapshots_and_indexes(app):
+    cache = ReferenceDataCache()
+    cache.tables = reference_data.tables
+
+    roles = cache.get("roles")
+    assert roles.get(1).name == "Admin" and roles.get("2").code == "cashier"
+    assert roles.by_code(" ADMIN ").permissions == ["*"]
+    assert roles.get(9) is None and roles.get("x") is None
+    with pytest.raises(AttributeError):
+        roles.get(1).name = "Root"
+
+    assert [c.name for c in cache.get("categories").active()] == ["Food"]
+    assert cache.get("warehouses").first().code == "WH-1"
+    settings = cache.get("settings")
+    assert settings.lookup("key", "Company").typed_value == {"name": "X"}
+    assert settings.lookup("key", "company") is None  # setting keys are exact
+
+    assert cache.get("roles") is roles and cache.loads == 4
+
+    # an ORM commit bumps the table version: next access reloads
+    db.session.get(Role, 2).name = "Till"
+    db.session.commit()
+    assert cache.get("roles").get(2).name == "Till" and cache.loads == 5
+    assert cache.get("categories") is cache.get("categories")
+
+
+def test_version_checked_once_per_request_and_misses_hit_the_db(app):
+    calls = []
+    versions = reference_data.versions
+
+    class CountingVersions:
+        def get(self, tables):
+            calls.append(tables)
+            return versions.get(tables)
+
+    cache = ReferenceDataCache(versions=CountingVersions())
+    cache.tables = reference_data.tables
+    with app.test_request_context("/"):
+        for _ in range(10):
+            cache.get("categories")
+    assert len(calls) == 1
+
+    # written outside the ORM (no version bump): the miss goes to the database
+    db.session.execute(text("INSERT INTO categories (id, name) VALUES (7, 'Toys')"))
+    db.session.commit()
+    with app.test_request_context("/"):
+        row = cache.find("categories", id=7)
+        assert row.name == "Toys"
+        assert cache.find("categories", name="toys").id == 7  # reloaded snapshot
+        assert cache.find("categories", id=99) is None
+
+
+def test_hot_paths_drop_queries(app):
+    def hot_request():
+        request.current_user_id = 1
+        get_current_user_role()
+        Setting.get("tax_enabled")
+        Setting.get("missing", "default")
+        reference_data.find("categories", id=1)
+        reference_data.find("warehouses", id=3)
+
+    with app.test_request_context("/"):
+        hot_request()  # warm the snapshots
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    for _ in range(3):
+        statements.clear()
+        with app.test_request_context("/"):
+            hot_request()
+        # only the user row is still read from the database
+        assert len(statements) == 1, statements
+
+    with app.test_request_context("/"):
+        request.current_user_id = 1
+        assert get_current_user_role() == "Cashier"
+        assert Setting.get("tax_enabled") is True
+        assert Setting.get_all_as_dict()["Company"] == {"name": "X"}
+        assert Setting.get("missing", "default") == "default"
+
+
+def test_setting_writes_are_visible_in_the_same_request(app):
+    with app.test_request_context("/"):
+        assert Setting.get("tax_enabled") is True  # snapshot memoised on g
+        Setting.set("tax_enabled", False, value_type="bool")
+        assert Setting.get("tax_enabled") is False
+        Setting.set("receipt_footer", "Thanks")
+        assert Setting.get_all_as_dict()["receipt_footer"] == "Thanks"
+        assert Setting.delete("receipt_footer")
+        assert Setting.get("receipt_footer", "none") == "none"
+        assert not Setting.delete("receipt_footer")
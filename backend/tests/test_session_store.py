@@ -0,0 +1,231 @@
+"""
+Tests for the server-side session store (middleware/session_store.py).
+
+Covers:
+- Lazy load: requests that never touch the session do no store I/O
+- Writes only for modified sessions; expiry touched at most per interval
+- Logout deletes the stored session; tampered cookies start a new one
+- SQL batch purge of expired rows; Redis backend TTL handling
+- SessionMiddleware leaves JWT (Bearer) requests alone, unless a session
+  cookie comes with an invalid token
+"""
+
+import time
+
+import jwt
+import pytest
+from flask import Flask, jsonify, session
+
+from src.middleware.session_middleware import SessionMiddleware
+from src.middleware.session_store import (
+    RedisSessionBackend,
+    SessionBackend,
+    SQLSessionBackend,
+    StoreSessionInterface,
+    init_session_store,
+)
+
+
+class RecordingBackend(SQLSessionBackend):
+    def __init__(self):
+        super().__init__("sqlite://")
+        self.calls = []
+
+    def load(self, sid):
+        self.calls.append("load")
+        return super().load(sid)
+
+    def save(self, sid, data, expires_at):
+        self.calls.append("save")
+        super().save(sid, data, expires_at)
+
+    def touch(self, sid, expires_at):
+        self.calls.append("touch")
+        super().touch(sid, expires_at)
+
+    def delete(self, sid):
+        self.calls.append("delete")
+        super().delete(sid)
+
+
+def _app(backend):
+    app = Flask(__name__)
+    app.secret_key = "test-secret"
+    init_session_store(app, backend)
+
+    @app.route("/login")
+    def login():
+        session["user_id"] = 7
+        session.permanent = True
+        return "ok"
+
+    @app.route("/me")
+    def me():
+        return jsonify(user_id=session.get("user_id"))
+
+    @app.route("/ping")
+    def ping():
+        return "pong"
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return "bye"
+
+    return app
+
+
+def test_writes_only_when_dirty_and_lazy_load():
+    backend = RecordingBackend()
+    app = _app(backend)
+    client = app.test_client()
+
+    assert client.get("/ping").status_code == 200
+    assert backend.calls == []
+
+    response = client.get("/login")
+    assert backend.calls == ["save"]
+    assert "Vary" in response.headers
+
+    backend.calls.clear()
+    for _ in range(3):
+        assert client.get("/me").get_json() == {"user_id": 7}
+    client.get("/ping")
+    assert backend.calls == ["load"] * 3
+
+    # once the interval has passed, an unmodified session is only touched
+    app.session_interface.touch_interval = 0
+    backend.calls.clear()
+    client.get("/me")
+    assert backend.calls == ["load", "touch"]
+
+    backend.calls.clear()
+    client.get("/logout")
+    assert backend.calls == ["load", "delete"]
+    assert client.get("/me").get_json() == {"user_id": None}
+
+
+def test_tampered_or_expired_cookie_starts_new_session():
+    backend = RecordingBackend()
+    app = _app(backend)
+    client = app.test_client()
+    client.get("/login")
+    sid = client.get_cookie("session").value.rsplit(".", 1)[0]
+
+    client.set_cookie("session", f"{sid}.forged")
+    assert client.get("/me").get_json() == {"user_id": None}
+
+    client.get("/login")
+    new_cookie = client.get_cookie("session").value
+    assert not new_cookie.startswith(sid)
+    backend.save(new_cookie.rsplit(".", 1)[0], "{}", time.time() - 1)
+    assert client.get("/me").get_json() == {"user_id": None}
+
+
+def test_sql_purge_in_batches():
+    backend = SQLSessionBackend("sqlite://")
+    now = time.time()
+    for i in range(25):
+        backend.save(f"old{i}", "{}", now - 10)
+    backend.save("live", '{"a": 1}', now + 3600)
+
+    assert backend.purge_expired(batch_size=7) == 25
+    assert backend.load("live") == ('{"a": 1}', now + 3600)
+    assert backend.purge_expired() == 0
+    assert any(ix.columns.keys() == ["expires_at"] for ix in backend.table.indexes)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self):
+        redis, ops = self, []
+
+        class Pipe:
+            def get(self, key):
+                ops.append(lambda: redis._live(key))
+
+            def pttl(self, key):
+                ops.append(
+                    lambda: int((redis.data[key][1] - time.time()) * 1000)
+                    if redis._live(key)
+                    else -2
+                )
+
+            def execute(self):
+                return [op() for op in ops]
+
+        return Pipe()
+
+    def _live(self, key):
+        value = self.data.get(key)
+        return value[0] if value and value[1] > time.time() else None
+
+    def set(self, key, value, px):
+        self.data[key] = (value.encode(), time.time() + px / 1000)
+
+    def pexpireat(self, key, when_ms):
+        self.data[key] = (self.data[key][0], when_ms / 1000)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_redis_backend():
+    backend = RedisSessionBackend(client=FakeRedis(), prefix="s:")
+    backend.save("abc", '{"x": 1}', time.time() + 60)
+    data, expires_at = backend.load("abc")
+    assert data == '{"x": 1}'
+    assert expires_at == pytest.approx(time.time() + 60, abs=1)
+
+    backend.touch("abc", time.time() + 600)
+    assert backend.load("abc")[1] == pytest.approx(time.time() + 600, abs=1)
+    backend.delete("abc")
+    assert backend.load("abc") is None
+
+    app = _app(RedisSessionBackend(client=FakeRedis()))
+    client = app.test_client()
+    client.get("/login")
+    assert client.get("/me").get_json() == {"user_id": 7}
+
+
+def test_jwt_requests_skip_the_session(monkeypatch):
+    backend = RecordingBackend()
+    app = _app(backend)
+    SessionMiddleware(app)
+    assert isinstance(app.session_interface, StoreSessionInterface)
+    client = app.test_client()
+    client.get("/login")
+
+    token = jwt.encode({"user_id": 7, "type": "access"}, "test-secret", algorithm="HS256")
+    backend.calls.clear()
+    client.get("/ping", headers={"Authorization": f"Bearer {token}"})
+    assert backend.calls == []
+
+    # a stolen cookie plus a made-up token still gets the session checks
+    client.get("/ping", headers={"Authorization": "Bearer forged"})
+    assert backend.calls == ["load"]
+
+    # without a session cookie there is nothing to check or load
+    backend.calls.clear()
+    app.test_client().get("/ping", headers={"Authorization": "Bearer forged"})
+    assert backend.calls == []
+
+    # cookie requests still load, but repeated reads do not rewrite it
+    client.get("/ping")
+    backend.calls.clear()
+    client.get("/ping")
+    assert backend.calls == ["load"]
+
+
+def test_session_backend_is_abstract():
+    with pytest.raises(TypeError):
+        SessionBackend()
+
+    class Partial(SessionBackend):
+        def load(self, sid):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
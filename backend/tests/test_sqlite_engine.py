@@ -0,0 +1,191 @@
+"""
+Tests for the pooled SQLite engine profile (database/sqlite_engine.py).
+
+Covers:
+- Pragmas applied once per pooled connection
+- Reads of GET requests routed to the read-only pool, writes to the single writer
+- Reads of write requests stay on the writer (read-modify-write)
+- Read-your-writes inside a transaction
+- SQLITE_BUSY retry on BEGIN IMMEDIATE
+- Pool statistics through ConnectionPoolMonitor
+"""
+
+import sqlite3
+import time
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.database import sqlite_engine
+from src.database.sqlite_engine import (
+    RoutingSession,
+    SQLiteEngineProfile,
+    begin_immediate,
+    get_busy_stats,
+)
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'branch.db'}"
+    db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+    class Item(db.Model):
+        __tablename__ = "profile_items"
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(50))
+
+    profile = SQLiteEngineProfile(read_pool_size=2)
+    profile.configure(app)
+    db.init_app(app)
+    profile.init_app(app, db)
+
+    with app.app_context():
+        db.create_all()
+        yield app, db, Item, profile
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        profile.reader.dispose()
+
+
+def test_pragmas_applied_to_pooled_connections(profiled):
+    _, db, _, profile = profiled
+    with db.engines[None].connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -64000
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 0
+    with profile.reader.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+    # the reader is not a bind: no extra metadata on the shared db object
+    assert list(db.metadatas) == [None]
+
+
+def test_reads_use_reader_and_writes_use_writer(profiled):
+    app, db, Item, profile = profiled
+    writer, reader = db.engines[None], profile.reader
+
+    with app.test_request_context("/", method="GET"):
+        assert db.session.get_bind(clause=db.select(Item)) is reader
+        assert db.session.get_bind(clause=text("SELECT COUNT(*) FROM profile_items")) is reader
+        assert db.session.get_bind(clause=db.select(Item).with_for_update()) is writer
+        assert db.session.get_bind(clause=text("DELETE FROM profile_items")) is writer
+
+
+def test_read_modify_write_stays_on_writer(profiled):
+    app, db, Item, _ = profiled
+    writer = db.engines[None]
+
+    # the SELECT before the first flush feeds the update: same transaction
+    with app.test_request_context("/", method="POST"):
+        assert db.session.get_bind(clause=db.select(Item)) is writer
+    # scripts and jobs outside a request
+    assert db.session.get_bind(clause=db.select(Item)) is writer
+
+
+def test_read_your_writes_until_commit(profiled):
+    app, db, Item, profile = profiled
+    reader = profile.reader
+
+    with app.test_request_context("/", method="GET"):
+        db.session.add(Item(name="pending"))
+        assert Item.query.filter_by(name="pending").count() == 1  # autoflush -> writer
+        assert db.session.get_bind(clause=db.select(Item)) is not reader
+
+        db.session.commit()
+        assert db.session.get_bind(clause=db.select(Item)) is reader
+        assert [i.name for i in Item.query.all()] == ["pending"]
+
+
+def test_nested_writer_connection_does_not_deadlock(profiled):
+    _, db, Item, _ = profiled
+    db.session.add(Item(name="held"))
+    db.session.flush()  # session now holds the write lock
+
+    # Same thread opening the engine directly gets a deferred transaction
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM profile_items").scalar() == 0
+    db.session.commit()
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO profile_items (name) VALUES ('next')")
+    assert Item.query.count() == 2
+
+
+def test_nested_writer_write_fails_fast(profiled):
+    _, db, Item, _ = profiled
+    db.session.add(Item(name="held"))
+    db.session.flush()
+
+    started = time.monotonic()
+    with pytest.raises(OperationalError, match="readonly"):
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO profile_items (name) VALUES ('nested')")
+    # no busy_timeout wait on the lock this thread already holds
+    assert time.monotonic() - started < 1
+    db.session.commit()
+
+    # the pooled connection is writable again once the lock is released
+    for _ in range(3):
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO profile_items (name) VALUES ('after')")
+            assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 0
+    assert Item.query.filter_by(name="after").count() == 3
+
+
+def test_writer_is_single_connection(profiled):
+    _, db, _, profile = profiled
+    assert db.engines[None].pool.size() == 1
+    assert profile.reader.pool.size() == 2
+    stats = profile.get_statistics()
+    assert set(stats) == {"writer", "reader", "busy"}
+
+
+def test_memory_database_keeps_single_engine():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    db = SQLAlchemy(session_options={"class_": RoutingSession})
+    profile = SQLiteEngineProfile()
+    profile.configure(app)
+    db.init_app(app)
+    profile.init_app(app, db)
+    assert profile.reader is None and set(profile.monitors) == {"writer"}
+    assert not app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    with app.app_context():
+        assert db.session.execute(text("PRAGMA temp_store")).scalar() == 2
+
+
+class _FlakyConnection:
+    def __init__(self, failures, message="database is locked"):
+        self.failures = failures
+        self.message = message
+        self.statements = []
+
+    def execute(self, sql):
+        self.statements.append(sql)
+        if len(self.statements) <= self.failures:
+            raise sqlite3.OperationalError(self.message)
+
+
+def test_begin_immediate_retries_on_busy(monkeypatch):
+    monkeypatch.setattr(sqlite_engine.time, "sleep", lambda _: None)
+    before = get_busy_stats()
+    conn = _FlakyConnection(failures=2)
+
+    begin_immediate(conn, retries=5)
+
+    assert conn.statements == ["BEGIN IMMEDIATE"] * 3
+    assert get_busy_stats()["retries"] == before["retries"] + 2
+
+
+def test_begin_immediate_gives_up(monkeypatch):
+    monkeypatch.setattr(sqlite_engine.time, "sleep", lambda _: None)
+    with pytest.raises(sqlite3.OperationalError):
+        begin_immediate(_FlakyConnection(failures=10), retries=2)
+    with pytest.raises(sqlite3.OperationalError):
+        begin_immediate(_FlakyConnection(failures=1, message="disk I/O error"))
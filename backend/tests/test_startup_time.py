@@ -0,0 +1,150 @@
+"""
+Tests for startup import cost (utils/lazy_imports.py, utils/blueprint_registry.py).
+
+Covers:
+- Heavy route dependencies stay out of worker startup
+- Lazy module proxies load on first attribute access
+- Route groups warm on the first request to one of their blueprints
+- importtime digest parsing (tools/startup_profile.py)
+- Startup import benchmark
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from flask import Blueprint, Flask, jsonify
+
+from src.utils.blueprint_registry import BlueprintRegistry
+from src.utils.lazy_imports import LazyModule, lazy_import_stats, lazy_module
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "tools"))
+
+import startup_profile  # noqa: E402
+
+HEAVY_MODULES = (
+    "pandas",
+    "openpyxl",
+    "reportlab.platypus",
+    "numpy",
+    "sentence_transformers",
+    "chromadb",
+)
+
+
+def _import_in_subprocess(module):
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({'seconds': time.perf_counter() - t,"
+        f" 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+class TestLazyImports:
+    def test_proxy_loads_on_first_attribute(self):
+        proxy = LazyModule("json.decoder")
+        assert "not loaded" in repr(proxy)
+
+        assert proxy.JSONDecodeError.__name__ == "JSONDecodeError"
+        assert "(loaded)" in repr(proxy)
+
+    def test_missing_attribute_raises(self):
+        proxy = LazyModule("json.scanner")
+        with pytest.raises(AttributeError):
+            proxy.does_not_exist
+
+    def test_shared_proxies_and_stats(self):
+        assert lazy_module("json.tool") is lazy_module("json.tool")
+        lazy_module("json.tool").main
+        assert lazy_import_stats()["json.tool"]["loaded"] is True
+
+
+class TestBlueprintRegistry:
+    def _app(self, registry):
+        app = Flask(__name__)
+        bp = Blueprint("sheets", "routes.excel_import")
+
+        @bp.route("/sheets")
+        def sheets():
+            return jsonify({"ok": True})
+
+        @app.route("/plain")
+        def plain():
+            return jsonify({"ok": True})
+
+        registry.register(app, bp, url_prefix="/api")
+        return app
+
+    def test_group_warmed_on_first_request(self):
+        registry = BlueprintRegistry(group_deps={"excel": ("json.tool",)})
+        client = self._app(registry).test_client()
+
+        client.get("/plain")
+        assert registry.stats()["groups"]["excel"]["warmed"] is False
+
+        assert client.get("/api/sheets").status_code == 200
+        assert registry.stats()["groups"]["excel"]["warmed"] is True
+        assert "json.tool" in registry.warm_times["excel"]
+
+    def test_missing_dependencies_are_skipped(self):
+        registry = BlueprintRegistry(group_deps={"excel": ("no_such_module_xyz",)})
+        client = self._app(registry).test_client()
+
+        assert client.get("/api/sheets").status_code == 200
+        assert registry.warm_times["excel"] == {}
+
+    def test_import_failures_are_recorded(self):
+        registry = BlueprintRegistry()
+        blueprints = registry.import_all([("routes.no_such_module", "missing_bp")])
+        assert blueprints == {"missing_bp": None}
+        assert "missing_bp" in registry.failed
+
+    def test_warmup_from_env(self, monkeypatch):
+        registry = BlueprintRegistry(group_deps={"excel": ("json.tool",), "pdf": ()})
+        monkeypatch.setenv("WARMUP_ROUTE_GROUPS", "excel")
+        assert set(registry.warmup_from_env()) == {"excel"}
+
+
+def test_parse_importtime():
+    sample = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   encodings.aliases\n"
+        "import time:      1500 |       1620 | encodings\n"
+        "noise line\n"
+    )
+    rows = startup_profile.parse_importtime(sample)
+    assert rows == [("encodings.aliases", 120, 120, 1), ("encodings", 1500, 1620, 0)]
+
+    digest = startup_profile.summarize(rows, top=1)
+    assert digest["total_ms"] == 1.62
+    assert digest["top_cumulative"] == [("encodings", 1.62)]
+    assert digest["by_package"] == [("encodings", 1.62)]
+
+
+@pytest.mark.slow
+def test_heavy_dependencies_not_imported_at_startup():
+    result = _import_in_subprocess("src.main")
+    assert result["loaded"] == []
+
+
+@pytest.mark.slow
+def test_benchmark_startup_import():
+    """Cold import time of the application module, with the top offenders"""
+    result = _import_in_subprocess("src.main")
+    digest = startup_profile.summarize(startup_profile.profile_module("src.main"), top=5)
+    assert digest["top_cumulative"]
+    assert result["seconds"] < 30
@@ -0,0 +1,211 @@
+"""
+Tests for cached statistics rollups (services/stats_rollups.py).
+
+Covers:
+- Invoice and product stats computed from one grouped scan
+- Same response keys as the per-metric count()/sum() queries
+- Cache hits cost no query; commits (ORM and bulk) invalidate, rollbacks don't
+- Freshness metadata
+"""
+
+import enum
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Enum,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    create_engine,
+    event,
+    update,
+)
+from sqlalchemy.orm import Session, declarative_base
+
+from src.services.stats_rollups import (
+    StatsCache,
+    invoice_rollup,
+    product_rollup,
+    stats_cache,
+)
+from src.services import stats_rollups
+
+Base = declarative_base()
+
+
+class InvoiceType(enum.Enum):
+    SALES = "sales"
+    PURCHASE = "purchase"
+
+
+class InvoiceStatus(enum.Enum):
+    DRAFT = "draft"
+    CONFIRMED = "confirmed"
+    PAID = "paid"
+
+
+class ProductType(enum.Enum):
+    STORABLE = "storable"
+    SERVICE = "service"
+
+
+class Invoice(Base):
+    __tablename__ = "rollup_invoices"
+    id = Column(Integer, primary_key=True)
+    invoice_type = Column(Enum(InvoiceType))
+    status = Column(Enum(InvoiceStatus))
+    total_amount = Column(Numeric(15, 2))
+    paid_amount = Column(Numeric(15, 2))
+    remaining_amount = Column(Numeric(15, 2))
+
+
+class Category(Base):
+    __tablename__ = "rollup_categories"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+
+class Product(Base):
+    __tablename__ = "rollup_products"
+    id = Column(Integer, primary_key=True)
+    is_active = Column(Boolean)
+    product_type = Column(Enum(ProductType))
+    category_id = Column(Integer, ForeignKey("rollup_categories.id"))
+    current_stock = Column(Integer)
+    min_quantity = Column(Integer)
+    cost_price = Column(Numeric(10, 2))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(stats_rollups, "stats_cache", StatsCache(ttl=60))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as sess:
+        for i in range(30):
+            sess.add(
+                Invoice(
+                    invoice_type=InvoiceType.SALES if i % 3 else InvoiceType.PURCHASE,
+                    status=list(InvoiceStatus)[i % 3],
+                    total_amount=Decimal("10.00"),
+                    paid_amount=Decimal("4.00"),
+                    remaining_amount=Decimal("6.00"),
+                )
+            )
+        sess.add_all([Category(id=1, name="بذور"), Category(id=2, name="أسمدة")])
+        for i in range(20):
+            sess.add(
+                Product(
+                    is_active=i % 4 != 0,
+                    product_type=ProductType.STORABLE if i % 2 else ProductType.SERVICE,
+                    category_id=1 + i % 2 if i < 18 else None,
+                    current_stock=i - 2,
+                    min_quantity=5,
+                    cost_price=Decimal("2.50"),
+                )
+            )
+        sess.commit()
+        sess.statements = statements
+        yield sess
+
+
+def _expected_invoice_stats(sess):
+    """The per-metric queries of the original endpoint."""
+    q = sess.query(Invoice)
+    return {
+        "total_invoices": q.count(),
+        "by_type": {
+            "sales": q.filter(Invoice.invoice_type == InvoiceType.SALES).count(),
+            "purchase": q.filter(Invoice.invoice_type == InvoiceType.PURCHASE).count(),
+        },
+        "by_status": {
+            s.value: q.filter(Invoice.status == s).count() for s in InvoiceStatus
+        },
+        "amounts": {
+            "total_sales": 200.0,
+            "total_purchases": 100.0,
+            "total_paid": 120.0,
+            "total_remaining": 180.0,
+        },
+    }
+
+
+def test_invoice_rollup_single_scan(session):
+    expected = _expected_invoice_stats(session)
+    session.statements.clear()
+    assert invoice_rollup(session, Invoice) == expected
+    assert len(session.statements) == 1
+
+
+def test_product_rollup(session):
+    session.statements.clear()
+    stats = product_rollup(session, Product, ProductType, Category)
+    # one products scan + category names lookup
+    assert len(session.statements) == 2
+    assert stats["total_products"] == 20
+    assert stats["active_products"] == 15
+    assert stats["inactive_products"] == 5
+    assert stats["total_stock"] == sum(range(-2, 18))
+    assert stats["low_stock_products"] == 5  # stock 1..5
+    assert stats["out_of_stock_products"] == 3  # stock -2..0
+    assert stats["total_inventory_value"] == 2.5 * sum(range(-2, 18))
+    assert stats["by_type"] == {"storable": 10, "service": 10}
+    assert sorted(stats["by_category"], key=lambda c: c["category"]) == [
+        {"category": "أسمدة", "count": 9},
+        {"category": "بذور", "count": 9},
+    ]
+
+
+def test_cache_hit_and_invalidation(session):
+    data, meta = stats_rollups.invoice_stats(session, Invoice)
+    assert meta["cached"] is False and meta["generated_at"]
+
+    session.statements.clear()
+    again, meta = stats_rollups.invoice_stats(session, Invoice)
+    assert again == data and meta["cached"] is True
+    assert session.statements == []
+
+    # Rolled back writes keep the cache
+    session.add(Invoice(invoice_type=InvoiceType.SALES, status=InvoiceStatus.DRAFT))
+    session.flush()
+    session.rollback()
+    assert stats_rollups.invoice_stats(session, Invoice)[1]["cached"] is True
+
+    # Committed ORM writes invalidate
+    session.add(Invoice(invoice_type=InvoiceType.SALES, status=InvoiceStatus.DRAFT))
+    session.commit()
+    data, meta = stats_rollups.invoice_stats(session, Invoice)
+    assert meta["cached"] is False
+    assert data["total_invoices"] == 31
+
+    # Bulk UPDATE statements invalidate as well
+    session.execute(update(Invoice).values(status=InvoiceStatus.PAID))
+    session.commit()
+    data, meta = stats_rollups.invoice_stats(session, Invoice)
+    assert meta["cached"] is False
+    assert data["by_status"]["paid"] == 31
+
+
+def test_writes_to_other_tables_keep_invoice_cache(session):
+    stats_rollups.invoice_stats(session, Invoice)
+    session.add(Category(name="أدوات"))
+    session.commit()
+    assert stats_rollups.invoice_stats(session, Invoice)[1]["cached"] is True
+    assert stats_rollups.product_stats(session, Product, ProductType, Category)[1][
+        "cached"
+    ] is False
+
+
+def test_ttl_expiry(session, monkeypatch):
+    monkeypatch.setattr(stats_rollups, "stats_cache", StatsCache(ttl=0))
+    stats_rollups.invoice_stats(session, Invoice)
+    assert stats_rollups.invoice_stats(session, Invoice)[1]["cached"] is False
+    assert stats_cache is not stats_rollups.stats_cache
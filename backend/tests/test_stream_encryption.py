@@ -0,0 +1,239 @@
+"""
+Tests for streaming chunked file encryption (utils/stream_encryption.py).
+
+Covers:
+- SEF1 round trips across chunk boundaries and through gzip
+- Tamper, truncation, chunk reordering and wrong-key detection
+- Reading legacy one-shot Fernet files
+- EncryptionManager / BackupService integration, piped dump/restore tools
+- Peak memory vs one-shot Fernet (slow)
+"""
+
+import gzip
+import io
+import os
+import subprocess
+import sys
+import tracemalloc
+
+import pytest
+from cryptography.fernet import Fernet
+
+from src.utils.stream_encryption import (
+    HEADER_SIZE,
+    TAG_SIZE,
+    StreamCipher,
+    StreamDecryptionError,
+    is_stream_encrypted,
+)
+
+CHUNK = 4096
+
+
+@pytest.fixture
+def key():
+    return Fernet.generate_key()
+
+
+@pytest.fixture
+def cipher(key):
+    return StreamCipher(key, chunk_size=CHUNK)
+
+
+def _encrypt(cipher, data):
+    out = io.BytesIO()
+    cipher.encrypt_stream(io.BytesIO(data), out)
+    return out.getvalue()
+
+
+def _decrypt(cipher, blob):
+    out = io.BytesIO()
+    cipher.decrypt_stream(io.BytesIO(blob), out)
+    return out.getvalue()
+
+
+class TestRoundTrip:
+    @pytest.mark.parametrize("size", [0, 1, CHUNK - 1, CHUNK, CHUNK + 1, 5 * CHUNK + 7])
+    def test_round_trip(self, cipher, size):
+        data = os.urandom(size)
+        blob = _encrypt(cipher, data)
+
+        assert is_stream_encrypted(blob)
+        chunks = max(1, -(-size // CHUNK))
+        assert len(blob) == HEADER_SIZE + size + chunks * TAG_SIZE
+        assert _decrypt(cipher, blob) == data
+
+    def test_same_plaintext_encrypts_differently(self, cipher):
+        assert _encrypt(cipher, b"backup") != _encrypt(cipher, b"backup")
+
+    def test_gzip_pipeline(self, cipher):
+        payload = b"INSERT INTO products VALUES (1, 'widget');\n" * 5000
+        raw = io.BytesIO()
+        with cipher.writer(raw) as enc:
+            with gzip.GzipFile(fileobj=enc, mode="wb") as gz:
+                gz.write(payload)
+
+        raw.seek(0)
+        with gzip.GzipFile(fileobj=cipher.reader(raw), mode="rb") as gz:
+            assert gz.read() == payload
+
+
+class TestIntegrity:
+    def test_tampered_chunk_rejected(self, cipher):
+        blob = bytearray(_encrypt(cipher, os.urandom(3 * CHUNK)))
+        blob[HEADER_SIZE + CHUNK + 5] ^= 0x01
+        with pytest.raises(StreamDecryptionError):
+            _decrypt(cipher, bytes(blob))
+
+    def test_truncation_at_chunk_boundary_rejected(self, cipher):
+        blob = _encrypt(cipher, os.urandom(3 * CHUNK))
+        with pytest.raises(StreamDecryptionError):
+            _decrypt(cipher, blob[: HEADER_SIZE + 2 * (CHUNK + TAG_SIZE)])
+
+    def test_reordered_chunks_rejected(self, cipher):
+        blob = _encrypt(cipher, os.urandom(3 * CHUNK))
+        sealed = CHUNK + TAG_SIZE
+        first = blob[HEADER_SIZE : HEADER_SIZE + sealed]
+        second = blob[HEADER_SIZE + sealed : HEADER_SIZE + 2 * sealed]
+        swapped = blob[:HEADER_SIZE] + second + first + blob[HEADER_SIZE + 2 * sealed :]
+        with pytest.raises(StreamDecryptionError):
+            _decrypt(cipher, swapped)
+
+    def test_wrong_key_rejected(self, cipher):
+        blob = _encrypt(cipher, b"secret ledger")
+        with pytest.raises(StreamDecryptionError):
+            _decrypt(StreamCipher(Fernet.generate_key()), blob)
+
+    def test_failed_decrypt_leaves_no_output(self, cipher, tmp_path):
+        enc = tmp_path / "data.enc"
+        enc.write_bytes(_encrypt(cipher, os.urandom(2 * CHUNK))[:-1])
+        with pytest.raises(StreamDecryptionError):
+            cipher.decrypt_file(enc, tmp_path / "data.bin")
+        assert os.listdir(tmp_path) == ["data.enc"]
+
+
+class TestLegacyFernet:
+    @pytest.mark.parametrize("size", [0, 15, 16, 100_000])
+    def test_reads_one_shot_fernet_files(self, key, cipher, size):
+        data = os.urandom(size)
+        assert _decrypt(cipher, Fernet(key).encrypt(data)) == data
+
+    def test_tampered_fernet_file_rejected(self, key, cipher):
+        token = bytearray(Fernet(key).encrypt(b"x" * 1000))
+        token[60] = ord("A") if token[60] != ord("A") else ord("B")
+        with pytest.raises(StreamDecryptionError):
+            _decrypt(cipher, bytes(token))
+
+
+def test_encryption_manager_file_round_trip(key, tmp_path):
+    from src.encryption_manager import EncryptionManager
+
+    manager = EncryptionManager.__new__(EncryptionManager)
+    manager.master_key = key
+    manager.fernet = Fernet(key)
+    manager.stream_cipher = StreamCipher(key)
+
+    plain = tmp_path / "upload.pdf"
+    plain.write_bytes(os.urandom(50_000))
+    legacy = tmp_path / "legacy.pdf.encrypted"
+    legacy.write_bytes(Fernet(key).encrypt(plain.read_bytes()))
+
+    assert manager.encrypt_file(plain, tmp_path / "upload.pdf.encrypted")
+    assert is_stream_encrypted(tmp_path / "upload.pdf.encrypted")
+    assert manager.decrypt_file(tmp_path / "upload.pdf.encrypted", tmp_path / "out.pdf")
+    assert manager.decrypt_file(legacy, tmp_path / "legacy_out.pdf")
+    assert (tmp_path / "out.pdf").read_bytes() == plain.read_bytes()
+    assert (tmp_path / "legacy_out.pdf").read_bytes() == plain.read_bytes()
+
+
+def test_encrypted_sqlite_backup_round_trip(key, tmp_path):
+    from flask import Flask
+
+    from src.services.backup_service import BackupService
+
+    import sqlite3
+
+    db_file = tmp_path / "store.db"
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE blobs (id INTEGER PRIMARY KEY, data BLOB)")
+    conn.executemany(
+        "INSERT INTO blobs (data) VALUES (?)", [(os.urandom(1000),) for _ in range(200)]
+    )
+    conn.commit()
+    conn.close()
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    service = BackupService(backup_dir=str(tmp_path / "backups"), encryption_key=key)
+
+    with app.app_context():
+        info = service.create_backup(compress=True, encrypt=True)
+        assert info.filename.endswith((".db.gz.enc", ".db.zst.enc"))
+        assert info.encrypted and info.compressed
+        assert [b.filename for b in service.list_backups()] == [info.filename]
+
+        dump = "\n".join(sqlite3.connect(db_file).iterdump())
+        db_file.write_bytes(b"corrupted")
+        assert service.restore_backup(info.filename)
+    assert "\n".join(sqlite3.connect(db_file).iterdump()) == dump
+
+
+def test_piped_tool_with_verbose_stderr():
+    from src.services.backup_service import BackupService
+
+    # more stderr than a pipe buffer holds, written before any stdout
+    noisy = "import sys; sys.stderr.write('w' * 1000000); sys.stdout.write('dump')"
+    out = io.BytesIO()
+    BackupService._run_piped([sys.executable, "-c", noisy], dict(os.environ), stdout_to=out)
+    assert out.getvalue() == b"dump"
+
+    failing = "import sys; sys.stdin.read(); sys.exit('restore failed')"
+    with pytest.raises(subprocess.CalledProcessError) as exc:
+        BackupService._run_piped(
+            [sys.executable, "-c", failing], dict(os.environ), stdin_from=io.BytesIO(b"x" * 10**6)
+        )
+    assert exc.value.stderr == b"restore failed\n"
+
+
+def _peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+@pytest.mark.slow
+def test_benchmark_streaming_vs_fernet(key, tmp_path):
+    """Peak memory for a 32 MB file"""
+    size = 32 * 1024 * 1024
+    plain = tmp_path / "backup.db"
+    with open(plain, "wb") as f:
+        for _ in range(size // (1024 * 1024)):
+            f.write(os.urandom(1024 * 1024))
+    cipher = StreamCipher(key)
+    fernet = Fernet(key)
+
+    def one_shot():
+        (tmp_path / "fernet.enc").write_bytes(fernet.encrypt(plain.read_bytes()))
+
+    def streaming():
+        cipher.encrypt_file(plain, tmp_path / "sef.enc")
+
+    def streaming_decrypt():
+        cipher.decrypt_file(tmp_path / "sef.enc", tmp_path / "sef.out")
+
+    def legacy_decrypt():
+        cipher.decrypt_file(tmp_path / "fernet.enc", tmp_path / "fernet.out")
+
+    fernet_peak = _peak_memory(one_shot)
+    sef_peak = _peak_memory(streaming)
+    sef_dec_peak = _peak_memory(streaming_decrypt)
+    legacy_peak = _peak_memory(legacy_decrypt)
+
+    assert (tmp_path / "sef.out").read_bytes() == plain.read_bytes()
+    assert (tmp_path / "fernet.out").read_bytes() == plain.read_bytes()
+    # Constant memory: a few chunks, independent of the file size
+    assert sef_peak < 8 * 1024 * 1024
+    assert sef_dec_peak < 8 * 1024 * 1024
+    assert legacy_peak < 8 * 1024 * 1024
+    assert fernet_peak > size
@@ -0,0 +1,145 @@
+"""
+Tests for the tax registry and batch calculator (services/tax_service.py).
+
+Covers:
+- Inclusive, exclusive and compound taxes in exact Decimal arithmetic
+- One rounding policy: totals are the sums of the rounded lines
+- Registry loaded once, reloaded after TaxConfiguration writes
+- 500-line invoice taxed without database queries
+- Invoice discounts spread over the lines before their taxes
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from sqlalchemy import event
+
+from src.database import db
+from src.routes import invoices_unified
+from src.services.tax_service import (
+    TaxConfiguration,
+    TaxRegistry,
+    TaxService,
+    tax_registry,
+)
+
+
+def _row(code, rate, **kwargs):
+    return {"code": code, "name": code, "rate": rate, **kwargs}
+
+
+def test_inclusive_exclusive_and_compound(monkeypatch):
+    registry = TaxRegistry(
+        load=lambda: [
+            _row("INC", 15, is_inclusive=True),
+            _row("CITY", 2),
+            _row("LUX", 10, is_compound=True),
+            _row("OLD", 5, valid_until=datetime(2020, 1, 1)),
+        ],
+        versions=type("V", (), {"get": lambda self, t: (0,)})(),
+    )
+    monkeypatch.setattr("src.services.tax_service.tax_registry", registry)
+
+    result = TaxService.calculate_batch(
+        [
+            {"amount": "115.00", "quantity": 1, "tax_code": "INC"},
+            {"amount": 0.1, "quantity": 3},
+            {"amount": 100, "quantity": 2, "discount": 20, "tax_code": ["LUX", "CITY"]},
+            {"amount": 50, "tax_code": "OLD"},
+            {"amount": 10, "tax_code": "EXEMPT"},
+        ]
+    )
+    inclusive, vat, compound, expired, exempt = result.lines
+
+    assert (inclusive.subtotal, inclusive.tax, inclusive.total) == (
+        Decimal("100.00"), Decimal("15.00"), Decimal("115.00"),
+    )
+    # 0.1 * 3 is exactly 0.30 (no float drift), VAT from the defaults
+    assert (vat.subtotal, vat.tax) == (Decimal("0.30"), Decimal("0.05"))
+    # city 2% on 180, luxury 10% on 180 + 3.60
+    assert compound.taxes == {"CITY": Decimal("3.60"), "LUX": Decimal("18.36")}
+    assert compound.total == Decimal("201.96")
+    assert (expired.tax, exempt.tax) == (Decimal("0"), Decimal("0"))
+
+    assert result.total_tax == float(sum(line.tax for line in result.lines))
+    assert result.total == float(sum(line.total for line in result.lines))
+    by_code = {b.tax_code: b for b in result.breakdown}
+    assert by_code["INC"].is_inclusive and by_code["INC"].taxable_amount == 100.0
+    assert set(by_code) == {"INC", "VAT", "CITY", "LUX"}
+
+    single = TaxService.calculate_tax(100, "INC", quantity=2).to_dict()
+    assert single == {
+        "subtotal": 173.91, "total_tax": 26.09, "total": 200.0,
+        "breakdown": [{"tax_code": "INC", "tax_name": "INC", "rate": 15,
+                       "taxable_amount": 173.91, "tax_amount": 26.09,
+                       "is_inclusive": True}],
+    }
+
+
+def test_invoice_discount_is_taxed_per_line(monkeypatch):
+    registry = TaxRegistry(
+        load=lambda: [_row("VAT", 15), _row("INC", 15, is_inclusive=True)],
+        versions=type("V", (), {"get": lambda self, t: (0,)})(),
+    )
+    monkeypatch.setattr("src.services.tax_service.tax_registry", registry)
+    items = [
+        {"price": 100, "quantity": 2, "discount": 20},
+        {"price": 0.1, "quantity": 3},
+        {"price": 115, "quantity": 1, "tax_code": "INC"},
+    ]
+
+    # 10% of 295.30, pro rata to the line amounts
+    spread = invoices_unified.spread_invoice_discount(items, Decimal("29.53"))
+    assert [line["discount"] for line in spread] == [
+        Decimal("38.00"), Decimal("0.03"), Decimal("11.50"),
+    ]
+    assert spread[2]["tax_code"] == "INC" and items[0]["discount"] == 20
+
+    lines = invoices_unified.calculate_line_taxes(spread, "VAT").lines
+    # 15% on the discounted amounts: 162.00, 0.27 and 103.50 incl. tax
+    assert [(line.subtotal, line.tax) for line in lines] == [
+        (Decimal("162.00"), Decimal("24.30")),
+        (Decimal("0.27"), Decimal("0.04")),
+        (Decimal("90.00"), Decimal("13.50")),
+    ]
+
+    create_invoice = invoices_unified.create_invoice
+    create_invoice = getattr(create_invoice, "__wrapped__", create_invoice)  # skip auth
+    with Flask(__name__).test_request_context(
+        json={"invoice_type": "sales", "items": items, "tax_rate": 15, "tax_code": "VAT"}
+    ):
+        response, status = create_invoice()
+    assert status == 400 and "tax_code" in response.get_json()["error"]["message"]
+
+
+def test_registry_reloads_on_writes_and_costs_no_queries():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        TaxConfiguration.__table__.create(db.engine)
+        db.session.add(TaxConfiguration(code="VAT", name="VAT", rate=5.0))
+        db.session.commit()
+        tax_registry.invalidate()
+
+        queries = []
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *args: queries.append(args[2]))
+        items = [{"amount": 10, "quantity": i % 5 + 1} for i in range(500)]
+        TaxService.calculate_line_items(items)
+        assert len(queries) == 1
+
+        queries.clear()
+        result = TaxService.calculate_line_items(items)
+        assert queries == []
+        assert result.total_tax == 0.5 * sum(i % 5 + 1 for i in range(500))
+
+        config = TaxConfiguration.query.filter_by(code="VAT").one()
+        config.rate = 15.0
+        config.valid_from = datetime.utcnow() - timedelta(days=1)
+        db.session.commit()
+        assert TaxService.get_tax_rate("VAT").rate == 15.0
+        assert TaxService.get_tax_rate("VAT_ZERO").rate == 0.0
+        assert TaxService.get_tax_rate("NOPE") is None
+        db.session.remove()
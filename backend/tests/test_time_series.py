@@ -0,0 +1,202 @@
+"""
+Tests for time-bucketed report series (services/time_series.py).
+
+Covers:
+- Day / week / month buckets with zero-filled gaps
+- Half-open ranges on the raw indexed column (no DATE() on the column)
+- Dialect-aware bucket expressions and the per-day Python roll-up fallback
+- Reading from the daily_sales rollup, with invoices for uncovered days
+- Rollup used only from an unbroken run of days; invoice writes refresh it
+- Nightly scheduler job rebuilding the rollup
+- Financial report series served by the same helper
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+import src.models.customer  # noqa: F401  (tables referenced by invoices)
+import src.models.inventory  # noqa: F401
+import src.models.supplier  # noqa: F401
+import src.models.user  # noqa: F401
+from src.database import db
+from src.models.invoice_unified import Invoice, InvoiceStatus, InvoiceType
+from src.routes.financial_reports import financial_reports_bp
+from src.services import time_series
+from src.services.time_series import (
+    DailySales,
+    bucket_expression,
+    bucket_starts,
+    refresh_daily_sales,
+    sales_series,
+)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    app.register_blueprint(financial_reports_bp)
+    with app.app_context():
+        Invoice.__table__.create(db.engine)
+        yield app
+        db.session.remove()
+
+
+def _invoice(n, day, amount, kind=InvoiceType.SALES, status=InvoiceStatus.CONFIRMED):
+    db.session.add(
+        Invoice(
+            invoice_number=f"INV-{n}",
+            invoice_type=kind,
+            invoice_date=day,
+            total_amount=amount,
+            status=status,
+            created_by=1,
+        )
+    )
+
+
+def _seed():
+    _invoice(1, date(2026, 2, 27), 10)
+    _invoice(2, date(2026, 3, 2), 20)
+    _invoice(3, date(2026, 3, 2), 5)
+    _invoice(4, date(2026, 3, 4), 99, status=InvoiceStatus.CANCELLED)
+    _invoice(5, date(2026, 3, 4), 40, kind=InvoiceType.PURCHASE)
+    _invoice(6, date(2026, 3, 31), 7)
+    _invoice(7, date(2026, 4, 1), 1000)  # outside [start, end)
+    db.session.commit()
+
+
+def test_buckets_and_gaps():
+    assert bucket_starts(date(2026, 3, 4), date(2026, 3, 17), "week") == [
+        date(2026, 3, 2), date(2026, 3, 9), date(2026, 3, 16),
+    ]
+    assert bucket_starts(date(2025, 12, 15), date(2026, 2, 1), "month") == [
+        date(2025, 12, 1), date(2026, 1, 1),
+    ]
+    with pytest.raises(ValueError):
+        bucket_starts(date(2026, 1, 1), date(2026, 2, 1), "hour")
+
+    compiled = str(bucket_expression(Invoice.invoice_date, "week", "postgresql"))
+    assert compiled.startswith("date_trunc(")
+    assert bucket_expression(Invoice.invoice_date, "week", "mysql") is None
+
+
+def test_series_half_open_and_zero_filled(app):
+    _seed()
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    sales_series(db.session, date(2026, 3, 1), date(2026, 4, 1), "day")
+    statements.clear()  # the rollup table lookup happens once per engine
+    daily = sales_series(db.session, date(2026, 3, 1), date(2026, 4, 1), "day")
+    assert len(statements) == 1
+    assert "invoices.invoice_date >= ?" in statements[0]
+    assert "date(invoices.invoice_date) >=" not in statements[0]
+    assert len(daily) == 31
+    assert daily[0] == {"bucket": "2026-03-01", "label": "2026-03-01", "total": 0.0, "count": 0.0}
+    assert (daily[1]["total"], daily[1]["count"]) == (25.0, 2.0)
+    assert daily[3]["total"] == 0.0  # cancelled sale and a purchase only
+    assert daily[-1]["total"] == 7.0
+
+    weekly = sales_series(db.session, date(2026, 2, 23), date(2026, 4, 1), "week")
+    assert [(p["label"], p["total"]) for p in weekly] == [
+        ("W9/2026", 10.0), ("W10/2026", 25.0), ("W11/2026", 0.0),
+        ("W12/2026", 0.0), ("W13/2026", 0.0), ("W14/2026", 7.0),
+    ]
+
+    monthly = sales_series(db.session, date(2026, 2, 1), date(2026, 4, 1), "month")
+    assert [(p["label"], p["total"]) for p in monthly] == [("Feb 2026", 10.0), ("Mar 2026", 32.0)]
+
+    # dialects without a truncation expression group per day and roll up here
+    statements.clear()
+    original = time_series.bucket_expression
+    time_series.bucket_expression = lambda *args: None
+    try:
+        assert sales_series(db.session, date(2026, 2, 1), date(2026, 4, 1), "month") == monthly
+    finally:
+        time_series.bucket_expression = original
+    assert "date(invoices.invoice_date)" in statements[0]
+
+
+def test_reads_daily_rollup_for_covered_days(app):
+    _seed()
+    assert refresh_daily_sales(db.session, date(2026, 3, 1), date(2026, 3, 3)) == 8
+    db.session.commit()
+    # the rollup is authoritative for the days it covers
+    db.session.get(DailySales, (date(2026, 3, 2), "sales")).total_amount = 26
+    _invoice(8, date(2026, 3, 3), 3)
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    series = sales_series(db.session, date(2026, 3, 1), date(2026, 3, 5), "day")
+    assert [p["total"] for p in series] == [0.0, 26.0, 3.0, 0.0]
+    assert any("FROM daily_sales" in s and "GROUP BY" in s for s in statements)
+
+    client = app.test_client()
+    data = client.get("/api/reports/sales/daily?date=2026-03-04&days=4").get_json()["data"]
+    assert (data["total_sales"], data["total_orders"], data["average_order"]) == (29.0, 3, 9.67)
+    assert [p["sales"] for p in data["series"]] == [0.0, 26.0, 3.0, 0.0]
+
+    data = client.get("/api/reports/sales/weekly?week=2026-W10").get_json()["data"]
+    assert data["week"] == "2026-W10" and len(data["daily_breakdown"]) == 7
+    assert data["daily_breakdown"][0] == {
+        "date": "2026-03-02", "day": "الاثنين", "sales": 26.0, "orders": 2,
+    }
+
+
+def test_rollup_gaps_and_invoice_writes(app):
+    for n, day in enumerate((1, 5, 9), start=1):
+        _invoice(n, date(2026, 3, day), 10)
+    db.session.commit()
+    refresh_daily_sales(db.session, date(2026, 3, 8), date(2026, 3, 11))
+    db.session.commit()
+
+    # the rollup starts on Mar 8: earlier days come from invoices
+    series = sales_series(db.session, date(2026, 3, 1), date(2026, 3, 11), "day")
+    assert [p["total"] for p in series if p["total"]] == [10.0, 10.0, 10.0]
+
+    _invoice(4, date(2026, 3, 9), 50)
+    db.session.commit()
+    assert db.session.get(DailySales, (date(2026, 3, 9), "sales")).total_amount == 60
+    series = sales_series(db.session, date(2026, 3, 8), date(2026, 3, 11), "day")
+    assert [p["total"] for p in series] == [0.0, 60.0, 0.0]
+
+    # moving an invoice refreshes both days; days outside the rollup stay out
+    invoice = Invoice.query.filter_by(invoice_number="INV-4").one()
+    invoice.invoice_date = date(2026, 3, 12)
+    db.session.commit()
+    assert db.session.get(DailySales, (date(2026, 3, 9), "sales")).total_amount == 10
+    assert db.session.get(DailySales, (date(2026, 3, 12), "sales")) is None
+    assert time_series.period_total(db.session, date(2026, 3, 8), date(2026, 3, 13)) == 60.0
+
+    Invoice.query.filter(Invoice.invoice_date == date(2026, 3, 9)).delete()
+    db.session.commit()
+    assert DailySales.query.count() == 0
+    assert time_series.period_total(db.session, date(2026, 3, 1), date(2026, 3, 13)) == 70.0
+
+
+def test_scheduler_rebuilds_the_rollup(app, monkeypatch):
+    from src.services.scheduler import TaskScheduler
+
+    today = date.today()
+    _invoice(1, today - timedelta(days=5), 10)
+    _invoice(2, today, 15)
+    db.session.commit()
+
+    scheduler = TaskScheduler(app)
+    assert scheduler._jobs["refresh_daily_sales"]["trigger"] == "cron"
+    scheduler._job_refresh_daily_sales()
+    types = len(InvoiceType)
+    assert DailySales.query.count() == 6 * types
+    assert db.session.get(DailySales, (today, "sales")).total_amount == 15
+
+    monkeypatch.setenv("DAILY_SALES_REFRESH_DAYS", "2")
+    DailySales.query.delete()
+    db.session.commit()
+    scheduler._job_refresh_daily_sales()
+    assert DailySales.query.count() == 2 * types
@@ -0,0 +1,114 @@
+"""
+Startup import-time profiler.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+prints a digest: total import time, the slowest modules (cumulative and self)
+and time grouped by top-level package.
+
+Usage:
+    python tools/startup_profile.py                 # profiles src.main
+    python tools/startup_profile.py --module app --top 30
+    python tools/startup_profile.py --json > startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr_text):
+    """Parse ``-X importtime`` output into [(module, self_us, cumulative_us, depth)]"""
+    rows = []
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line.split("|", 2)
+            self_us = int(self_us.replace("import time:", "").strip())
+            cumulative_us = int(cumulative_us.strip())
+        except ValueError:
+            continue
+        # one leading space after "|", then two spaces per nesting level
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def summarize(rows, top=20):
+    """Digest of parsed rows (times in milliseconds)"""
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".", 1)[0]] += self_us
+
+    def _ms(us):
+        return round(us / 1000.0, 2)
+
+    return {
+        "total_ms": _ms(sum(self_us for _, self_us, _, _ in rows)),
+        "module_count": len(rows),
+        "top_cumulative": [
+            (name, _ms(cum))
+            for name, _, cum, _ in sorted(rows, key=lambda r: -r[2])[:top]
+        ],
+        "top_self": [
+            (name, _ms(self_us))
+            for name, self_us, _, _ in sorted(rows, key=lambda r: -r[1])[:top]
+        ],
+        "by_package": [
+            (package, _ms(us))
+            for package, us in sorted(by_package.items(), key=lambda i: -i[1])[:top]
+        ],
+    }
+
+
+def profile_module(module="src.main", env=None):
+    """Import ``module`` in a subprocess with -X importtime; returns parsed rows"""
+    proc_env = dict(os.environ, **(env or {}))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=proc_env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def _print_table(title, items):
+    print(f"\n{title}")
+    print("-" * len(title))
+    for name, ms in items:
+        print(f"{ms:10.2f} ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile backend startup imports")
+    parser.add_argument("--module", default="src.main", help="module to import")
+    parser.add_argument("--top", type=int, default=20, help="rows per table")
+    parser.add_argument("--json", action="store_true", help="emit JSON")
+    args = parser.parse_args(argv)
+
+    digest = summarize(profile_module(args.module), top=args.top)
+    if args.json:
+        print(json.dumps(digest, indent=2))
+        return 0
+
+    print(
+        f"import {args.module}: {digest['total_ms']:.1f} ms "
+        f"across {digest['module_count']} modules"
+    )
+    _print_table("Slowest modules (cumulative)", digest["top_cumulative"])
+    _print_table("Slowest modules (self)", digest["top_self"])
+    _print_table("Time by top-level package", digest["by_package"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())